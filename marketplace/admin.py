@@ -1,9 +1,50 @@
+import re
+
 from django.contrib import admin
+from django.db.models import Q
 from django.utils.html import format_html
 from .models import (
     Category, Seller, Buyer, Product, ProductImage, PODCustomization, 
-    ProductReview, Order, OrderItem, Transaction, CreditTransaction
+    ProductReview, Order, OrderItem, Transaction, CreditTransaction,
+    ModerationJob, ApprovalAudit, ProductImport, ChunkedUpload
 )
+from .moderation import enqueue_job
+from .pagination import EstimatedCountPaginator
+
+
+# A state code followed by the PAN's letters (GSTIN characters 3-7): digits
+# alone could be a phone number, so they are searched normally
+GSTIN_PREFIX = r'^[0-9]{2}([A-Z]{1,4}|[A-Z]{5}[0-9A-Z]{0,8})$'
+
+
+class ScalableChangeListMixin:
+    """
+    Changelist settings for tables that grow without bound.
+
+    Skips the unfiltered COUNT(*) shown next to filtered results, uses a
+    planner estimate for the page count of unfiltered listings, and routes
+    searches that look like an identifier (``prefix_search_fields`` maps a
+    field to the pattern its values follow) to an index-backed prefix match
+    instead of OR-ing ``icontains`` across every search field. The patterns
+    must not match terms meant for the other search fields, such as phone
+    numbers or names, since those fields are then not searched.
+    """
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+    prefix_search_fields = {}
+    
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip().upper()
+        matching = [
+            field for field, pattern in self.prefix_search_fields.items()
+            if term and re.match(pattern, term)
+        ]
+        if matching:
+            condition = Q()
+            for field in matching:
+                condition |= Q(**{f'{field}__prefix': term})
+            return queryset.filter(condition), False
+        return super().get_search_results(request, queryset, search_term)
 
 
 @admin.register(Category)
@@ -14,13 +55,15 @@ class CategoryAdmin(admin.ModelAdmin):
 
 
 @admin.register(Seller)
-class SellerAdmin(admin.ModelAdmin):
+class SellerAdmin(ScalableChangeListMixin, admin.ModelAdmin):
     list_display = [
         'business_name', 'owner_name', 'user', 'gstin', 'city', 'state', 
         'business_type', 'approval_status_badge', 'verified', 'turnover', 'created_at'
     ]
-    list_filter = ['business_type', 'verified', 'approval_status', 'state']
-    search_fields = ['business_name', 'owner_name', 'user__username', 'city', 'gstin']
+    list_filter = ['business_type', 'verified', 'approval_status', 'gstin_status', 'state']
+    list_select_related = ['user']
+    search_fields = ['business_name', 'owner_name', 'user__username', 'city']
+    prefix_search_fields = {'gstin': GSTIN_PREFIX}
     ordering = ['-created_at']
     list_editable = ['verified']
     readonly_fields = ['created_at']
@@ -30,7 +73,7 @@ class SellerAdmin(admin.ModelAdmin):
             'fields': ('user', 'owner_name')
         }),
         ('Business Details', {
-            'fields': ('business_name', 'business_type', 'gstin', 'turnover')
+            'fields': ('business_name', 'business_type', 'gstin', 'gstin_status', 'turnover')
         }),
         ('Contact Information', {
             'fields': ('phone', 'address', 'city', 'state', 'pincode')
@@ -65,13 +108,13 @@ class SellerAdmin(admin.ModelAdmin):
     actions = ['approve_sellers', 'reject_sellers']
     
     def approve_sellers(self, request, queryset):
-        updated = queryset.update(approval_status='approved', verified=True)
-        self.message_user(request, f'{updated} sellers approved successfully.')
+        job = enqueue_job('seller', 'approve', queryset.values_list('pk', flat=True), requested_by=request.user)
+        self.message_user(request, f'Queued moderation job #{job.pk} to approve {job.total} sellers.')
     approve_sellers.short_description = 'Approve selected sellers'
     
     def reject_sellers(self, request, queryset):
-        updated = queryset.update(approval_status='rejected', verified=False)
-        self.message_user(request, f'{updated} sellers rejected.')
+        job = enqueue_job('seller', 'reject', queryset.values_list('pk', flat=True), requested_by=request.user)
+        self.message_user(request, f'Queued moderation job #{job.pk} to reject {job.total} sellers.')
     reject_sellers.short_description = 'Reject selected sellers'
 
 
@@ -86,13 +129,15 @@ class PODCustomizationInline(admin.TabularInline):
 
 
 @admin.register(Buyer)
-class BuyerAdmin(admin.ModelAdmin):
+class BuyerAdmin(ScalableChangeListMixin, admin.ModelAdmin):
     list_display = [
         'name', 'business_name', 'user', 'gstin', 'mobile_number', 
         'approval_status_badge', 'verified', 'credit_balance', 'created_at'
     ]
-    list_filter = ['verified', 'approval_status', 'created_at']
-    search_fields = ['name', 'business_name', 'user__username', 'gstin', 'mobile_number']
+    list_filter = ['verified', 'approval_status', 'gstin_status', 'created_at']
+    list_select_related = ['user']
+    search_fields = ['name', 'business_name', 'user__username', 'mobile_number']
+    prefix_search_fields = {'gstin': GSTIN_PREFIX}
     ordering = ['-created_at']
     list_editable = ['verified']
     readonly_fields = ['created_at']
@@ -102,7 +147,7 @@ class BuyerAdmin(admin.ModelAdmin):
             'fields': ('user', 'name', 'business_name')
         }),
         ('Contact Information', {
-            'fields': ('address', 'mobile_number', 'gstin')
+            'fields': ('address', 'mobile_number', 'gstin', 'gstin_status')
         }),
         ('Financial Information', {
             'fields': ('credit_balance', 'bank_name', 'account_number', 'ifsc_code')
@@ -131,23 +176,24 @@ class BuyerAdmin(admin.ModelAdmin):
     actions = ['approve_buyers', 'reject_buyers']
     
     def approve_buyers(self, request, queryset):
-        updated = queryset.update(approval_status='approved', verified=True)
-        self.message_user(request, f'{updated} buyers approved successfully.')
+        job = enqueue_job('buyer', 'approve', queryset.values_list('pk', flat=True), requested_by=request.user)
+        self.message_user(request, f'Queued moderation job #{job.pk} to approve {job.total} buyers.')
     approve_buyers.short_description = 'Approve selected buyers'
     
     def reject_buyers(self, request, queryset):
-        updated = queryset.update(approval_status='rejected', verified=False)
-        self.message_user(request, f'{updated} buyers rejected.')
+        job = enqueue_job('buyer', 'reject', queryset.values_list('pk', flat=True), requested_by=request.user)
+        self.message_user(request, f'Queued moderation job #{job.pk} to reject {job.total} buyers.')
     reject_buyers.short_description = 'Reject selected buyers'
 
 
 @admin.register(Product)
-class ProductAdmin(admin.ModelAdmin):
+class ProductAdmin(ScalableChangeListMixin, admin.ModelAdmin):
     list_display = [
         'name', 'seller', 'category', 'mrp', 'selling_price', 'gst_rate', 
         'stock_quantity', 'approval_status_badge', 'is_active', 'is_customizable', 'created_at'
     ]
     list_filter = ['category', 'is_active', 'is_customizable', 'approval_status', 'gst_rate', 'seller__business_type']
+    list_select_related = ['seller', 'category']
     search_fields = ['name', 'description', 'tags', 'seller__business_name']
     ordering = ['-created_at']
     list_editable = ['is_active']
@@ -156,7 +202,7 @@ class ProductAdmin(admin.ModelAdmin):
     
     fieldsets = (
         ('Basic Information', {
-            'fields': ('seller', 'category', 'name', 'description')
+            'fields': ('seller', 'category', 'name', 'sku', 'description')
         }),
         ('Pricing & GST', {
             'fields': ('mrp', 'selling_price', 'gst_rate')
@@ -188,19 +234,20 @@ class ProductAdmin(admin.ModelAdmin):
     actions = ['approve_products', 'reject_products']
     
     def approve_products(self, request, queryset):
-        updated = queryset.update(approval_status='approved', is_active=True)
-        self.message_user(request, f'{updated} products approved successfully.')
+        job = enqueue_job('product', 'approve', queryset.values_list('pk', flat=True), requested_by=request.user)
+        self.message_user(request, f'Queued moderation job #{job.pk} to approve {job.total} products.')
     approve_products.short_description = 'Approve selected products'
     
     def reject_products(self, request, queryset):
-        updated = queryset.update(approval_status='rejected', is_active=False)
-        self.message_user(request, f'{updated} products rejected.')
+        job = enqueue_job('product', 'reject', queryset.values_list('pk', flat=True), requested_by=request.user)
+        self.message_user(request, f'Queued moderation job #{job.pk} to reject {job.total} products.')
     reject_products.short_description = 'Reject selected products'
 
 
 @admin.register(ProductImage)
 class ProductImageAdmin(admin.ModelAdmin):
     list_display = ['product', 'is_primary', 'created_at']
+    list_select_related = ['product']
     list_filter = ['is_primary', 'created_at']
     search_fields = ['product__name', 'alt_text']
 
@@ -208,6 +255,7 @@ class ProductImageAdmin(admin.ModelAdmin):
 @admin.register(PODCustomization)
 class PODCustomizationAdmin(admin.ModelAdmin):
     list_display = ['product', 'name', 'customization_type', 'additional_cost', 'is_required']
+    list_select_related = ['product']
     list_filter = ['customization_type', 'is_required']
     search_fields = ['product__name', 'name']
 
@@ -215,6 +263,7 @@ class PODCustomizationAdmin(admin.ModelAdmin):
 @admin.register(ProductReview)
 class ProductReviewAdmin(admin.ModelAdmin):
     list_display = ['product', 'user', 'rating', 'created_at']
+    list_select_related = ['product', 'user']
     list_filter = ['rating', 'created_at']
     search_fields = ['product__name', 'user__username', 'comment']
     ordering = ['-created_at']
@@ -227,13 +276,16 @@ class OrderItemInline(admin.TabularInline):
 
 
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
+class OrderAdmin(ScalableChangeListMixin, admin.ModelAdmin):
     list_display = [
         'order_number', 'buyer', 'seller', 'total_amount', 'status', 
         'payment_method', 'payment_status', 'created_at'
     ]
     list_filter = ['status', 'payment_method', 'payment_status', 'created_at']
-    search_fields = ['order_number', 'buyer__name', 'seller__business_name']
+    list_select_related = ['buyer', 'seller']
+    search_fields = ['buyer__name', 'seller__business_name']
+    # A digit tells an order number from a name starting with "ord"
+    prefix_search_fields = {'order_number': r'^ORD(?=[0-9A-Z]*[0-9])[0-9A-Z]{1,17}$'}
     ordering = ['-created_at']
     readonly_fields = ['order_number', 'created_at', 'updated_at']
     inlines = [OrderItemInline]
@@ -258,13 +310,15 @@ class OrderAdmin(admin.ModelAdmin):
 
 
 @admin.register(Transaction)
-class TransactionAdmin(admin.ModelAdmin):
+class TransactionAdmin(ScalableChangeListMixin, admin.ModelAdmin):
     list_display = [
         'transaction_id', 'transaction_type', 'buyer', 'seller', 'amount', 
         'status', 'created_at'
     ]
     list_filter = ['transaction_type', 'status', 'created_at']
-    search_fields = ['transaction_id', 'buyer__name', 'seller__business_name', 'reference_number']
+    list_select_related = ['buyer', 'seller']
+    search_fields = ['buyer__name', 'seller__business_name', 'reference_number']
+    prefix_search_fields = {'transaction_id': r'^TXN(?=[0-9A-Z-]*[0-9])[0-9A-Z-]{1,27}$'}
     ordering = ['-created_at']
     readonly_fields = ['transaction_id', 'created_at', 'updated_at']
     
@@ -285,9 +339,10 @@ class TransactionAdmin(admin.ModelAdmin):
 
 
 @admin.register(CreditTransaction)
-class CreditTransactionAdmin(admin.ModelAdmin):
+class CreditTransactionAdmin(ScalableChangeListMixin, admin.ModelAdmin):
     list_display = ['buyer', 'transaction_type', 'amount', 'balance_after', 'created_at']
     list_filter = ['transaction_type', 'created_at']
+    list_select_related = ['buyer']
     search_fields = ['buyer__name', 'reference', 'description']
     ordering = ['-created_at']
     readonly_fields = ['created_at']
@@ -303,3 +358,72 @@ class CreditTransactionAdmin(admin.ModelAdmin):
             'fields': ('created_at',)
         }),
     )
+
+
+@admin.register(ModerationJob)
+class ModerationJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'target', 'action', 'status', 'progress_display', 'requested_by', 'created_at', 'finished_at']
+    list_filter = ['status', 'target', 'action']
+    list_select_related = ['requested_by']
+    ordering = ['-created_at']
+    exclude = ['object_ids']
+    readonly_fields = [
+        'target', 'action', 'rejection_reason', 'requested_by', 'status', 'total',
+        'processed', 'error', 'created_at', 'started_at', 'finished_at'
+    ]
+    
+    def progress_display(self, obj):
+        return f'{obj.processed}/{obj.total} ({obj.progress}%)'
+    progress_display.short_description = 'Progress'
+    
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(ProductImport)
+class ProductImportAdmin(admin.ModelAdmin):
+    list_display = ['id', 'seller', 'status', 'total_rows', 'created_count', 'updated_count', 'error_count', 'created_at']
+    list_filter = ['status']
+    list_select_related = ['seller']
+    ordering = ['-created_at']
+    readonly_fields = [
+        'seller', 'file', 'status', 'total_rows', 'created_count', 'updated_count',
+        'error_count', 'error_report', 'error', 'created_at', 'started_at', 'finished_at'
+    ]
+    
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(ChunkedUpload)
+class ChunkedUploadAdmin(admin.ModelAdmin):
+    list_display = ['id', 'purpose', 'filename', 'user', 'size', 'offset', 'status', 'updated_at']
+    list_filter = ['purpose', 'status']
+    list_select_related = ['user']
+    ordering = ['-updated_at']
+    readonly_fields = [
+        'token', 'user', 'purpose', 'file', 'size', 'offset', 'chunk_hashes', 'sha256',
+        'status', 'created_at', 'updated_at'
+    ]
+    
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(ApprovalAudit)
+class ApprovalAuditAdmin(ScalableChangeListMixin, admin.ModelAdmin):
+    list_display = ['target', 'object_id', 'action', 'actor', 'job', 'created_at']
+    list_filter = ['target', 'action']
+    list_select_related = ['actor', 'job']
+    search_fields = ['actor__username']
+    ordering = ['-created_at']
+    
+    # The audit log is append-only
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
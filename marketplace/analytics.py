@@ -0,0 +1,425 @@
+"""
+Seller sales analytics.
+
+SellerDailyStats is maintained incrementally from the order signals (see
+marketplace.signals) and rebuilt from history by ``backfill_seller_stats``,
+hot and archived orders alike.
+Dashboards read it instead of aggregating Order/OrderItem on every load.
+
+SellerProductDailyStats is the same rollup per product and GST rate. Both
+back ``seller_analytics``, the seller analytics API: time-bucketed series
+plus product and GST breakdowns, cached per seller under a version that
+changes whenever the seller's stats do.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+from django.db.models.functions import TruncDate, TruncDay, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .cache import bump_version, get_version
+from .models import OrderArchive, OrderItem, Product, SellerDailyStats, SellerProductDailyStats
+
+
+CENT = Decimal('0.01')
+
+ANALYTICS_CACHE_TIMEOUT = 600
+
+BUCKET_FUNCTIONS = {'day': TruncDay, 'week': TruncWeek, 'month': TruncMonth}
+
+
+def stats_version_key(seller_id):
+    return f'marketplace:seller_stats_version:{seller_id}'
+
+
+def bump_stats_version(seller_id):
+    transaction.on_commit(lambda: bump_version(stats_version_key(seller_id)))
+
+
+def _line_gst(total_price, gst_rate):
+    return total_price * gst_rate / 100
+
+
+def _apply_delta(model, lookup, **values):
+    changes = {name: F(name) + value for name, value in values.items()}
+    if model.objects.filter(**lookup).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **values)
+    except IntegrityError:
+        # Another request created the row first
+        model.objects.filter(**lookup).update(**changes)
+
+
+def _empty_line():
+    return {'units': 0, 'revenue': Decimal('0'), 'gst': Decimal('0')}
+
+
+def record_order_items(order, items, sign=1, count_orders=True):
+    """
+    Add (sign=1) or remove (sign=-1) ``items`` of ``order`` from the rollups.
+
+    Each category the items touch counts the order once, unless
+    ``count_orders`` is False because the order was already counted there.
+    """
+    day = timezone.localdate(order.created_at)
+    by_category = defaultdict(_empty_line)
+    by_product = defaultdict(_empty_line)
+    for item in items:
+        revenue = Decimal(item.total_price)
+        gst = _line_gst(revenue, item.gst_rate)
+        for line in (by_category[item.product.category_id], by_product[(item.product_id, item.gst_rate)]):
+            line['units'] += item.quantity
+            line['revenue'] += revenue
+            line['gst'] += gst
+
+    if by_category:
+        bump_stats_version(order.seller_id)
+    for category_id, line in by_category.items():
+        _apply_delta(
+            SellerDailyStats,
+            {'seller_id': order.seller_id, 'day': day, 'category_id': category_id},
+            orders=sign if count_orders else 0,
+            units=sign * line['units'],
+            revenue=sign * line['revenue'].quantize(CENT),
+            gst=sign * line['gst'].quantize(CENT),
+        )
+    for (product_id, gst_rate), line in by_product.items():
+        _apply_delta(
+            SellerProductDailyStats,
+            {'seller_id': order.seller_id, 'day': day, 'product_id': product_id, 'gst_rate': gst_rate},
+            units=sign * line['units'],
+            revenue=sign * line['revenue'].quantize(CENT),
+            gst=sign * line['gst'].quantize(CENT),
+        )
+
+
+def _history_totals(seller_ids, *dimensions):
+    return (
+        OrderItem.objects
+        .filter(order__seller_id__in=seller_ids)
+        .exclude(order__status='cancelled')
+        .annotate(day=TruncDate('order__created_at'))
+        .values('order__seller_id', 'day', *dimensions)
+        .annotate(
+            order_count=Count('order_id', distinct=True),
+            unit_count=Sum('quantity'),
+            revenue_total=Sum('total_price'),
+            gst_total=Sum(ExpressionWrapper(
+                F('total_price') * F('gst_rate') / 100,
+                output_field=DecimalField(max_digits=14, decimal_places=2),
+            )),
+        )
+        .order_by()
+    )
+
+
+def _empty_totals():
+    return {'orders': 0, 'units': 0, 'revenue': Decimal('0'), 'gst': Decimal('0')}
+
+
+def _archived_totals(seller_ids, by_category, by_product):
+    """
+    Add the items of archived orders to the ``by_category`` and ``by_product``
+    totals. Archived items keep their product but not its category, which is
+    looked up; items of products deleted since are skipped like their stats.
+    """
+    orders = list(
+        OrderArchive.objects.filter(seller_id__in=seller_ids).exclude(status='cancelled')
+        .values_list('seller_id', 'created_at', 'items')
+    )
+    product_ids = {item['product_id'] for *_, items in orders for item in items}
+    categories = dict(Product.objects.filter(pk__in=product_ids).values_list('pk', 'category_id'))
+    for seller_id, created_at, items in orders:
+        day = timezone.localdate(created_at)
+        counted = set()
+        for item in items:
+            category_id = categories.get(item['product_id'])
+            if category_id is None:
+                continue
+            revenue = Decimal(item['total_price'])
+            gst = _line_gst(revenue, item['gst_rate'])
+            category_line = by_category[seller_id, day, category_id]
+            if category_id not in counted:
+                counted.add(category_id)
+                category_line['orders'] += 1
+            for line in (category_line, by_product[seller_id, day, item['product_id'], item['gst_rate']]):
+                line['units'] += item['quantity']
+                line['revenue'] += revenue
+                line['gst'] += gst
+
+
+def rebuild_seller_stats(seller_ids):
+    """
+    Recompute the rollups for ``seller_ids`` from Order/OrderItem history,
+    including orders that ``archive_history`` has moved to OrderArchive
+    """
+    by_category = defaultdict(_empty_totals)
+    by_product = defaultdict(_empty_totals)
+    for row in _history_totals(seller_ids, 'product__category_id'):
+        by_category[row['order__seller_id'], row['day'], row['product__category_id']].update(
+            orders=row['order_count'], units=row['unit_count'] or 0,
+            revenue=Decimal(row['revenue_total'] or 0), gst=Decimal(row['gst_total'] or 0),
+        )
+    for row in _history_totals(seller_ids, 'product_id', 'gst_rate'):
+        by_product[row['order__seller_id'], row['day'], row['product_id'], row['gst_rate']].update(
+            units=row['unit_count'] or 0,
+            revenue=Decimal(row['revenue_total'] or 0), gst=Decimal(row['gst_total'] or 0),
+        )
+    _archived_totals(seller_ids, by_category, by_product)
+
+    stats = [
+        SellerDailyStats(
+            seller_id=seller_id, day=day, category_id=category_id, orders=line['orders'], units=line['units'],
+            revenue=line['revenue'].quantize(CENT), gst=line['gst'].quantize(CENT),
+        )
+        for (seller_id, day, category_id), line in by_category.items()
+    ]
+    product_stats = [
+        SellerProductDailyStats(
+            seller_id=seller_id, day=day, product_id=product_id, gst_rate=gst_rate, units=line['units'],
+            revenue=line['revenue'].quantize(CENT), gst=line['gst'].quantize(CENT),
+        )
+        for (seller_id, day, product_id, gst_rate), line in by_product.items()
+    ]
+    with transaction.atomic():
+        SellerDailyStats.objects.filter(seller_id__in=seller_ids).delete()
+        SellerDailyStats.objects.bulk_create(stats, batch_size=1000)
+        SellerProductDailyStats.objects.filter(seller_id__in=seller_ids).delete()
+        SellerProductDailyStats.objects.bulk_create(product_stats, batch_size=1000)
+        for seller_id in seller_ids:
+            bump_stats_version(seller_id)
+    return len(stats) + len(product_stats)
+
+
+def rebuild_seller_stats_in_thread(seller_ids):
+    """``rebuild_seller_stats`` for worker threads, which own their connection"""
+    close_old_connections()
+    try:
+        return rebuild_seller_stats(seller_ids)
+    finally:
+        close_old_connections()
+
+
+def seller_revenue_trend(seller, days=30):
+    """Daily revenue, units and orders for the last ``days`` days, gaps filled"""
+    end = timezone.localdate()
+    start = end - timedelta(days=days - 1)
+    totals = {
+        row['day']: row
+        for row in SellerDailyStats.objects
+        .filter(seller=seller, day__gte=start, day__lte=end)
+        .values('day')
+        .annotate(revenue=Sum('revenue'), units=Sum('units'), orders=Sum('orders'))
+        .order_by('day')
+    }
+    trend = []
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        row = totals.get(day, {})
+        trend.append({
+            'day': day,
+            'revenue': row.get('revenue') or Decimal('0'),
+            'units': row.get('units') or 0,
+            'orders': row.get('orders') or 0,
+        })
+
+    peak = max((point['revenue'] for point in trend), default=0)
+    for point in trend:
+        point['bar'] = int(point['revenue'] * 100 / peak) if peak else 0
+    return trend
+
+
+def seller_top_products(seller, days=30, limit=5):
+    """Best-selling products by revenue over the last ``days`` days"""
+    start = timezone.localdate() - timedelta(days=days - 1)
+    return list(
+        SellerProductDailyStats.objects
+        .filter(seller=seller, day__gte=start)
+        .values('product_id', 'product__name')
+        .annotate(units=Sum('units'), revenue=Sum('revenue'))
+        .order_by('-revenue')[:limit]
+    )
+
+
+# Analytics API
+
+def bucket_start(day, bucket):
+    if bucket == 'week':
+        return day - timedelta(days=day.weekday())
+    if bucket == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def _next_bucket(start, bucket):
+    if bucket == 'week':
+        return start + timedelta(days=7)
+    if bucket == 'month':
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def _numpy():
+    # NumPy is optional; the pure-Python paths give the same results
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def moving_average(values, window):
+    """Trailing mean over ``window`` points (fewer at the start of the series)"""
+    np = _numpy()
+    if np is not None and values:
+        series = np.asarray(values, dtype=float)
+        running = np.cumsum(series)
+        averages = running / np.arange(1, len(series) + 1)
+        if len(series) > window:
+            averages[window:] = (running[window:] - running[:-window]) / window
+        return [round(value, 2) for value in averages.tolist()]
+    return [
+        round(sum(values[max(0, index - window + 1):index + 1]) / min(index + 1, window), 2)
+        for index in range(len(values))
+    ]
+
+
+def percent_change(values):
+    """Change from the previous point in percent; None where it is undefined"""
+    np = _numpy()
+    if np is not None and len(values) > 1:
+        series = np.asarray(values, dtype=float)
+        previous, current = series[:-1], series[1:]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            changes = np.where(previous != 0, (current - previous) * 100 / previous, np.nan)
+        return [None] + [None if np.isnan(value) else round(value, 2) for value in changes.tolist()]
+    return [None] + [
+        round((current - previous) * 100 / previous, 2) if previous else None
+        for previous, current in zip(values, values[1:])
+    ]
+
+
+def _period_totals(seller, start, end):
+    totals = SellerDailyStats.objects.filter(seller=seller, day__gte=start, day__lte=end).aggregate(
+        orders=Sum('orders'), units=Sum('units'), revenue=Sum('revenue'), gst=Sum('gst')
+    )
+    return {
+        'orders': totals['orders'] or 0,
+        'units': totals['units'] or 0,
+        'revenue': float(totals['revenue'] or 0),
+        'gst': float(totals['gst'] or 0),
+    }
+
+
+def seller_sales_series(seller, start, end, bucket='week'):
+    """
+    Orders, units, revenue and GST per ``bucket`` between ``start`` and
+    ``end``, gaps filled with zeros. An order with items in several
+    categories counts once per category, as in the rollup.
+    """
+    totals = {
+        row['period']: row
+        for row in SellerDailyStats.objects
+        .filter(seller=seller, day__gte=start, day__lte=end)
+        .annotate(period=BUCKET_FUNCTIONS[bucket]('day'))
+        .values('period')
+        .annotate(orders=Sum('orders'), units=Sum('units'), revenue=Sum('revenue'), gst=Sum('gst'))
+        .order_by()
+    }
+
+    series = []
+    period = bucket_start(start, bucket)
+    while period <= end:
+        row = totals.get(period, {})
+        series.append({
+            'period': period,
+            'orders': row.get('orders') or 0,
+            'units': row.get('units') or 0,
+            'revenue': float(row.get('revenue') or 0),
+            'gst': float(row.get('gst') or 0),
+        })
+        period = _next_bucket(period, bucket)
+    return series
+
+
+def seller_sales_breakdown(seller, start, end, limit=10):
+    """
+    Best-selling products (by units) and taxable value/GST per GST rate,
+    both summed from one grouped read of the product rollup.
+    """
+    products = {}
+    rates = {}
+    rows = (
+        SellerProductDailyStats.objects
+        .filter(seller=seller, day__gte=start, day__lte=end)
+        .values('product_id', 'gst_rate')
+        .annotate(units=Sum('units'), revenue=Sum('revenue'), gst=Sum('gst'))
+        .order_by()
+    )
+    for row in rows:
+        product = products.setdefault(row['product_id'], {'product_id': row['product_id'], 'units': 0, 'revenue': 0})
+        product['units'] += row['units']
+        product['revenue'] += row['revenue']
+        rate = rates.setdefault(row['gst_rate'], {'rate': row['gst_rate'], 'taxable': 0, 'gst': 0})
+        rate['taxable'] += row['revenue']
+        rate['gst'] += row['gst']
+
+    top = sorted(products.values(), key=lambda product: (-product['units'], product['product_id']))[:limit]
+    names = dict(Product.objects.filter(pk__in=[product['product_id'] for product in top]).values_list('pk', 'name'))
+    for product in top:
+        product['name'] = names.get(product['product_id'], '')
+        product['revenue'] = float(product['revenue'])
+    gst_by_rate = [
+        {'rate': rate['rate'], 'taxable': float(rate['taxable']), 'gst': float(rate['gst'])}
+        for rate in sorted(rates.values(), key=lambda rate: rate['rate'])
+    ]
+    return top, gst_by_rate
+
+
+def seller_analytics(seller, start, end, bucket='week', window=4):
+    """
+    Everything the seller analytics API returns for one range, cached under
+    the seller's stats version so new orders invalidate it.
+    """
+    version = get_version(stats_version_key(seller.pk))
+    key = f'marketplace:seller_analytics:{seller.pk}:{version}:{start}:{end}:{bucket}:{window}'
+    report = cache.get(key)
+    if report is not None:
+        return report
+
+    series = seller_sales_series(seller, start, end, bucket)
+    revenue = [point['revenue'] for point in series]
+    for point, average, change in zip(series, moving_average(revenue, window), percent_change(revenue)):
+        point['period'] = point['period'].isoformat()
+        point['revenue_average'] = average
+        point['revenue_change'] = change
+
+    previous_end = start - timedelta(days=1)
+    previous_start = previous_end - (end - start)
+    totals = {
+        name: round(sum(point[name] for point in series), 2)
+        for name in ('orders', 'units', 'revenue', 'gst')
+    }
+    previous = _period_totals(seller, previous_start, previous_end)
+    products, gst_by_rate = seller_sales_breakdown(seller, start, end)
+
+    report = {
+        'range': {'start': start.isoformat(), 'end': end.isoformat(), 'bucket': bucket, 'window': window},
+        'series': series,
+        'totals': totals,
+        'previous_totals': previous,
+        'change': {
+            name: percent_change([previous[name], totals[name]])[1]
+            for name in totals
+        },
+        'products': products,
+        'gst_by_rate': gst_by_rate,
+    }
+    cache.set(key, report, ANALYTICS_CACHE_TIMEOUT)
+    return report
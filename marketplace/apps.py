@@ -4,3 +4,16 @@ from django.apps import AppConfig
 class MarketplaceConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'marketplace'
+
+    def ready(self):
+        # Register custom lookups and signal handlers. This runs in every
+        # process at startup (see benchmark_startup); keep heavy imports out
+        from . import lookups, signals  # noqa: F401
+        from django.db import connections
+        from django.db.backends.signals import connection_created
+        from .instrumentation import install_query_recorder, is_enabled
+
+        if is_enabled():
+            connection_created.connect(install_query_recorder)
+            for connection in connections.all(initialized_only=True):
+                install_query_recorder(sender=None, connection=connection)
@@ -0,0 +1,191 @@
+"""
+Time-partitioned archival of transaction, credit and order history.
+
+Rows older than the horizon are moved from the hot tables into the
+``*Archive`` models in batches; each batch is copied and deleted inside one
+transaction per database, so an interrupted run never loses or duplicates
+rows.
+
+History screens read both sides: ``admin_transactions`` pages through hot
+and archived transactions together (merged_keyset_paginate), and the
+dashboards merge archived orders and credit entries into their recent lists
+and add archived orders to their counters.
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import (
+    Buyer, Seller, Transaction, CreditTransaction, Order, OrderItem,
+    TransactionArchive, CreditTransactionArchive, OrderArchive
+)
+from .routers import ARCHIVE_MODELS, archive_database
+
+
+DEFAULT_HORIZON_DAYS = 365
+
+# Only rows that can no longer change are archived
+FINAL_TRANSACTION_STATUSES = ['completed', 'failed', 'cancelled']
+FINAL_ORDER_STATUSES = ['delivered', 'cancelled']
+
+TRANSACTION_FIELDS = [
+    'id', 'buyer_id', 'seller_id', 'order_id', 'transaction_id', 'transaction_type',
+    'amount', 'status', 'description', 'reference_number', 'created_at', 'updated_at',
+]
+CREDIT_TRANSACTION_FIELDS = [
+    'id', 'buyer_id', 'amount', 'transaction_type', 'reference', 'description',
+    'balance_after', 'created_at',
+]
+ORDER_FIELDS = [
+    'id', 'buyer_id', 'seller_id', 'order_number', 'subtotal', 'gst_amount',
+    'total_amount', 'status', 'payment_method', 'payment_status', 'po_document',
+    'shipping_address', 'created_at', 'updated_at',
+]
+
+
+def archive_cutoff(horizon_days=None):
+    if horizon_days is None:
+        horizon_days = getattr(settings, 'MARKETPLACE_ARCHIVE_HORIZON_DAYS', DEFAULT_HORIZON_DAYS)
+    return timezone.now() - timedelta(days=horizon_days)
+
+
+def archive_month(created_at):
+    return date(created_at.year, created_at.month, 1)
+
+
+def _move_batch(queryset, archive_model, fields, batch_size, build_extra=None):
+    """Copy one batch into the archive and delete it from the hot table"""
+    hot_alias = queryset.db
+    cold_alias = archive_database()
+
+    with transaction.atomic(using=hot_alias), transaction.atomic(using=cold_alias):
+        rows = list(queryset.order_by('created_at', 'id').values(*fields)[:batch_size])
+        if not rows:
+            return 0
+
+        extra = build_extra(rows) if build_extra else {}
+        archive_model.objects.using(cold_alias).bulk_create(
+            [
+                archive_model(archive_month=archive_month(row['created_at']), **row, **extra.get(row['id'], {}))
+                for row in rows
+            ],
+            ignore_conflicts=True,
+        )
+        queryset.model.objects.using(hot_alias).filter(pk__in=[row['id'] for row in rows]).delete()
+    return len(rows)
+
+
+def _order_items(rows):
+    items = {row['id']: {'items': []} for row in rows}
+    for item in OrderItem.objects.filter(order_id__in=items).values(
+        'order_id', 'product_id', 'product__name', 'quantity', 'unit_price',
+        'gst_rate', 'total_price', 'customizations'
+    ):
+        order_id = item.pop('order_id')
+        item['product_name'] = item.pop('product__name')
+        item['unit_price'] = str(item['unit_price'])
+        item['total_price'] = str(item['total_price'])
+        items[order_id]['items'].append(item)
+    return items
+
+
+def _archive_plan(cutoff):
+    """What archive_history moves and pending_archive_counts counts, in order"""
+    archivable_transactions = Q(created_at__lt=cutoff, status__in=FINAL_TRANSACTION_STATUSES)
+    staying_transactions = Transaction.objects.exclude(archivable_transactions).filter(order__isnull=False)
+    return [
+        (
+            'transactions', Transaction.objects.filter(archivable_transactions),
+            TransactionArchive, TRANSACTION_FIELDS, None,
+        ),
+        (
+            'credit_transactions', CreditTransaction.objects.filter(created_at__lt=cutoff),
+            CreditTransactionArchive, CREDIT_TRANSACTION_FIELDS, None,
+        ),
+        (
+            # Orders still referenced by a transaction that stays hot stay hot too
+            'orders',
+            Order.objects.filter(created_at__lt=cutoff, status__in=FINAL_ORDER_STATUSES)
+            .exclude(pk__in=staying_transactions.values('order_id')),
+            OrderArchive, ORDER_FIELDS, _order_items,
+        ),
+    ]
+
+
+def archive_history(cutoff=None, batch_size=1000, stdout=None):
+    """
+    Move finished history older than ``cutoff`` into the archive tables.
+
+    Transactions go first so that orders whose transactions have all been
+    archived become eligible in the same run. Returns per-model counts.
+    """
+    counts = {}
+    for label, queryset, archive_model, fields, build_extra in _archive_plan(cutoff or archive_cutoff()):
+        if label == 'orders':
+            # Their archivable transactions have moved by now. Deleting an
+            # order cascades to its transactions, so one that became final
+            # since the plan was built must keep its order hot.
+            queryset = queryset.filter(transaction__isnull=True)
+        moved = 0
+        while True:
+            batch = _move_batch(queryset, archive_model, fields, batch_size, build_extra)
+            moved += batch
+            if batch < batch_size:
+                break
+            if stdout:
+                stdout.write(f'  {label}: {moved} archived...')
+        counts[label] = moved
+    return counts
+
+
+def pending_archive_counts(cutoff=None):
+    """Rows that archive_history would move, without moving them"""
+    return {label: queryset.count() for label, queryset, *_ in _archive_plan(cutoff or archive_cutoff())}
+
+
+# Read path
+
+def with_archived(hot_rows, archive_queryset, limit):
+    """
+    The newest ``limit`` rows of ``hot_rows`` (already fetched, newest
+    first) and ``archive_queryset`` together. Archived rows are marked
+    ``archived`` and get the buyer, seller and order objects templates
+    render for hot rows.
+    """
+    archived = list(archive_queryset.order_by('-created_at', '-id')[:limit])
+    rows = sorted([*hot_rows, *archived], key=lambda row: (row.created_at, row.id), reverse=True)[:limit]
+    return attach_related(rows)
+
+
+def attach_related(rows):
+    """Mark the archived rows among ``rows`` and attach their related profiles and orders"""
+    archived = [row for row in rows if row._meta.model_name in ARCHIVE_MODELS]
+    if not archived:
+        return rows
+    buyers = Buyer.objects.in_bulk({row.buyer_id for row in archived if row.buyer_id})
+    sellers = Seller.objects.in_bulk({row.seller_id for row in archived if getattr(row, 'seller_id', None)})
+    order_ids = {row.order_id for row in archived if getattr(row, 'order_id', None)}
+    # An archived transaction's order may be archived too, or still hot
+    orders = {**OrderArchive.objects.in_bulk(order_ids), **Order.objects.in_bulk(order_ids)}
+    for row in archived:
+        row.archived = True
+        row.buyer = buyers.get(row.buyer_id)
+        if hasattr(row, 'seller_id'):
+            row.seller = sellers.get(row.seller_id)
+        if hasattr(row, 'order_id'):
+            row.order = orders.get(row.order_id)
+    return rows
+
+
+def archived_order_totals(**filters):
+    """Counters over archived orders matching ``filters``, to add to the hot ones"""
+    return OrderArchive.objects.filter(**filters).aggregate(
+        orders=Count('pk'),
+        delivered_orders=Count('pk', filter=Q(status='delivered')),
+        spent=Coalesce(Sum('total_amount', filter=~Q(status='cancelled')), Decimal('0')),
+    )
@@ -0,0 +1,13 @@
+"""
+The SQLite and PostgreSQL backends, timing how long each new connection
+takes to open (or, with the psycopg pool, to be handed out) in
+marketplace.metrics. Use them as ENGINE 'marketplace.backends.sqlite3' and
+'marketplace.backends.postgresql'.
+"""
+from ..metrics import DB_CONNECTION_WAIT_SECONDS
+
+
+class ConnectionWaitMixin:
+    def get_new_connection(self, conn_params):
+        with DB_CONNECTION_WAIT_SECONDS.time(database=self.alias):
+            return super().get_new_connection(conn_params)
@@ -0,0 +1,7 @@
+from django.db.backends.sqlite3 import base
+
+from .. import ConnectionWaitMixin
+
+
+class DatabaseWrapper(ConnectionWaitMixin, base.DatabaseWrapper):
+    pass
@@ -0,0 +1,195 @@
+"""
+Bulk edits of a seller's catalog: stock by SKU, price changes and
+activation by filter.
+
+Every operation can be previewed (counts only, nothing written) and is
+applied as set-based UPDATEs inside one transaction, with ``updated_at`` set
+explicitly since ``QuerySet.update`` skips ``auto_now``. Caches that show
+products are invalidated once per batch, after commit.
+"""
+import re
+from decimal import Decimal
+
+from django.db import connections, router, transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Q, Value
+from django.db.models.functions import Greatest, Least, Round
+from django.utils import timezone
+
+from .cache import bump_catalog_version
+from .dashboards import invalidate_dashboards
+from .models import Product
+
+
+MIN_PRICE = Decimal('0.01')
+STOCK_CHUNK_SIZE = 1000
+PREVIEW_SAMPLE_SIZE = 5
+
+
+def update_rows(model, objects, field_names):
+    """
+    Write ``field_names`` of ``objects`` with one parametrised UPDATE run
+    through executemany. QuerySet.bulk_update builds a CASE expression per
+    field per row, which costs seconds of Python time per thousand rows.
+    """
+    if not objects:
+        return
+    connection = connections[router.db_for_write(model)]
+    quote = connection.ops.quote_name
+    fields = [model._meta.get_field(name) for name in field_names]
+    sql = 'UPDATE {} SET {} WHERE {} = %s'.format(
+        quote(model._meta.db_table),
+        ', '.join(f'{quote(field.column)} = %s' for field in fields),
+        quote(model._meta.pk.column),
+    )
+    params = [
+        [field.get_db_prep_save(getattr(obj, field.attname), connection) for field in fields] + [obj.pk]
+        for obj in objects
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, params)
+
+
+def insert_statement(model, objects):
+    """
+    One parametrised INSERT for ``objects`` and its executemany parameters.
+    QuerySet.bulk_create compiles a placeholder and runs pre_save for every
+    value, which costs more than SQLite spends writing the rows. pre_save is
+    skipped here, so auto_now fields keep the values set on the objects, and
+    nothing sends signals. The primary key is written when the first object
+    has one and left to the database otherwise. Building the statement needs
+    no connection to the database, so other processes can prepare it.
+    """
+    connection = connections[router.db_for_write(model)]
+    quote = connection.ops.quote_name
+    fields = [
+        field for field in model._meta.concrete_fields
+        if not (field.primary_key and objects[0].pk is None)
+    ]
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        quote(model._meta.db_table),
+        ', '.join(quote(field.column) for field in fields),
+        ', '.join(['%s'] * len(fields)),
+    )
+    params = [[field.get_db_prep_save(getattr(obj, field.attname), connection) for field in fields] for obj in objects]
+    return sql, params
+
+
+def _catalog_changed(seller):
+    transaction.on_commit(bump_catalog_version)
+    transaction.on_commit(lambda: invalidate_dashboards('seller', [seller.pk]))
+
+
+def seller_products(seller, category=None, tag=None, skus=None):
+    """The seller's products narrowed by category id, tag and/or SKU list"""
+    products = Product.objects.filter(seller=seller)
+    if category:
+        products = products.filter(category_id=category)
+    if tag:
+        # Tags are stored comma-separated; match whole tags only
+        products = products.filter(tags__iregex=rf'(^|,)\s*{re.escape(tag)}\s*(,|$)')
+    if skus:
+        products = products.filter(sku__in=skus)
+    return products
+
+
+def set_stock(seller, stock_by_sku, apply=False):
+    """
+    Set stock quantities from ``{sku: quantity}``. Unknown SKUs are reported
+    and skipped; rows already at the requested quantity are not rewritten.
+    """
+    skus = list(stock_by_sku)
+    current = {}
+    for chunk_start in range(0, len(skus), STOCK_CHUNK_SIZE):
+        chunk = skus[chunk_start:chunk_start + STOCK_CHUNK_SIZE]
+        current.update(
+            (sku, (pk, stock))
+            for pk, sku, stock in Product.objects.filter(seller=seller, sku__in=chunk)
+            .order_by().values_list('pk', 'sku', 'stock_quantity')
+        )
+
+    unknown = sorted(set(stock_by_sku) - set(current))
+    changes = [
+        Product(pk=pk, stock_quantity=stock_by_sku[sku])
+        for sku, (pk, stock) in current.items()
+        if stock != stock_by_sku[sku]
+    ]
+    result = {'matched': len(current), 'changed': len(changes), 'unknown_skus': unknown}
+    if not apply or not changes:
+        return result
+
+    now = timezone.now()
+    for product in changes:
+        product.updated_at = now
+    with transaction.atomic():
+        for chunk_start in range(0, len(changes), STOCK_CHUNK_SIZE):
+            update_rows(Product, changes[chunk_start:chunk_start + STOCK_CHUNK_SIZE], ['stock_quantity', 'updated_at'])
+        _catalog_changed(seller)
+    result['updated'] = len(changes)
+    return result
+
+
+def _price_expression(mode, value):
+    """New selling price before clamping, rounded to paise"""
+    price = F('selling_price')
+    if mode == 'percent':
+        price = Round(price * (Value(Decimal('100')) + Value(value)) / Value(Decimal('100')), 2)
+    else:
+        price = price + Value(value)
+    return ExpressionWrapper(price, output_field=DecimalField(max_digits=10, decimal_places=2))
+
+
+def change_prices(seller, products, mode, value, apply=False):
+    """
+    Raise or lower the selling price of ``products`` by ``value`` percent
+    (``mode='percent'``) or rupees (``mode='absolute'``). Prices are kept
+    between ₹0.01 and the product's MRP; the preview reports how many would
+    be clamped.
+    """
+    raw_price = _price_expression(mode, value)
+    new_price = Greatest(
+        Least(raw_price, F('mrp')), Value(MIN_PRICE),
+        output_field=DecimalField(max_digits=10, decimal_places=2),
+    )
+    counts = products.annotate(raw_price=raw_price).aggregate(
+        matched=Count('pk'),
+        clamped=Count('pk', filter=Q(raw_price__gt=F('mrp')) | Q(raw_price__lt=MIN_PRICE)),
+    )
+    if not apply:
+        counts['sample'] = [
+            {'sku': row['sku'], 'name': row['name'], 'selling_price': row['selling_price'],
+             'new_price': row['new_price'], 'mrp': row['mrp']}
+            for row in products.annotate(new_price=new_price)
+            .values('sku', 'name', 'selling_price', 'new_price', 'mrp')
+            .order_by('pk')[:PREVIEW_SAMPLE_SIZE]
+        ]
+        return counts
+
+    with transaction.atomic():
+        counts['updated'] = products.update(selling_price=new_price, updated_at=timezone.now())
+        _catalog_changed(seller)
+    return counts
+
+
+def set_active(seller, products, active, apply=False):
+    """
+    Show or hide ``products`` in the marketplace. Only approved products can
+    be shown: pending and rejected ones are left hidden and reported as
+    ``not_approved``, so moderation decisions cannot be undone here.
+    """
+    changing = products.exclude(is_active=active)
+    if active:
+        result = products.aggregate(
+            matched=Count('pk'),
+            changed=Count('pk', filter=Q(is_active=False, approval_status='approved')),
+            not_approved=Count('pk', filter=Q(is_active=False) & ~Q(approval_status='approved')),
+        )
+        changing = changing.filter(approval_status='approved')
+    else:
+        result = products.aggregate(matched=Count('pk'), changed=Count('pk', filter=Q(is_active=True)))
+    if not apply:
+        return result
+
+    with transaction.atomic():
+        result['updated'] = changing.update(is_active=active, updated_at=timezone.now())
+        _catalog_changed(seller)
+    return result
@@ -0,0 +1,46 @@
+"""
+Cache versioning.
+
+Cached data (rendered pages, fragments, lookups, API responses) embeds a
+version number in its key. Bumping the version invalidates all of it at
+once without having to find and delete individual keys. The catalog has one
+global version; other scopes (e.g. a seller's sales analytics) use their own
+version key.
+
+A missing version (never set, or evicted) is seeded from the clock rather
+than a fixed number, so it never repeats a value that entries cached before
+the eviction were stored under.
+"""
+import time
+
+from django.core.cache import cache
+
+
+CATALOG_VERSION_KEY = 'marketplace:catalog_version'
+
+
+def get_version(key):
+    version = cache.get(key)
+    if version is None:
+        seed = time.time_ns()
+        cache.add(key, seed, timeout=None)
+        version = cache.get(key, seed)
+    return version
+
+
+def bump_version(key):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Key was evicted; a new seed is past any value it can have had
+        version = time.time_ns()
+        cache.set(key, version, timeout=None)
+        return version
+
+
+def get_catalog_version():
+    return get_version(CATALOG_VERSION_KEY)
+
+
+def bump_catalog_version():
+    return bump_version(CATALOG_VERSION_KEY)
@@ -0,0 +1,178 @@
+"""
+Catalog browsing shared by the storefront pages and their JSON endpoints.
+
+``catalog_filters`` reads the filters from the query string and
+``filter_products`` applies them, so the home page and the AJAX filter
+endpoint always agree. The ``a``-prefixed helpers fetch pages, facets and
+suggestions with the async ORM for the async views.
+
+Their queries are awaited one after another. Django 5.2's async ORM runs
+each query through sync_to_async(thread_sensitive=True), which serialises
+them on one thread, so gathering them would not run them in parallel.
+"""
+from decimal import Decimal, InvalidOperation
+
+from django.core.paginator import Page, Paginator
+from django.db.models import Max, Min, Q
+from django.urls import reverse
+
+from .models import Category, Product, Seller
+
+
+PAGE_SIZE = 12
+RELATED_LIMIT = 6
+AUTOCOMPLETE_LIMIT = 8
+AUTOCOMPLETE_MIN_LENGTH = 2
+
+# Every ordering ends with the id so pages are stable when values tie
+SORT_ORDERINGS = {
+    'newest': ('-created_at', '-id'),
+    'price_low': ('selling_price', 'id'),
+    'price_high': ('-selling_price', '-id'),
+    'name': ('name', 'id'),
+}
+
+
+def _price(value):
+    try:
+        price = Decimal(value)
+    except (InvalidOperation, TypeError):
+        return None
+    return price if price.is_finite() else None
+
+
+def catalog_filters(params):
+    """The catalog filters in ``params`` (a QueryDict), as entered, for applying and echoing back"""
+    sort_by = params.get('sort', 'newest')
+    return {
+        'search': params.get('search', '').strip(),
+        'category': params.get('category', ''),
+        'min_price': params.get('min_price', ''),
+        'max_price': params.get('max_price', ''),
+        'location': params.get('location', '').strip(),
+        'business_type': params.get('business_type', ''),
+        'customizable': params.get('customizable', ''),
+        'sort': sort_by if sort_by in SORT_ORDERINGS else 'newest',
+    }
+
+
+def filter_products(filters):
+    """Active products matching ``filters`` in the requested order; malformed values are ignored"""
+    products = Product.objects.filter(is_active=True).select_related('seller', 'category')
+
+    search = filters['search']
+    if search:
+        products = products.filter(
+            Q(name__icontains=search) |
+            Q(description__icontains=search) |
+            Q(tags__icontains=search) |
+            Q(seller__business_name__icontains=search)
+        )
+
+    if filters['category'].isdigit():
+        products = products.filter(category_id=int(filters['category']))
+
+    min_price = _price(filters['min_price'])
+    if min_price is not None:
+        products = products.filter(selling_price__gte=min_price)
+
+    max_price = _price(filters['max_price'])
+    if max_price is not None:
+        products = products.filter(selling_price__lte=max_price)
+
+    location = filters['location']
+    if location:
+        products = products.filter(Q(seller__city__icontains=location) | Q(seller__state__icontains=location))
+
+    if filters['business_type']:
+        products = products.filter(seller__business_type=filters['business_type'])
+
+    if filters['customizable'] == 'true':
+        products = products.filter(is_customizable=True)
+
+    return products.order_by(*SORT_ORDERINGS[filters['sort']])
+
+
+async def alist(queryset):
+    return [obj async for obj in queryset]
+
+
+async def aget_page(queryset, number, per_page=PAGE_SIZE):
+    """
+    Async ``Paginator.get_page()``: one query for the count and one for the
+    requested page. A page past the end costs one more query, for the last
+    page, which is what get_page() falls back to.
+    """
+    paginator = Paginator(queryset, per_page)
+    try:
+        number = max(int(number), 1)
+    except (TypeError, ValueError):
+        number = 1
+
+    offset = (number - 1) * per_page
+    count = await queryset.acount()
+    rows = await alist(queryset[offset:offset + per_page])
+    # count is a cached_property; filling it in keeps the paginator from counting again
+    paginator.count = count
+    if number > paginator.num_pages:
+        number = paginator.num_pages
+        offset = (number - 1) * per_page
+        rows = await alist(queryset[offset:offset + per_page])
+    return Page(rows, number, paginator)
+
+
+async def acatalog_facets():
+    """Options for the catalog's filter sidebar"""
+    return {
+        'categories': await alist(Category.objects.order_by('name')),
+        'price_range': await Product.objects.filter(is_active=True).aaggregate(
+            min_price=Min('selling_price'), max_price=Max('selling_price')
+        ),
+        'business_types': await alist(
+            Seller.objects.order_by('business_type').values_list('business_type', flat=True).distinct()
+        ),
+        'locations': await alist(Seller.objects.order_by('state', 'city').values('city', 'state').distinct()[:20]),
+    }
+
+
+def product_summary(product):
+    """JSON-ready card data for a product fetched by ``filter_products``"""
+    return {
+        'id': product.pk,
+        'name': product.name,
+        'url': product.get_absolute_url(),
+        'price': str(product.selling_price),
+        'mrp': str(product.mrp),
+        'discount_percentage': float(product.discount_percentage),
+        'in_stock': product.in_stock,
+        'is_customizable': product.is_customizable,
+        'category': product.category.name,
+        'seller': product.seller.business_name,
+        'location': f'{product.seller.city}, {product.seller.state}',
+    }
+
+
+async def aautocomplete(term, limit=AUTOCOMPLETE_LIMIT):
+    """Products, categories and sellers whose names start with ``term``"""
+    term = term.strip()
+    if len(term) < AUTOCOMPLETE_MIN_LENGTH:
+        return {'products': [], 'categories': [], 'sellers': []}
+
+    products = await alist(
+        Product.objects.filter(is_active=True, name__istartswith=term)
+        .order_by('name', 'id').values('id', 'name')[:limit]
+    )
+    categories = await alist(
+        Category.objects.filter(name__istartswith=term).order_by('name').values('id', 'name')[:limit]
+    )
+    sellers = await alist(
+        Seller.objects.filter(approval_status='approved', business_name__istartswith=term)
+        .order_by('business_name', 'id').values('id', 'business_name')[:limit]
+    )
+    for product in products:
+        product['url'] = reverse('marketplace:product_detail', args=[product['id']])
+    for category in categories:
+        category['url'] = reverse('marketplace:category_products', args=[category['id']])
+    for seller in sellers:
+        seller['url'] = reverse('marketplace:seller_products', args=[seller['id']])
+    return {'products': products, 'categories': categories, 'sellers': sellers}
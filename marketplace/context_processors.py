@@ -0,0 +1,6 @@
+from .roles import ANONYMOUS_ROLE
+
+
+def role(request):
+    """Expose ``request.role`` to templates as ``role``"""
+    return {'role': getattr(request, 'role', ANONYMOUS_ROLE)}
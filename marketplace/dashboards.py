@@ -0,0 +1,131 @@
+"""
+Data for the seller and buyer dashboards.
+
+All counters for a dashboard come from one query (a conditional COUNT/SUM
+subquery per counter, evaluated against the profile row), and the listed
+orders, products and credit entries are fetched with the relations their
+templates render. Archived orders and credit entries (marketplace.archive)
+are read separately, since the archive may live in another database, and
+merged in. The result is cached per profile and dropped by the
+signals in marketplace.signals when orders, products or credit change. That
+only reaches other worker processes through a shared cache (CACHE_BACKEND
+in the settings).
+"""
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, DecimalField, IntegerField, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from .analytics import seller_revenue_trend, seller_top_products
+from .archive import archived_order_totals, with_archived
+from .models import Buyer, CreditTransaction, CreditTransactionArchive, Order, OrderArchive, Product, Seller
+
+
+DEFAULT_CACHE_TIMEOUT = 300
+RECENT_LIMIT = 10
+
+
+def dashboard_cache_key(role, profile_id):
+    return f'marketplace:dashboard:{role}:{profile_id}'
+
+
+def invalidate_dashboards(role, profile_ids):
+    cache.delete_many([dashboard_cache_key(role, profile_id) for profile_id in set(profile_ids)])
+
+
+def _cache_timeout():
+    return getattr(settings, 'MARKETPLACE_DASHBOARD_CACHE_TIMEOUT', DEFAULT_CACHE_TIMEOUT)
+
+
+def _count(model, owner, condition=None):
+    rows = model.objects.filter(**{owner: OuterRef('pk')})
+    if condition is not None:
+        rows = rows.filter(condition)
+    counted = rows.order_by().values(owner).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(counted, output_field=IntegerField()), 0)
+
+
+def _sum(model, owner, field, condition=None):
+    rows = model.objects.filter(**{owner: OuterRef('pk')})
+    if condition is not None:
+        rows = rows.filter(condition)
+    summed = rows.order_by().values(owner).annotate(total=Sum(field)).values('total')
+    output_field = DecimalField(max_digits=14, decimal_places=2)
+    return Coalesce(Subquery(summed, output_field=output_field), Decimal('0'), output_field=output_field)
+
+
+def seller_counters(seller):
+    """Product and order counters for ``seller``: one query, plus one for archived orders"""
+    counters = Seller.objects.filter(pk=seller.pk).values(
+        total_products=_count(Product, 'seller'),
+        active_products=_count(Product, 'seller', Q(is_active=True)),
+        pending_products=_count(Product, 'seller', Q(approval_status='pending')),
+        out_of_stock=_count(Product, 'seller', Q(stock_quantity=0)),
+        total_orders=_count(Order, 'seller'),
+        pending_orders=_count(Order, 'seller', Q(status='pending')),
+    ).get()
+    # Archived orders are final, so they only add to the total
+    counters['total_orders'] += archived_order_totals(seller_id=seller.pk)['orders']
+    return counters
+
+
+def buyer_counters(buyer):
+    """Order counters and spend for ``buyer``: one query, plus one for archived orders"""
+    counters = Buyer.objects.filter(pk=buyer.pk).values(
+        total_orders=_count(Order, 'buyer'),
+        pending_orders=_count(Order, 'buyer', Q(status='pending')),
+        delivered_orders=_count(Order, 'buyer', Q(status='delivered')),
+        total_spent=_sum(Order, 'buyer', 'total_amount', ~Q(status='cancelled')),
+    ).get()
+    archived = archived_order_totals(buyer_id=buyer.pk)
+    counters['total_orders'] += archived['orders']
+    counters['delivered_orders'] += archived['delivered_orders']
+    counters['total_spent'] += archived['spent']
+    return counters
+
+
+def seller_dashboard_data(seller):
+    key = dashboard_cache_key('seller', seller.pk)
+    data = cache.get(key)
+    if data is None:
+        revenue_trend = seller_revenue_trend(seller, days=30)
+        data = {
+            **seller_counters(seller),
+            'products': list(
+                Product.objects.filter(seller=seller).select_related('category')
+                .order_by('-created_at', '-id')[:RECENT_LIMIT]
+            ),
+            'orders': with_archived(
+                Order.objects.filter(seller=seller).select_related('buyer')
+                .order_by('-created_at', '-id')[:RECENT_LIMIT],
+                OrderArchive.objects.filter(seller_id=seller.pk), RECENT_LIMIT,
+            ),
+            'revenue_trend': revenue_trend,
+            'revenue_30d': sum(point['revenue'] for point in revenue_trend),
+            'units_30d': sum(point['units'] for point in revenue_trend),
+            'top_products': seller_top_products(seller, days=30),
+        }
+        cache.set(key, data, _cache_timeout())
+    return data
+
+
+def buyer_dashboard_data(buyer):
+    key = dashboard_cache_key('buyer', buyer.pk)
+    data = cache.get(key)
+    if data is None:
+        data = {
+            **buyer_counters(buyer),
+            'orders': with_archived(
+                Order.objects.filter(buyer=buyer).select_related('seller')
+                .order_by('-created_at', '-id')[:RECENT_LIMIT],
+                OrderArchive.objects.filter(buyer_id=buyer.pk), RECENT_LIMIT,
+            ),
+            'credit_transactions': with_archived(
+                CreditTransaction.objects.filter(buyer=buyer).order_by('-created_at', '-id')[:RECENT_LIMIT],
+                CreditTransactionArchive.objects.filter(buyer_id=buyer.pk), RECENT_LIMIT,
+            ),
+        }
+        cache.set(key, data, _cache_timeout())
+    return data
@@ -2,11 +2,55 @@ from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
-from .models import Seller, Buyer, Product, ProductImage, Order, PODCustomization
-import re
+from django.utils import timezone
+from .gstin import validate_gstin
+from .uploads import PURPOSES as UPLOAD_PURPOSES, claim_upload, max_size as max_upload_size
+from .models import Seller, Buyer, Product, ProductImage, Order, PODCustomization, Transaction, ChunkedUpload
+import os
+from datetime import timedelta
 
 
-class SellerRegistrationForm(UserCreationForm):
+class ChunkedUploadFieldsMixin:
+    """
+    Lets the file fields named in ``chunked_upload_fields`` be filled by a
+    finished chunked upload (see marketplace.uploads). A ``<field>_token``
+    value is swapped for the stored file's name, which the model field takes
+    as-is. Posting the file directly still works.
+    """
+    chunked_upload_fields = ()
+    
+    def __init__(self, *args, upload_user=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.upload_user = upload_user
+        self.chunked_uploads = []
+        self.required_uploads = set()
+        for name in self.chunked_upload_fields:
+            field = self.fields[name]
+            if field.required:
+                # Either the file or a token will do; checked in clean()
+                self.required_uploads.add(name)
+                field.required = False
+            field.widget.attrs['data-chunked-upload'] = name
+            self.fields[f'{name}_token'] = forms.CharField(required=False, widget=forms.HiddenInput)
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        for name in self.chunked_upload_fields:
+            token = cleaned_data.get(f'{name}_token')
+            if token:
+                try:
+                    upload = claim_upload(token, name, self.upload_user)
+                except ValidationError as error:
+                    self.add_error(name, error)
+                    continue
+                self.chunked_uploads.append(upload)
+                cleaned_data[name] = upload.file.name
+            elif not cleaned_data.get(name) and name in self.required_uploads:
+                self.add_error(name, self.fields[name].error_messages['required'])
+        return cleaned_data
+
+
+class SellerRegistrationForm(ChunkedUploadFieldsMixin, UserCreationForm):
     # User fields
     email = forms.EmailField(required=True)
     first_name = forms.CharField(max_length=30, required=True, label="Owner First Name")
@@ -49,16 +93,16 @@ class SellerRegistrationForm(UserCreationForm):
     pan_document = forms.FileField(required=True, label="PAN Card Document")
     gst_certificate = forms.FileField(required=False, label="GST Certificate")
     
+    chunked_upload_fields = ('pan_document', 'gst_certificate')
+    
     class Meta:
         model = User
         fields = ['username', 'email', 'password1', 'password2', 'first_name', 'last_name']
     
     def clean_gstin(self):
         gstin = self.cleaned_data.get('gstin', '').upper()
-        # GSTIN validation pattern
-        pattern = r'^[0-9]{2}[A-Z]{5}[0-9]{4}[A-Z]{1}[1-9A-Z]{1}Z[0-9A-Z]{1}$'
-        if not re.match(pattern, gstin):
-            raise ValidationError("Enter a valid GSTIN number (15 characters)")
+        # Format, state code and check digit
+        validate_gstin(gstin)
         
         # Check if GSTIN already exists
         if Seller.objects.filter(gstin=gstin).exists():
@@ -103,10 +147,8 @@ class BuyerRegistrationForm(UserCreationForm):
     
     def clean_gstin(self):
         gstin = self.cleaned_data.get('gstin', '').upper()
-        # GSTIN validation pattern
-        pattern = r'^[0-9]{2}[A-Z]{5}[0-9]{4}[A-Z]{1}[1-9A-Z]{1}Z[0-9A-Z]{1}$'
-        if not re.match(pattern, gstin):
-            raise ValidationError("Enter a valid GSTIN number (15 characters)")
+        # Format, state code and check digit
+        validate_gstin(gstin)
         
         # Check if GSTIN already exists
         if Buyer.objects.filter(gstin=gstin).exists() or Seller.objects.filter(gstin=gstin).exists():
@@ -145,6 +187,59 @@ class ProductForm(forms.ModelForm):
         return cleaned_data
 
 
+class ProductImportForm(forms.Form):
+    file = forms.FileField(
+        help_text='CSV or Excel (.xlsx) file, one product per row',
+        widget=forms.FileInput(attrs={'accept': '.csv,.xlsx'})
+    )
+    
+    def clean_file(self):
+        file = self.cleaned_data['file']
+        extension = os.path.splitext(file.name)[1].lower()
+        if extension not in ('.csv', '.xlsx'):
+            raise ValidationError("Upload a .csv or .xlsx file")
+        return file
+
+
+class ProductImportRowForm(ProductForm):
+    """
+    One row of a bulk upload, validated by ProductForm's rules. The category
+    is given by name and resolved by the importer from a cached map, so
+    validating a row never touches the database.
+    """
+    sku = forms.CharField(max_length=64)
+    category = forms.CharField(max_length=100)
+    
+    class Meta(ProductForm.Meta):
+        fields = [
+            'sku', 'name', 'description', 'mrp', 'selling_price', 'gst_rate',
+            'stock_quantity', 'minimum_order_quantity', 'is_customizable', 'tags'
+        ]
+
+
+class ChunkedUploadStartForm(forms.Form):
+    purpose = forms.ChoiceField(choices=ChunkedUpload.PURPOSES)
+    filename = forms.CharField(max_length=200)
+    size = forms.IntegerField(min_value=1)
+    
+    def clean_size(self):
+        size = self.cleaned_data['size']
+        if size > max_upload_size():
+            raise ValidationError(f"Files can be at most {max_upload_size() // (1024 * 1024)} MB")
+        return size
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        purpose = cleaned_data.get('purpose')
+        filename = cleaned_data.get('filename')
+        if purpose and filename:
+            extension = os.path.splitext(filename)[1].lower()
+            allowed = UPLOAD_PURPOSES[purpose][1]
+            if extension not in allowed:
+                self.add_error('filename', f"Upload a {', '.join(sorted(allowed))} file")
+        return cleaned_data
+
+
 class ProductImageForm(forms.ModelForm):
     class Meta:
         model = ProductImage
@@ -154,7 +249,9 @@ class ProductImageForm(forms.ModelForm):
         }
 
 
-class OrderForm(forms.ModelForm):
+class OrderForm(ChunkedUploadFieldsMixin, forms.ModelForm):
+    chunked_upload_fields = ('po_document',)
+    
     class Meta:
         model = Order
         fields = ['payment_method', 'po_document', 'shipping_address']
@@ -220,3 +317,140 @@ class AdminApprovalForm(forms.Form):
             raise ValidationError("Rejection reason is required when rejecting")
         
         return cleaned_data
+
+
+class TransactionFilterForm(forms.Form):
+    transaction_type = forms.ChoiceField(
+        choices=[('', 'All types')] + Transaction.TRANSACTION_TYPE,
+        required=False
+    )
+    status = forms.ChoiceField(
+        choices=[('', 'All statuses')] + Transaction.TRANSACTION_STATUS,
+        required=False
+    )
+    date_from = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+    date_to = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+    buyer = forms.IntegerField(required=False, min_value=1, label="Buyer ID")
+    seller = forms.IntegerField(required=False, min_value=1, label="Seller ID")
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        date_from = cleaned_data.get('date_from')
+        date_to = cleaned_data.get('date_to')
+        
+        if date_from and date_to and date_from > date_to:
+            raise ValidationError("Start date must be on or before end date")
+        
+        return cleaned_data
+
+
+class SellerAnalyticsForm(forms.Form):
+    BUCKET_CHOICES = [
+        ('day', 'Daily'),
+        ('week', 'Weekly'),
+        ('month', 'Monthly'),
+    ]
+    MAX_RANGE_DAYS = 3 * 366
+    
+    start = forms.DateField(required=False)
+    end = forms.DateField(required=False)
+    bucket = forms.ChoiceField(choices=BUCKET_CHOICES, required=False)
+    window = forms.IntegerField(required=False, min_value=1, max_value=12)
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        end = cleaned_data.get('end') or timezone.localdate()
+        start = cleaned_data.get('start') or end - timedelta(days=89)
+        
+        if start > end:
+            raise ValidationError("Start date must be on or before end date")
+        if (end - start).days >= self.MAX_RANGE_DAYS:
+            raise ValidationError(f"Date range cannot exceed {self.MAX_RANGE_DAYS} days")
+        
+        cleaned_data['start'] = start
+        cleaned_data['end'] = end
+        cleaned_data['bucket'] = cleaned_data.get('bucket') or 'week'
+        cleaned_data['window'] = cleaned_data.get('window') or 4
+        return cleaned_data
+
+
+def _clean_sku_list(value, field_name='skus'):
+    if value in (None, ''):
+        return []
+    if not isinstance(value, list) or not all(isinstance(sku, str) and sku.strip() for sku in value):
+        raise ValidationError(f"{field_name} must be a list of SKU strings")
+    return [sku.strip() for sku in value]
+
+
+class BulkProductFilterForm(forms.Form):
+    """Which of the seller's products a bulk edit applies to (JSON body)"""
+    MAX_SKUS = 20000
+    
+    category = forms.IntegerField(required=False, min_value=1)
+    tag = forms.CharField(max_length=100, required=False)
+    skus = forms.JSONField(required=False)
+    preview = forms.BooleanField(required=False)
+    
+    def clean_skus(self):
+        skus = _clean_sku_list(self.cleaned_data.get('skus'))
+        if len(skus) > self.MAX_SKUS:
+            raise ValidationError(f"At most {self.MAX_SKUS} SKUs per request")
+        return skus
+
+
+class BulkStockForm(forms.Form):
+    MAX_ITEMS = 20000
+    
+    items = forms.JSONField(help_text='List of {"sku": ..., "stock": ...}')
+    preview = forms.BooleanField(required=False)
+    
+    def clean_items(self):
+        items = self.cleaned_data['items']
+        if not isinstance(items, list) or not items:
+            raise ValidationError("items must be a non-empty list")
+        if len(items) > self.MAX_ITEMS:
+            raise ValidationError(f"At most {self.MAX_ITEMS} items per request")
+        
+        stock_by_sku = {}
+        for position, item in enumerate(items):
+            sku = item.get('sku') if isinstance(item, dict) else None
+            stock = item.get('stock') if isinstance(item, dict) else None
+            if not isinstance(sku, str) or not sku.strip():
+                raise ValidationError(f"Item {position}: sku is required")
+            if not isinstance(stock, int) or isinstance(stock, bool) or stock < 0:
+                raise ValidationError(f"Item {position}: stock must be a whole number of at least 0")
+            stock_by_sku[sku.strip()] = stock
+        return stock_by_sku
+
+
+class BulkPriceForm(BulkProductFilterForm):
+    MODE_CHOICES = [
+        ('percent', 'Percentage'),
+        ('absolute', 'Absolute (₹)'),
+    ]
+    
+    mode = forms.ChoiceField(choices=MODE_CHOICES)
+    value = forms.DecimalField(max_digits=10, decimal_places=2)
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        mode = cleaned_data.get('mode')
+        value = cleaned_data.get('value')
+        
+        if value is not None and value == 0:
+            raise ValidationError("value must not be zero")
+        if mode == 'percent' and value is not None and not -90 <= value <= 500:
+            raise ValidationError("Percentage changes must be between -90 and 500")
+        
+        return cleaned_data
+
+
+class BulkActiveForm(BulkProductFilterForm):
+    # JSON true/false; a required BooleanField would reject false
+    active = forms.NullBooleanField()
+    
+    def clean_active(self):
+        active = self.cleaned_data.get('active')
+        if active is None:
+            raise ValidationError("active must be true or false")
+        return active
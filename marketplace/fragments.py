@@ -0,0 +1,58 @@
+"""
+Cached template fragments for products.
+
+Product cards and the detail page's images, customizations and description
+are cached under the product's id and ``updated_at``. Anything that changes
+what they show therefore has to move ``updated_at``: saving the product,
+and the ``touch_products`` calls in marketplace.signals for images,
+customizations and seller renames. Superseded fragments are never read
+again and expire after MARKETPLACE_FRAGMENT_CACHE_SECONDS.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import prefetch_related_objects
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.safestring import mark_safe
+
+from .metrics import FRAGMENT_CACHE_LOOKUPS
+from .models import Product
+
+
+CARD_TEMPLATE = 'marketplace/includes/product_card.html'
+DEFAULT_TIMEOUT = 24 * 60 * 60
+
+
+def fragment_cache_seconds():
+    return getattr(settings, 'MARKETPLACE_FRAGMENT_CACHE_SECONDS', DEFAULT_TIMEOUT)
+
+
+def card_cache_key(product):
+    return f'marketplace:card:{product.pk}:{product.updated_at.timestamp():.6f}'
+
+
+def render_product_cards(products, use_cache=True):
+    """
+    The card HTML for each of ``products`` (fetched with their seller), in
+    order. Cached cards come from one get_many; the rest have their images
+    prefetched in one query, are rendered, and are stored with one set_many.
+    """
+    products = list(products)
+    keys = [card_cache_key(product) for product in products]
+    cached = cache.get_many(keys) if use_cache else {}
+
+    missing = [product for product, key in zip(products, keys) if key not in cached]
+    if use_cache and products:
+        FRAGMENT_CACHE_LOOKUPS.inc(len(products) - len(missing), result='hit')
+        FRAGMENT_CACHE_LOOKUPS.inc(len(missing), result='miss')
+    prefetch_related_objects(missing, 'images')
+    rendered = {card_cache_key(product): render_to_string(CARD_TEMPLATE, {'product': product}) for product in missing}
+    if use_cache and rendered:
+        cache.set_many(rendered, timeout=fragment_cache_seconds())
+
+    return [mark_safe(cached.get(key) or rendered[key]) for key in keys]
+
+
+def touch_products(**filters):
+    """Move ``updated_at`` on matching products, so their cached fragments are rebuilt"""
+    Product.objects.filter(**filters).update(updated_at=timezone.now())
@@ -0,0 +1,114 @@
+"""
+GSTIN (GST identification number) validation.
+
+A GSTIN is 15 characters: a two-digit state code, the holder's 10-character
+PAN, an entity number, the letter Z and a mod-36 check character computed
+over the first 14. ``check_gstin`` is a pure function of the string so it
+can run in worker processes (see the ``verify_gstins`` command).
+"""
+import re
+
+from django.core.exceptions import ValidationError
+
+
+GSTIN_PATTERN = re.compile(r'^[0-9]{2}[A-Z]{5}[0-9]{4}[A-Z][1-9A-Z]Z[0-9A-Z]$')
+
+CHARSET = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+CHAR_VALUES = {char: value for value, char in enumerate(CHARSET)}
+# Every second character is weighted 2; its contribution is the base-36 digit sum
+DOUBLED_VALUES = {char: (2 * value) // 36 + (2 * value) % 36 for char, value in CHAR_VALUES.items()}
+
+STATE_CODES = {
+    '01': 'Jammu and Kashmir',
+    '02': 'Himachal Pradesh',
+    '03': 'Punjab',
+    '04': 'Chandigarh',
+    '05': 'Uttarakhand',
+    '06': 'Haryana',
+    '07': 'Delhi',
+    '08': 'Rajasthan',
+    '09': 'Uttar Pradesh',
+    '10': 'Bihar',
+    '11': 'Sikkim',
+    '12': 'Arunachal Pradesh',
+    '13': 'Nagaland',
+    '14': 'Manipur',
+    '15': 'Mizoram',
+    '16': 'Tripura',
+    '17': 'Meghalaya',
+    '18': 'Assam',
+    '19': 'West Bengal',
+    '20': 'Jharkhand',
+    '21': 'Odisha',
+    '22': 'Chhattisgarh',
+    '23': 'Madhya Pradesh',
+    '24': 'Gujarat',
+    '25': 'Daman and Diu',
+    '26': 'Dadra and Nagar Haveli and Daman and Diu',
+    '27': 'Maharashtra',
+    '28': 'Andhra Pradesh (before division)',
+    '29': 'Karnataka',
+    '30': 'Goa',
+    '31': 'Lakshadweep',
+    '32': 'Kerala',
+    '33': 'Tamil Nadu',
+    '34': 'Puducherry',
+    '35': 'Andaman and Nicobar Islands',
+    '36': 'Telangana',
+    '37': 'Andhra Pradesh',
+    '38': 'Ladakh',
+    '97': 'Other Territory',
+    '99': 'Centre Jurisdiction',
+}
+
+# Results of check_gstin, stored in Seller/Buyer.gstin_status
+VALID = 'valid'
+INVALID_FORMAT = 'invalid_format'
+INVALID_STATE = 'invalid_state'
+INVALID_CHECKSUM = 'invalid_checksum'
+
+ERROR_MESSAGES = {
+    INVALID_FORMAT: 'Enter a valid GSTIN number (15 characters)',
+    INVALID_STATE: 'GSTIN does not start with a valid state code',
+    INVALID_CHECKSUM: 'GSTIN check digit does not match; please re-check the number',
+}
+
+
+def check_digit(first_14):
+    """The mod-36 check character for the first 14 characters of a GSTIN"""
+    total = sum(map(CHAR_VALUES.__getitem__, first_14[0::2]))
+    total += sum(map(DOUBLED_VALUES.__getitem__, first_14[1::2]))
+    return CHARSET[(36 - total % 36) % 36]
+
+
+def check_gstin(gstin):
+    """Return VALID or the first problem found with ``gstin``"""
+    if not GSTIN_PATTERN.match(gstin or ''):
+        return INVALID_FORMAT
+    if gstin[:2] not in STATE_CODES:
+        return INVALID_STATE
+    if check_digit(gstin[:14]) != gstin[14]:
+        return INVALID_CHECKSUM
+    return VALID
+
+
+def check_gstins(gstins):
+    """``check_gstin`` over a list; the unit of work for worker processes"""
+    return [check_gstin(gstin) for gstin in gstins]
+
+
+def validate_gstin(value):
+    """Form/model validator: format, state code and check digit"""
+    status = check_gstin(value)
+    if status != VALID:
+        raise ValidationError(ERROR_MESSAGES[status], code=status)
+
+
+def pan_from_gstin(gstin):
+    """The holder's PAN, characters 3-12 of the GSTIN"""
+    return gstin[2:12]
+
+
+def state_from_gstin(gstin):
+    """Name of the state the GSTIN is registered in, or None"""
+    return STATE_CODES.get(gstin[:2])
@@ -0,0 +1,35 @@
+"""
+Image processing.
+
+Pillow takes about as long to import as all of the marketplace's own
+modules together, and only a few code paths (saving product images,
+generating placeholders) need it. It is imported inside these functions, so
+worker processes, management commands and test runs only load it when they
+process an image. Keep Pillow imports out of module level elsewhere too;
+``benchmark_startup`` fails when ``django.setup()`` imports it.
+"""
+import io
+
+
+MAX_PRODUCT_IMAGE_SIZE = (800, 800)
+
+
+def shrink_to_fit(path, size=MAX_PRODUCT_IMAGE_SIZE):
+    """Scale the image file at ``path`` down in place to fit within ``size``; returns whether it was changed"""
+    from PIL import Image
+
+    with Image.open(path) as image:
+        if image.width <= size[0] and image.height <= size[1]:
+            return False
+        image.thumbnail(size)
+        image.save(path)
+    return True
+
+
+def solid_jpeg(size, color, quality=80):
+    """JPEG bytes of a ``size`` image filled with the RGB ``color``"""
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color).save(buffer, 'JPEG', quality=quality)
+    return buffer.getvalue()
@@ -0,0 +1,271 @@
+"""
+Bulk product uploads.
+
+A ProductImport's file is streamed row by row (CSV via the csv module, XLSX
+via openpyxl's read-only mode), so memory stays flat however large the
+catalog. Rows are validated with ProductImportRowForm and written in batches:
+one query finds which SKUs the seller already has, then new products are
+bulk-created and changed ones rewritten by ``bulk.update_rows``. Invalid
+rows are written to a CSV error report the seller can download.
+"""
+import csv
+import io
+import logging
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files import File
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .bulk import update_rows
+from .cache import bump_catalog_version, get_catalog_version
+from .dashboards import invalidate_dashboards
+from .forms import ProductImportRowForm
+from .models import Category, Product, ProductImport
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 1000
+
+COLUMNS = [
+    'sku', 'name', 'category', 'description', 'mrp', 'selling_price', 'gst_rate',
+    'stock_quantity', 'minimum_order_quantity', 'is_customizable', 'tags',
+]
+REQUIRED_COLUMNS = {'sku', 'name', 'category', 'description', 'mrp', 'selling_price'}
+
+# Fields written when an existing SKU is updated
+UPDATE_FIELDS = [
+    'name', 'category', 'description', 'mrp', 'selling_price', 'gst_rate',
+    'stock_quantity', 'minimum_order_quantity', 'is_customizable', 'tags', 'updated_at',
+]
+
+ROW_DEFAULTS = {'gst_rate': '18', 'stock_quantity': '0', 'minimum_order_quantity': '1'}
+
+FALSE_VALUES = {'', '0', 'false', 'no', 'n', 'off'}
+
+_executor = None
+
+
+class ImportFileError(Exception):
+    """The file as a whole cannot be imported (bad format, missing columns)"""
+
+
+def category_map():
+    """Lower-cased category name -> id, cached until the catalog changes"""
+    key = f'marketplace:category_map:{get_catalog_version()}'
+    categories = cache.get(key)
+    if categories is None:
+        categories = {name.strip().lower(): pk for pk, name in Category.objects.values_list('pk', 'name')}
+        cache.set(key, categories, 3600)
+    return categories
+
+
+def _normalise_header(header):
+    return [str(name or '').strip().lower().replace(' ', '_') for name in header]
+
+
+def _csv_rows(handle):
+    reader = csv.reader(io.TextIOWrapper(handle, encoding='utf-8-sig', newline=''))
+    yield from reader
+
+
+def _cell_text(value):
+    if value is None:
+        return ''
+    # Excel stores 18 and SKU 1001 as 18.0 and 1001.0
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value)
+
+
+def _xlsx_rows(handle):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ImportFileError('Excel uploads need the openpyxl package; upload a CSV instead.')
+    workbook = load_workbook(handle, read_only=True, data_only=True)
+    try:
+        for row in workbook.active.iter_rows(values_only=True):
+            yield [_cell_text(value) for value in row]
+    finally:
+        workbook.close()
+
+
+def read_rows(handle, filename):
+    """Yield ``(row_number, {column: value})`` for each data row of the file"""
+    extension = os.path.splitext(filename)[1].lower()
+    rows = _xlsx_rows(handle) if extension == '.xlsx' else _csv_rows(handle)
+    try:
+        header = _normalise_header(next(rows))
+    except StopIteration:
+        raise ImportFileError('The file is empty.')
+    except UnicodeDecodeError:
+        raise ImportFileError('The CSV file must be UTF-8 encoded.')
+
+    missing = REQUIRED_COLUMNS - set(header)
+    if missing:
+        raise ImportFileError(f'Missing required columns: {", ".join(sorted(missing))}')
+
+    for row_number, values in enumerate(rows, start=2):
+        if not any(str(value).strip() for value in values):
+            continue
+        yield row_number, {
+            column: str(value).strip()
+            for column, value in zip(header, values)
+            if column in COLUMNS
+        }
+
+
+def validate_row(data, categories):
+    """Return ``(cleaned_data, None)`` or ``(None, error message)``"""
+    data = dict(data)
+    if data.get('is_customizable', '').lower() in FALSE_VALUES:
+        data['is_customizable'] = ''
+    for column, default in ROW_DEFAULTS.items():
+        if not data.get(column):
+            data[column] = default
+
+    form = ProductImportRowForm(data)
+    valid = form.is_valid()
+    category_id = categories.get(data.get('category', '').lower())
+    if category_id is None and data.get('category'):
+        form.add_error('category', f'Unknown category "{data["category"]}"')
+        valid = False
+    if not valid:
+        return None, '; '.join(
+            f'{field}: {" ".join(errors)}' if field != '__all__' else ' '.join(errors)
+            for field, errors in form.errors.items()
+        )
+
+    cleaned = form.cleaned_data
+    cleaned['category'] = category_id
+    return cleaned, None
+
+
+def write_batch(seller, rows):
+    """
+    Upsert validated ``rows`` (keyed by SKU) for ``seller``; returns
+    ``(created, updated)``. Later rows for the same SKU win; rows that match
+    the stored product exactly are not rewritten.
+    """
+    by_sku = {row['sku']: row for row in rows}
+    existing = {
+        product.sku: product
+        for product in Product.objects.filter(seller=seller, sku__in=list(by_sku)).order_by()
+    }
+    now = timezone.now()
+    to_create = []
+    to_update = []
+    for sku, row in by_sku.items():
+        values = {field: row[field] for field in UPDATE_FIELDS if field not in ('category', 'updated_at')}
+        product = existing.get(sku)
+        if product is None:
+            to_create.append(Product(seller=seller, sku=sku, category_id=row['category'], **values))
+            continue
+        values['category_id'] = row['category']
+        if all(getattr(product, field) == value for field, value in values.items()):
+            continue
+        for field, value in values.items():
+            setattr(product, field, value)
+        product.updated_at = now
+        to_update.append(product)
+
+    with transaction.atomic():
+        Product.objects.bulk_create(to_create)
+        update_rows(Product, to_update, UPDATE_FIELDS)
+    return len(to_create), len(to_update)
+
+
+def import_products(product_import, batch_size=None):
+    """Run ``product_import`` to completion, recording counts as it goes"""
+    batch_size = batch_size or getattr(settings, 'MARKETPLACE_IMPORT_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+    seller = product_import.seller
+    categories = category_map()
+    counts = {'total_rows': 0, 'created_count': 0, 'updated_count': 0, 'error_count': 0}
+
+    def flush(batch):
+        created, updated = write_batch(seller, batch)
+        counts['created_count'] += created
+        counts['updated_count'] += updated
+        ProductImport.objects.filter(pk=product_import.pk).update(**counts)
+        batch.clear()
+
+    with tempfile.TemporaryFile(mode='w+', newline='', encoding='utf-8') as report:
+        errors = csv.writer(report)
+        errors.writerow(['row', 'sku', 'error'])
+        batch = []
+        with product_import.file.open('rb') as handle:
+            for row_number, data in read_rows(handle, product_import.file.name):
+                counts['total_rows'] += 1
+                cleaned, error = validate_row(data, categories)
+                if error:
+                    counts['error_count'] += 1
+                    errors.writerow([row_number, data.get('sku', ''), error])
+                    continue
+                batch.append(cleaned)
+                if len(batch) >= batch_size:
+                    flush(batch)
+        if batch:
+            flush(batch)
+
+        if counts['error_count']:
+            report.seek(0)
+            product_import.error_report.save(
+                f'import_{product_import.pk}_errors.csv', File(report), save=False
+            )
+
+    for field, value in counts.items():
+        setattr(product_import, field, value)
+    if counts['created_count'] or counts['updated_count']:
+        bump_catalog_version()
+        invalidate_dashboards('seller', [seller.pk])
+    return product_import
+
+
+def run_import(import_id):
+    """Claim and run a queued import; safe to call from several workers"""
+    claimed = ProductImport.objects.filter(pk=import_id, status='queued').update(
+        status='running', started_at=timezone.now()
+    )
+    if not claimed:
+        return None
+
+    product_import = ProductImport.objects.select_related('seller').get(pk=import_id)
+    try:
+        import_products(product_import)
+    except ImportFileError as exc:
+        product_import.status = 'failed'
+        product_import.error = str(exc)
+    except Exception as exc:
+        logger.exception('Product import %s failed', import_id)
+        product_import.status = 'failed'
+        product_import.error = str(exc)
+    else:
+        product_import.status = 'completed'
+    product_import.finished_at = timezone.now()
+    product_import.save()
+    return product_import
+
+
+def start_import(import_id):
+    """Run an import in the background worker thread once the upload is committed"""
+    if not getattr(settings, 'MARKETPLACE_IMPORT_ASYNC', True):
+        run_import(import_id)
+        return
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='product-import')
+    _executor.submit(_run_in_thread, import_id)
+
+
+def _run_in_thread(import_id):
+    close_old_connections()
+    try:
+        run_import(import_id)
+    finally:
+        close_old_connections()
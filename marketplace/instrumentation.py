@@ -0,0 +1,208 @@
+"""
+Per-view request instrumentation.
+
+InstrumentationMiddleware gives each request a RequestRecord in a context
+variable. Every database connection gets ``record_query`` as an execute
+wrapper when it connects; the wrapper times the query, and
+InstrumentedDjangoTemplates times top-level template renders. Both add to
+the current request's record. Context variables follow sync_to_async, so
+async views and their ORM calls are recorded as well. Template time
+includes any queries the template triggers.
+
+When the request finishes its record is added to the stats of its URL
+name. These stats live in this process's memory. They hold a ring buffer
+of recent requests for percentiles and a cumulative latency histogram,
+and keep the slowest statements seen. Requests issuing more than
+MARKETPLACE_INSTRUMENTATION_QUERY_THRESHOLD queries are logged as
+warnings to ``marketplace.instrumentation``.
+"""
+import bisect
+import logging
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.template.backends.django import DjangoTemplates, Template
+
+
+logger = logging.getLogger(__name__)
+
+SAMPLES_PER_VIEW = 1000
+SLOWEST_STATEMENTS = 5
+STATEMENT_PREVIEW = 300
+# Upper bounds (ms) of the latency histogram buckets; the last one is open
+HISTOGRAM_BOUNDS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+DEFAULT_QUERY_THRESHOLD = 50
+
+_current = ContextVar('marketplace_request_record', default=None)
+
+
+def is_enabled():
+    return getattr(settings, 'MARKETPLACE_INSTRUMENTATION', True)
+
+
+def query_threshold():
+    return getattr(settings, 'MARKETPLACE_INSTRUMENTATION_QUERY_THRESHOLD', DEFAULT_QUERY_THRESHOLD)
+
+
+class RequestRecord:
+    __slots__ = ('queries', 'sql_seconds', 'template_seconds', 'slowest', 'render_depth')
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.template_seconds = 0.0
+        self.slowest = []
+        self.render_depth = 0
+
+    def add_query(self, sql, seconds):
+        self.queries += 1
+        self.sql_seconds += seconds
+        if len(self.slowest) < SLOWEST_STATEMENTS or seconds > self.slowest[-1][0]:
+            bisect.insort(self.slowest, (seconds, sql[:STATEMENT_PREVIEW]), key=lambda item: -item[0])
+            del self.slowest[SLOWEST_STATEMENTS:]
+
+
+def start_request():
+    return _current.set(RequestRecord())
+
+
+def finish_request(token):
+    record = _current.get()
+    _current.reset(token)
+    return record
+
+
+def record_query(execute, sql, params, many, context):
+    record = _current.get()
+    if record is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        record.add_query(sql, time.perf_counter() - started)
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """connection_created receiver; reconnects reuse the wrapper object, so add it once"""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class InstrumentedTemplate(Template):
+    def render(self, context=None, request=None):
+        record = _current.get()
+        if record is None:
+            return super().render(context, request)
+        # Templates rendered while rendering (e.g. by a tag) are already timed
+        record.render_depth += 1
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            record.render_depth -= 1
+            if not record.render_depth:
+                record.template_seconds += time.perf_counter() - started
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """The Django template backend, with render times added to the request record"""
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return InstrumentedTemplate(template.template, self)
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    return sorted_values[min(int(len(sorted_values) * fraction), len(sorted_values) - 1)]
+
+
+class ViewStats:
+    """Recent samples, a cumulative latency histogram and the slowest statements of one view"""
+
+    def __init__(self, name):
+        self.name = name
+        self.requests = 0
+        self.samples = deque(maxlen=SAMPLES_PER_VIEW)
+        self.histogram = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+        self.slowest = []
+
+    def add(self, total_ms, record):
+        self.requests += 1
+        self.samples.append((total_ms, record.queries, record.sql_seconds * 1000, record.template_seconds * 1000))
+        self.histogram[bisect.bisect_left(HISTOGRAM_BOUNDS_MS, total_ms)] += 1
+        for seconds, sql in record.slowest:
+            if len(self.slowest) < SLOWEST_STATEMENTS or seconds * 1000 > self.slowest[-1][0]:
+                bisect.insort(self.slowest, (seconds * 1000, sql), key=lambda item: -item[0])
+                del self.slowest[SLOWEST_STATEMENTS:]
+
+    def summary(self):
+        columns = list(zip(*self.samples))
+        latencies, queries = sorted(columns[0]), sorted(columns[1])
+        count = len(self.samples)
+        return {
+            'name': self.name,
+            'requests': self.requests,
+            'samples': count,
+            'p50_ms': percentile(latencies, 0.5),
+            'p95_ms': percentile(latencies, 0.95),
+            'p99_ms': percentile(latencies, 0.99),
+            'max_ms': latencies[-1],
+            'queries_p50': percentile(queries, 0.5),
+            'queries_max': queries[-1],
+            'sql_ms_avg': sum(columns[2]) / count,
+            'template_ms_avg': sum(columns[3]) / count,
+            'histogram': list(zip(HISTOGRAM_BOUNDS_MS + [None], self.histogram)),
+            'slowest': list(self.slowest),
+        }
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}
+        self.started = time.time()
+
+    def add(self, name, total_ms, record):
+        with self.lock:
+            stats = self.views.get(name)
+            if stats is None:
+                stats = self.views[name] = ViewStats(name)
+            stats.add(total_ms, record)
+
+    def report(self):
+        """Summaries of all views, slowest p95 first"""
+        with self.lock:
+            summaries = [stats.summary() for stats in self.views.values() if stats.samples]
+        return sorted(summaries, key=lambda summary: -summary['p95_ms'])
+
+    def reset(self):
+        with self.lock:
+            self.views.clear()
+            self.started = time.time()
+
+
+registry = Registry()
+
+
+def record_request(request, total_seconds, record):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        # Static files and unknown URLs
+        return
+    total_ms = total_seconds * 1000
+    registry.add(match.view_name, total_ms, record)
+    if record.queries > query_threshold():
+        logger.warning(
+            '%s %s issued %d queries (%.1f ms SQL, %.1f ms total); slowest: %s',
+            request.method, request.path, record.queries, record.sql_seconds * 1000, total_ms,
+            '; '.join(f'{seconds * 1000:.1f} ms {sql}' for seconds, sql in record.slowest[:3]),
+        )
@@ -0,0 +1,506 @@
+"""
+Scripted HTTP load test against a running server.
+
+Virtual users are asyncio tasks, each with its own keep-alive connection
+and cookie jar. Buyers and sellers log in through the login form with the
+seeded accounts from ``load_sample_data``; anonymous users only browse. Each
+user then repeats a weighted choice of actions, among those its role can
+take, with an exponentially distributed think time in between. Products are
+picked with Zipf weights, so a few are hot as on a real catalog.
+
+The client is a minimal HTTP/1.1 implementation over asyncio streams
+(Content-Length and chunked bodies, no redirects followed), so the harness
+needs nothing outside the standard library. Latencies are measured from
+sending the request to reading the whole body and are grouped by URL name,
+with `` POST`` appended for form posts. A response with an unexpected
+status, a timeout or a connection error counts as an error.
+"""
+import asyncio
+import random
+import time
+from collections import Counter, defaultdict
+from urllib.parse import urlencode, urlsplit
+
+from django.urls import reverse
+
+from .instrumentation import percentile
+from .synthetic import PASSWORD, pick, zipf_cum_weights
+
+
+USER_AGENT = 'marketplace-loadtest'
+PRODUCT_ZIPF_EXPONENT = 1.1
+SORT_ORDERS = ('newest', 'price_low', 'price_high', 'name')
+SHIPPING_ADDRESS = '12 Industrial Area, Pune, Maharashtra 411019'
+
+# Relative weights of the actions; users skip the ones their role cannot take
+DEFAULT_MIX = {
+    'browse': 25,
+    'search': 15,
+    'filter': 15,
+    'product_detail': 25,
+    'autocomplete': 10,
+    'checkout': 4,
+    'top_up': 1,
+    'dashboard': 5,
+}
+ROLES = ('anonymous', 'buyer', 'seller')
+
+
+class RequestFailed(Exception):
+    """A timeout, connection error or unexpected status; the request is already recorded"""
+
+
+class Connection:
+    """One keep-alive HTTP/1.1 connection, reopened when the server closes it"""
+
+    def __init__(self, host, port, timeout):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.reader = None
+        self.writer = None
+
+    async def request(self, method, target, headers, body=b''):
+        """Send one request and return ``(status, headers, body)``; header names are lower-cased"""
+        # A reused connection may have been closed by the server meanwhile;
+        # retry once on a fresh one before giving up
+        for attempt in (1, 2):
+            fresh = self.writer is None
+            if fresh:
+                self.reader, self.writer = await asyncio.wait_for(
+                    asyncio.open_connection(self.host, self.port), self.timeout,
+                )
+            try:
+                return await asyncio.wait_for(self._exchange(method, target, headers, body), self.timeout)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                self.close()
+                if fresh or attempt == 2:
+                    raise
+            except BaseException:
+                self.close()
+                raise
+
+    async def _exchange(self, method, target, headers, body):
+        lines = [f'{method} {target} HTTP/1.1', f'Host: {self.host}:{self.port}', f'User-Agent: {USER_AGENT}']
+        lines.extend(f'{name}: {value}' for name, value in headers.items())
+        if body or method == 'POST':
+            lines.append(f'Content-Length: {len(body)}')
+        self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+        await self.writer.drain()
+
+        head = await self.reader.readuntil(b'\r\n\r\n')
+        status_line, *header_lines = head.decode('latin-1').split('\r\n')
+        version, status = status_line.split(' ', 2)[:2]
+        response_headers = defaultdict(list)
+        for line in header_lines:
+            if line:
+                name, _, value = line.partition(':')
+                response_headers[name.strip().lower()].append(value.strip())
+
+        if method == 'HEAD' or status in ('204', '304'):
+            content = b''
+        elif 'chunked' in ','.join(response_headers.get('transfer-encoding', [])).lower():
+            content = await self._read_chunked()
+        elif 'content-length' in response_headers:
+            content = await self.reader.readexactly(int(response_headers['content-length'][0]))
+        else:
+            content = await self.reader.read()
+            self.close()
+
+        connection = ','.join(response_headers.get('connection', [])).lower()
+        if 'close' in connection or (version == 'HTTP/1.0' and 'keep-alive' not in connection):
+            self.close()
+        return int(status), response_headers, content
+
+    async def _read_chunked(self):
+        chunks = []
+        while True:
+            size = int((await self.reader.readline()).split(b';', 1)[0], 16)
+            if not size:
+                # Trailers, up to the blank line
+                while (await self.reader.readline()) not in (b'\r\n', b''):
+                    pass
+                return b''.join(chunks)
+            chunks.append(await self.reader.readexactly(size))
+            await self.reader.readexactly(2)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+class Session:
+    """A connection with a cookie jar that records every request it makes"""
+
+    def __init__(self, connection, recorder):
+        self.connection = connection
+        self.recorder = recorder
+        self.cookies = {}
+
+    def _headers(self, extra=None):
+        headers = dict(extra or {})
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{name}={value}' for name, value in self.cookies.items())
+        return headers
+
+    def _store_cookies(self, headers):
+        for header in headers.get('set-cookie', []):
+            pair, *attributes = header.split(';')
+            name, _, value = pair.strip().partition('=')
+            expired = any(
+                attribute.strip().lower().replace(' ', '') in ('max-age=0', 'max-age=-1') for attribute in attributes
+            )
+            if expired or not value or value == '""':
+                self.cookies.pop(name, None)
+            else:
+                self.cookies[name] = value
+
+    async def request(self, name, method, path, expect=(200,), fields=None, headers=None):
+        body = b''
+        extra = dict(headers or {})
+        if fields is not None:
+            fields = dict(fields, csrfmiddlewaretoken=self.cookies.get('csrftoken', ''))
+            body = urlencode(fields).encode()
+            extra['Content-Type'] = 'application/x-www-form-urlencoded'
+        label = f'{name} POST' if method == 'POST' else name
+        started = time.perf_counter()
+        try:
+            status, response_headers, content = await self.connection.request(
+                method, path, self._headers(extra), body,
+            )
+        except asyncio.TimeoutError:
+            self.recorder.add(label, time.perf_counter() - started, 'timeout')
+            raise RequestFailed(label, 'timeout')
+        except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError) as e:
+            self.recorder.add(label, time.perf_counter() - started, f'connection error: {type(e).__name__}')
+            raise RequestFailed(label, e)
+        elapsed = time.perf_counter() - started
+        self._store_cookies(response_headers)
+        if status not in expect:
+            self.recorder.add(label, elapsed, f'status {status}')
+            raise RequestFailed(label, status)
+        self.recorder.add(label, elapsed)
+        return status, response_headers, content
+
+    async def get(self, name, path, params=None, expect=(200,), headers=None):
+        if params:
+            path = f'{path}?{urlencode(params)}'
+        return await self.request(name, 'GET', path, expect=expect, headers=headers)
+
+    async def post(self, name, path, fields, expect=(302,)):
+        return await self.request(name, 'POST', path, expect=expect, fields=fields)
+
+
+class Recorder:
+    """Latencies, statuses and errors per URL name, kept once warm-up is over"""
+
+    def __init__(self):
+        self.recording = False
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(Counter)
+        self.started = self.stopped = None
+
+    def start(self):
+        self.recording = True
+        self.started = time.perf_counter()
+
+    def stop(self):
+        self.recording = False
+        self.stopped = time.perf_counter()
+
+    def add(self, name, seconds, error=None):
+        if not self.recording:
+            return
+        self.latencies[name].append(seconds * 1000)
+        if error:
+            self.errors[name][error] += 1
+
+    def summary(self):
+        elapsed = (self.stopped or time.perf_counter()) - self.started
+        endpoints = []
+        for name, latencies in sorted(self.latencies.items()):
+            latencies = sorted(latencies)
+            errors = sum(self.errors[name].values())
+            endpoints.append({
+                'name': name,
+                'requests': len(latencies),
+                'errors': errors,
+                'error_rate': errors / len(latencies),
+                'throughput_rps': len(latencies) / elapsed,
+                'mean_ms': sum(latencies) / len(latencies),
+                'p50_ms': percentile(latencies, 0.5),
+                'p90_ms': percentile(latencies, 0.9),
+                'p95_ms': percentile(latencies, 0.95),
+                'p99_ms': percentile(latencies, 0.99),
+                'max_ms': latencies[-1],
+                'error_kinds': dict(self.errors[name]),
+            })
+        requests = sum(endpoint['requests'] for endpoint in endpoints)
+        errors = sum(endpoint['errors'] for endpoint in endpoints)
+        return {
+            'elapsed_seconds': elapsed,
+            'requests': requests,
+            'errors': errors,
+            'error_rate': errors / requests if requests else 0,
+            'throughput_rps': requests / elapsed if elapsed else 0,
+            'endpoints': endpoints,
+        }
+
+
+class Workload:
+    """
+    What the virtual users work with, read from the database before the run
+    so that the event loop never touches the ORM: seeded accounts, a sample
+    of active products with their minimum order quantities, categories and
+    search terms taken from product names.
+    """
+
+    def __init__(self, buyers, sellers, products, categories, terms, seed=0):
+        self.buyers = buyers
+        self.sellers = sellers
+        self.products = products
+        self.product_weights = zipf_cum_weights(len(products), PRODUCT_ZIPF_EXPONENT)
+        self.categories = categories
+        self.terms = terms
+        self.rng = random.Random(seed)
+        self.paths = {
+            'home': reverse('marketplace:home'),
+            'ajax_filter': reverse('marketplace:ajax_filter'),
+            'autocomplete': reverse('marketplace:autocomplete'),
+            'login': reverse('marketplace:login'),
+            'add_credit': reverse('marketplace:add_credit'),
+            'buyer_dashboard': reverse('marketplace:buyer_dashboard'),
+            'seller_dashboard': reverse('marketplace:seller_dashboard'),
+        }
+
+    @classmethod
+    def from_database(cls, buyers, sellers, username_prefix='synth_', sample=1000, seed=0):
+        from .models import Buyer, Category, Product, Seller
+
+        rng = random.Random(seed)
+        buyer_names = list(
+            Buyer.objects.filter(approval_status='approved', user__username__startswith=username_prefix)
+            .order_by('pk').values_list('user__username', flat=True)[:buyers]
+        )
+        seller_names = list(
+            Seller.objects.filter(approval_status='approved', user__username__startswith=username_prefix)
+            .order_by('pk').values_list('user__username', flat=True)[:sellers]
+        )
+        product_ids = list(Product.objects.filter(is_active=True).order_by().values_list('pk', flat=True))
+        if len(product_ids) > sample:
+            product_ids = rng.sample(product_ids, sample)
+        rows = {
+            pk: (pk, category_id, moq, name)
+            for pk, category_id, moq, name in Product.objects.filter(pk__in=product_ids)
+            .values_list('pk', 'category_id', 'minimum_order_quantity', 'name')
+        }
+        # Keep the sampled order so the hot products are a random subset
+        products = [rows[pk][:3] for pk in product_ids if pk in rows]
+        terms = sorted({
+            word.lower() for *_, name in rows.values() for word in name.split() if len(word) > 3 and word.isalpha()
+        })
+        categories = list(Category.objects.order_by('pk').values_list('pk', flat=True))
+        return cls(buyer_names, seller_names, products, categories, terms, seed)
+
+    def product(self, rng):
+        return pick(rng, self.products, self.product_weights)
+
+
+class VirtualUser:
+    def __init__(self, role, username, session, workload, mix, think, rng, password):
+        self.role = role
+        self.username = username
+        self.session = session
+        self.workload = workload
+        self.rng = rng
+        self.password = password
+        self.think = think
+        self.actions = [action for action in mix if role in ACTIONS[action][1] and mix[action] > 0]
+        self.weights = [mix[action] for action in self.actions]
+
+    async def login(self):
+        path = self.workload.paths['login']
+        await self.session.get('marketplace:login', path)
+        await self.session.post('marketplace:login', path, {
+            'username': self.username, 'password': self.password, 'user_type': self.role,
+        })
+
+    async def run(self, deadline):
+        # Spread the first requests so users do not arrive in lockstep
+        await asyncio.sleep(self.rng.uniform(0, self.think))
+        while time.perf_counter() < deadline:
+            try:
+                if self.role != 'anonymous' and 'sessionid' not in self.session.cookies:
+                    await self.login()
+                if self.actions:
+                    action = self.rng.choices(self.actions, self.weights)[0]
+                    await ACTIONS[action][0](self)
+            except RequestFailed:
+                pass
+            if self.think:
+                await asyncio.sleep(min(self.rng.expovariate(1 / self.think), max(deadline - time.perf_counter(), 0)))
+        self.session.connection.close()
+
+
+async def browse(user):
+    workload, rng = user.workload, user.rng
+    if workload.categories and rng.random() < 0.4:
+        category = rng.choice(workload.categories)
+        await user.session.get(
+            'marketplace:category_products', reverse('marketplace:category_products', args=[category]),
+            {'page': rng.randint(1, 3)},
+        )
+    else:
+        params = {'page': rng.randint(2, 5)} if rng.random() < 0.3 else None
+        await user.session.get('marketplace:home', workload.paths['home'], params)
+
+
+async def search(user):
+    if user.workload.terms:
+        await user.session.get(
+            'marketplace:home', user.workload.paths['home'], {'search': user.rng.choice(user.workload.terms)},
+        )
+
+
+async def filter_products(user):
+    workload, rng = user.workload, user.rng
+    params = {'sort': rng.choice(SORT_ORDERS)}
+    if workload.categories:
+        params['category'] = rng.choice(workload.categories)
+    if rng.random() < 0.3:
+        params['min_price'] = rng.choice((100, 500, 1000))
+        params['max_price'] = params['min_price'] * rng.choice((5, 10, 50))
+    if rng.random() < 0.2:
+        params['page'] = 2
+    await user.session.get(
+        'marketplace:ajax_filter', workload.paths['ajax_filter'], params,
+        headers={'X-Requested-With': 'XMLHttpRequest'},
+    )
+
+
+async def product_detail(user):
+    pk, _, _ = user.workload.product(user.rng)
+    await user.session.get('marketplace:product_detail', reverse('marketplace:product_detail', args=[pk]))
+
+
+async def autocomplete(user):
+    if user.workload.terms:
+        term = user.rng.choice(user.workload.terms)
+        await user.session.get(
+            'marketplace:autocomplete', user.workload.paths['autocomplete'], {'q': term[:user.rng.randint(2, 4)]},
+        )
+
+
+async def checkout(user):
+    """Open the order form of a product and place an order for its minimum quantity"""
+    pk, _, moq = user.workload.product(user.rng)
+    path = reverse('marketplace:place_order', args=[pk])
+    await user.session.get('marketplace:place_order', path)
+    # A credit order over the balance re-renders the form with a message
+    await user.session.post('marketplace:place_order', path, {
+        'payment_method': user.rng.choices(('credit', 'online', 'po'), (45, 40, 15))[0],
+        'shipping_address': SHIPPING_ADDRESS,
+        'quantity': moq,
+    }, expect=(200, 302))
+
+
+async def top_up(user):
+    path = user.workload.paths['add_credit']
+    await user.session.get('marketplace:add_credit', path)
+    await user.session.post('marketplace:add_credit', path, {
+        'amount': user.rng.choice((10000, 25000, 50000)),
+        'reference': f'LOAD{user.rng.randrange(10 ** 8):08d}',
+        'description': 'Load test top-up',
+    })
+
+
+async def dashboard(user):
+    name = f'{user.role}_dashboard'
+    await user.session.get(f'marketplace:{name}', user.workload.paths[name])
+
+
+# Action name: (coroutine, roles that take it)
+ACTIONS = {
+    'browse': (browse, ROLES),
+    'search': (search, ROLES),
+    'filter': (filter_products, ROLES),
+    'product_detail': (product_detail, ROLES),
+    'autocomplete': (autocomplete, ROLES),
+    'checkout': (checkout, ('buyer',)),
+    'top_up': (top_up, ('buyer',)),
+    'dashboard': (dashboard, ('buyer', 'seller')),
+}
+
+
+def parse_mix(text):
+    """``'browse=30,search=10'`` as weights over DEFAULT_MIX; unnamed actions are not run"""
+    mix = dict.fromkeys(DEFAULT_MIX, 0)
+    for item in filter(None, (part.strip() for part in text.split(','))):
+        action, _, weight = item.partition('=')
+        action = action.strip()
+        if action not in ACTIONS:
+            raise ValueError(f'Unknown action {action!r}; choose from {", ".join(ACTIONS)}')
+        try:
+            mix[action] = float(weight)
+        except ValueError:
+            raise ValueError(f'Weight of {action!r} must be a number, not {weight!r}')
+        if mix[action] < 0:
+            raise ValueError(f'Weight of {action!r} must not be negative')
+    if not any(mix.values()):
+        raise ValueError('The mix gives no action a weight')
+    return mix
+
+
+async def run(base_url, workload, mix, anonymous=0, duration=60, warmup=0, think=1.0, timeout=10,
+              password=PASSWORD, seed=0):
+    """Run the virtual users against ``base_url`` and return the Recorder summary"""
+    parts = urlsplit(base_url)
+    if parts.scheme != 'http' or not parts.hostname:
+        raise ValueError('The server URL must be http://host[:port]')
+    host, port = parts.hostname, parts.port or 80
+    recorder = Recorder()
+    rng = random.Random(seed)
+    accounts = (
+        [('buyer', username) for username in workload.buyers]
+        + [('seller', username) for username in workload.sellers]
+        + [('anonymous', None)] * anonymous
+    )
+    users = [
+        VirtualUser(
+            role, username, Session(Connection(host, port, timeout), recorder), workload, mix, think,
+            random.Random(rng.random()), password,
+        )
+        for role, username in accounts
+    ]
+
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    deadline = started + warmup + duration
+    if warmup:
+        loop.call_later(warmup, recorder.start)
+    else:
+        recorder.start()
+    await asyncio.gather(*(user.run(deadline) for user in users))
+    if not recorder.recording:
+        recorder.start()
+    recorder.stop()
+    return recorder.summary()
+
+
+def compare(results, baseline):
+    """Per URL name changes from ``baseline``: requests/s, p50 and p95 and error rate, both runs' values"""
+    previous = {endpoint['name']: endpoint for endpoint in baseline.get('endpoints', [])}
+    rows = []
+    for endpoint in results['endpoints']:
+        before = previous.get(endpoint['name'])
+        if before is None:
+            continue
+        rows.append({
+            'name': endpoint['name'],
+            **{
+                key: (before[key], endpoint[key])
+                for key in ('throughput_rps', 'p50_ms', 'p95_ms', 'error_rate')
+            },
+        })
+    return rows
@@ -0,0 +1,20 @@
+from django.db.models import CharField
+from django.db.models.lookups import StartsWith
+
+
+@CharField.register_lookup
+class Prefix(StartsWith):
+    """
+    Case-sensitive ``startswith`` that stays on the column's B-tree index.
+
+    SQLite's LIKE is case-insensitive, so it cannot use an index on a normally
+    collated column; GLOB is case-sensitive and can. On PostgreSQL the
+    inherited ``LIKE 'x%'`` is already index-backed, because unique and
+    indexed CharFields get a companion varchar_pattern_ops index.
+    """
+    lookup_name = 'prefix'
+
+    def as_sqlite(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        pattern = ''.join(f'[{char}]' if char in '*?[' else char for char in str(self.rhs))
+        return f'{lhs} GLOB %s', (*lhs_params, pattern + '*')
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from marketplace.archive import archive_cutoff, archive_history, pending_archive_counts
+
+
+class Command(BaseCommand):
+    help = 'Move finished transaction, credit and order history older than the horizon into the archive tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=None,
+            help='Archive rows older than this many days (default: MARKETPLACE_ARCHIVE_HORIZON_DAYS)'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows moved per transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Report eligible rows without moving them')
+
+    def handle(self, *args, **options):
+        cutoff = archive_cutoff(options['days'])
+        self.stdout.write(f'Archiving history created before {cutoff:%Y-%m-%d %H:%M}...')
+
+        if options['dry_run']:
+            counts = pending_archive_counts(cutoff)
+            for label, count in counts.items():
+                self.stdout.write(f'- {label}: {count} eligible')
+            return
+
+        counts = archive_history(cutoff, batch_size=options['batch_size'], stdout=self.stdout)
+        self.stdout.write(
+            self.style.SUCCESS(
+                'Successfully archived:\n' +
+                '\n'.join(f'- {count} {label}' for label, count in counts.items())
+            )
+        )
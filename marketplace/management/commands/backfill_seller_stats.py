@@ -0,0 +1,39 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from marketplace.analytics import rebuild_seller_stats, rebuild_seller_stats_in_thread
+from marketplace.models import Seller
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the SellerDailyStats rollup from order history, in parallel chunks of sellers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Chunks processed concurrently')
+        parser.add_argument('--chunk-size', type=int, default=50, help='Sellers per chunk')
+        parser.add_argument('--seller', type=int, action='append', dest='sellers', help='Only rebuild these seller ids')
+
+    def handle(self, *args, **options):
+        seller_ids = options['sellers'] or list(Seller.objects.order_by('pk').values_list('pk', flat=True))
+        chunk_size = options['chunk_size']
+        chunks = [seller_ids[i:i + chunk_size] for i in range(0, len(seller_ids), chunk_size)]
+        self.stdout.write(f'Rebuilding sales stats for {len(seller_ids)} sellers in {len(chunks)} chunks...')
+
+        started = time.perf_counter()
+        if options['workers'] > 1:
+            with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+                rows = self.report(pool.map(rebuild_seller_stats_in_thread, chunks), len(chunks))
+        else:
+            rows = self.report(map(rebuild_seller_stats, chunks), len(chunks))
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully wrote {rows} stats rows in {time.perf_counter() - started:.1f}s')
+        )
+
+    def report(self, results, total_chunks):
+        rows = 0
+        for done, count in enumerate(results, start=1):
+            rows += count
+            self.stdout.write(f'  chunk {done}/{total_chunks}: {count} rows')
+        return rows
@@ -0,0 +1,121 @@
+import time
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from marketplace.models import (
+    Category, Seller, Buyer, Product, Order, Transaction, CreditTransaction
+)
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Measure query count and latency of the large admin changelists against seeded rows (rolled back afterwards)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000000, help='Rows seeded into each large table')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--repeat', type=int, default=3, help='Requests per changelist; the best time is reported')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.seed(options['rows'], options['batch_size'])
+                self.run(options['repeat'])
+                raise Rollback
+        except Rollback:
+            self.stdout.write('Seeded rows rolled back.')
+
+    def seed(self, rows, batch_size):
+        self.stdout.write(f'Seeding {rows} rows per table...')
+        started = time.perf_counter()
+        party_count = max(rows // 1000, 10)
+
+        category = Category.objects.create(name='Benchmark Category')
+        users = User.objects.bulk_create(
+            [User(username=f'bench_seller_{i}') for i in range(party_count)] +
+            [User(username=f'bench_buyer_{i}') for i in range(party_count)],
+            batch_size=batch_size,
+        )
+        sellers = Seller.objects.bulk_create([
+            Seller(
+                user=user, business_name=f'Bench Seller {i}', owner_name='Owner', phone='0',
+                address='-', city='Pune', state='Maharashtra', pincode='411001',
+                gstin=f'27BNCH{i:06d}Z1Z', turnover=Decimal('10'), bank_name='-',
+                account_number='-', ifsc_code='-', account_holder_name='-',
+                business_type='manufacturer', approval_status='pending' if i % 5 == 0 else 'approved',
+            )
+            for i, user in enumerate(users[:party_count])
+        ], batch_size=batch_size)
+        buyers = Buyer.objects.bulk_create([
+            Buyer(
+                user=user, name=f'Bench Buyer {i}', address='-', mobile_number='0',
+                gstin=f'29BNCH{i:06d}Z1Z', approval_status='pending' if i % 5 == 0 else 'approved',
+            )
+            for i, user in enumerate(users[party_count:])
+        ], batch_size=batch_size)
+
+        def bulk(model, build):
+            for start in range(0, rows, batch_size):
+                model.objects.bulk_create(
+                    [build(i) for i in range(start, min(start + batch_size, rows))],
+                    batch_size=batch_size,
+                )
+
+        bulk(Product, lambda i: Product(
+            seller=sellers[i % party_count], category=category, name=f'Product {i}',
+            description='-', mrp=Decimal('100'), selling_price=Decimal('90'), stock_quantity=10,
+            approval_status='pending' if i % 7 == 0 else 'approved',
+        ))
+        bulk(Order, lambda i: Order(
+            buyer=buyers[i % party_count], seller=sellers[i % party_count], order_number=f'ORD{i:08X}',
+            subtotal=Decimal('90'), gst_amount=Decimal('16.20'), total_amount=Decimal('106.20'),
+            status='pending' if i % 3 == 0 else 'delivered', payment_method='credit', shipping_address='-',
+        ))
+        bulk(Transaction, lambda i: Transaction(
+            buyer=buyers[i % party_count], seller=sellers[i % party_count], transaction_id=f'TXN{i:010X}',
+            transaction_type='purchase', amount=Decimal('106.20'), status='completed',
+        ))
+        bulk(CreditTransaction, lambda i: CreditTransaction(
+            buyer=buyers[i % party_count], amount=Decimal('100'), transaction_type='credit',
+            description='-', balance_after=Decimal('100'),
+        ))
+
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        self.stdout.write(f'Seeded in {time.perf_counter() - started:.1f}s')
+
+    def run(self, repeat):
+        admin_user = User.objects.create_superuser('bench_admin', 'bench@example.com', None)
+        client = Client()
+        client.force_login(admin_user)
+
+        cases = [
+            ('seller', ''), ('seller', '?approval_status__exact=pending'), ('seller', '?q=27BNCH00001'),
+            ('buyer', ''), ('buyer', '?q=29BNCH00001'),
+            ('product', ''), ('product', '?approval_status__exact=pending'),
+            ('order', ''), ('order', '?status__exact=pending'), ('order', '?q=ORD0000001'),
+            ('transaction', ''), ('transaction', '?q=TXN000000001'),
+            ('credittransaction', ''), ('credittransaction', '?transaction_type__exact=credit'),
+        ]
+
+        self.stdout.write(f'{"changelist":<50} {"queries":>8} {"best ms":>10}')
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            for model_name, query in cases:
+                url = reverse(f'admin:marketplace_{model_name}_changelist') + query
+                timings = []
+                for _ in range(repeat):
+                    with CaptureQueriesContext(connection) as queries:
+                        started = time.perf_counter()
+                        response = client.get(url)
+                        timings.append((time.perf_counter() - started) * 1000)
+                    if response.status_code != 200:
+                        self.stderr.write(f'{url} returned {response.status_code}')
+                self.stdout.write(f'{url:<50} {len(queries):>8} {min(timings):>10.1f}')
@@ -0,0 +1,167 @@
+import asyncio
+import io
+import logging
+import sys
+import threading
+import time
+
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.test.utils import override_settings
+from django.urls import reverse
+from marketplace.models import Product
+
+
+HOST = 'testserver'
+
+
+def percentile(latencies, fraction):
+    if not latencies:
+        return 0
+    return latencies[min(int(len(latencies) * fraction), len(latencies) - 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        'Serve the catalog read paths through the WSGI and the ASGI application in-process, '
+        'from many concurrent connections, and report requests/s and latency percentiles'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, default=200, help='Concurrent client connections')
+        parser.add_argument('--requests', type=int, default=2000, help='Requests per handler')
+        parser.add_argument('--handler', choices=['wsgi', 'asgi', 'both'], default='both')
+
+    def handle(self, *args, **options):
+        product = Product.objects.filter(is_active=True).order_by('-created_at').first()
+        if product is None:
+            raise CommandError('No active products; load some first, e.g. with load_sample_data')
+        requests = [
+            (reverse('marketplace:home'), ''),
+            (reverse('marketplace:home'), f'category={product.category_id}&sort=price_low'),
+            (reverse('marketplace:product_detail', args=[product.pk]), ''),
+            (reverse('marketplace:ajax_filter'), f'category={product.category_id}&page=2'),
+            (reverse('marketplace:autocomplete'), f'q={product.name[:2]}'),
+        ]
+
+        self.stdout.write(
+            f'{"handler":<8} {"requests":>9} {"errors":>7} {"seconds":>8} {"req/s":>8} '
+            f'{"p50 ms":>8} {"p99 ms":>8}'
+        )
+        names = ['wsgi', 'asgi'] if options['handler'] == 'both' else [options['handler']]
+        # Set up before silencing the request logger: setup reconfigures logging
+        applications = {'wsgi': get_wsgi_application(), 'asgi': get_asgi_application()}
+        # Errors are counted in the report rather than logged one by one
+        request_logger = logging.getLogger('django.request')
+        level = request_logger.level
+        request_logger.setLevel(logging.CRITICAL)
+        try:
+            with override_settings(ALLOWED_HOSTS=[HOST]):
+                for name in names:
+                    run = self.run_wsgi if name == 'wsgi' else self.run_asgi
+                    started = time.perf_counter()
+                    latencies, errors = run(
+                        applications[name], requests, options['connections'], options['requests']
+                    )
+                    self.report(name, latencies, errors, time.perf_counter() - started)
+        finally:
+            request_logger.setLevel(level)
+
+    def report(self, name, latencies, errors, elapsed):
+        latencies.sort()
+        self.stdout.write(
+            f'{name:<8} {len(latencies):>9} {errors:>7} {elapsed:>8.2f} {len(latencies) / elapsed:>8.1f} '
+            f'{percentile(latencies, 0.5) * 1000:>8.1f} {percentile(latencies, 0.99) * 1000:>8.1f}'
+        )
+
+    def run_wsgi(self, application, requests, connections, total):
+        """A threaded WSGI server: each connection holds a thread for its requests"""
+        latencies = []
+        errors = 0
+        lock = threading.Lock()
+        counter = iter(range(total))
+
+        def connection():
+            nonlocal errors
+            while True:
+                with lock:
+                    index = next(counter, None)
+                if index is None:
+                    return
+                path, query = requests[index % len(requests)]
+                environ = {
+                    'REQUEST_METHOD': 'GET', 'SCRIPT_NAME': '', 'PATH_INFO': path, 'QUERY_STRING': query,
+                    'SERVER_NAME': HOST, 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+                    'HTTP_HOST': HOST, 'REMOTE_ADDR': '127.0.0.1', 'wsgi.version': (1, 0),
+                    'wsgi.url_scheme': 'http', 'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr,
+                    'wsgi.multithread': True, 'wsgi.multiprocess': False, 'wsgi.run_once': False,
+                }
+                statuses = []
+                started = time.perf_counter()
+                response = application(environ, lambda status, headers: statuses.append(status))
+                try:
+                    for _ in response:
+                        pass
+                finally:
+                    response.close()
+                elapsed = time.perf_counter() - started
+                with lock:
+                    latencies.append(elapsed)
+                    errors += not statuses[0].startswith('200')
+
+        threads = [threading.Thread(target=connection) for _ in range(connections)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return latencies, errors
+
+    def run_asgi(self, application, requests, connections, total):
+        """An ASGI server: every connection is a task on one event loop"""
+        latencies = []
+        errors = 0
+        counter = iter(range(total))
+
+        async def request(path, query):
+            scope = {
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+                'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': query.encode(),
+                'root_path': '', 'headers': [(b'host', HOST.encode())],
+                'client': ('127.0.0.1', 0), 'server': (HOST, 80),
+            }
+            body_sent = False
+            finished = asyncio.Event()
+            status = []
+
+            async def receive():
+                nonlocal body_sent
+                if not body_sent:
+                    body_sent = True
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+                await finished.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    status.append(message['status'])
+                elif not message.get('more_body'):
+                    finished.set()
+
+            await application(scope, receive, send)
+            return status[0]
+
+        async def connection():
+            nonlocal errors
+            for index in counter:
+                path, query = requests[index % len(requests)]
+                started = time.perf_counter()
+                status = await request(path, query)
+                latencies.append(time.perf_counter() - started)
+                errors += status != 200
+
+        async def main():
+            await asyncio.gather(*(connection() for _ in range(connections)))
+
+        asyncio.run(main())
+        return latencies, errors
@@ -0,0 +1,162 @@
+import logging
+import threading
+import time
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+from django.db.models import Sum
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from marketplace.gstin import check_digit
+from marketplace.models import Buyer, Category, OrderItem, Product, Seller
+
+
+PREFIX = 'bench_checkout_'
+STOCK = 1000000
+CREDIT = Decimal('100000000')
+
+# SQLite as configured before the database settings profile: rollback
+# journal, full syncs, deferred transactions and Python's 5s busy timeout
+SQLITE_BASELINE_OPTIONS = {'init_command': 'PRAGMA journal_mode=DELETE;PRAGMA synchronous=FULL'}
+
+
+def _gstin(state, i):
+    first_14 = f'{state}CHKOT{i:04d}Z1Z'
+    return first_14 + check_digit(first_14)
+
+
+class Command(BaseCommand):
+    help = 'Place orders from parallel buyer sessions and report checkout throughput and lock errors'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=16, help='Concurrent buyers checking out')
+        parser.add_argument('--orders', type=int, default=25, help='Orders placed by each worker')
+        parser.add_argument('--products', type=int, default=4, help='Products the orders are spread over')
+        parser.add_argument(
+            '--compare', action='store_true',
+            help='SQLite only: run with the untuned baseline connection options first'
+        )
+
+    def handle(self, *args, **options):
+        if User.objects.filter(username__startswith=PREFIX).exists():
+            raise CommandError(f'Users named {PREFIX}* exist; remove them or let a previous run finish')
+
+        settings_dict = connection.settings_dict
+        self.stdout.write(f'Database: {settings_dict["ENGINE"]} {settings_dict["NAME"]}')
+        profiles = [('configured', settings_dict['OPTIONS'])]
+        if options['compare']:
+            if connection.vendor != 'sqlite':
+                raise CommandError('--compare only applies to SQLite')
+            profiles.insert(0, ('baseline', SQLITE_BASELINE_OPTIONS))
+
+        self.stdout.write(
+            f'{"profile":<12} {"orders":>7} {"failed":>7} {"locked":>7} {"seconds":>8} {"orders/s":>9} {"consistent":>11}'
+        )
+        configured_options = settings_dict['OPTIONS']
+        try:
+            for name, db_options in profiles:
+                # New connections, including the workers', pick up these options
+                connections.close_all()
+                settings_dict['OPTIONS'] = db_options
+                self.run_profile(name, options)
+        finally:
+            connections.close_all()
+            settings_dict['OPTIONS'] = configured_options
+
+    def seed(self, options):
+        category = Category.objects.create(name=f'{PREFIX}category')
+        seller = Seller.objects.create(
+            user=User.objects.create_user(f'{PREFIX}seller'), business_name='Checkout Bench', owner_name='-',
+            phone='0', address='-', city='Pune', state='Maharashtra', pincode='411001',
+            gstin=_gstin('27', 0), turnover=Decimal('10'), bank_name='-', account_number='-',
+            ifsc_code='-', account_holder_name='-', business_type='manufacturer', approval_status='approved',
+        )
+        products = [
+            Product.objects.create(
+                seller=seller, category=category, name=f'Bench Product {i}', description='-',
+                mrp=Decimal('120'), selling_price=Decimal('100'), stock_quantity=STOCK,
+                approval_status='approved', is_active=True,
+            )
+            for i in range(options['products'])
+        ]
+        buyers = [
+            Buyer.objects.create(
+                user=User.objects.create_user(f'{PREFIX}buyer_{i}'), name=f'Bench Buyer {i}', address='-',
+                mobile_number='0', gstin=_gstin('29', i + 1), approval_status='approved',
+                credit_balance=CREDIT,
+            )
+            for i in range(options['workers'])
+        ]
+        return products, buyers
+
+    def cleanup(self):
+        User.objects.filter(username__startswith=PREFIX).delete()
+        Category.objects.filter(name=f'{PREFIX}category').delete()
+
+    def run_profile(self, name, options):
+        products, buyers = self.seed(options)
+        results = []
+        lock = threading.Lock()
+        barrier = threading.Barrier(len(buyers))
+
+        def worker(index, buyer):
+            placed = failed = locked = 0
+            try:
+                client = Client()
+                client.force_login(buyer.user)
+                barrier.wait()
+                for n in range(options['orders']):
+                    product = products[(index + n) % len(products)]
+                    try:
+                        response = client.post(reverse('marketplace:place_order', args=[product.pk]), {
+                            'quantity': 1, 'payment_method': 'credit', 'shipping_address': '-',
+                        })
+                    except OperationalError as exc:
+                        failed += 1
+                        locked += 'locked' in str(exc)
+                        continue
+                    if response.status_code == 302:
+                        placed += 1
+                    else:
+                        failed += 1
+            finally:
+                connections.close_all()
+            with lock:
+                results.append((placed, failed, locked))
+
+        threads = [threading.Thread(target=worker, args=(i, buyer)) for i, buyer in enumerate(buyers)]
+        # Failed checkouts are counted below rather than logged one by one
+        request_logger = logging.getLogger('django.request')
+        level = request_logger.level
+        request_logger.setLevel(logging.CRITICAL)
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            started = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - started
+        request_logger.setLevel(level)
+
+        placed = sum(result[0] for result in results)
+        failed = sum(result[1] for result in results)
+        locked = sum(result[2] for result in results)
+
+        # Every committed order item must show up once in stock and in credit
+        # balances; lost updates between concurrent checkouts break this
+        units = OrderItem.objects.filter(product__in=products).aggregate(units=Sum('quantity'))['units'] or 0
+        stock_sold = sum(STOCK - stock for stock in Product.objects.filter(
+            pk__in=[product.pk for product in products]).values_list('stock_quantity', flat=True))
+        charged = sum(CREDIT - balance for balance in Buyer.objects.filter(
+            pk__in=[buyer.pk for buyer in buyers]).values_list('credit_balance', flat=True))
+        product = products[0]
+        consistent = units == stock_sold and charged == product.selling_price * (100 + product.gst_rate) / 100 * units
+
+        self.stdout.write(
+            f'{name:<12} {placed:>7} {failed:>7} {locked:>7} {elapsed:>8.2f} '
+            f'{placed / elapsed if elapsed else 0:>9.1f} {"yes" if consistent else "NO":>11}'
+        )
+        self.cleanup()
@@ -0,0 +1,85 @@
+import statistics
+import time
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.template.loader import render_to_string
+from marketplace.fragments import card_cache_key, render_product_cards
+from marketplace.gstin import check_digit
+from marketplace.models import Category, Product, ProductImage, Seller
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Measure category page render time with and without cached product cards (seeded rows are rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[12, 48], help='Cards per page')
+        parser.add_argument('--repeat', type=int, default=50, help='Renders per measurement; the median is reported')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                category = self.seed(max(options['sizes']))
+                self.stdout.write(f'{"cards":>6} {"uncached ms":>12} {"cold ms":>8} {"warm ms":>8} {"speedup":>8}')
+                for size in options['sizes']:
+                    self.measure(category, size, options['repeat'])
+                raise Rollback
+        except Rollback:
+            self.stdout.write('Seeded rows rolled back.')
+
+    def seed(self, count):
+        first_14 = '27BNCHF0000Z1Z'
+        seller = Seller.objects.create(
+            user=User.objects.create_user('bench_fragments_seller'), business_name='Fragment Bench',
+            owner_name='-', phone='0', address='-', city='Pune', state='Maharashtra', pincode='411001',
+            gstin=first_14 + check_digit(first_14), turnover=Decimal('10'), bank_name='-', account_number='-',
+            ifsc_code='-', account_holder_name='-', business_type='manufacturer', approval_status='approved',
+        )
+        category = Category.objects.create(name='Fragment Bench Category')
+        products = Product.objects.bulk_create([
+            Product(
+                seller=seller, category=category, name=f'Bench Product {i}', description='Sturdy, tested. ' * 8,
+                mrp=Decimal('120'), selling_price=Decimal('99.50'), stock_quantity=10, is_customizable=i % 3 == 0,
+                approval_status='approved', is_active=True,
+            )
+            for i in range(count)
+        ])
+        # Rows only: saving a ProductImage would open the (absent) file to resize it
+        ProductImage.objects.bulk_create([
+            ProductImage(product=product, image=f'products/bench_{product.pk}.jpg', is_primary=True)
+            for product in products
+        ])
+        return category
+
+    def render_page(self, category, size, use_cache):
+        started = time.perf_counter()
+        products = Product.objects.filter(category=category, is_active=True).select_related('seller')[:size]
+        page_obj = Paginator(list(products), size).page(1)
+        render_to_string('marketplace/category_products.html', {
+            'category': category,
+            'page_obj': page_obj,
+            'products': page_obj.object_list,
+            'product_cards': render_product_cards(page_obj.object_list, use_cache=use_cache),
+        })
+        return (time.perf_counter() - started) * 1000
+
+    def measure(self, category, size, repeat):
+        uncached = statistics.median(self.render_page(category, size, False) for _ in range(repeat))
+        # Only this page's cards are dropped; the cache may be shared with a live site
+        card_keys = [card_cache_key(product) for product in Product.objects.filter(category=category)]
+        cold = []
+        for _ in range(repeat):
+            cache.delete_many(card_keys)
+            cold.append(self.render_page(category, size, True))
+        warm = statistics.median(self.render_page(category, size, True) for _ in range(repeat))
+        self.stdout.write(
+            f'{size:>6} {uncached:>12.2f} {statistics.median(cold):>8.2f} {warm:>8.2f} {uncached / warm:>7.1f}x'
+        )
@@ -0,0 +1,49 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from marketplace import instrumentation
+from marketplace.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Measure the per-request overhead of the request instrumentation middleware'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=300, help='Requests per URL and round')
+        parser.add_argument('--rounds', type=int, default=5, help='Alternating off/on rounds; medians are reported')
+
+    def handle(self, *args, **options):
+        product = Product.objects.filter(is_active=True).first()
+        if product is None:
+            raise CommandError('No active products; load some first, e.g. with load_sample_data')
+        urls = [
+            reverse('marketplace:home'),
+            reverse('marketplace:product_detail', args=[product.pk]),
+            f'{reverse("marketplace:ajax_filter")}?category={product.category_id}',
+            f'{reverse("marketplace:autocomplete")}?q={product.name[:2]}',
+        ]
+
+        timings = {(url, enabled): [] for url in urls for enabled in (False, True)}
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            for _ in range(options['rounds']):
+                for enabled in (False, True):
+                    # A new client loads the middleware again under the setting
+                    with override_settings(MARKETPLACE_INSTRUMENTATION=enabled):
+                        client = Client()
+                        for url in urls:
+                            client.get(url)
+                            started = time.perf_counter()
+                            for _ in range(options['requests']):
+                                client.get(url)
+                            timings[url, enabled].append((time.perf_counter() - started) / options['requests'])
+        instrumentation.registry.reset()
+
+        self.stdout.write(f'{"url":<40} {"off us":>9} {"on us":>9} {"overhead us":>11} {"overhead":>9}')
+        for url in urls:
+            off = statistics.median(timings[url, False]) * 1e6
+            on = statistics.median(timings[url, True]) * 1e6
+            self.stdout.write(f'{url[:40]:<40} {off:>9.0f} {on:>9.0f} {on - off:>11.0f} {(on - off) / off:>8.1%}')
@@ -0,0 +1,159 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+# Run in a fresh interpreter. -X importtime only reports import statements,
+# so import_module (settings, app modules, models, admin) is routed through
+# __import__ to have those attributed too. The marker separates the imports
+# of django.setup() from those of loading the WSGI application (middleware).
+MARKER = '--- setup done ---'
+CHILD = f'''
+import importlib, importlib.util, json, sys, time
+
+def import_module(name, package=None):
+    name = importlib.util.resolve_name(name, package)
+    __import__(name)
+    return sys.modules[name]
+
+importlib.import_module = import_module
+started = time.perf_counter()
+import django
+django.setup()
+setup = time.perf_counter()
+print({MARKER!r}, file=sys.stderr, flush=True)
+from django.core.wsgi import get_wsgi_application
+get_wsgi_application()
+print(json.dumps({{'setup_ms': (setup - started) * 1000, 'application_ms': (time.perf_counter() - started) * 1000}}))
+'''
+PROJECT_PACKAGES = ('marketplace', 'power_app')
+
+
+def parse_importtime(stderr):
+    """``(module, self_us, cumulative_us)`` of the imports before the marker in ``-X importtime`` output"""
+    rows = []
+    for line in stderr.splitlines():
+        if line == MARKER:
+            break
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, module = line[len('import time:'):].split('|')
+        rows.append((module.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def imports(module, imported):
+    return any(name == module or name.startswith(module + '.') for name in imported)
+
+
+class Command(BaseCommand):
+    help = (
+        'Time django.setup() and loading the WSGI application in fresh interpreters, attribute the import '
+        'time with -X importtime, and fail when setup imports a forbidden module or gets slower'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--runs', type=int, default=7,
+            help='Timed interpreter starts; the fastest setup is checked, since noise only adds time',
+        )
+        parser.add_argument('--top', type=int, default=10, help='Packages listed by import time')
+        parser.add_argument(
+            '--forbid', action='append', default=None,
+            help='Module django.setup() must not import (repeatable; default: PIL)',
+        )
+        parser.add_argument('--max-setup-ms', type=float, help='Fail when the fastest setup takes longer')
+        parser.add_argument('--baseline', help='Results JSON of an earlier run to compare with')
+        parser.add_argument(
+            '--tolerance', type=float, default=15, help='Allowed setup slowdown over the baseline, in percent',
+        )
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+
+    def run_child(self, *flags):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE)
+        result = subprocess.run(
+            [sys.executable, *flags, '-c', CHILD], cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        if result.returncode:
+            raise CommandError(f'Starting Django failed:\n{result.stderr[-2000:]}')
+        return json.loads(result.stdout.strip().splitlines()[-1]), result.stderr
+
+    def handle(self, *args, **options):
+        if options['runs'] < 1:
+            raise CommandError('--runs must be at least 1')
+        forbidden = options['forbid'] or ['PIL']
+        baseline = None
+        if options['baseline']:
+            try:
+                with open(options['baseline']) as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f'Cannot read the baseline: {e}')
+
+        # Import timing slows the interpreter down, so it gets a run of its own
+        timings = [self.run_child()[0] for _ in range(options['runs'])]
+        rows = parse_importtime(self.run_child('-X', 'importtime')[1])
+
+        by_package = defaultdict(int)
+        for module, self_us, _ in rows:
+            by_package[module.split('.')[0]] += self_us
+        results = {
+            'python': sys.version.split()[0],
+            'runs': options['runs'],
+            'setup_ms': statistics.median(timing['setup_ms'] for timing in timings),
+            'setup_min_ms': min(timing['setup_ms'] for timing in timings),
+            'application_ms': statistics.median(timing['application_ms'] for timing in timings),
+            'modules': len(rows),
+            'import_ms': sum(self_us for _, self_us, _ in rows) / 1000,
+            'packages_ms': {
+                package: self_us / 1000 for package, self_us in sorted(by_package.items(), key=lambda item: -item[1])
+            },
+            'project_modules_ms': {
+                module: cumulative_us / 1000 for module, _, cumulative_us in rows
+                if module.split('.')[0] in PROJECT_PACKAGES
+            },
+            'forbidden_imported': [module for module in forbidden if imports(module, {row[0] for row in rows})],
+        }
+        self.report(results, options['top'])
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f'Results written to {options["output"]}')
+
+        failures = [f'django.setup() imports {module}' for module in results['forbidden_imported']]
+        fastest = results['setup_min_ms']
+        if options['max_setup_ms'] is not None and fastest > options['max_setup_ms']:
+            failures.append(f'setup took {fastest:.0f} ms, over the {options["max_setup_ms"]:g} ms budget')
+        if baseline is not None:
+            before = baseline['setup_min_ms']
+            self.stdout.write(
+                f'Fastest setup {before:.1f} ms > {fastest:.1f} ms ({fastest / before - 1:+.1%} vs the baseline)'
+            )
+            if fastest > before * (1 + options['tolerance'] / 100):
+                failures.append(
+                    f'setup took {fastest:.0f} ms, over {options["tolerance"]:g}% slower than '
+                    f'the baseline\'s {before:.0f} ms'
+                )
+        if failures:
+            raise CommandError('Startup regressed: ' + '; '.join(failures))
+
+    def report(self, results, top):
+        self.stdout.write(f'{"phase":<28} {"median ms":>10} {"fastest ms":>10}')
+        self.stdout.write(f'{"django.setup()":<28} {results["setup_ms"]:>10.1f} {results["setup_min_ms"]:>10.1f}')
+        self.stdout.write(f'{"+ WSGI application":<28} {results["application_ms"]:>10.1f}')
+        self.stdout.write(
+            f'\n{results["modules"]} modules imported by setup, {results["import_ms"]:.1f} ms of import time '
+            '(under -X importtime)'
+        )
+        self.stdout.write(f'{"package":<28} {"import ms":>10}')
+        for package, ms in list(results['packages_ms'].items())[:top]:
+            self.stdout.write(f'{package:<28} {ms:>10.1f}')
+        self.stdout.write(f'\n{"project module":<36} {"cumulative ms":>13}')
+        for module, ms in sorted(results['project_modules_ms'].items(), key=lambda item: -item[1])[:top]:
+            self.stdout.write(f'{module:<36} {ms:>13.1f}')
@@ -0,0 +1,25 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from marketplace.models import ChunkedUpload
+from marketplace.uploads import delete_upload
+
+
+class Command(BaseCommand):
+    help = 'Delete chunked uploads that were abandoned or never attached to a form'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=24, help='Age after which an unused upload is removed')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options['hours'])
+        stale = ChunkedUpload.objects.filter(status__in=['uploading', 'complete'], updated_at__lt=cutoff)
+        removed = 0
+        for upload in stale.iterator():
+            delete_upload(upload)
+            removed += 1
+
+        # Attached files belong to their seller or order now; only the record goes
+        attached, _ = ChunkedUpload.objects.filter(status='attached', updated_at__lt=cutoff).delete()
+        self.stdout.write(self.style.SUCCESS(f'Removed {removed} abandoned uploads and {attached} attached records'))
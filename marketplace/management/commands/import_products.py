@@ -0,0 +1,38 @@
+import os
+import time
+
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+from marketplace.imports import run_import
+from marketplace.models import ProductImport, Seller
+
+
+class Command(BaseCommand):
+    help = 'Import a CSV/XLSX product catalog for a seller, as the bulk upload page does'
+
+    def add_arguments(self, parser):
+        parser.add_argument('seller_id', type=int)
+        parser.add_argument('path', help='CSV or XLSX file to import')
+
+    def handle(self, *args, **options):
+        try:
+            seller = Seller.objects.get(pk=options['seller_id'])
+        except Seller.DoesNotExist:
+            raise CommandError(f'Seller {options["seller_id"]} does not exist')
+
+        path = options['path']
+        with open(path, 'rb') as handle:
+            upload = ProductImport.objects.create(seller=seller, file=File(handle, name=os.path.basename(path)))
+
+        started = time.perf_counter()
+        upload = run_import(upload.pk)
+        elapsed = time.perf_counter() - started
+
+        if upload.status == 'failed':
+            raise CommandError(f'Import #{upload.pk} failed: {upload.error}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Import #{upload.pk}: {upload.total_rows} rows, {upload.created_count} created, '
+            f'{upload.updated_count} updated, {upload.error_count} errors in {elapsed:.1f}s'
+        ))
+        if upload.error_report:
+            self.stdout.write(f'Error report: {upload.error_report.path}')
@@ -1,13 +1,99 @@
-from django.core.management.base import BaseCommand
+import random
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
 from django.contrib.auth.models import User
+from marketplace import synthetic
 from marketplace.models import Category, Seller, Product, PODCustomization
-import random
+
+
+SCALE_OPTIONS = ('sellers', 'buyers', 'products', 'orders', 'reviews')
 
 
 class Command(BaseCommand):
-    help = 'Load sample data for the marketplace'
+    help = (
+        'Load sample data for the marketplace: a small hand-written catalog, or with any of '
+        '--sellers/--buyers/--products/--orders/--reviews a generated one at load-testing scale'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sellers', type=int, default=0, help='Sellers to generate')
+        parser.add_argument('--buyers', type=int, default=0, help='Buyers to generate')
+        parser.add_argument('--products', type=int, default=0,
+                            help='Products to generate, with images and customizations')
+        parser.add_argument('--orders', type=int, default=0,
+                            help='Orders to generate, with items, transactions and credit ledger')
+        parser.add_argument('--reviews', type=int, default=0, help='Product reviews to generate')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed; the same seed gives the same data')
+        parser.add_argument('--days', type=int, default=365, help='Days of history to spread rows over')
+        parser.add_argument('--zipf', type=float, default=1.1, help='Zipf exponent of product popularity')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows generated and inserted per batch')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Processes generating batches; this one inserts them in order')
 
     def handle(self, *args, **options):
+        counts = {name: options[name] for name in SCALE_OPTIONS}
+        if any(counts.values()):
+            self.generate(counts, options)
+        else:
+            self.load_demo_data()
+
+    def generate(self, counts, options):
+        if any(count < 0 for count in counts.values()):
+            raise CommandError('Counts cannot be negative')
+        if counts['products'] and not counts['sellers']:
+            raise CommandError('--products needs --sellers to own them')
+        if (counts['orders'] or counts['reviews']) and not (counts['buyers'] and counts['products']):
+            raise CommandError('--orders and --reviews need --buyers and --products')
+        if options['days'] < 1 or options['batch_size'] < 1 or options['workers'] < 1:
+            raise CommandError('--days, --batch-size and --workers must be at least 1')
+
+        started = time.perf_counter()
+        plan = synthetic.build_plan(
+            counts, seed=options['seed'], days=options['days'], zipf=options['zipf'], batch_size=options['batch_size']
+        )
+        if counts['products']:
+            synthetic.ensure_placeholder_images()
+        tasks = plan.batches()
+        self.stdout.write(f'Planned {len(tasks)} batches in {time.perf_counter() - started:.1f}s')
+
+        if options['workers'] > 1:
+            with ProcessPoolExecutor(
+                max_workers=options['workers'], initializer=synthetic.init_worker, initargs=(plan,)
+            ) as pool:
+                rows = self.write(self.generated_in_pool(pool, tasks, options['workers']), len(tasks), started)
+        else:
+            rows = self.write((synthetic.prepare_batch(plan, *task) for task in tasks), len(tasks), started)
+
+        stats_rows = synthetic.finish(plan)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {rows} rows ({", ".join(f"{count} {name}" for name, count in counts.items())}) '
+            f'and {stats_rows} sales stats rows in {elapsed:.1f}s ({rows / elapsed:.0f} rows/s)'
+        ))
+
+    def generated_in_pool(self, pool, tasks, workers):
+        """Batches in task order, keeping a bounded number in flight so memory stays flat"""
+        pending = deque()
+        for task in tasks:
+            pending.append(pool.submit(synthetic.prepare_in_worker, *task))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+    def write(self, batches, total, started):
+        rows = 0
+        for done, batch in enumerate(batches, start=1):
+            rows += synthetic.write_batch(batch)
+            if done % 10 == 0 or done == total:
+                elapsed = time.perf_counter() - started
+                self.stdout.write(f'  batch {done}/{total}: {rows} rows, {rows / elapsed:.0f} rows/s')
+        return rows
+
+    def load_demo_data(self):
         self.stdout.write('Loading sample data...')
 
         # Create categories
@@ -42,7 +128,7 @@ class Command(BaseCommand):
                 'phone': '+91-9876543210',
                 'city': 'Mumbai',
                 'state': 'Maharashtra',
-                'gstin': '27AABCT1332L1ZA',
+                'gstin': '27AABCT1332L1ZE',
                 'turnover': 15.5,
                 'bank_name': 'State Bank of India',
                 'account_number': '1234567890123456',
@@ -59,7 +145,7 @@ class Command(BaseCommand):
                 'phone': '+91-9876543211',
                 'city': 'Jaipur',
                 'state': 'Rajasthan',
-                'gstin': '08AABCT1332L1ZB',
+                'gstin': '08AABCT1332L1ZE',
                 'turnover': 25.0,
                 'bank_name': 'ICICI Bank',
                 'account_number': '6543210987654321',
@@ -76,7 +162,7 @@ class Command(BaseCommand):
                 'phone': '+91-9876543212',
                 'city': 'Bangalore',
                 'state': 'Karnataka',
-                'gstin': '29AABCT1332L1ZC',
+                'gstin': '29AABCT1332L1ZA',
                 'turnover': 18.9,
                 'bank_name': 'HDFC Bank',
                 'account_number': '9876543210123456',
@@ -93,7 +179,7 @@ class Command(BaseCommand):
                 'phone': '+91-9876543213',
                 'city': 'Delhi',
                 'state': 'Delhi',
-                'gstin': '07AABCT1332L1ZD',
+                'gstin': '07AABCT1332L1ZG',
                 'turnover': 22.0,
                 'bank_name': 'AXIS Bank',
                 'account_number': '3210987654321098',
@@ -110,7 +196,7 @@ class Command(BaseCommand):
                 'phone': '+91-9876543214',
                 'city': 'Kolkata',
                 'state': 'West Bengal',
-                'gstin': '19AABCT1332L1ZE',
+                'gstin': '19AABCT1332L1ZB',
                 'turnover': 30.0,
                 'bank_name': 'Kotak Mahindra Bank',
                 'account_number': '2109876543210987',
@@ -0,0 +1,146 @@
+import asyncio
+import json
+import subprocess
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from marketplace import loadtest
+
+
+class Command(BaseCommand):
+    help = (
+        'Replay a mix of buyer, seller and anonymous traffic against a running server with the accounts '
+        'seeded by load_sample_data, and report throughput, latency percentiles and errors per URL name'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='Server to load, e.g. runserver')
+        parser.add_argument('--buyers', type=int, default=20, help='Logged-in buyers')
+        parser.add_argument('--sellers', type=int, default=5, help='Logged-in sellers')
+        parser.add_argument('--anonymous', type=int, default=25, help='Visitors who only browse')
+        parser.add_argument('--duration', type=float, default=60, help='Seconds measured')
+        parser.add_argument('--warmup', type=float, default=0, help='Seconds run before measuring')
+        parser.add_argument('--think', type=float, default=1.0, help='Mean pause between a user\'s actions (s)')
+        parser.add_argument('--timeout', type=float, default=10, help='Seconds before a request counts as failed')
+        parser.add_argument(
+            '--mix', default=','.join(f'{action}={weight}' for action, weight in loadtest.DEFAULT_MIX.items()),
+            help=f'Action weights; actions: {", ".join(loadtest.ACTIONS)}',
+        )
+        parser.add_argument('--password', default=loadtest.PASSWORD, help='Password of the seeded accounts')
+        parser.add_argument('--username-prefix', default='synth_', help='Only log in accounts named like this')
+        parser.add_argument('--products', type=int, default=1000, help='Active products sampled for the run')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+        parser.add_argument('--baseline', help='Results JSON of an earlier run to compare with')
+
+    def handle(self, *args, **options):
+        for name in ('buyers', 'sellers', 'anonymous', 'products'):
+            if options[name] < 0:
+                raise CommandError(f'--{name} must not be negative')
+        if options['duration'] <= 0 or options['warmup'] < 0 or options['think'] < 0 or options['timeout'] <= 0:
+            raise CommandError('--duration and --timeout must be positive, --warmup and --think not negative')
+        try:
+            mix = loadtest.parse_mix(options['mix'])
+        except ValueError as e:
+            raise CommandError(e)
+        baseline = None
+        if options['baseline']:
+            try:
+                with open(options['baseline']) as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f'Cannot read the baseline: {e}')
+
+        workload = loadtest.Workload.from_database(
+            options['buyers'], options['sellers'], options['username_prefix'], options['products'], options['seed'],
+        )
+        if not workload.products:
+            raise CommandError('No active products; load some first, e.g. with load_sample_data')
+        for role in ('buyers', 'sellers'):
+            found = len(getattr(workload, role))
+            if found < options[role]:
+                self.stderr.write(
+                    f'Only {found} approved {role} named {options["username_prefix"]}*; '
+                    'load more with load_sample_data --buyers/--sellers'
+                )
+        users = len(workload.buyers) + len(workload.sellers) + options['anonymous']
+        if not users:
+            raise CommandError('No virtual users to run')
+
+        self.stdout.write(
+            f'{users} users ({len(workload.buyers)} buyers, {len(workload.sellers)} sellers, '
+            f'{options["anonymous"]} anonymous) against {options["url"]} for {options["duration"]:g}s'
+        )
+        try:
+            summary = asyncio.run(loadtest.run(
+                options['url'], workload, mix, anonymous=options['anonymous'], duration=options['duration'],
+                warmup=options['warmup'], think=options['think'], timeout=options['timeout'],
+                password=options['password'], seed=options['seed'],
+            ))
+        except ValueError as e:
+            raise CommandError(e)
+
+        results = {
+            'commit': self.commit(),
+            'started_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'config': {
+                key: options[key] for key in (
+                    'url', 'buyers', 'sellers', 'anonymous', 'duration', 'warmup', 'think', 'timeout',
+                    'products', 'seed',
+                )
+            } | {'mix': mix, 'users': users},
+            **summary,
+        }
+        self.report(results)
+        if baseline is not None:
+            self.report_changes(results, baseline)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f'Results written to {options["output"]}')
+
+    def commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def report(self, results):
+        self.stdout.write(
+            f'{"url name":<38} {"requests":>8} {"errors":>7} {"req/s":>7} {"p50 ms":>8} {"p90 ms":>8} '
+            f'{"p95 ms":>8} {"p99 ms":>8} {"max ms":>8}'
+        )
+        for endpoint in results['endpoints']:
+            self.stdout.write(
+                f'{endpoint["name"][:38]:<38} {endpoint["requests"]:>8} {endpoint["errors"]:>7} '
+                f'{endpoint["throughput_rps"]:>7.1f} {endpoint["p50_ms"]:>8.1f} {endpoint["p90_ms"]:>8.1f} '
+                f'{endpoint["p95_ms"]:>8.1f} {endpoint["p99_ms"]:>8.1f} {endpoint["max_ms"]:>8.1f}'
+            )
+            for kind, count in sorted(endpoint['error_kinds'].items()):
+                self.stdout.write(f'    {count} x {kind}')
+        self.stdout.write(
+            f'{results["requests"]} requests in {results["elapsed_seconds"]:.1f}s: '
+            f'{results["throughput_rps"]:.1f} req/s, {results["errors"]} errors ({results["error_rate"]:.2%})'
+        )
+
+    def report_changes(self, results, baseline):
+        self.stdout.write(f'\nCompared with {baseline.get("commit") or "the baseline"}:')
+        self.stdout.write(
+            f'{"url name":<38} {"req/s":>15} {"p50 ms":>17} {"p95 ms":>17} {"p95 change":>10}'
+        )
+        for row in loadtest.compare(results, baseline):
+            (rps_before, rps), (p50_before, p50), (p95_before, p95) = (
+                row['throughput_rps'], row['p50_ms'], row['p95_ms']
+            )
+            change = f'{(p95 - p95_before) / p95_before:>+10.1%}' if p95_before else f'{"":>10}'
+            self.stdout.write(
+                f'{row["name"][:38]:<38} {rps_before:>7.1f}>{rps:<7.1f} {p50_before:>8.1f}>{p50:<8.1f} '
+                f'{p95_before:>8.1f}>{p95:<8.1f} {change}'
+            )
+        self.stdout.write(
+            f'{"total":<38} {baseline["throughput_rps"]:>7.1f}>{results["throughput_rps"]:<7.1f}  '
+            f'errors {baseline["error_rate"]:.2%} > {results["error_rate"]:.2%}'
+        )
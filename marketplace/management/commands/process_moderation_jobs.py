@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+from marketplace.models import ModerationJob
+from marketplace.moderation import run_queued_jobs
+
+
+class Command(BaseCommand):
+    help = 'Process queued bulk moderation jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--poll', type=float, default=0,
+            help='Keep running, checking for new jobs every N seconds'
+        )
+        parser.add_argument(
+            '--retry-failed', action='store_true',
+            help='Re-queue failed jobs; they resume from the last completed chunk'
+        )
+
+    def handle(self, *args, **options):
+        if options['retry_failed']:
+            requeued = ModerationJob.objects.filter(status='failed').update(status='queued', error='')
+            self.stdout.write(f'Re-queued {requeued} failed jobs')
+
+        while True:
+            count = run_queued_jobs()
+            if count:
+                self.stdout.write(self.style.SUCCESS(f'Processed {count} moderation jobs'))
+            if not options['poll']:
+                break
+            time.sleep(options['poll'])
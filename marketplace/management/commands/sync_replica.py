@@ -0,0 +1,46 @@
+import sqlite3
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from marketplace.routers import read_replicas
+
+
+class Command(BaseCommand):
+    help = (
+        'Copy the primary SQLite database into each read replica file with the online backup API; '
+        'a local stand-in for streaming replication'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0, help='Keep syncing every N seconds')
+
+    def handle(self, *args, **options):
+        primary = connections[DEFAULT_DB_ALIAS]
+        if primary.vendor != 'sqlite':
+            raise CommandError('sync_replica only copies SQLite files; use the database\'s own replication')
+        replicas = read_replicas()
+        if not replicas:
+            raise CommandError('No read replicas configured; set DB_REPLICAS')
+
+        while True:
+            started = time.perf_counter()
+            for alias in replicas:
+                self.copy(primary.settings_dict['NAME'], connections[alias].settings_dict['NAME'])
+            self.stdout.write(
+                f'Synced {len(replicas)} replica(s) in {(time.perf_counter() - started) * 1000:.0f} ms'
+            )
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def copy(self, source_name, target_name):
+        source = sqlite3.connect(str(source_name))
+        target = sqlite3.connect(str(target_name), timeout=30)
+        try:
+            # One step: stepwise copies restart whenever the primary is written.
+            # Replica readers wait on their busy timeout while pages land.
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
@@ -0,0 +1,97 @@
+import os
+import time
+from collections import Counter, defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from marketplace.gstin import check_gstins
+from marketplace.models import Buyer, Seller
+
+
+# Primary keys per UPDATE ... WHERE id IN (...), under SQLite's default bound-parameter limit
+UPDATE_BATCH_SIZE = 900
+
+
+class Command(BaseCommand):
+    help = 'Check every seller and buyer GSTIN (format, state code, check digit) and record the result'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=10000, help='Profiles read and checked per chunk')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Worker processes; 1 checks inline')
+        parser.add_argument('--only-unverified', action='store_true', help='Skip profiles already checked')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        if options['workers'] > 1:
+            with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+                totals = self.verify_all(pool, options)
+        else:
+            totals = self.verify_all(None, options)
+
+        for model, (checked, changed, statuses) in totals.items():
+            summary = ', '.join(f'{status}: {count}' for status, count in sorted(statuses.items()))
+            self.stdout.write(f'{model._meta.verbose_name_plural}: {checked} checked, {changed} changed ({summary or "none"})')
+        self.stdout.write(self.style.SUCCESS(f'Verified GSTINs in {time.perf_counter() - started:.1f}s'))
+
+    def verify_all(self, pool, options):
+        return {model: self.verify(model, pool, options) for model in (Seller, Buyer)}
+
+    def chunks(self, model, options):
+        """Yield ``(pks, gstins, statuses)`` by primary key, chunk_size rows at a time"""
+        queryset = model.objects.order_by('pk')
+        if options['only_unverified']:
+            queryset = queryset.filter(gstin_status='unverified')
+        last_pk = 0
+        while True:
+            rows = list(queryset.filter(pk__gt=last_pk).values_list('pk', 'gstin', 'gstin_status')[:options['chunk_size']])
+            if not rows:
+                return
+            last_pk = rows[-1][0]
+            yield tuple(map(list, zip(*rows)))
+
+    def verify(self, model, pool, options):
+        checked = changed = 0
+        statuses = Counter()
+
+        def save(pks, old_statuses, new_statuses):
+            # Only rows whose status changed are written, one UPDATE per
+            # status; building a model instance per row for bulk_update
+            # would cost more than checking the GSTINs
+            changes = defaultdict(list)
+            for pk, old, new in zip(pks, old_statuses, new_statuses):
+                if old != new:
+                    changes[new].append(pk)
+            with transaction.atomic():
+                for status, changed_pks in changes.items():
+                    for start in range(0, len(changed_pks), UPDATE_BATCH_SIZE):
+                        model.objects.filter(pk__in=changed_pks[start:start + UPDATE_BATCH_SIZE]).update(
+                            gstin_status=status
+                        )
+            statuses.update(new_statuses)
+            return len(pks), sum(map(len, changes.values()))
+
+        if pool is None:
+            for pks, gstins, old_statuses in self.chunks(model, options):
+                rows, written = save(pks, old_statuses, check_gstins(gstins))
+                checked += rows
+                changed += written
+            return checked, changed, statuses
+
+        # Keep a bounded number of chunks in flight so memory stays flat
+        pending = deque()
+        window = options['workers'] * 2
+        for pks, gstins, old_statuses in self.chunks(model, options):
+            pending.append((pks, old_statuses, pool.submit(check_gstins, gstins)))
+            if len(pending) >= window:
+                pks, old_statuses, future = pending.popleft()
+                rows, written = save(pks, old_statuses, future.result())
+                checked += rows
+                changed += written
+        while pending:
+            pks, old_statuses, future = pending.popleft()
+            rows, written = save(pks, old_statuses, future.result())
+            checked += rows
+            changed += written
+        return checked, changed, statuses
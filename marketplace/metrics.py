@@ -0,0 +1,393 @@
+"""
+Business and latency metrics in the Prometheus text format.
+
+Counters, gauges and histograms are declared at the bottom of this module
+and updated from the views, the page and fragment caches and the database
+backends in marketplace.backends. ``/metrics`` renders them.
+
+Values live in this process's memory unless MARKETPLACE_METRICS_DIR is set.
+Under a multi-process server (gunicorn workers, several uvicorn processes)
+set it to a directory shared by the processes of one deployment: each
+process then keeps its values in a memory-mapped file of its own there, and
+``/metrics`` adds up the files of all processes, whichever one serves it.
+Counters and histograms of processes that have exited still count, so
+totals don't drop when a worker is recycled; gauges only count processes
+that are still running. Empty the directory when the deployment restarts.
+"""
+import bisect
+import json
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+INITIAL_FILE_SIZE = 64 * 1024
+
+
+def metrics_directory():
+    return getattr(settings, 'MARKETPLACE_METRICS_DIR', '')
+
+
+def scrape_token():
+    return getattr(settings, 'MARKETPLACE_METRICS_TOKEN', '')
+
+
+class MmapValues:
+    """
+    Values of one process in a memory-mapped file. The file holds the number
+    of bytes used, then entries of a length-prefixed key and an 8-byte
+    aligned double. Entries are only appended, and the used count is written
+    after the entry, so other processes can read the file at any time.
+    """
+
+    def __init__(self, path, reset=False):
+        self.path = path
+        self.file = open(path, 'a+b' if not reset else 'w+b')
+        if os.fstat(self.file.fileno()).st_size == 0:
+            self.file.truncate(INITIAL_FILE_SIZE)
+        self.map = mmap.mmap(self.file.fileno(), 0)
+        self.used = struct.unpack_from('i', self.map, 0)[0] or 8
+        self.positions = {key: position for key, _, position in read_entries(self.map, self.used)}
+
+    def add(self, key, amount):
+        position = self.position(key)
+        value = struct.unpack_from('d', self.map, position)[0]
+        struct.pack_into('d', self.map, position, value + amount)
+
+    def set(self, key, value):
+        struct.pack_into('d', self.map, self.position(key), value)
+
+    def position(self, key):
+        position = self.positions.get(key)
+        if position is None:
+            encoded = key.encode()
+            header = 4 + len(encoded)
+            position = self.used + header + (-header % 8)
+            if position + 8 > len(self.map):
+                self.grow(position + 8)
+            struct.pack_into(f'i{len(encoded)}s', self.map, self.used, len(encoded), encoded)
+            struct.pack_into('d', self.map, position, 0.0)
+            self.used = position + 8
+            struct.pack_into('i', self.map, 0, self.used)
+            self.positions[key] = position
+        return position
+
+    def grow(self, needed):
+        size = len(self.map)
+        while size < needed:
+            size *= 2
+        self.map.close()
+        self.file.truncate(size)
+        self.map = mmap.mmap(self.file.fileno(), 0)
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+
+def read_entries(data, used=None):
+    """(key, value, position) of each entry in the bytes of an MmapValues file"""
+    if used is None:
+        used = struct.unpack_from('i', data, 0)[0] if len(data) >= 8 else 0
+    offset = 8
+    while offset < used:
+        length = struct.unpack_from('i', data, offset)[0]
+        header = 4 + length
+        position = offset + header + (-header % 8)
+        if position + 8 > len(data):
+            # Read while the file was growing
+            return
+        key = bytes(data[offset + 4:offset + 4 + length]).decode()
+        yield key, struct.unpack_from('d', data, position)[0], position
+        offset = position + 8
+
+
+class FileStore:
+    """
+    The values of all processes using ``directory``. This process writes to
+    ``counter_<pid>.db`` (counters and histograms) and ``gauge_<pid>.db``;
+    the files are opened again after a fork.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.pid = None
+        self.files = {}
+
+    def values(self, kind):
+        pid = os.getpid()
+        if pid != self.pid:
+            os.makedirs(self.directory, exist_ok=True)
+            # The files of the parent process stay open in the parent
+            self.files = {
+                'counter': MmapValues(os.path.join(self.directory, f'counter_{pid}.db')),
+                # A process that reuses a pid starts with its gauges unset
+                'gauge': MmapValues(os.path.join(self.directory, f'gauge_{pid}.db'), reset=True),
+            }
+            self.pid = pid
+        return self.files['gauge' if kind == 'gauge' else 'counter']
+
+    def add(self, kind, key, amount):
+        with self.lock:
+            self.values(kind).add(key, amount)
+
+    def set(self, kind, key, value):
+        with self.lock:
+            self.values(kind).set(key, value)
+
+    def collect(self):
+        """Values summed over the processes' files; gauges of exited processes are left out"""
+        totals = defaultdict(float)
+        if not os.path.isdir(self.directory):
+            return totals
+        for filename in os.listdir(self.directory):
+            kind, _, rest = filename.partition('_')
+            pid = rest.removesuffix('.db')
+            if kind not in ('counter', 'gauge') or not pid.isdigit():
+                continue
+            if kind == 'gauge' and not is_running(int(pid)):
+                continue
+            try:
+                with open(os.path.join(self.directory, filename), 'rb') as handle:
+                    data = handle.read()
+            except FileNotFoundError:
+                continue
+            for key, value, _ in read_entries(data):
+                totals[key] += value
+        return totals
+
+
+class MemoryStore:
+    """The values of this process, in a dict"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = defaultdict(float)
+
+    def add(self, kind, key, amount):
+        with self.lock:
+            self.values[key] += amount
+
+    def set(self, kind, key, value):
+        with self.lock:
+            self.values[key] = value
+
+    def collect(self):
+        with self.lock:
+            return dict(self.values)
+
+
+def is_running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                directory = metrics_directory()
+                _store = FileStore(directory) if directory else MemoryStore()
+    return _store
+
+
+def reset_store():
+    """Forget the store, so the next update picks it again from the settings (for tests)"""
+    global _store
+    with _store_lock:
+        _store = None
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f'Metric {metric.name} is already registered')
+        self.metrics[metric.name] = metric
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        values = defaultdict(dict)
+        for key, value in get_store().collect().items():
+            name, suffix, label_values = json.loads(key)
+            values[name][suffix, tuple(label_values)] = value
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f'# HELP {metric.name} {escape_help(metric.documentation)}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for suffix, label_names, label_values, value in metric.samples(values.get(metric.name, {})):
+                lines.append(f'{metric.name}{suffix}{format_labels(label_names, label_values)} {format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+def escape_help(text):
+    return text.replace('\\', r'\\').replace('\n', r'\n')
+
+
+def format_labels(names, values):
+    if not names:
+        return ''
+    pairs = (
+        '{}="{}"'.format(name, value.replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"'))
+        for name, value in zip(names, values)
+    )
+    return '{' + ','.join(pairs) + '}'
+
+
+def format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return f'{value:.1f}'
+    return repr(value)
+
+
+registry = Registry()
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=registry):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        # Store keys by sample and label values; encoding them is most of the cost of an update
+        self.keys = {}
+        registry.register(self)
+
+    def label_values(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f'{self.name} takes the labels {", ".join(self.labelnames) or "(none)"}')
+        return [str(labels[name]) for name in self.labelnames]
+
+    def key(self, suffix, label_values):
+        cache_key = (suffix, *label_values)
+        key = self.keys.get(cache_key)
+        if key is None:
+            key = self.keys[cache_key] = json.dumps([self.name, suffix, label_values])
+        return key
+
+    def label_sets(self, values, suffix=''):
+        """Label values seen for ``suffix``; an unlabelled metric is always shown"""
+        label_sets = {label_values for sample_suffix, label_values in values if sample_suffix == suffix}
+        if not self.labelnames:
+            label_sets.add(())
+        return sorted(label_sets)
+
+    def samples(self, values):
+        for label_values in self.label_sets(values):
+            yield '', self.labelnames, label_values, values.get(('', label_values), 0.0)
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        if amount < 0:
+            raise ValueError('Counters can only be increased')
+        get_store().add(self.kind, self.key('', self.label_values(labels)), float(amount))
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        get_store().set(self.kind, self.key('', self.label_values(labels)), float(value))
+
+    def inc(self, amount=1, **labels):
+        get_store().add(self.kind, self.key('', self.label_values(labels)), float(amount))
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track_in_progress(self, **labels):
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(Metric):
+    """Observations counted per bucket; the buckets are made cumulative when rendered"""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=registry):
+        if 'le' in labelnames:
+            raise ValueError('"le" is reserved for histogram buckets')
+        super().__init__(name, documentation, labelnames, registry)
+        self.buckets = [float(bound) for bound in buckets] + [math.inf]
+        self.bucket_labels = [format_value(bound) for bound in self.buckets]
+
+    def observe(self, value, **labels):
+        label_values = self.label_values(labels)
+        le = self.bucket_labels[bisect.bisect_left(self.buckets, value)]
+        store = get_store()
+        store.add(self.kind, self.key('_bucket', label_values + [le]), 1.0)
+        store.add(self.kind, self.key('_sum', label_values), float(value))
+        store.add(self.kind, self.key('_count', label_values), 1.0)
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self, values):
+        bucket_names = self.labelnames + ('le',)
+        for label_values in self.label_sets(values, '_count'):
+            cumulative = 0.0
+            for le in self.bucket_labels:
+                cumulative += values.get(('_bucket', label_values + (le,)), 0.0)
+                yield '_bucket', bucket_names, label_values + (le,), cumulative
+            yield '_sum', self.labelnames, label_values, values.get(('_sum', label_values), 0.0)
+            yield '_count', self.labelnames, label_values, values.get(('_count', label_values), 0.0)
+
+
+ORDERS = Counter('marketplace_orders_total', 'Orders placed', ['payment_method'])
+CHECKOUT_SECONDS = Histogram('marketplace_checkout_seconds', 'Time to place an order, from form validation to commit')
+CHECKOUTS_IN_PROGRESS = Gauge('marketplace_checkouts_in_progress', 'Orders being placed right now')
+CREDIT_TOPUPS = Counter('marketplace_credit_topups_total', 'Credit top-ups by buyers')
+CREDIT_TOPUP_AMOUNT = Counter('marketplace_credit_topup_amount_total', 'Credit added by buyers, in rupees')
+SEARCH_SECONDS = Histogram(
+    'marketplace_search_seconds', 'Time to query a catalog listing or search suggestions', ['endpoint', 'search'],
+)
+PAGE_CACHE_REQUESTS = Counter(
+    'marketplace_page_cache_requests_total', 'Anonymous catalog page requests by page cache result', ['result'],
+)
+FRAGMENT_CACHE_LOOKUPS = Counter(
+    'marketplace_fragment_cache_lookups_total', 'Product card lookups by fragment cache result', ['result'],
+)
+APPROVAL_DECISIONS = Counter(
+    'marketplace_approval_decisions_total', 'Sellers, buyers and products approved or rejected', ['target', 'action'],
+)
+DB_CONNECTION_WAIT_SECONDS = Histogram(
+    'marketplace_db_connection_wait_seconds', 'Time to open a database connection or take one from the pool',
+    ['database'], buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
@@ -0,0 +1,170 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.functional import SimpleLazyObject
+
+from . import instrumentation, pagecache, staticfiles
+from .roles import get_role
+from .routers import read_replicas, replica_reads
+
+
+PRIMARY_PIN_COOKIE = 'mkt_primary'
+
+
+class AsyncCapableMiddleware:
+    """
+    Base for middleware that runs in whichever mode the handler does, so
+    async views under ASGI are not pushed back onto a thread. Subclasses
+    implement ``process(request)`` and ``aprocess(request)``.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.aprocess(request)
+        return self.process(request)
+
+
+class RoleMiddleware(AsyncCapableMiddleware):
+    """
+    Sets ``request.role``, resolved on first use; needs AuthenticationMiddleware
+    before it. Resolving it touches the session and database, so async views
+    must do that (or render templates using it) via sync_to_async.
+    """
+
+    def process(self, request):
+        request.role = SimpleLazyObject(lambda: get_role(request))
+        return self.get_response(request)
+
+    async def aprocess(self, request):
+        request.role = SimpleLazyObject(lambda: get_role(request))
+        return await self.get_response(request)
+
+
+class ReplicaRoutingMiddleware(AsyncCapableMiddleware):
+    """
+    Lets GET/HEAD requests read the catalog from a replica. A request that
+    writes pins the client to the primary for MARKETPLACE_REPLICA_PIN_SECONDS
+    with a cookie, so their next pages show what they just changed.
+    """
+
+    def process(self, request):
+        if not read_replicas():
+            return self.get_response(request)
+
+        with replica_reads(self.use_replica(request)) as state:
+            response = self.get_response(request)
+        return self.pin(request, response, state)
+
+    async def aprocess(self, request):
+        if not read_replicas():
+            return await self.get_response(request)
+
+        # Async ORM calls copy the context, so they see this routing state
+        with replica_reads(self.use_replica(request)) as state:
+            response = await self.get_response(request)
+        return self.pin(request, response, state)
+
+    def use_replica(self, request):
+        return request.method in ('GET', 'HEAD') and PRIMARY_PIN_COOKIE not in request.COOKIES
+
+    def pin(self, request, response, state):
+        if state['wrote'] or request.method not in ('GET', 'HEAD', 'OPTIONS'):
+            response.set_cookie(
+                PRIMARY_PIN_COOKIE, '1', max_age=getattr(settings, 'MARKETPLACE_REPLICA_PIN_SECONDS', 10),
+                httponly=True, samesite='Lax',
+            )
+        return response
+
+
+class CatalogPageCacheMiddleware(AsyncCapableMiddleware):
+    """
+    Serves anonymous catalog pages from marketplace.pagecache. Must come after
+    AuthenticationMiddleware and MessageMiddleware; last in the list, the
+    middleware above it still adds their headers to cached responses.
+    """
+
+    def process(self, request):
+        return pagecache.store(request, self.get_response(request))
+
+    async def aprocess(self, request):
+        response = await self.get_response(request)
+        return await sync_to_async(pagecache.store)(request, response)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if pagecache.is_cacheable_request(request):
+            return pagecache.lookup(request)
+        return None
+
+
+class StaticFilesMiddleware(AsyncCapableMiddleware):
+    """
+    Serves the files collected into STATIC_ROOT (see marketplace.staticfiles)
+    when MARKETPLACE_SERVE_STATIC is on. The file list is read at startup, so
+    restart the process after collectstatic.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'MARKETPLACE_SERVE_STATIC', not settings.DEBUG):
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+        self.files = staticfiles.build_index()
+
+    def find(self, request):
+        if request.method in ('GET', 'HEAD'):
+            return self.files.get(request.path_info)
+        return None
+
+    def process(self, request):
+        static_file = self.find(request)
+        if static_file is not None:
+            return static_file.response(request)
+        return self.get_response(request)
+
+    async def aprocess(self, request):
+        static_file = self.find(request)
+        if static_file is not None:
+            # The file is read off the event loop
+            return await sync_to_async(static_file.response)(request)
+        return await self.get_response(request)
+
+
+class InstrumentationMiddleware(AsyncCapableMiddleware):
+    """
+    Records query count, SQL and template time and latency per URL name (see
+    marketplace.instrumentation). Goes first, so the latency covers the
+    other middleware too.
+    """
+
+    def __init__(self, get_response):
+        if not instrumentation.is_enabled():
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def process(self, request):
+        token = instrumentation.start_request()
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            record = instrumentation.finish_request(token)
+        instrumentation.record_request(request, time.perf_counter() - started, record)
+        return response
+
+    async def aprocess(self, request):
+        token = instrumentation.start_request()
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            record = instrumentation.finish_request(token)
+        instrumentation.record_request(request, time.perf_counter() - started, record)
+        return response
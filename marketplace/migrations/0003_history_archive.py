@@ -0,0 +1,75 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0002_transaction_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CreditTransactionArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('archive_month', models.DateField()),
+                ('buyer_id', models.BigIntegerField()),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('transaction_type', models.CharField(choices=[('credit', 'Credit Added'), ('debit', 'Credit Used')], max_length=20)),
+                ('reference', models.CharField(blank=True, max_length=100)),
+                ('description', models.TextField()),
+                ('balance_after', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('created_at', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['archive_month'], name='credit_archive_month_idx'), models.Index(fields=['buyer_id', '-created_at', '-id'], name='credit_archive_buyer_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='OrderArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('archive_month', models.DateField()),
+                ('buyer_id', models.BigIntegerField()),
+                ('seller_id', models.BigIntegerField()),
+                ('order_number', models.CharField(max_length=20, unique=True)),
+                ('subtotal', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('gst_amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('total_amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('confirmed', 'Confirmed'), ('processing', 'Processing'), ('shipped', 'Shipped'), ('delivered', 'Delivered'), ('cancelled', 'Cancelled')], max_length=20)),
+                ('payment_method', models.CharField(choices=[('credit', 'Credit Balance'), ('online', 'Online Payment'), ('po', 'Purchase Order')], max_length=20)),
+                ('payment_status', models.BooleanField(default=False)),
+                ('po_document', models.CharField(blank=True, max_length=255)),
+                ('shipping_address', models.TextField()),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('items', models.JSONField(blank=True, default=list)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['archive_month'], name='order_archive_month_idx'), models.Index(fields=['buyer_id', '-created_at', '-id'], name='order_archive_buyer_idx'), models.Index(fields=['seller_id', '-created_at', '-id'], name='order_archive_seller_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='TransactionArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('archive_month', models.DateField()),
+                ('buyer_id', models.BigIntegerField(blank=True, null=True)),
+                ('seller_id', models.BigIntegerField(blank=True, null=True)),
+                ('order_id', models.BigIntegerField(blank=True, null=True)),
+                ('transaction_id', models.CharField(max_length=30, unique=True)),
+                ('transaction_type', models.CharField(choices=[('purchase', 'Purchase'), ('credit_add', 'Credit Added'), ('credit_deduct', 'Credit Deducted'), ('refund', 'Refund')], max_length=20)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('completed', 'Completed'), ('failed', 'Failed'), ('cancelled', 'Cancelled')], max_length=20)),
+                ('description', models.TextField(blank=True)),
+                ('reference_number', models.CharField(blank=True, max_length=50)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['archive_month'], name='txn_archive_month_idx'), models.Index(fields=['buyer_id', '-created_at', '-id'], name='txn_archive_buyer_idx'), models.Index(fields=['seller_id', '-created_at', '-id'], name='txn_archive_seller_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,99 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0003_history_archive'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='buyer',
+            index=models.Index(fields=['-created_at', '-id'], name='buyer_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='buyer',
+            index=models.Index(fields=['approval_status', '-created_at', '-id'], name='buyer_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='buyer',
+            index=models.Index(fields=['verified', '-created_at', '-id'], name='buyer_verified_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='credittransaction',
+            index=models.Index(fields=['-created_at', '-id'], name='credit_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='credittransaction',
+            index=models.Index(fields=['buyer', '-created_at', '-id'], name='credit_buyer_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='credittransaction',
+            index=models.Index(fields=['transaction_type', '-created_at', '-id'], name='credit_type_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['-created_at', '-id'], name='order_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', '-created_at', '-id'], name='order_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['payment_method', '-created_at', '-id'], name='order_method_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['payment_status', '-created_at', '-id'], name='order_paid_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['-created_at', '-id'], name='product_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category', '-created_at', '-id'], name='product_category_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['approval_status', '-created_at', '-id'], name='product_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_active', '-created_at', '-id'], name='product_active_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_customizable', '-created_at', '-id'], name='product_custom_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['gst_rate', '-created_at', '-id'], name='product_gst_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='seller',
+            index=models.Index(fields=['-created_at', '-id'], name='seller_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='seller',
+            index=models.Index(fields=['approval_status', '-created_at', '-id'], name='seller_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='seller',
+            index=models.Index(fields=['business_type', '-created_at', '-id'], name='seller_type_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='seller',
+            index=models.Index(fields=['state', '-created_at', '-id'], name='seller_state_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='seller',
+            index=models.Index(fields=['verified', '-created_at', '-id'], name='seller_verified_created_idx'),
+        ),
+    ]
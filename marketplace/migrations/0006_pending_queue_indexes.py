@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:28
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0005_moderation_jobs'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='buyer',
+            index=models.Index(condition=models.Q(('approval_status', 'pending')), fields=['created_at', 'id'], name='buyer_pending_queue_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('approval_status', 'pending')), fields=['created_at', 'id'], name='product_pending_queue_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='seller',
+            index=models.Index(condition=models.Q(('approval_status', 'pending')), fields=['created_at', 'id'], name='seller_pending_queue_idx'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0006_pending_queue_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SellerDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('orders', models.IntegerField(default=0)),
+                ('units', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('gst', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'verbose_name_plural': 'Seller daily stats',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['seller', '-created_at', '-id'], name='order_seller_created_idx'),
+        ),
+        migrations.AddField(
+            model_name='sellerdailystats',
+            name='category',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='marketplace.category'),
+        ),
+        migrations.AddField(
+            model_name='sellerdailystats',
+            name='seller',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='marketplace.seller'),
+        ),
+        migrations.AddConstraint(
+            model_name='sellerdailystats',
+            constraint=models.UniqueConstraint(fields=('seller', 'day', 'category'), name='seller_daily_stats_unique'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0008_order_buyer_created_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SellerProductDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('gst_rate', models.IntegerField()),
+                ('units', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('gst', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='marketplace.product')),
+                ('seller', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='product_daily_stats', to='marketplace.seller')),
+            ],
+            options={
+                'verbose_name_plural': 'Seller product daily stats',
+                'constraints': [models.UniqueConstraint(fields=('seller', 'day', 'product', 'gst_rate'), name='seller_product_daily_stats_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:50
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0010_product_sku_and_imports'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='buyer',
+            name='gstin_status',
+            field=models.CharField(choices=[('unverified', 'Not checked'), ('valid', 'Valid'), ('invalid_format', 'Invalid format'), ('invalid_state', 'Unknown state code'), ('invalid_checksum', 'Check digit mismatch')], default='unverified', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='seller',
+            name='gstin_status',
+            field=models.CharField(choices=[('unverified', 'Not checked'), ('valid', 'Valid'), ('invalid_format', 'Invalid format'), ('invalid_state', 'Unknown state code'), ('invalid_checksum', 'Check digit mismatch')], default='unverified', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='buyer',
+            index=models.Index(fields=['gstin_status', '-created_at', '-id'], name='buyer_gstin_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='seller',
+            index=models.Index(fields=['gstin_status', '-created_at', '-id'], name='seller_gstin_created_idx'),
+        ),
+    ]
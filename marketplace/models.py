@@ -2,10 +2,22 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.urls import reverse
 from django.core.validators import RegexValidator, MinValueValidator, MaxValueValidator
-from PIL import Image
 import os
+import uuid
 from decimal import Decimal
 
+from . import images
+
+
+# Result of the last GSTIN check (see marketplace.gstin and verify_gstins)
+GSTIN_STATUS = [
+    ('unverified', 'Not checked'),
+    ('valid', 'Valid'),
+    ('invalid_format', 'Invalid format'),
+    ('invalid_state', 'Unknown state code'),
+    ('invalid_checksum', 'Check digit mismatch'),
+]
+
 
 class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)
@@ -35,6 +47,7 @@ class Seller(models.Model):
         message='Enter a valid GSTIN number (15 characters)'
     )
     gstin = models.CharField(max_length=15, validators=[gstin_validator], unique=True)
+    gstin_status = models.CharField(max_length=20, choices=GSTIN_STATUS, default='unverified')
     
     # Turnover in Crores
     turnover = models.DecimalField(
@@ -73,6 +86,22 @@ class Seller(models.Model):
     
     created_at = models.DateTimeField(auto_now_add=True)
     
+    class Meta:
+        # Back the admin changelist filters, each sorted by newest first
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='seller_created_idx'),
+            models.Index(fields=['approval_status', '-created_at', '-id'], name='seller_status_created_idx'),
+            models.Index(fields=['business_type', '-created_at', '-id'], name='seller_type_created_idx'),
+            models.Index(fields=['state', '-created_at', '-id'], name='seller_state_created_idx'),
+            models.Index(fields=['verified', '-created_at', '-id'], name='seller_verified_created_idx'),
+            models.Index(fields=['gstin_status', '-created_at', '-id'], name='seller_gstin_created_idx'),
+            # Moderation queue: only pending rows, oldest first
+            models.Index(
+                fields=['created_at', 'id'], condition=models.Q(approval_status='pending'),
+                name='seller_pending_queue_idx'
+            ),
+        ]
+    
     def __str__(self):
         return self.business_name
     
@@ -94,6 +123,7 @@ class Buyer(models.Model):
         message='Enter a valid GSTIN number (15 characters)'
     )
     gstin = models.CharField(max_length=15, validators=[gstin_validator], unique=True)
+    gstin_status = models.CharField(max_length=20, choices=GSTIN_STATUS, default='unverified')
     
     # Credit balance
     credit_balance = models.DecimalField(max_digits=12, decimal_places=2, default=0.00)
@@ -115,6 +145,18 @@ class Buyer(models.Model):
     
     created_at = models.DateTimeField(auto_now_add=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='buyer_created_idx'),
+            models.Index(fields=['approval_status', '-created_at', '-id'], name='buyer_status_created_idx'),
+            models.Index(fields=['verified', '-created_at', '-id'], name='buyer_verified_created_idx'),
+            models.Index(fields=['gstin_status', '-created_at', '-id'], name='buyer_gstin_created_idx'),
+            models.Index(
+                fields=['created_at', 'id'], condition=models.Q(approval_status='pending'),
+                name='buyer_pending_queue_idx'
+            ),
+        ]
+    
     def __str__(self):
         return f"{self.name} ({self.business_name if self.business_name else 'Individual'})"
     
@@ -162,8 +204,28 @@ class Product(models.Model):
     # For search functionality
     tags = models.CharField(max_length=500, blank=True, help_text="Comma-separated tags for search")
     
+    # Seller's own stock keeping unit; bulk uploads match existing products on it
+    sku = models.CharField(max_length=64, blank=True)
+    
     class Meta:
         ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['seller', 'sku'], condition=~models.Q(sku=''), name='product_seller_sku_unique'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='product_created_idx'),
+            models.Index(fields=['category', '-created_at', '-id'], name='product_category_created_idx'),
+            models.Index(fields=['approval_status', '-created_at', '-id'], name='product_status_created_idx'),
+            models.Index(fields=['is_active', '-created_at', '-id'], name='product_active_created_idx'),
+            models.Index(fields=['is_customizable', '-created_at', '-id'], name='product_custom_created_idx'),
+            models.Index(fields=['gst_rate', '-created_at', '-id'], name='product_gst_created_idx'),
+            models.Index(
+                fields=['created_at', 'id'], condition=models.Q(approval_status='pending'),
+                name='product_pending_queue_idx'
+            ),
+        ]
     
     def __str__(self):
         return self.name
@@ -218,10 +280,7 @@ class ProductImage(models.Model):
         super().save(*args, **kwargs)
         # Resize image if too large
         if self.image:
-            img = Image.open(self.image.path)
-            if img.height > 800 or img.width > 800:
-                img.thumbnail((800, 800))
-                img.save(self.image.path)
+            images.shrink_to_fit(self.image.path)
 
 
 class PODCustomization(models.Model):
@@ -297,13 +356,22 @@ class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='order_created_idx'),
+            models.Index(fields=['status', '-created_at', '-id'], name='order_status_created_idx'),
+            models.Index(fields=['payment_method', '-created_at', '-id'], name='order_method_created_idx'),
+            models.Index(fields=['payment_status', '-created_at', '-id'], name='order_paid_created_idx'),
+            models.Index(fields=['seller', '-created_at', '-id'], name='order_seller_created_idx'),
+            models.Index(fields=['buyer', '-created_at', '-id'], name='order_buyer_created_idx'),
+        ]
+    
     def __str__(self):
         return f"Order {self.order_number} - {self.buyer.name}"
     
     def save(self, *args, **kwargs):
         if not self.order_number:
             # Generate unique order number
-            import uuid
             self.order_number = f"ORD{str(uuid.uuid4())[:8].upper()}"
         super().save(*args, **kwargs)
 
@@ -327,6 +395,58 @@ class OrderItem(models.Model):
         super().save(*args, **kwargs)
 
 
+class SellerDailyStats(models.Model):
+    """
+    Daily sales rollup per seller and category, kept current as orders are
+    placed and cancelled. Cancelled orders are excluded. Rows are never
+    decremented when orders are archived, so history outlives the hot tables.
+    """
+    seller = models.ForeignKey(Seller, on_delete=models.CASCADE, related_name='daily_stats')
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='+')
+    day = models.DateField()
+    
+    orders = models.IntegerField(default=0)
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    gst = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    
+    class Meta:
+        verbose_name_plural = 'Seller daily stats'
+        constraints = [
+            # Also the index behind (seller, day range) reads
+            models.UniqueConstraint(fields=['seller', 'day', 'category'], name='seller_daily_stats_unique'),
+        ]
+    
+    def __str__(self):
+        return f"{self.seller_id} {self.day} {self.category_id}: ₹{self.revenue}"
+
+
+class SellerProductDailyStats(models.Model):
+    """
+    Daily sales rollup per seller, product and GST rate, maintained alongside
+    SellerDailyStats. Backs the product and GST breakdowns of seller analytics.
+    """
+    seller = models.ForeignKey(Seller, on_delete=models.CASCADE, related_name='product_daily_stats')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    day = models.DateField()
+    gst_rate = models.IntegerField()
+    
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    gst = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    
+    class Meta:
+        verbose_name_plural = 'Seller product daily stats'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['seller', 'day', 'product', 'gst_rate'], name='seller_product_daily_stats_unique'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.seller_id} {self.day} {self.product_id} @{self.gst_rate}%: ₹{self.revenue}"
+
+
 class Transaction(models.Model):
     TRANSACTION_TYPE = [
         ('purchase', 'Purchase'),
@@ -357,12 +477,22 @@ class Transaction(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        # Every index ends in (created_at, id) so filtered listings can seek
+        # past a keyset cursor without sorting or counting the table.
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='txn_created_idx'),
+            models.Index(fields=['transaction_type', '-created_at', '-id'], name='txn_type_created_idx'),
+            models.Index(fields=['status', '-created_at', '-id'], name='txn_status_created_idx'),
+            models.Index(fields=['buyer', '-created_at', '-id'], name='txn_buyer_created_idx'),
+            models.Index(fields=['seller', '-created_at', '-id'], name='txn_seller_created_idx'),
+        ]
+    
     def __str__(self):
         return f"{self.transaction_id} - ₹{self.amount}"
     
     def save(self, *args, **kwargs):
         if not self.transaction_id:
-            import uuid
             self.transaction_id = f"TXN{str(uuid.uuid4())[:10].upper()}"
         super().save(*args, **kwargs)
 
@@ -382,6 +512,271 @@ class CreditTransaction(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='credit_created_idx'),
+            models.Index(fields=['buyer', '-created_at', '-id'], name='credit_buyer_created_idx'),
+            models.Index(fields=['transaction_type', '-created_at', '-id'], name='credit_type_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.buyer.name} - {self.transaction_type} - ₹{self.amount}"
+
+
+# History archive
+#
+# Cold copies of Transaction, CreditTransaction and Order rows moved out of the
+# hot tables by the ``archive_history`` command. Primary keys are preserved and
+# relations are stored as plain ids so the archive can live in a separate
+# database (see MARKETPLACE_ARCHIVE_DATABASE and marketplace.routers).
+# ``archive_month`` is the partition key: the first day of the row's month.
+
+class TransactionArchive(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    archive_month = models.DateField()
+    buyer_id = models.BigIntegerField(null=True, blank=True)
+    seller_id = models.BigIntegerField(null=True, blank=True)
+    order_id = models.BigIntegerField(null=True, blank=True)
+    transaction_id = models.CharField(max_length=30, unique=True)
+    transaction_type = models.CharField(max_length=20, choices=Transaction.TRANSACTION_TYPE)
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    status = models.CharField(max_length=20, choices=Transaction.TRANSACTION_STATUS)
+    description = models.TextField(blank=True)
+    reference_number = models.CharField(max_length=50, blank=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['archive_month'], name='txn_archive_month_idx'),
+            models.Index(fields=['buyer_id', '-created_at', '-id'], name='txn_archive_buyer_idx'),
+            models.Index(fields=['seller_id', '-created_at', '-id'], name='txn_archive_seller_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.transaction_id} - ₹{self.amount} (archived)"
+
+
+class CreditTransactionArchive(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    archive_month = models.DateField()
+    buyer_id = models.BigIntegerField()
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    transaction_type = models.CharField(max_length=20, choices=[
+        ('credit', 'Credit Added'),
+        ('debit', 'Credit Used'),
+    ])
+    reference = models.CharField(max_length=100, blank=True)
+    description = models.TextField()
+    balance_after = models.DecimalField(max_digits=12, decimal_places=2)
+    created_at = models.DateTimeField()
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['archive_month'], name='credit_archive_month_idx'),
+            models.Index(fields=['buyer_id', '-created_at', '-id'], name='credit_archive_buyer_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Buyer {self.buyer_id} - {self.transaction_type} - ₹{self.amount} (archived)"
+
+
+class OrderArchive(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    archive_month = models.DateField()
+    buyer_id = models.BigIntegerField()
+    seller_id = models.BigIntegerField()
+    order_number = models.CharField(max_length=20, unique=True)
+    subtotal = models.DecimalField(max_digits=12, decimal_places=2)
+    gst_amount = models.DecimalField(max_digits=12, decimal_places=2)
+    total_amount = models.DecimalField(max_digits=12, decimal_places=2)
+    status = models.CharField(max_length=20, choices=Order.ORDER_STATUS)
+    payment_method = models.CharField(max_length=20, choices=Order.PAYMENT_METHOD)
+    payment_status = models.BooleanField(default=False)
+    po_document = models.CharField(max_length=255, blank=True)
+    shipping_address = models.TextField()
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    
+    # OrderItem rows are folded into the archived order
+    items = models.JSONField(default=list, blank=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['archive_month'], name='order_archive_month_idx'),
+            models.Index(fields=['buyer_id', '-created_at', '-id'], name='order_archive_buyer_idx'),
+            models.Index(fields=['seller_id', '-created_at', '-id'], name='order_archive_seller_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Order {self.order_number} (archived)"
+
+
+# Bulk product imports
+#
+# A seller's catalog file and the progress of importing it. Rows are streamed
+# and written in batches by ``marketplace.imports``, outside the request.
+
+class ProductImport(models.Model):
+    """A seller's bulk catalog upload (CSV or XLSX), imported outside the request"""
+    IMPORT_STATUS = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    
+    seller = models.ForeignKey(Seller, on_delete=models.CASCADE, related_name='product_imports')
+    file = models.FileField(upload_to='product_imports/')
+    
+    status = models.CharField(max_length=20, choices=IMPORT_STATUS, default='queued')
+    total_rows = models.PositiveIntegerField(default=0)
+    created_count = models.PositiveIntegerField(default=0)
+    updated_count = models.PositiveIntegerField(default=0)
+    error_count = models.PositiveIntegerField(default=0)
+    error_report = models.FileField(upload_to='product_imports/errors/', blank=True)
+    error = models.TextField(blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['seller', '-created_at'], name='import_seller_created_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Import #{self.pk} by {self.seller.business_name} ({self.status})"
+    
+    @property
+    def filename(self):
+        return os.path.basename(self.file.name)
+
+
+# Chunked uploads
+#
+# Resumable uploads of PAN/GST documents and purchase orders. Chunks are
+# written in place by ``marketplace.uploads``; forms attach the finished file
+# by token.
+
+class ChunkedUpload(models.Model):
+    """
+    A document uploaded in chunks ahead of the form that uses it. The file is
+    written in place at its final storage path; forms reference it by token.
+    """
+    PURPOSES = [
+        ('pan_document', 'PAN card document'),
+        ('gst_certificate', 'GST certificate'),
+        ('po_document', 'Purchase order'),
+    ]
+    
+    UPLOAD_STATUS = [
+        ('uploading', 'Uploading'),
+        ('complete', 'Complete'),
+        ('attached', 'Attached'),
+    ]
+    
+    token = models.CharField(max_length=64, unique=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='chunked_uploads')
+    purpose = models.CharField(max_length=20, choices=PURPOSES)
+    file = models.FileField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    offset = models.PositiveBigIntegerField(default=0)
+    chunk_hashes = models.JSONField(default=list, blank=True)
+    sha256 = models.CharField(max_length=64, blank=True)
+    status = models.CharField(max_length=20, choices=UPLOAD_STATUS, default='uploading')
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'updated_at'], name='upload_status_updated_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_purpose_display()} upload {self.token[:8]} ({self.status})"
+    
+    @property
+    def filename(self):
+        return os.path.basename(self.file.name)
+
+
+# Moderation
+#
+# Bulk approve/reject jobs run in chunks by ``marketplace.moderation``, and the
+# append-only audit log every decision writes to.
+
+class ModerationJob(models.Model):
+    """Bulk approve/reject request processed in chunks outside the admin request"""
+    TARGETS = [
+        ('seller', 'Seller'),
+        ('buyer', 'Buyer'),
+        ('product', 'Product'),
+    ]
+    
+    ACTIONS = [
+        ('approve', 'Approve'),
+        ('reject', 'Reject'),
+    ]
+    
+    JOB_STATUS = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    
+    target = models.CharField(max_length=10, choices=TARGETS)
+    action = models.CharField(max_length=10, choices=ACTIONS)
+    object_ids = models.JSONField(default=list)
+    rejection_reason = models.TextField(blank=True)
+    requested_by = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, related_name='moderation_jobs'
+    )
+    
+    status = models.CharField(max_length=20, choices=JOB_STATUS, default='queued')
+    total = models.PositiveIntegerField(default=0)
+    processed = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='modjob_status_created_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Job #{self.pk}: {self.get_action_display()} {self.total} {self.target}s"
+    
+    @property
+    def progress(self):
+        if self.total:
+            return round(self.processed * 100 / self.total, 1)
+        return 100.0 if self.status == 'completed' else 0.0
+
+
+class ApprovalAudit(models.Model):
+    """Append-only log of who approved or rejected what"""
+    target = models.CharField(max_length=10, choices=ModerationJob.TARGETS)
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=10, choices=ModerationJob.ACTIONS)
+    actor = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    job = models.ForeignKey(
+        ModerationJob, on_delete=models.SET_NULL, null=True, blank=True, related_name='audits'
+    )
+    reason = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['target', 'object_id'], name='audit_target_idx'),
+            models.Index(fields=['-created_at', '-id'], name='audit_created_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_action_display()} {self.target} #{self.object_id}"
@@ -0,0 +1,209 @@
+"""
+Approval and rejection of sellers, buyers and products.
+
+Every decision goes through ``apply_decision``, which updates the rows with
+one UPDATE, writes ApprovalAudit entries with one bulk insert and bumps the
+catalog version once. Bulk admin actions enqueue a ModerationJob that feeds
+ids to ``apply_decision`` in chunks and records progress after each chunk.
+"""
+import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .cache import bump_catalog_version
+from .dashboards import invalidate_dashboards
+from .metrics import APPROVAL_DECISIONS
+from .models import Seller, Buyer, Product, ModerationJob, ApprovalAudit
+from .roles import invalidate_roles
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REJECTION_REASON = 'Rejected by administrator'
+DEFAULT_CHUNK_SIZE = 500
+# Chunks take well under a second, so a job running for this long was left
+# behind by a worker that died
+DEFAULT_STALE_SECONDS = 3600
+
+# target -> (model, flag set on approval and cleared on rejection)
+MODERATION_TARGETS = {
+    'seller': (Seller, 'verified'),
+    'buyer': (Buyer, 'verified'),
+    'product': (Product, 'is_active'),
+}
+
+# Targets whose status changes what the public catalog shows
+CATALOG_TARGETS = {'seller', 'product'}
+
+_executor = None
+
+
+def decision_updates(target, action, reason=''):
+    """Field values written by an approve/reject decision"""
+    flag = MODERATION_TARGETS[target][1]
+    if action == 'approve':
+        return {'approval_status': 'approved', flag: True, 'rejection_reason': ''}
+    return {
+        'approval_status': 'rejected',
+        flag: False,
+        'rejection_reason': reason or DEFAULT_REJECTION_REASON,
+    }
+
+
+def apply_decision(target, action, object_ids, actor=None, reason='', job=None):
+    """Approve or reject ``object_ids`` in one transaction; returns rows updated"""
+    model = MODERATION_TARGETS[target][0]
+    updates = decision_updates(target, action, reason)
+    object_ids = list(object_ids)
+
+    with transaction.atomic():
+        updated = model.objects.filter(pk__in=object_ids).update(**updates)
+        ApprovalAudit.objects.bulk_create([
+            ApprovalAudit(
+                target=target, object_id=object_id, action=action, actor=actor,
+                job=job, reason=updates['rejection_reason'],
+            )
+            for object_id in object_ids
+        ])
+        if target in CATALOG_TARGETS:
+            transaction.on_commit(bump_catalog_version)
+        if target == 'product':
+            # Product status shows on the owning sellers' dashboards
+            seller_ids = set(model.objects.filter(pk__in=object_ids).values_list('seller_id', flat=True))
+            transaction.on_commit(lambda: invalidate_dashboards('seller', seller_ids))
+        else:
+            # Approval status is part of the role kept in the users' sessions
+            user_ids = list(model.objects.filter(pk__in=object_ids).values_list('user_id', flat=True))
+            transaction.on_commit(lambda: invalidate_roles(user_ids))
+        transaction.on_commit(lambda: APPROVAL_DECISIONS.inc(updated, target=target, action=action))
+    return updated
+
+
+def pending_queryset(target):
+    """Pending rows for the moderation queue, with what a reviewer needs to see"""
+    model = MODERATION_TARGETS[target][0]
+    queryset = model.objects.filter(approval_status='pending')
+    if target == 'product':
+        return queryset.select_related('seller', 'category').prefetch_related('images', 'customizations')
+    return queryset.select_related('user')
+
+
+def apply_batch(target, decisions, actor=None):
+    """
+    Apply reviewer decisions ``[(object_id, action, reason), ...]`` in one
+    transaction. Rows decided by someone else in the meantime are left alone;
+    the rest are updated in one statement per distinct (action, reason).
+    """
+    model = MODERATION_TARGETS[target][0]
+    with transaction.atomic():
+        still_pending = set(
+            model.objects.select_for_update()
+            .filter(pk__in=[object_id for object_id, _, _ in decisions], approval_status='pending')
+            .values_list('pk', flat=True)
+        )
+        groups = defaultdict(list)
+        for object_id, action, reason in decisions:
+            if object_id in still_pending:
+                groups[(action, reason if action == 'reject' else '')].append(object_id)
+        return sum(
+            apply_decision(target, action, object_ids, actor=actor, reason=reason)
+            for (action, reason), object_ids in groups.items()
+        )
+
+
+def enqueue_job(target, action, object_ids, requested_by=None, reason=''):
+    """Record a bulk moderation job and start it once the caller commits"""
+    object_ids = list(object_ids)
+    job = ModerationJob.objects.create(
+        target=target,
+        action=action,
+        object_ids=object_ids,
+        rejection_reason=reason,
+        requested_by=requested_by,
+        total=len(object_ids),
+    )
+    transaction.on_commit(lambda: start_job(job.pk))
+    return job
+
+
+def start_job(job_id):
+    """
+    Run a job in the background worker thread. With
+    MARKETPLACE_MODERATION_ASYNC off it is left queued for a separate
+    ``process_moderation_jobs`` worker.
+    """
+    if not getattr(settings, 'MARKETPLACE_MODERATION_ASYNC', True):
+        return
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='moderation')
+    _executor.submit(_run_in_thread, job_id)
+
+
+def _run_in_thread(job_id):
+    close_old_connections()
+    try:
+        run_job(job_id)
+    finally:
+        close_old_connections()
+
+
+def run_job(job_id, chunk_size=None):
+    """Process a queued job chunk by chunk; safe to call from several workers"""
+    chunk_size = chunk_size or getattr(settings, 'MARKETPLACE_MODERATION_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+
+    # Claim the job so concurrent workers never process it twice
+    claimed = ModerationJob.objects.filter(pk=job_id, status='queued').update(
+        status='running', started_at=timezone.now()
+    )
+    if not claimed:
+        return None
+
+    job = ModerationJob.objects.get(pk=job_id)
+    try:
+        for start in range(job.processed, job.total, chunk_size):
+            chunk = job.object_ids[start:start + chunk_size]
+            with transaction.atomic():
+                apply_decision(
+                    job.target, job.action, chunk, actor=job.requested_by,
+                    reason=job.rejection_reason, job=job,
+                )
+                job.processed = start + len(chunk)
+                ModerationJob.objects.filter(pk=job.pk).update(processed=job.processed)
+    except Exception as exc:
+        logger.exception('Moderation job %s failed', job.pk)
+        ModerationJob.objects.filter(pk=job.pk).update(
+            status='failed', error=str(exc), finished_at=timezone.now()
+        )
+        raise
+
+    ModerationJob.objects.filter(pk=job.pk).update(status='completed', finished_at=timezone.now())
+    job.refresh_from_db()
+    return job
+
+
+def requeue_stale_jobs(stale_seconds=None):
+    """Queue running jobs whose worker died again; they resume from the last completed chunk"""
+    if stale_seconds is None:
+        stale_seconds = getattr(settings, 'MARKETPLACE_MODERATION_STALE_SECONDS', DEFAULT_STALE_SECONDS)
+    requeued = ModerationJob.objects.filter(
+        status='running', started_at__lt=timezone.now() - timedelta(seconds=stale_seconds)
+    ).update(status='queued')
+    if requeued:
+        logger.warning('Re-queued %s stale moderation jobs', requeued)
+    return requeued
+
+
+def run_queued_jobs():
+    """Run every queued job, and stale running ones, in creation order; returns the number run"""
+    requeue_stale_jobs()
+    count = 0
+    for job_id in ModerationJob.objects.filter(status='queued').order_by('created_at').values_list('pk', flat=True):
+        if run_job(job_id) is not None:
+            count += 1
+    return count
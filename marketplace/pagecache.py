@@ -0,0 +1,181 @@
+"""
+Full-response cache for the catalog pages anonymous visitors see.
+
+Entries are keyed on the host, path, the query string with its parameters
+sorted and blanks dropped, and the values of any request headers the view
+varied on (learned per path, as Django's cache middleware does). Cookie is
+not one of them: only anonymous requests without pending messages are
+served from or stored in the cache, so the page does not depend on it.
+
+Each entry records the catalog version it was rendered under (see
+marketplace.cache). It is fresh while that version is current and it is
+younger than MARKETPLACE_PAGE_CACHE_SECONDS. After that it may still be
+served stale for up to MARKETPLACE_PAGE_CACHE_STALE_SECONDS more. This
+only happens while another request, holding the key's lock, renders its
+replacement, so each page is re-rendered by one request at a time. When
+nothing is cached yet, the other requests render the page themselves
+without storing it; waiting for the lock would hold a thread that, under
+ASGI, other requests' sync code is queued behind.
+
+Responses carry an ETag and Last-Modified. Browsers are told to revalidate
+(Cache-Control: no-cache), and a matching conditional GET gets a 304.
+"""
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from .cache import get_catalog_version
+from .metrics import PAGE_CACHE_REQUESTS
+
+
+CACHED_VIEWS = {
+    'marketplace:home',
+    'marketplace:product_detail',
+    'marketplace:category_products',
+    'marketplace:seller_products',
+}
+
+DEFAULT_FRESH_SECONDS = 60
+DEFAULT_STALE_SECONDS = 300
+LOCK_SECONDS = 30
+STATUS_HEADER = 'X-Page-Cache'
+
+
+def _fresh_seconds():
+    return getattr(settings, 'MARKETPLACE_PAGE_CACHE_SECONDS', DEFAULT_FRESH_SECONDS)
+
+
+def _stale_seconds():
+    return getattr(settings, 'MARKETPLACE_PAGE_CACHE_STALE_SECONDS', DEFAULT_STALE_SECONDS)
+
+
+def _digest(*parts):
+    return hashlib.md5('\n'.join(parts).encode(), usedforsecurity=False).hexdigest()
+
+
+def normalized_query(request):
+    """The query string with parameters sorted and blank values dropped"""
+    return urlencode(sorted(
+        (name, value) for name, values in request.GET.lists() for value in values if value != ''
+    ))
+
+
+def _vary_key(request):
+    return f'marketplace:page_vary:{_digest(request.get_host(), request.path)}'
+
+
+def page_cache_key(request, vary_headers=None):
+    if vary_headers is None:
+        vary_headers = cache.get(_vary_key(request), [])
+    header_values = [request.headers.get(header, '') for header in vary_headers]
+    return f'marketplace:page:{_digest(request.get_host(), request.path, normalized_query(request), *header_values)}'
+
+
+def is_cacheable_request(request):
+    """GETs of the catalog views by anonymous visitors with no messages waiting"""
+    match = request.resolver_match
+    return (
+        request.method in ('GET', 'HEAD')
+        and match is not None and match.view_name in CACHED_VIEWS
+        and CookieStorage.cookie_name not in request.COOKIES
+        and not request.user.is_authenticated
+    )
+
+
+def _is_cacheable_response(request, response):
+    if response.status_code != 200 or response.streaming or response.cookies:
+        return False
+    # A rendered CSRF token or message belongs to this visitor only
+    if request.META.get('CSRF_COOKIE_NEEDS_UPDATE'):
+        return False
+    storage = getattr(request, '_messages', None)
+    if storage is not None and (storage.used or storage._queued_messages):
+        return False
+    cache_control = response.get('Cache-Control', '')
+    return 'private' not in cache_control and 'no-store' not in cache_control and response.get('Vary') != '*'
+
+
+def _vary_headers(response):
+    vary = response.get('Vary', '')
+    return sorted({
+        header.strip().lower() for header in vary.split(',') if header.strip() and header.strip().lower() != 'cookie'
+    })
+
+
+def _response_from(request, entry, status):
+    PAGE_CACHE_REQUESTS.inc(result=status.lower())
+    response = HttpResponse(entry['content'], status=200)
+    for header, value in entry['headers']:
+        response[header] = value
+    response[STATUS_HEADER] = status
+    return get_conditional_response(
+        request, etag=entry['etag'], last_modified=entry['last_modified'], response=response
+    )
+
+
+def lookup(request):
+    """
+    A cached response for ``request``, or None if the view has to run. When
+    it does, the request may have been given the key's lock; ``store``
+    must then be called with the response.
+    """
+    key = page_cache_key(request)
+    version = get_catalog_version()
+    entry = cache.get(key)
+    if entry is not None and entry['version'] == version and entry['fresh_until'] > time.time():
+        return _response_from(request, entry, 'HIT')
+
+    lock_key = f'{key}:lock'
+    if cache.add(lock_key, 1, timeout=LOCK_SECONDS):
+        request._page_cache = (key, lock_key, version, entry)
+        PAGE_CACHE_REQUESTS.inc(result='miss')
+        return None
+    if entry is not None:
+        return _response_from(request, entry, 'STALE')
+    # Nothing to fall back on: render, and leave storing it to the lock holder
+    PAGE_CACHE_REQUESTS.inc(result='busy')
+    return None
+
+
+def store(request, response):
+    """Cache ``response`` if this request holds the lock and the response is shareable"""
+    state = getattr(request, '_page_cache', None)
+    if state is None:
+        return response
+    key, lock_key, version, previous = state
+    try:
+        if not _is_cacheable_response(request, response):
+            return response
+
+        vary_headers = _vary_headers(response)
+        if vary_headers:
+            cache.set(_vary_key(request), vary_headers, timeout=None)
+            key = page_cache_key(request, vary_headers)
+
+        etag = f'"{hashlib.md5(response.content, usedforsecurity=False).hexdigest()}"'
+        now = time.time()
+        # Re-rendering the same content doesn't make it newer
+        last_modified = previous['last_modified'] if previous and previous['etag'] == etag else int(now)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        patch_cache_control(response, no_cache=True)
+
+        cache.set(key, {
+            'version': version,
+            'fresh_until': now + _fresh_seconds(),
+            'etag': etag,
+            'last_modified': last_modified,
+            'content': response.content,
+            'headers': [(header, value) for header, value in response.items() if header != STATUS_HEADER],
+        }, timeout=_fresh_seconds() + _stale_seconds())
+        response[STATUS_HEADER] = 'MISS'
+        return get_conditional_response(request, etag=etag, last_modified=last_modified, response=response)
+    finally:
+        cache.delete(lock_key)
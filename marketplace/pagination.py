@@ -0,0 +1,184 @@
+import base64
+import json
+
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.db.models import Q, QuerySet
+from django.utils.functional import cached_property
+
+
+class KeysetPage:
+    """A page of results fetched by seeking past a cursor instead of OFFSET"""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+
+def encode_cursor(values):
+    payload = json.dumps([str(value) for value in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, model, field_names):
+    """Decode a cursor into typed values, returning None if it is malformed"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw_values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if len(raw_values) != len(field_names):
+            return None
+        return [
+            model._meta.get_field(name).to_python(value)
+            for name, value in zip(field_names, raw_values)
+        ]
+    except Exception:
+        return None
+
+
+def _seek_filter(ordering, values, forward):
+    """
+    Build the row-value comparison ``(a, b) < (x, y)`` as an OR of prefixes,
+    which databases can satisfy with a range scan on a composite index.
+    """
+    condition = Q()
+    for position, field in enumerate(ordering):
+        descending = field.startswith('-')
+        name = field.lstrip('-')
+        lookup = 'lt' if descending == forward else 'gt'
+        prefix = {ordering[i].lstrip('-'): values[i] for i in range(position)}
+        condition |= Q(**prefix, **{f'{name}__{lookup}': values[position]})
+    return condition
+
+
+def _reverse_ordering(ordering):
+    return [field[1:] if field.startswith('-') else f'-{field}' for field in ordering]
+
+
+def _sort_rows(rows, ordering):
+    # Stable sorts from the last column to the first handle mixed directions
+    for field in reversed(ordering):
+        name = field.lstrip('-')
+        rows.sort(key=lambda row: getattr(row, name), reverse=field.startswith('-'))
+    return rows
+
+
+def keyset_paginate(queryset, ordering, per_page, after=None, before=None):
+    """
+    Return a KeysetPage of ``queryset`` ordered by ``ordering``.
+
+    ``ordering`` must end with a unique column (usually ``id``) so every row
+    has a distinct position. ``after``/``before`` are cursors produced by a
+    previous page; neither requires counting the table.
+    """
+    return merged_keyset_paginate([queryset], ordering, per_page, after, before)
+
+
+def merged_keyset_paginate(querysets, ordering, per_page, after=None, before=None):
+    """
+    keyset_paginate over the union of ``querysets``, e.g. a hot table and its
+    archive. Each is sought past the cursor on its own and the pages are
+    merged, so the ordering columns must identify a row across all of them.
+    """
+    ordering = list(ordering)
+    field_names = [field.lstrip('-') for field in ordering]
+    model = querysets[0].model
+
+    after_values = decode_cursor(after, model, field_names)
+    before_values = None if after_values else decode_cursor(before, model, field_names)
+
+    if before_values:
+        reverse_ordering = _reverse_ordering(ordering)
+        rows = [
+            row for queryset in querysets
+            for row in queryset.filter(_seek_filter(ordering, before_values, forward=False))
+            .order_by(*reverse_ordering)[:per_page + 1]
+        ]
+        if len(querysets) > 1:
+            _sort_rows(rows, reverse_ordering)
+        has_more = len(rows) > per_page
+        rows = rows[:per_page]
+        rows.reverse()
+        has_previous, has_next = has_more, True
+    else:
+        if after_values:
+            querysets = [queryset.filter(_seek_filter(ordering, after_values, forward=True)) for queryset in querysets]
+        rows = [row for queryset in querysets for row in queryset.order_by(*ordering)[:per_page + 1]]
+        if len(querysets) > 1:
+            _sort_rows(rows, ordering)
+        has_next = len(rows) > per_page
+        rows = rows[:per_page]
+        has_previous = after_values is not None
+
+    def cursor_for(obj):
+        return encode_cursor([getattr(obj, name) for name in field_names])
+
+    next_cursor = cursor_for(rows[-1]) if rows and has_next else None
+    previous_cursor = cursor_for(rows[0]) if rows and has_previous else None
+    return KeysetPage(rows, next_cursor, previous_cursor)
+
+
+def estimate_row_count(model, using='default'):
+    """
+    Return the planner's row estimate for ``model``'s table, or None.
+
+    PostgreSQL keeps it in pg_class; SQLite only has one after ANALYZE has
+    populated sqlite_stat1.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [table])
+            elif connection.vendor == 'sqlite':
+                cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [table])
+            else:
+                return None
+            row = cursor.fetchone()
+    except DatabaseError:
+        return None
+    if not row or row[0] is None:
+        return None
+    estimate = int(str(row[0]).split()[0])
+    return estimate if estimate >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that avoids COUNT(*) over large unfiltered tables.
+
+    When the queryset has no WHERE clause and the table is estimated to hold
+    more than ``exact_count_threshold`` rows, the estimate is used as the
+    count. Filtered querysets and small tables are counted exactly.
+    """
+    exact_count_threshold = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if isinstance(queryset, QuerySet) and not queryset.query.where:
+            estimate = estimate_row_count(queryset.model, using=queryset.db)
+            if estimate is not None and estimate > self.exact_count_threshold:
+                return estimate
+        return super().count
@@ -0,0 +1,158 @@
+"""
+Who the logged-in user is to the marketplace: seller, buyer, staff or none.
+
+ProfileModelBackend loads the user together with their Seller and Buyer
+profiles in one joined query, so ``request.user.seller`` costs nothing
+extra. RoleMiddleware puts the resolved role on ``request.role`` and keeps
+a copy in the session. The copy carries a per-user version from the cache,
+bumped when the user's profile is saved, deleted or moderated, so stale
+copies are resolved again.
+"""
+from functools import wraps
+
+from django.contrib import messages
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.decorators import login_required
+from django.contrib.auth.models import User
+from django.core.exceptions import ObjectDoesNotExist
+from django.http import JsonResponse
+from django.shortcuts import redirect
+
+from .cache import bump_version, get_version
+
+
+ROLE_SESSION_KEY = 'marketplace_role'
+PROFILE_ROLES = ('seller', 'buyer')
+
+
+def role_version_key(user_id):
+    return f'marketplace:role_version:{user_id}'
+
+
+class Role:
+    """The user's marketplace role and, for sellers and buyers, their profile's state"""
+    __slots__ = ('name', 'profile_id', 'approval_status', 'is_staff')
+
+    def __init__(self, name=None, profile_id=None, approval_status='', is_staff=False):
+        self.name = name
+        self.profile_id = profile_id
+        self.approval_status = approval_status
+        self.is_staff = is_staff
+
+    def __repr__(self):
+        return f'<Role {self.name} {self.profile_id} {self.approval_status}>'
+
+    @property
+    def is_seller(self):
+        return self.name == 'seller'
+
+    @property
+    def is_buyer(self):
+        return self.name == 'buyer'
+
+    @property
+    def is_approved(self):
+        return self.approval_status == 'approved'
+
+    def as_dict(self):
+        return {field: getattr(self, field) for field in self.__slots__}
+
+
+ANONYMOUS_ROLE = Role()
+
+
+def resolve_role(user):
+    """Role of ``user`` from its (ideally already joined) profiles"""
+    if not user.is_authenticated:
+        return ANONYMOUS_ROLE
+    for name in PROFILE_ROLES:
+        try:
+            profile = getattr(user, name)
+        except ObjectDoesNotExist:
+            continue
+        return Role(name, profile.pk, profile.approval_status, user.is_staff)
+    return Role('staff' if user.is_staff else None, is_staff=user.is_staff)
+
+
+def remember_role(request, role):
+    user_id = request.user.pk
+    request.session[ROLE_SESSION_KEY] = {
+        **role.as_dict(), 'user_id': user_id, 'version': get_version(role_version_key(user_id)),
+    }
+
+
+def get_role(request):
+    """The request user's role, from the session while it is current"""
+    user = request.user
+    if not user.is_authenticated:
+        return ANONYMOUS_ROLE
+    cached = request.session.get(ROLE_SESSION_KEY)
+    if (cached and cached.get('user_id') == user.pk
+            and cached.get('version') == get_version(role_version_key(user.pk))):
+        return Role(**{field: cached[field] for field in Role.__slots__})
+    role = resolve_role(user)
+    remember_role(request, role)
+    return role
+
+
+def invalidate_roles(user_ids):
+    """Make session copies of these users' roles stale"""
+    for user_id in set(user_ids):
+        bump_version(role_version_key(user_id))
+
+
+class ProfileModelBackend(ModelBackend):
+    """ModelBackend that fetches the seller and buyer profiles with the user"""
+
+    def get_queryset(self):
+        return User._default_manager.select_related(*PROFILE_ROLES)
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(User.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = self.get_queryset().get(**{User.USERNAME_FIELD: username})
+        except User.DoesNotExist:
+            # Run the hasher anyway, as ModelBackend does, to keep timing even
+            User().set_password(password)
+            return None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
+
+    def get_user(self, user_id):
+        try:
+            user = self.get_queryset().get(pk=user_id)
+        except User.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
+
+
+def role_required(name, message, redirect_to='marketplace:home', json=False):
+    """
+    Limit a view to logged-in users with role ``name``. Others are sent to
+    ``redirect_to`` with ``message``, or get a 403 JSON error if ``json``.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.role.name != name:
+                if json:
+                    return JsonResponse({'error': message}, status=403)
+                messages.error(request, message)
+                return redirect(redirect_to)
+            return view(request, *args, **kwargs)
+        return login_required(wrapper)
+    return decorator
+
+
+def seller_required(view=None, message='Seller profile not found.', **kwargs):
+    decorator = role_required('seller', message, **kwargs)
+    return decorator(view) if view else decorator
+
+
+def buyer_required(view=None, message='Buyer profile not found.', **kwargs):
+    decorator = role_required('buyer', message, **kwargs)
+    return decorator(view) if view else decorator
@@ -0,0 +1,112 @@
+"""
+Database routing.
+
+ArchiveRouter keeps the history archive tables on their own alias.
+PrimaryReplicaRouter sends catalog reads to a read replica, but only during
+GET/HEAD requests (see ReplicaRoutingMiddleware). Every write goes to the
+primary. Reads stay on the primary:
+
+- inside a transaction;
+- once the request has written;
+- for a few seconds after the user's last write, so users see their own
+  changes despite replica lag.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+ARCHIVE_MODELS = {'transactionarchive', 'credittransactionarchive', 'orderarchive'}
+
+
+def archive_database():
+    return getattr(settings, 'MARKETPLACE_ARCHIVE_DATABASE', 'default')
+
+
+def _is_archive_model(model):
+    return model._meta.app_label == 'marketplace' and model._meta.model_name in ARCHIVE_MODELS
+
+
+class ArchiveRouter:
+    """Send the history archive tables to MARKETPLACE_ARCHIVE_DATABASE"""
+
+    def db_for_read(self, model, **hints):
+        if _is_archive_model(model):
+            return archive_database()
+        return None
+
+    def db_for_write(self, model, **hints):
+        if _is_archive_model(model):
+            return archive_database()
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        alias = archive_database()
+        if alias == 'default':
+            return None
+        if app_label == 'marketplace' and model_name in ARCHIVE_MODELS:
+            return db == alias
+        if db == alias:
+            # The archive database only holds archive tables
+            return False
+        return None
+
+
+# Models shown while browsing the catalog; everything else (sessions, users,
+# orders, credit) is always read from the primary
+CATALOG_MODELS = {'category', 'product', 'productimage', 'podcustomization', 'productreview', 'seller'}
+
+# Per-request routing state: {'replica': reads may use a replica, 'wrote': a write was routed}
+_routing = ContextVar('marketplace_db_routing', default=None)
+
+
+def read_replicas():
+    return getattr(settings, 'MARKETPLACE_READ_REPLICAS', [])
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    """Let catalog reads in this block use a replica (set per request by the middleware)"""
+    state = {'replica': enabled, 'wrote': False}
+    token = _routing.set(state)
+    try:
+        yield state
+    finally:
+        _routing.reset(token)
+
+
+class PrimaryReplicaRouter:
+    """Catalog reads to MARKETPLACE_READ_REPLICAS when it is safe to, everything else to the primary"""
+
+    def db_for_read(self, model, **hints):
+        state = _routing.get()
+        replicas = read_replicas()
+        if (not replicas or state is None or not state['replica'] or state['wrote']
+                or model._meta.app_label != 'marketplace' or model._meta.model_name not in CATALOG_MODELS):
+            return DEFAULT_DB_ALIAS
+        # Reads inside a transaction are usually followed by a write based on them
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        # Entries of the database cache backend are not the user's writes
+        if state is not None and model._meta.app_label != 'django_cache':
+            state['wrote'] = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *read_replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas are copies of the primary, never migrated on their own
+        if db in read_replicas():
+            return False
+        return None
@@ -0,0 +1,133 @@
+from django.db import transaction
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from .analytics import record_order_items
+from .cache import bump_catalog_version
+from .dashboards import invalidate_dashboards
+from .fragments import touch_products
+from .models import (
+    Buyer, Category, CreditTransaction, Order, OrderItem, PODCustomization, Product, ProductImage, Seller
+)
+from .roles import invalidate_roles
+
+
+# Sales rollups
+
+@receiver(post_init, sender=Order)
+def remember_order_status(sender, instance, **kwargs):
+    instance._stats_status = instance.status
+
+
+@receiver(post_save, sender=OrderItem)
+def add_item_to_sales_stats(sender, instance, created, **kwargs):
+    if not created or kwargs.get('raw'):
+        return
+    order = instance.order
+    if order.status == 'cancelled':
+        return
+    # The order is counted once per category it has items in
+    already_counted = OrderItem.objects.filter(
+        order_id=order.pk, product__category_id=instance.product.category_id
+    ).exclude(pk=instance.pk).exists()
+    record_order_items(order, [instance], count_orders=not already_counted)
+
+
+@receiver(post_save, sender=Order)
+def update_sales_stats_on_cancel(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_stats_status', None)
+    instance._stats_status = instance.status
+    if created or kwargs.get('raw'):
+        return
+    was_cancelled = previous == 'cancelled'
+    is_cancelled = instance.status == 'cancelled'
+    if was_cancelled != is_cancelled:
+        items = instance.items.select_related('product')
+        record_order_items(instance, items, sign=-1 if is_cancelled else 1)
+
+
+# Dashboard caches
+
+def _invalidate_after_commit(role, *profile_ids):
+    profile_ids = [profile_id for profile_id in profile_ids if profile_id is not None]
+    if profile_ids:
+        transaction.on_commit(lambda: invalidate_dashboards(role, profile_ids))
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+def invalidate_order_dashboards(sender, instance, **kwargs):
+    _invalidate_after_commit('seller', instance.seller_id)
+    _invalidate_after_commit('buyer', instance.buyer_id)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product_dashboards(sender, instance, **kwargs):
+    _invalidate_after_commit('seller', instance.seller_id)
+
+
+@receiver(post_save, sender=CreditTransaction)
+@receiver(post_delete, sender=CreditTransaction)
+def invalidate_credit_dashboards(sender, instance, **kwargs):
+    _invalidate_after_commit('buyer', instance.buyer_id)
+
+
+# Catalog version: cached catalog pages and lookups are keyed on it
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_save, sender=PODCustomization)
+@receiver(post_delete, sender=PODCustomization)
+@receiver(post_save, sender=Seller)
+@receiver(post_delete, sender=Seller)
+def bump_catalog_on_change(sender, **kwargs):
+    if not kwargs.get('raw'):
+        transaction.on_commit(bump_catalog_version)
+
+
+# Product fragments are keyed on Product.updated_at (see marketplace.fragments)
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_save, sender=PODCustomization)
+@receiver(post_delete, sender=PODCustomization)
+def touch_product_on_detail_change(sender, instance, **kwargs):
+    if not kwargs.get('raw'):
+        touch_products(pk=instance.product_id)
+
+
+@receiver(post_init, sender=Seller)
+def remember_seller_name(sender, instance, **kwargs):
+    instance._fragment_business_name = instance.business_name
+
+
+@receiver(post_save, sender=Seller)
+def touch_products_on_seller_rename(sender, instance, created, **kwargs):
+    previous = instance._fragment_business_name
+    instance._fragment_business_name = instance.business_name
+    if not created and not kwargs.get('raw') and previous != instance.business_name:
+        touch_products(seller_id=instance.pk)
+
+
+# Session-cached roles
+
+@receiver(post_save, sender=Seller)
+@receiver(post_delete, sender=Seller)
+@receiver(post_save, sender=Buyer)
+@receiver(post_delete, sender=Buyer)
+def invalidate_profile_role(sender, instance, **kwargs):
+    transaction.on_commit(lambda: invalidate_roles([instance.user_id]))
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_role(sender, instance, created, update_fields=None, **kwargs):
+    # is_staff may have changed; new users have no cached role yet and
+    # logging in only touches last_login
+    if not created and update_fields != frozenset(['last_login']):
+        transaction.on_commit(lambda: invalidate_roles([instance.pk]))
@@ -0,0 +1,169 @@
+"""
+Static files in production.
+
+``collectstatic`` with CompressedManifestStaticFilesStorage copies assets to
+STATIC_ROOT under content-hashed names (css/marketplace.3f2a9c.css). It also
+writes gzip (``.gz``) and, if the brotli package is installed, brotli
+(``.br``) variants of text assets next to each file. StaticFilesMiddleware
+serves STATIC_ROOT from the web process. It picks the smallest variant the
+client accepts. Hashed names never change content, so they are sent with a
+one-year ``immutable`` Cache-Control. A repeat visit therefore fetches no
+static bytes; other names must be revalidated.
+"""
+import gzip
+import mimetypes
+import os
+import posixpath
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import http_date, parse_etags
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.mjs', '.map', '.json', '.svg', '.txt', '.html', '.xml', '.ico'}
+MIN_COMPRESS_SIZE = 256
+# Variants in order of preference, with the suffix collectstatic gives them
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+DEFAULT_MAX_AGE = 60
+
+
+def compress(data):
+    """Compressed variants of ``data`` worth keeping, by encoding"""
+    variants = {'gzip': gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['br'] = brotli.compress(data, quality=11)
+    # Keep a variant only when it saves at least 5%
+    return {encoding: body for encoding, body in variants.items() if len(body) < len(data) * 0.95}
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """ManifestStaticFilesStorage that also writes .gz/.br variants of text assets"""
+
+    def stored_name(self, name):
+        # Before the first collectstatic (development, tests) there is no
+        # manifest to look names up in; link the unhashed file instead
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        names = set(paths)
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if hashed_name:
+                names.add(hashed_name)
+            yield name, hashed_name, processed
+        if dry_run:
+            return
+        for name in sorted(names):
+            if posixpath.splitext(name)[1].lower() in COMPRESSIBLE_EXTENSIONS and self.exists(name):
+                self.write_variants(name)
+
+    def write_variants(self, name):
+        path = self.path(name)
+        with open(path, 'rb') as handle:
+            data = handle.read()
+        if len(data) < MIN_COMPRESS_SIZE:
+            return
+        variants = compress(data)
+        for encoding, suffix in ENCODINGS:
+            variant_path = path + suffix
+            if encoding in variants:
+                with open(variant_path, 'wb') as handle:
+                    handle.write(variants[encoding])
+            elif os.path.exists(variant_path):
+                os.remove(variant_path)
+
+
+class StaticFile:
+    """A collected file and its compressed variants, with the headers to serve them"""
+
+    def __init__(self, path, immutable):
+        self.content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        if self.content_type.startswith('text/') or self.content_type in ('application/javascript', 'image/svg+xml'):
+            self.content_type += '; charset=utf-8'
+        self.cache_control = IMMUTABLE_CACHE_CONTROL if immutable else f'public, max-age={DEFAULT_MAX_AGE}'
+        self.variants = {}
+        for encoding, suffix in [*ENCODINGS, (None, '')]:
+            if os.path.exists(path + suffix):
+                stat = os.stat(path + suffix)
+                tag = f'-{encoding}' if encoding else ''
+                self.variants[encoding] = {
+                    'path': path + suffix,
+                    'size': stat.st_size,
+                    'etag': f'"{stat.st_size:x}-{int(stat.st_mtime):x}{tag}"',
+                    'last_modified': http_date(stat.st_mtime),
+                }
+
+    def choose(self, accept_encoding):
+        accepted = {
+            token.split(';')[0].strip().lower()
+            for token in accept_encoding.split(',')
+            if not token.replace(' ', '').endswith(';q=0')
+        }
+        for encoding, _ in ENCODINGS:
+            if encoding in self.variants and encoding in accepted:
+                return encoding
+        return None
+
+    def headers(self, encoding):
+        variant = self.variants[encoding]
+        headers = {
+            'Content-Type': self.content_type,
+            'Cache-Control': self.cache_control,
+            'ETag': variant['etag'],
+            'Last-Modified': variant['last_modified'],
+        }
+        if len(self.variants) > 1:
+            headers['Vary'] = 'Accept-Encoding'
+        if encoding:
+            headers['Content-Encoding'] = encoding
+        return headers
+
+    def response(self, request):
+        encoding = self.choose(request.headers.get('Accept-Encoding', ''))
+        variant = self.variants[encoding]
+        headers = self.headers(encoding)
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match and (variant['etag'] in parse_etags(if_none_match) or if_none_match.strip() == '*'):
+            response = HttpResponseNotModified()
+            for header in ('Cache-Control', 'ETag', 'Vary'):
+                if header in headers:
+                    response[header] = headers[header]
+            return response
+        if request.method == 'HEAD':
+            response = HttpResponse(headers=headers)
+        else:
+            with open(variant['path'], 'rb') as handle:
+                response = HttpResponse(handle.read(), headers=headers)
+        response['Content-Length'] = str(variant['size'])
+        return response
+
+
+def build_index(root=None, url=None):
+    """
+    Map each URL path under STATIC_URL to the StaticFile collected for it.
+    Names the manifest hashed are served as immutable.
+    """
+    root = str(root or settings.STATIC_ROOT or '')
+    url = url or settings.STATIC_URL
+    if not root or not os.path.isdir(root):
+        return {}
+    prefix = '/' + url.lstrip('/')
+    hashed_names = set(getattr(staticfiles_storage, 'hashed_files', {}).values())
+    suffixes = tuple(suffix for _, suffix in ENCODINGS)
+    index = {}
+    for directory, _, filenames in os.walk(root):
+        for filename in filenames:
+            if filename.endswith(suffixes):
+                continue
+            path = os.path.join(directory, filename)
+            name = os.path.relpath(path, root).replace(os.sep, '/')
+            index[prefix + name] = StaticFile(path, immutable=name in hashed_names)
+    return index
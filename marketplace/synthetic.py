@@ -0,0 +1,732 @@
+"""
+Synthetic marketplace data at load-testing scale.
+
+``load_sample_data --sellers/--buyers/--products/--orders/--reviews`` builds
+a Plan first: primary keys are assigned up front (after the current maximum
+of each table), and the facts rows of one batch need about rows of another
+(a product's seller, price, GST rate and creation time; which products are
+on sale and how popular they are; how many orders each buyer places) are
+drawn into compact arrays. Batches are then generated independently from
+the plan, each with its own ``random.Random`` seeded from ``--seed`` and
+the batch, so the same seed and batch size give the same rows whether the
+batches are generated inline or by worker processes (timestamps are
+relative to the start of the run). Batches are turned into executemany
+INSERTs (``bulk.insert_statement``) where they are generated, so workers
+also take the per-value conversion off the process that writes them, one
+transaction per batch. The generated created_at/updated_at are kept.
+
+Distributions:
+
+- Product popularity (orders and reviews) is Zipf-distributed over the
+  products on sale; seller catalog sizes and buyer activity follow flatter
+  Zipf curves.
+- Each category has its own price range (log-uniform), GST rates and
+  naming vocabulary.
+- Sellers and buyers are spread over Indian cities weighted roughly by
+  commercial activity, with the matching GSTIN state code and pincode.
+
+Orders are generated per buyer in time order with a running credit
+balance. Credit entries are written in time order too: refunds and the
+opening top-up wait in a queue until the buyer's ledger reaches their
+time, and top-ups are never dated before the previous entry. So each
+``balance_after`` follows from the one before it by ``created_at``, and
+the last agrees with ``credit_balance``. Product images point at a few placeholder JPEGs per category. No
+signals run for inserted rows: ``finish`` rebuilds the sales
+rollups of the new sellers and bumps the catalog version instead.
+"""
+import heapq
+import math
+import random
+from array import array
+from bisect import bisect
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.color import no_style
+from django.db import connections, router, transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.text import slugify
+
+from . import images
+from .analytics import rebuild_seller_stats
+from .bulk import insert_statement
+from .cache import bump_catalog_version
+from .gstin import STATE_CODES, check_digit
+from .models import (
+    Buyer, Category, CreditTransaction, Order, OrderItem, PODCustomization, Product, ProductImage,
+    ProductReview, Seller, Transaction,
+)
+
+
+DAY = 86400
+PASSWORD = 'password123'
+# Zipf exponents; product popularity is set per run with --zipf
+SELLER_SIZE_EXPONENT = 0.8
+BUYER_ACTIVITY_EXPONENT = 0.6
+PLACEHOLDER_VARIANTS = 4
+PLACEHOLDER_SIZE = 600
+STATS_CHUNK_SIZE = 50
+
+# Product status codes in Plan.product_status
+ON_SALE, INACTIVE, PENDING, REJECTED = range(4)
+APPROVAL_STATUSES = ('approved', 'approved', 'pending', 'rejected')
+
+CATEGORIES = [
+    {
+        'name': 'Textiles & Apparel', 'description': 'Clothing, fabrics, and textile products',
+        'weight': 22, 'price': (150, 2500), 'gst_rates': (5, 12), 'customizable': 0.5,
+        'styles': ('Cotton', 'Silk', 'Linen', 'Khadi', 'Chanderi', 'Block-Printed', 'Handloom', 'Embroidered'),
+        'nouns': ('Kurta', 'Saree', 'Dupatta', 'T-Shirt', 'Shirt', 'Bedsheet', 'Stole', 'Fabric Roll',
+                  'Towel Set', 'Shawl'),
+    },
+    {
+        'name': 'Handicrafts', 'description': 'Traditional and handmade crafts',
+        'weight': 12, 'price': (200, 8000), 'gst_rates': (5, 12), 'customizable': 0.3,
+        'styles': ('Brass', 'Terracotta', 'Sheesham', 'Jute', 'Bamboo', 'Marble', 'Madhubani', 'Blue Pottery'),
+        'nouns': ('Carpet', 'Dhurrie', 'Lamp', 'Elephant Figurine', 'Vase', 'Wall Plate', 'Pot', 'Coaster Set',
+                  'Basket', 'Tray'),
+    },
+    {
+        'name': 'Electronics', 'description': 'Electronic components and devices',
+        'weight': 14, 'price': (300, 25000), 'gst_rates': (18, 28), 'customizable': 0.05,
+        'styles': ('Smart', 'Wireless', 'Rechargeable', 'Portable', 'Compact', 'Heavy-Duty', 'Solar', 'USB-C'),
+        'nouns': ('LED Strip', 'Power Bank', 'Bluetooth Speaker', 'Charger', 'Plug', 'Extension Board',
+                  'Ceiling Fan', 'Inverter Battery', 'Earphones', 'Table Lamp'),
+    },
+    {
+        'name': 'Food Products', 'description': 'Processed and packaged food items',
+        'weight': 12, 'price': (50, 1500), 'gst_rates': (0, 5, 12), 'customizable': 0.1,
+        'styles': ('Organic', 'Kashmiri', 'Malabar', 'Assam', 'Darjeeling', 'Homestyle', 'Roasted', 'Cold-Pressed'),
+        'nouns': ('Spice Mix', 'Basmati Rice', 'Green Tea', 'Mango Pickle', 'Ghee', 'Jaggery', 'Honey',
+                  'Namkeen', 'Dry Fruit Pack', 'Masala Chai'),
+    },
+    {
+        'name': 'Jewelry', 'description': 'Traditional and modern jewelry',
+        'weight': 10, 'price': (500, 60000), 'gst_rates': (3,), 'customizable': 0.4,
+        'styles': ('Silver', 'Kundan', 'Oxidised', 'Temple', 'Meenakari', 'Polki', 'Pearl', 'Gold-Plated'),
+        'nouns': ('Earrings', 'Necklace', 'Bangles', 'Anklet', 'Ring', 'Nose Pin', 'Pendant', 'Jhumka',
+                  'Maang Tikka', 'Bracelet'),
+    },
+    {
+        'name': 'Home Decor', 'description': 'Interior decoration items',
+        'weight': 12, 'price': (200, 12000), 'gst_rates': (12, 18), 'customizable': 0.35,
+        'styles': ('Wooden', 'Macrame', 'Ceramic', 'Wrought Iron', 'Hand-Painted', 'Rattan', 'Mirror-Work',
+                   'Velvet'),
+        'nouns': ('Wall Art', 'Cushion Cover', 'Wall Clock', 'Table Runner', 'Photo Frame', 'Candle Stand',
+                  'Curtain', 'Planter', 'Mirror', 'Wind Chime'),
+    },
+    {
+        'name': 'Automotive Parts', 'description': 'Vehicle components and accessories',
+        'weight': 8, 'price': (150, 15000), 'gst_rates': (18, 28), 'customizable': 0.05,
+        'styles': ('Universal', 'OEM', 'All-Weather', 'Premium', 'Ceramic', 'Synthetic', 'Heavy-Duty', 'Sport'),
+        'nouns': ('Floor Mats', 'Seat Cover', 'Brake Pads', 'Air Filter', 'Wiper Blades', 'Headlight Bulb',
+                  'Car Charger', 'Steering Cover', 'Engine Oil', 'Spark Plug'),
+    },
+    {
+        'name': 'Beauty Products', 'description': 'Cosmetics and personal care items',
+        'weight': 10, 'price': (80, 3000), 'gst_rates': (18,), 'customizable': 0.15,
+        'styles': ('Herbal', 'Ayurvedic', 'Sandalwood', 'Neem', 'Rose', 'Aloe Vera', 'Saffron', 'Charcoal'),
+        'nouns': ('Face Cream', 'Hair Oil', 'Face Wash', 'Lip Balm', 'Kajal', 'Sunscreen', 'Ubtan',
+                  'Body Lotion', 'Shampoo', 'Soap'),
+    },
+]
+
+NAME_PREFIXES = ('', '', '', 'Premium', 'Classic', 'Deluxe', 'Eco', 'Royal', 'Heritage', 'Festive')
+SELLING_POINTS = (
+    'Made in small batches and quality checked before dispatch.',
+    'Bulk pricing available for repeat orders.',
+    'Sourced directly from the maker.',
+    'Ships within two working days.',
+    'Packed for safe long-distance transport.',
+    'GST invoice provided with every order.',
+    'Popular with retailers across India.',
+    'Custom branding available on request.',
+)
+CUSTOMIZATION_OPTIONS = [
+    ('text', 'Custom Text', 'Add your custom text to the product', {}, 2000),
+    ('logo', 'Logo Upload', 'Upload your logo for printing', {}, 5000),
+    ('color', 'Color Selection', 'Choose your preferred color',
+     {'colors': ['Red', 'Blue', 'Green', 'Black', 'White', 'Yellow']}, 0),
+    ('size', 'Size Selection', 'Select the size', {'sizes': ['XS', 'S', 'M', 'L', 'XL', 'XXL']}, 0),
+    ('material', 'Material Selection', 'Choose the material', {'materials': ['Standard', 'Premium']}, 3000),
+]
+
+# (city, state, pincode prefix, weight)
+CITIES = [
+    ('Mumbai', 'Maharashtra', '400', 12), ('Pune', 'Maharashtra', '411', 5), ('Delhi', 'Delhi', '110', 12),
+    ('Bengaluru', 'Karnataka', '560', 9), ('Chennai', 'Tamil Nadu', '600', 7),
+    ('Coimbatore', 'Tamil Nadu', '641', 3), ('Hyderabad', 'Telangana', '500', 7),
+    ('Kolkata', 'West Bengal', '700', 7), ('Ahmedabad', 'Gujarat', '380', 6), ('Surat', 'Gujarat', '395', 5),
+    ('Jaipur', 'Rajasthan', '302', 5), ('Jodhpur', 'Rajasthan', '342', 2),
+    ('Lucknow', 'Uttar Pradesh', '226', 4), ('Kanpur', 'Uttar Pradesh', '208', 3),
+    ('Noida', 'Uttar Pradesh', '201', 3), ('Gurugram', 'Haryana', '122', 4), ('Ludhiana', 'Punjab', '141', 3),
+    ('Indore', 'Madhya Pradesh', '452', 3), ('Bhopal', 'Madhya Pradesh', '462', 2), ('Kochi', 'Kerala', '682', 3),
+    ('Visakhapatnam', 'Andhra Pradesh', '530', 2), ('Bhubaneswar', 'Odisha', '751', 2),
+    ('Patna', 'Bihar', '800', 2), ('Guwahati', 'Assam', '781', 2), ('Chandigarh', 'Chandigarh', '160', 1),
+]
+CITY_CUM_WEIGHTS = list(accumulate(city[3] for city in CITIES))
+STATE_CODE = {state: code for code, state in STATE_CODES.items()}
+
+FIRST_NAMES = (
+    'Aarav', 'Priya', 'Rahul', 'Ananya', 'Vikram', 'Sneha', 'Arjun', 'Kavya', 'Rohan', 'Meera', 'Karthik',
+    'Divya', 'Amit', 'Pooja', 'Sanjay', 'Lakshmi', 'Imran', 'Fatima', 'Harpreet', 'Joseph',
+)
+SURNAMES = (
+    'Sharma', 'Patel', 'Iyer', 'Reddy', 'Gupta', 'Nair', 'Singh', 'Das', 'Mehta', 'Khan', 'Joshi', 'Rao',
+    'Banerjee', 'Kulkarni', 'Agarwal', 'Pillai', 'Chauhan', 'Menon', 'Bose', 'Desai',
+)
+BUSINESS_SUFFIXES = (
+    'Traders', 'Industries', 'Enterprises', 'Exports', 'Handlooms', 'Crafts', 'Overseas', '& Sons', 'Udyog',
+    'Mart',
+)
+BANKS = (
+    ('State Bank of India', 'SBIN'), ('HDFC Bank', 'HDFC'), ('ICICI Bank', 'ICIC'), ('Axis Bank', 'UTIB'),
+    ('Kotak Mahindra Bank', 'KKBK'), ('Punjab National Bank', 'PUNB'), ('Bank of Baroda', 'BARB'),
+    ('Canara Bank', 'CNRB'),
+)
+STREETS = ('MG Road', 'Station Road', 'Gandhi Nagar', 'Industrial Area', 'Market Yard', 'Nehru Street',
+           'Civil Lines', 'Sector 5')
+BUSINESS_TYPES = ('manufacturer', 'wholesaler', 'retailer', 'service_provider')
+BUSINESS_TYPE_CUM_WEIGHTS = list(accumulate((45, 30, 20, 5)))
+PAYMENT_METHODS = ('credit', 'online', 'po')
+PAYMENT_METHOD_CUM_WEIGHTS = list(accumulate((45, 40, 15)))
+QUANTITY_MULTIPLIERS = (1, 1, 1, 2, 2, 3, 5, 10)
+TOPUP_RUPEES = (10000, 25000, 50000, 100000, 250000)
+TOPUP_CHANNELS = ('NEFT', 'RTGS', 'UPI', 'IMPS')
+CANCELLATION_RATE = 0.04
+RATING_CUM_WEIGHTS = list(accumulate((5, 7, 13, 35, 40)))
+REVIEW_COMMENTS = {
+    1: ('Not as described.', 'Arrived damaged.'),
+    2: ('Quality could be better.', 'Late delivery.'),
+    3: ('Okay for the price.', 'Average quality.'),
+    4: ('Good quality, will reorder.', 'Customers liked it.'),
+    5: ('Excellent, exactly as shown.', 'Best supplier we have used.', 'Sold out in a week!'),
+}
+
+
+def zipf_cum_weights(count, exponent):
+    """Cumulative Zipf weights for ranks 1..count, for ``Random.choices`` or ``pick``"""
+    return array('d', accumulate(1 / rank ** exponent for rank in range(1, count + 1)))
+
+
+def pick(rng, population, cum_weights):
+    return population[bisect(cum_weights, rng.random() * cum_weights[-1], 0, len(population) - 1)]
+
+
+def paise_to_rupees(paise):
+    return Decimal(paise).scaleb(-2)
+
+
+def to_datetime(timestamp):
+    return datetime.fromtimestamp(timestamp, dt_timezone.utc)
+
+
+def product_words(index, category):
+    """``(prefix, style, noun)``, a function of the index so other batches can name the product"""
+    mixed = index * 2654435761 % 2 ** 32
+    styles, nouns = category['styles'], category['nouns']
+    prefix = NAME_PREFIXES[mixed % len(NAME_PREFIXES)]
+    mixed //= len(NAME_PREFIXES)
+    return prefix, styles[mixed % len(styles)], nouns[mixed // len(styles) % len(nouns)]
+
+
+def product_name(index, category):
+    return ' '.join(word for word in product_words(index, category) if word)
+
+
+def gstin_for(number, state, holder_type):
+    """
+    A valid GSTIN that is unique per ``number`` and ``holder_type`` (the
+    fourth PAN letter: C for companies, P for individuals)
+    """
+    digits, rest = number % 10000, number // 10000
+    letters = []
+    for _ in range(5):
+        rest, value = divmod(rest, 26)
+        letters.append(chr(65 + value))
+    pan = f'{letters[0]}{letters[1]}{letters[2]}{holder_type}{letters[3]}{digits:04d}{letters[4]}'
+    first_14 = f'{STATE_CODE[state]}{pan}1Z'
+    return first_14 + check_digit(first_14)
+
+
+def placeholder_image_name(category_index, variant):
+    return f'products/synthetic/{slugify(CATEGORIES[category_index]["name"])}-{variant}.jpg'
+
+
+class Plan:
+    """Keys and the cross-batch facts drawn before any batch is generated"""
+
+    def __init__(self, counts, seed, days, zipf, batch_size, category_ids, starts):
+        self.seed = seed
+        self.batch_size = batch_size
+        self.category_ids = category_ids
+        self.now = timezone.now().timestamp()
+        self.start = self.now - days * DAY
+        self.sellers, self.buyers, self.products = counts['sellers'], counts['buyers'], counts['products']
+        self.orders, self.reviews = counts['orders'], counts['reviews']
+        # Sellers' users come first, then buyers'
+        self.user_start = starts['user']
+        self.seller_start = starts['seller']
+        self.buyer_start = starts['buyer']
+        self.product_start = starts['product']
+        self.order_start = starts['order']
+        self.password = make_password(PASSWORD)
+
+        rng = random.Random(f'{seed}:plan')
+        span = self.now - self.start
+        # The first seller, buyer and product are always approved so small runs can still trade
+        self.seller_approved = bytearray(i == 0 or rng.random() < 0.85 for i in range(self.sellers))
+        self.seller_created = array('d', (self.start + rng.random() * span * 0.5 for _ in range(self.sellers)))
+        self.plan_products(rng, zipf)
+        self.buyer_approved = bytearray(i == 0 or rng.random() < 0.9 for i in range(self.buyers))
+        self.buyer_created = array('d', (self.start + rng.random() * span * 0.8 for _ in range(self.buyers)))
+        self.buyer_orders = self.spread(rng, self.orders)
+        self.buyer_reviews = self.spread(rng, self.reviews)
+        self.order_offsets = array('q', accumulate(self.buyer_orders, initial=0))
+
+    def plan_products(self, rng, zipf):
+        count = self.products
+        sellers = list(range(self.sellers))
+        rng.shuffle(sellers)
+        self.product_seller = array('i', rng.choices(
+            sellers, cum_weights=zipf_cum_weights(len(sellers), SELLER_SIZE_EXPONENT), k=count
+        ) if count else [])
+        if count:
+            # Seller 0 is always approved, so product 0 can always be on sale
+            self.product_seller[0] = 0
+        category_weights = list(accumulate(category['weight'] for category in CATEGORIES))
+        self.product_category = array('b', rng.choices(range(len(CATEGORIES)), cum_weights=category_weights, k=count))
+        self.product_price = array('q')
+        self.product_moq = array('i')
+        self.product_gst = array('b')
+        self.product_status = bytearray()
+        self.product_created = array('d')
+        for index in range(count):
+            category = CATEGORIES[self.product_category[index]]
+            low, high = category['price']
+            rupees = round(low * math.exp(rng.random() * math.log(high / low)))
+            if rupees >= 100:
+                rupees = rupees // 10 * 10 + 9
+            self.product_price.append(rupees * 100)
+            self.product_moq.append(rng.choice((1, 1, 1, 2, 5, 10, 12, 25, 50)))
+            self.product_gst.append(rng.choice(category['gst_rates']))
+            if not self.seller_approved[self.product_seller[index]]:
+                status = PENDING
+            elif index == 0:
+                status = ON_SALE
+            else:
+                status = pick(rng, (ON_SALE, INACTIVE, PENDING, REJECTED), (88, 92, 97, 100))
+            self.product_status.append(status)
+            seller_created = self.seller_created[self.product_seller[index]]
+            self.product_created.append(seller_created + rng.random() * (self.now - DAY - seller_created))
+        # Popularity ranks over the products on sale, in random product order
+        self.popular = array('i', (index for index in range(count) if self.product_status[index] == ON_SALE))
+        rng.shuffle(self.popular)
+        self.popular_weights = zipf_cum_weights(len(self.popular), zipf)
+
+    def spread(self, rng, total):
+        """Split ``total`` over the approved buyers, Zipf-weighted by activity"""
+        counts = array('i', [0]) * self.buyers
+        approved = [index for index in range(self.buyers) if self.buyer_approved[index]]
+        if not total or not approved:
+            return counts
+        rng.shuffle(approved)
+        weights = zipf_cum_weights(len(approved), BUYER_ACTIVITY_EXPONENT)
+        for index in rng.choices(approved, cum_weights=weights, k=total):
+            counts[index] += 1
+        return counts
+
+    def popular_product(self, rng):
+        return pick(rng, self.popular, self.popular_weights)
+
+    def batches(self):
+        """``(kind, first, count)`` tasks in the order they must be written"""
+        tasks = []
+        for kind, total in (('sellers', self.sellers), ('products', self.products)):
+            tasks.extend((kind, first, min(self.batch_size, total - first))
+                         for first in range(0, total, self.batch_size))
+        # Buyer batches also carry the buyers' orders, so they are cut by rows
+        first = 0
+        while first < self.buyers:
+            end, rows = first, 0
+            while end < self.buyers and (rows < self.batch_size or end == first):
+                rows += 1 + self.buyer_orders[end]
+                end += 1
+            tasks.append(('buyers', first, end - first))
+            first = end
+        return tasks
+
+
+def build_plan(counts, seed=0, days=365, zipf=1.1, batch_size=5000):
+    categories = ensure_categories()
+    starts = {
+        name: (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+        for name, model in (('user', User), ('seller', Seller), ('buyer', Buyer), ('product', Product),
+                            ('order', Order))
+    }
+    return Plan(counts, seed, days, zipf, batch_size, [category.pk for category in categories], starts)
+
+
+def ensure_categories():
+    return [
+        Category.objects.get_or_create(name=data['name'], defaults={'description': data['description']})[0]
+        for data in CATEGORIES
+    ]
+
+
+def ensure_placeholder_images():
+    """A few plain JPEGs per category for the generated ProductImage rows to point at"""
+    for category_index, category in enumerate(CATEGORIES):
+        for variant in range(PLACEHOLDER_VARIANTS):
+            name = placeholder_image_name(category_index, variant)
+            if default_storage.exists(name):
+                continue
+            rng = random.Random(name)
+            color = tuple(rng.randrange(90, 230) for _ in range(3))
+            content = images.solid_jpeg((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE), color)
+            default_storage.save(name, ContentFile(content))
+
+
+def generate_batch(plan, kind, first, count):
+    """Model instances for one batch, as ``[(model, objects), ...]`` in insert order"""
+    rng = random.Random(f'{plan.seed}:{kind}:{first}')
+    return GENERATORS[kind](plan, rng, first, count)
+
+
+def prepare_batch(plan, kind, first, count):
+    """One batch as ``[(model, sql, params), ...]`` INSERTs ready for ``write_batch``"""
+    return [
+        (model, *insert_statement(model, objects))
+        for model, objects in generate_batch(plan, kind, first, count) if objects
+    ]
+
+
+_worker_plan = None
+
+
+def init_worker(plan):
+    global _worker_plan
+    _worker_plan = plan
+
+
+def prepare_in_worker(kind, first, count):
+    """``prepare_batch`` for worker processes, which receive the plan once at start-up"""
+    return prepare_batch(_worker_plan, kind, first, count)
+
+
+def _place(rng):
+    city, state, pincode_prefix, _ = pick(rng, CITIES, CITY_CUM_WEIGHTS)
+    address = f'{rng.randint(1, 400)}, {rng.choice(STREETS)}, {city}'
+    return city, state, f'{pincode_prefix}{rng.randint(1, 99):03d}', address
+
+
+def _person(rng):
+    return rng.choice(FIRST_NAMES), rng.choice(SURNAMES)
+
+
+def _user(plan, pk, username, first_name, last_name, created):
+    return User(
+        pk=pk, username=username, email=f'{username}@example.com', first_name=first_name, last_name=last_name,
+        password=plan.password, date_joined=created,
+    )
+
+
+def _sellers(plan, rng, first, count):
+    users, sellers = [], []
+    for index in range(first, first + count):
+        pk = plan.seller_start + index
+        user_pk = plan.user_start + index
+        created = to_datetime(plan.seller_created[index])
+        first_name, surname = _person(rng)
+        city, state, pincode, address = _place(rng)
+        business_name = f'{rng.choice((surname, city))} {rng.choice(BUSINESS_SUFFIXES)}'
+        bank_name, ifsc_prefix = rng.choice(BANKS)
+        approved = plan.seller_approved[index]
+        status = 'approved' if approved else rng.choice(('pending', 'pending', 'rejected'))
+        users.append(_user(plan, user_pk, f'synth_seller_{pk}', first_name, surname, created))
+        sellers.append(Seller(
+            pk=pk, user_id=user_pk, business_name=business_name, owner_name=f'{first_name} {surname}',
+            phone=f'+91{rng.randint(6000000000, 9999999999)}', address=address, city=city, state=state,
+            pincode=pincode, gstin=gstin_for(pk, state, 'C'), gstin_status='valid',
+            turnover=Decimal(round(2 * math.exp(rng.random() * math.log(25)), 2)).quantize(Decimal('0.01')),
+            bank_name=bank_name, account_number=str(rng.randint(10 ** 11, 10 ** 16 - 1)),
+            ifsc_code=f'{ifsc_prefix}0{rng.randint(0, 999999):06d}', account_holder_name=business_name,
+            business_type=pick(rng, BUSINESS_TYPES, BUSINESS_TYPE_CUM_WEIGHTS), approval_status=status,
+            verified=approved and rng.random() < 0.6,
+            rejection_reason='GST certificate does not match the business name' if status == 'rejected' else '',
+            created_at=created,
+        ))
+    return [(User, users), (Seller, sellers)]
+
+
+def _products(plan, rng, first, count):
+    products, images, customizations = [], [], []
+    for index in range(first, first + count):
+        pk = plan.product_start + index
+        category_index = plan.product_category[index]
+        category = CATEGORIES[category_index]
+        name = product_name(index, category)
+        price = plan.product_price[index]
+        mrp = -(-price * (100 + rng.choice((0, 0, 5, 10, 15, 20, 25, 30, 40))) // 10000) * 100
+        created_ts = plan.product_created[index]
+        created = to_datetime(created_ts)
+        updated = to_datetime(min(plan.now, created_ts + rng.random() * 30 * DAY))
+        status = plan.product_status[index]
+        customizable = rng.random() < category['customizable']
+        _, style, noun = product_words(index, category)
+        products.append(Product(
+            pk=pk, seller_id=plan.seller_start + plan.product_seller[index],
+            category_id=plan.category_ids[category_index], name=name,
+            description=f'{name}. {" ".join(rng.sample(SELLING_POINTS, 2))}',
+            mrp=paise_to_rupees(mrp), selling_price=paise_to_rupees(price), gst_rate=plan.product_gst[index],
+            stock_quantity=0 if rng.random() < 0.05 else int(rng.expovariate(1 / 300)) + 1,
+            minimum_order_quantity=plan.product_moq[index],
+            approval_status=APPROVAL_STATUSES[status],
+            is_active=status != INACTIVE, is_customizable=customizable,
+            rejection_reason='Images do not show the product' if status == REJECTED else '',
+            tags=', '.join((style.lower(), noun.lower(), slugify(category['name']).split('-')[0])),
+            sku=f'SYN-{pk}', created_at=created, updated_at=updated,
+        ))
+        for position in range(1 + rng.choice((0, 0, 0, 0, 1, 1, 1, 2, 2, 3))):
+            images.append(ProductImage(
+                product_id=pk, image=placeholder_image_name(category_index, rng.randrange(PLACEHOLDER_VARIANTS)),
+                alt_text=name, is_primary=position == 0, created_at=created,
+            ))
+        if customizable:
+            for kind, option_name, description, options, cost in rng.sample(CUSTOMIZATION_OPTIONS, rng.randint(2, 3)):
+                customizations.append(PODCustomization(
+                    product_id=pk, customization_type=kind, name=option_name, description=description,
+                    options=options, additional_cost=paise_to_rupees(cost), is_required=kind in ('color', 'size'),
+                    created_at=created,
+                ))
+    return [(Product, products), (ProductImage, images), (PODCustomization, customizations)]
+
+
+def _order_status(rng, method, age_days):
+    if rng.random() < CANCELLATION_RATE:
+        return 'cancelled', method == 'credit'
+    if age_days < 1:
+        status = 'confirmed' if method == 'credit' else 'pending'
+    elif age_days < 3:
+        status = rng.choice(('confirmed', 'processing'))
+    elif age_days < 8:
+        status = 'shipped'
+    else:
+        status = 'delivered'
+    return status, method != 'po' or status == 'delivered'
+
+
+class BuyerHistory:
+    """One buyer's orders and ledger, generated in time order with a running credit balance"""
+
+    def __init__(self, plan, rng, rows, buyer_pk, created_ts):
+        self.plan, self.rng, self.rows = plan, rng, rows
+        self.buyer_pk, self.created_ts = buyer_pk, created_ts
+        self.balance = 0
+        # Time of the latest ledger entry; entries are appended in time order
+        self.ledger_ts = created_ts
+        # Credits dated after the entries written so far: (timestamp, sequence, paise, reference, description)
+        self.scheduled = []
+
+    def credit(self, paise, timestamp, reference, description):
+        self.balance += paise
+        self.ledger_ts = max(self.ledger_ts, timestamp)
+        self.rows[CreditTransaction].append(CreditTransaction(
+            buyer_id=self.buyer_pk, amount=paise_to_rupees(paise), transaction_type='credit', reference=reference,
+            description=description, balance_after=paise_to_rupees(self.balance),
+            created_at=to_datetime(self.ledger_ts),
+        ))
+
+    def schedule_credit(self, paise, timestamp, reference, description):
+        heapq.heappush(self.scheduled, (timestamp, len(self.scheduled), paise, reference, description))
+
+    def settle(self, until):
+        """Write the scheduled credits dated up to ``until``"""
+        while self.scheduled and self.scheduled[0][0] <= until:
+            timestamp, _, paise, reference, description = heapq.heappop(self.scheduled)
+            self.credit(paise, timestamp, reference, description)
+
+    def top_up(self, needed, timestamp, schedule=False):
+        rupees = max(-(-needed // 500000) * 5000, self.rng.choice(TOPUP_RUPEES))
+        channel = self.rng.choice(TOPUP_CHANNELS)
+        (self.schedule_credit if schedule else self.credit)(
+            rupees * 100, timestamp, f'{channel}{self.rng.randint(10 ** 9, 10 ** 10 - 1)}',
+            f'Credit top-up via {channel}',
+        )
+
+    def order_lines(self):
+        """A first product by popularity, then other popular products of the same seller"""
+        plan, rng = self.plan, self.rng
+        first = plan.popular_product(rng)
+        seller = plan.product_seller[first]
+        lines = [first]
+        wanted = rng.choice((1, 1, 1, 1, 1, 2, 2, 3, 4))
+        for _ in range(10 * (wanted - 1)):
+            if len(lines) == wanted:
+                break
+            candidate = plan.popular_product(rng)
+            if plan.product_seller[candidate] == seller and candidate not in lines:
+                lines.append(candidate)
+        earliest = max(self.created_ts, *(plan.product_created[index] for index in lines))
+        return earliest + rng.random() * (plan.now - earliest), lines
+
+    def add_orders(self, order_pk, count, address):
+        plan, rng, rows = self.plan, self.rng, self.rows
+        ordered = []
+        for order_pk, (timestamp, lines) in enumerate(sorted(self.order_lines() for _ in range(count)), start=order_pk):
+            created = to_datetime(timestamp)
+            method = pick(rng, PAYMENT_METHODS, PAYMENT_METHOD_CUM_WEIGHTS)
+            status, paid = _order_status(rng, method, (plan.now - timestamp) / DAY)
+            subtotal = gst = 0
+            for index in lines:
+                quantity = plan.product_moq[index] * rng.choice(QUANTITY_MULTIPLIERS)
+                line_total = plan.product_price[index] * quantity
+                subtotal += line_total
+                gst += (line_total * plan.product_gst[index] + 50) // 100
+                rows[OrderItem].append(OrderItem(
+                    order_id=order_pk, product_id=plan.product_start + index, quantity=quantity,
+                    unit_price=paise_to_rupees(plan.product_price[index]), gst_rate=plan.product_gst[index],
+                    total_price=paise_to_rupees(line_total),
+                ))
+            total = subtotal + gst
+            seller_pk = plan.seller_start + plan.product_seller[lines[0]]
+            name = product_name(lines[0], CATEGORIES[plan.product_category[lines[0]]])
+            order_number = f'ORDS{order_pk:09d}'
+            if method == 'credit':
+                self.settle(timestamp)
+                if self.balance < total:
+                    # Dated no earlier than the previous entry, or than the buyer's sign-up
+                    self.top_up(total - self.balance, timestamp - rng.random() * DAY)
+                self.balance -= total
+                self.ledger_ts = timestamp
+                rows[CreditTransaction].append(CreditTransaction(
+                    buyer_id=self.buyer_pk, amount=paise_to_rupees(total), transaction_type='debit',
+                    reference=order_number, description=f'Purchase: {name}',
+                    balance_after=paise_to_rupees(self.balance), created_at=created,
+                ))
+            updated_ts = min(plan.now, timestamp + rng.random() * 10 * DAY)
+            updated = to_datetime(updated_ts)
+            rows[Order].append(Order(
+                pk=order_pk, buyer_id=self.buyer_pk, seller_id=seller_pk, order_number=order_number,
+                subtotal=paise_to_rupees(subtotal), gst_amount=paise_to_rupees(gst),
+                total_amount=paise_to_rupees(total),
+                status=status, payment_method=method, payment_status=paid, shipping_address=address,
+                created_at=created, updated_at=updated,
+            ))
+            rows[Transaction].append(Transaction(
+                buyer_id=self.buyer_pk, seller_id=seller_pk, order_id=order_pk, transaction_id=f'TXNS{order_pk:010d}',
+                transaction_type='purchase', amount=paise_to_rupees(total),
+                status='cancelled' if status == 'cancelled' else 'completed' if paid else 'pending',
+                description=f'Purchase of {name}', created_at=created, updated_at=updated,
+            ))
+            if status == 'cancelled' and paid:
+                self.schedule_credit(total, updated_ts, order_number, f'Refund: {name}')
+                rows[Transaction].append(Transaction(
+                    buyer_id=self.buyer_pk, seller_id=seller_pk, order_id=order_pk,
+                    transaction_id=f'TXNR{order_pk:010d}', transaction_type='refund', amount=paise_to_rupees(total),
+                    status='completed', description=f'Refund for {order_number}', created_at=updated,
+                    updated_at=updated,
+                ))
+            elif status == 'delivered':
+                ordered.extend((index, timestamp) for index in lines)
+        self.settle(math.inf)
+        return ordered
+
+    def add_reviews(self, user_pk, count, ordered):
+        """Reviews of delivered products first, then of other popular products"""
+        plan, rng = self.plan, self.rng
+        reviewed = set()
+        candidates = [(index, timestamp + rng.random() * 14 * DAY) for index, timestamp in ordered]
+        rng.shuffle(candidates)
+        attempts = 0
+        while len(reviewed) < min(count, len(plan.popular)) and attempts < 20 * count:
+            attempts += 1
+            if candidates:
+                index, timestamp = candidates.pop()
+            else:
+                index = plan.popular_product(rng)
+                earliest = max(self.created_ts, plan.product_created[index])
+                timestamp = earliest + rng.random() * (plan.now - earliest)
+            if index in reviewed:
+                continue
+            reviewed.add(index)
+            rating = pick(rng, (1, 2, 3, 4, 5), RATING_CUM_WEIGHTS)
+            self.rows[ProductReview].append(ProductReview(
+                product_id=plan.product_start + index, user_id=user_pk, rating=rating,
+                comment=rng.choice(REVIEW_COMMENTS[rating]) if rng.random() < 0.6 else '',
+                created_at=to_datetime(min(plan.now, timestamp)),
+            ))
+
+
+def _buyers(plan, rng, first, count):
+    models = (User, Buyer, Order, OrderItem, Transaction, CreditTransaction, ProductReview)
+    rows = {model: [] for model in models}
+    for index in range(first, first + count):
+        pk = plan.buyer_start + index
+        user_pk = plan.user_start + plan.sellers + index
+        created_ts = plan.buyer_created[index]
+        created = to_datetime(created_ts)
+        first_name, surname = _person(rng)
+        city, state, _, address = _place(rng)
+        has_business = rng.random() < 0.7
+        approved = plan.buyer_approved[index]
+        status = 'approved' if approved else rng.choice(('pending', 'pending', 'rejected'))
+        history = BuyerHistory(plan, rng, rows, pk, created_ts)
+        if approved and rng.random() < 0.5:
+            history.top_up(0, min(plan.now, created_ts + rng.random() * DAY), schedule=True)
+        ordered = history.add_orders(plan.order_start + plan.order_offsets[index], plan.buyer_orders[index], address)
+        history.add_reviews(user_pk, plan.buyer_reviews[index], ordered)
+        bank_name, ifsc_prefix = rng.choice(BANKS) if has_business else ('', '')
+        rows[User].append(_user(plan, user_pk, f'synth_buyer_{pk}', first_name, surname, created))
+        rows[Buyer].append(Buyer(
+            pk=pk, user_id=user_pk, name=f'{first_name} {surname}',
+            business_name=f'{surname} {rng.choice(BUSINESS_SUFFIXES)}' if has_business else '', address=address,
+            mobile_number=f'+91{rng.randint(6000000000, 9999999999)}', gstin=gstin_for(pk, state, 'P'),
+            gstin_status='valid', credit_balance=paise_to_rupees(history.balance), bank_name=bank_name,
+            account_number=str(rng.randint(10 ** 11, 10 ** 16 - 1)) if has_business else '',
+            ifsc_code=f'{ifsc_prefix}0{rng.randint(0, 999999):06d}' if has_business else '',
+            approval_status=status, verified=approved and rng.random() < 0.5,
+            rejection_reason='GSTIN does not belong to the applicant' if status == 'rejected' else '',
+            created_at=created,
+        ))
+    return [(model, rows[model]) for model in models]
+
+
+GENERATORS = {'sellers': _sellers, 'products': _products, 'buyers': _buyers}
+
+
+def write_batch(statements):
+    """Run one prepared batch in one transaction; returns the number of rows written"""
+    with transaction.atomic():
+        for model, sql, params in statements:
+            with connections[router.db_for_write(model)].cursor() as cursor:
+                cursor.executemany(sql, params)
+    return sum(len(params) for _, _, params in statements)
+
+
+def finish(plan):
+    """
+    Do what the skipped signals would have: move sequences past the assigned
+    keys (PostgreSQL), rebuild the new sellers' sales rollups and bump the
+    catalog version. Returns the number of rollup rows written.
+    """
+    models = [User, Seller, Buyer, Product, Order]
+    connection = connections[router.db_for_write(Product)]
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    if statements:
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+    rows = 0
+    if plan.orders:
+        seller_ids = list(range(plan.seller_start, plan.seller_start + plan.sellers))
+        for start in range(0, len(seller_ids), STATS_CHUNK_SIZE):
+            rows += rebuild_seller_stats(seller_ids[start:start + STATS_CHUNK_SIZE])
+    bump_catalog_version()
+    return rows
@@ -0,0 +1,23 @@
+from django import template
+
+
+register = template.Library()
+
+
+@register.filter
+def split(value, separator=','):
+    """Split ``value`` on ``separator``, dropping blank items: ``{% for tag in product.tags|split:"," %}``"""
+    return [item.strip() for item in str(value or '').split(separator) if item.strip()]
+
+
+# Bootstrap class for each widget type; other widgets get form-control
+WIDGET_CLASSES = {'checkbox': 'form-check-input', 'select': 'form-select'}
+
+
+@register.filter
+def bootstrap(field):
+    """A bound field's widget with the Bootstrap class for its type (and is-invalid on errors)"""
+    classes = [field.field.widget.attrs.get('class', ''), WIDGET_CLASSES.get(field.widget_type, 'form-control')]
+    if field.errors:
+        classes.append('is-invalid')
+    return field.as_widget(attrs={'class': ' '.join(filter(None, classes))})
@@ -1,3 +1,1593 @@
-from django.test import TestCase
+import gzip
+import hashlib
+import json
+import os
+import runpy
+import statistics
+import time
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.http import HttpResponse
+from django.templatetags.static import static
+from django.db import connection
+from django.db.utils import ConnectionHandler
+from django.db.models import Sum
+from django.test import Client, LiveServerTestCase, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .archive import archive_history, pending_archive_counts
+from .cache import CATALOG_VERSION_KEY, bump_catalog_version
+from .dashboards import dashboard_cache_key
+from .forms import BuyerRegistrationForm, OrderForm
+from .gstin import check_digit, check_gstin, pan_from_gstin, state_from_gstin
+from .images import shrink_to_fit, solid_jpeg
+from .middleware import StaticFilesMiddleware
+from .fragments import render_product_cards
+from .instrumentation import registry
+from .loadtest import parse_mix
+from . import metrics
+from .moderation import apply_decision, enqueue_job, run_job, run_queued_jobs
+from .pagecache import page_cache_key
+from .roles import role_version_key
+from .routers import PrimaryReplicaRouter, replica_reads
+from . import uploads
+from .models import (
+    Category, Seller, Buyer, Product, Order, OrderItem, CreditTransaction, ProductImport, ChunkedUpload,
+    PODCustomization, ProductImage, ProductReview, SellerDailyStats, SellerProductDailyStats, Transaction,
+    CreditTransactionArchive, OrderArchive, TransactionArchive, ModerationJob, ApprovalAudit
+)
+
+
+def create_seller(username='seller', **kwargs):
+    user = User.objects.create_user(username, password='password')
+    fields = {
+        'business_name': f'{username} Traders', 'owner_name': 'Owner', 'phone': '9876543210',
+        'address': 'Street 1', 'city': 'Pune', 'state': 'Maharashtra', 'pincode': '411001',
+        'gstin': '27AAPFU0939F1ZV', 'turnover': Decimal('10'), 'bank_name': 'Bank',
+        'account_number': '000111', 'ifsc_code': 'BANK0000001', 'account_holder_name': 'Owner',
+        'business_type': 'manufacturer', 'approval_status': 'approved', 'verified': True,
+    }
+    fields.update(kwargs)
+    return Seller.objects.create(user=user, **fields)
+
+
+def create_buyer(username='buyer', **kwargs):
+    user = User.objects.create_user(username, password='password')
+    fields = {
+        'name': 'Buyer', 'address': 'Street 2', 'mobile_number': '9876543211',
+        'gstin': '29AAPFU0939F1ZR', 'approval_status': 'approved', 'verified': True,
+        'credit_balance': Decimal('100000'),
+    }
+    fields.update(kwargs)
+    return Buyer.objects.create(user=user, **fields)
+
+
+def create_product(seller, category, name='Product', **kwargs):
+    fields = {
+        'description': 'Description', 'mrp': Decimal('120'), 'selling_price': Decimal('100'),
+        'stock_quantity': 50, 'approval_status': 'approved', 'is_active': True,
+    }
+    fields.update(kwargs)
+    return Product.objects.create(seller=seller, category=category, name=name, **fields)
+
+
+def log_in(client, profile, user_type):
+    """Log in through the login view, which also stores the role in the session"""
+    client.post(reverse('marketplace:login'), {
+        'username': profile.user.username, 'password': 'password', 'user_type': user_type,
+    })
+
+
+def create_order(buyer, seller, status='pending'):
+    return Order.objects.create(
+        buyer=buyer, seller=seller, subtotal=Decimal('100'), gst_amount=Decimal('18'),
+        total_amount=Decimal('118'), status=status, payment_method='credit', shipping_address='Street 2',
+    )
+
+
+class DashboardQueryTests(TestCase):
+    """Dashboards run a fixed number of queries however many rows they list"""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Textiles')
+        cls.seller = create_seller()
+        cls.buyer = create_buyer()
+        for i in range(12):
+            create_product(cls.seller, category, name=f'Product {i}', stock_quantity=i)
+            create_order(cls.buyer, cls.seller, status='pending' if i % 3 else 'delivered')
+            CreditTransaction.objects.create(
+                buyer=cls.buyer, amount=Decimal('10'), transaction_type='credit',
+                description='Top up', balance_after=Decimal('100000'),
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_seller_dashboard_queries(self):
+        log_in(self.client, self.seller, 'seller')
+        url = reverse('marketplace:seller_dashboard')
+        # session, user joined with profiles, counters, archived counters, products, orders,
+        # archived orders, trend, top products
+        with self.assertNumQueries(9):
+            response = self.client.get(url)
+        self.assertEqual(response.context['total_products'], 12)
+        self.assertEqual(response.context['total_orders'], 12)
+        self.assertEqual(response.context['pending_orders'], 8)
+        self.assertEqual(response.context['out_of_stock'], 1)
+        self.assertEqual(len(response.context['orders']), 10)
+
+        # Cached: session, user
+        with self.assertNumQueries(2):
+            self.client.get(url)
+
+    def test_buyer_dashboard_queries(self):
+        log_in(self.client, self.buyer, 'buyer')
+        url = reverse('marketplace:buyer_dashboard')
+        # session, user joined with profiles, counters, archived counters, orders, archived
+        # orders, credit entries, archived credit entries
+        with self.assertNumQueries(8):
+            response = self.client.get(url)
+        self.assertEqual(response.context['total_orders'], 12)
+        self.assertEqual(response.context['pending_orders'], 8)
+        self.assertEqual(response.context['delivered_orders'], 4)
+        self.assertEqual(response.context['total_spent'], Decimal('1416.00'))
+        self.assertEqual(len(response.context['credit_transactions']), 10)
+
+        with self.assertNumQueries(2):
+            self.client.get(url)
+
+    def test_dashboard_cache_invalidated_by_changes(self):
+        self.client.force_login(self.buyer.user)
+        url = reverse('marketplace:buyer_dashboard')
+        self.client.get(url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            create_order(self.buyer, self.seller)
+        self.assertEqual(self.client.get(url).context['total_orders'], 13)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            CreditTransaction.objects.create(
+                buyer=self.buyer, amount=Decimal('5'), transaction_type='debit',
+                description='Order', balance_after=Decimal('99995'),
+            )
+        self.assertEqual(self.client.get(url).context['credit_transactions'][0].amount, Decimal('5.00'))
+
+        self.client.force_login(self.seller.user)
+        url = reverse('marketplace:seller_dashboard')
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            create_product(self.seller, Category.objects.get(), name='New Product')
+        self.assertEqual(self.client.get(url).context['total_products'], 13)
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'marketplace_test_cache'},
+})
+class SharedCacheTests(TestCase):
+    """Invalidation goes through the configured cache, so every process sharing it sees it"""
+
+    def setUp(self):
+        call_command('createcachetable', stdout=StringIO())
+        # A second connection to the cache, as another worker process has
+        self.other_process = caches.create_connection('default')
+
+    def test_dashboard_invalidated_for_other_processes(self):
+        seller = create_seller()
+        buyer = create_buyer()
+        self.client.force_login(buyer.user)
+        self.client.get(reverse('marketplace:buyer_dashboard'))
+        key = dashboard_cache_key('buyer', buyer.pk)
+        self.assertEqual(self.other_process.get(key)['total_orders'], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            create_order(buyer, seller)
+        self.assertIsNone(self.other_process.get(key))
+        self.assertEqual(self.client.get(reverse('marketplace:buyer_dashboard')).context['total_orders'], 1)
+
+
+class SellerAnalyticsApiTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = create_seller()
+        cls.buyer = create_buyer()
+        cls.product = create_product(cls.seller, Category.objects.create(name='Textiles'), gst_rate=12)
+
+    def setUp(self):
+        cache.clear()
+
+    def place_order(self, quantity):
+        self.client.force_login(self.buyer.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('marketplace:place_order', args=[self.product.pk]), {
+                'quantity': quantity, 'payment_method': 'credit', 'shipping_address': 'Street 2',
+            })
+        log_in(self.client, self.seller, 'seller')
+
+    def test_series_and_breakdowns_come_from_rollups(self):
+        self.place_order(3)
+        url = reverse('marketplace:seller_analytics')
+        # session, user joined with profiles, series, previous period, breakdown, product names
+        with self.assertNumQueries(6):
+            report = self.client.get(url, {'bucket': 'day', 'window': 7}).json()
+        self.assertEqual(len(report['series']), 90)
+        self.assertEqual(report['totals'], {'orders': 1, 'units': 3, 'revenue': 300.0, 'gst': 36.0})
+        self.assertEqual(report['products'][0]['name'], self.product.name)
+        self.assertEqual(report['gst_by_rate'], [{'rate': 12, 'taxable': 300.0, 'gst': 36.0}])
+
+        # New orders bump the seller's stats version
+        self.place_order(1)
+        self.assertEqual(self.client.get(url, {'bucket': 'day', 'window': 7}).json()['totals']['units'], 4)
+
+    def test_invalid_range(self):
+        self.client.force_login(self.seller.user)
+        response = self.client.get(reverse('marketplace:seller_analytics'), {'start': '2025-02-01', 'end': '2025-01-01'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_backfill_keeps_archived_history(self):
+        order = create_order(self.buyer, self.seller, status='delivered')
+        OrderItem.objects.create(order=order, product=self.product, quantity=2, unit_price=Decimal('50'), gst_rate=12)
+        old = timezone.now() - timedelta(days=400)
+        Order.objects.filter(pk=order.pk).update(created_at=old)
+
+        def old_day_totals():
+            stats = SellerDailyStats.objects.filter(day=timezone.localdate(old))
+            return list(stats.values_list('orders', 'units', 'revenue', 'gst'))
+
+        call_command('backfill_seller_stats', '--workers', '1', stdout=StringIO())
+        self.assertEqual(old_day_totals(), [(1, 2, Decimal('100.00'), Decimal('12.00'))])
+        self.assertEqual(archive_history()['orders'], 1)
+        self.assertFalse(Order.objects.exists())
+
+        call_command('backfill_seller_stats', '--workers', '1', stdout=StringIO())
+        self.assertEqual(old_day_totals(), [(1, 2, Decimal('100.00'), Decimal('12.00'))])
+        self.assertEqual(SellerProductDailyStats.objects.get().units, 2)
+
+
+class ArchiveTests(TestCase):
+    """Archiving moves only finished history, and history screens still show it"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = create_seller()
+        cls.buyer = create_buyer()
+        cls.staff = User.objects.create_user('staff', password='password', is_staff=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def backdate(self, *rows, days=400):
+        for row in rows:
+            type(row).objects.filter(pk=row.pk).update(created_at=timezone.now() - timedelta(days=days))
+
+    def create_transaction(self, order=None, status='completed', **kwargs):
+        return Transaction.objects.create(
+            buyer=self.buyer, seller=self.seller, order=order, transaction_type='purchase',
+            amount=Decimal('118'), status=status, **kwargs,
+        )
+
+    def test_dry_run_counts_what_is_moved(self):
+        # Archived together with its transaction in the same run
+        paid = create_order(self.buyer, self.seller, status='delivered')
+        paid_transaction = self.create_transaction(paid)
+        # Kept hot: still open, or referenced by a transaction that stays
+        open_order = create_order(self.buyer, self.seller)
+        refunding = create_order(self.buyer, self.seller, status='cancelled')
+        pending_refund = self.create_transaction(refunding, status='pending')
+        credit = CreditTransaction.objects.create(
+            buyer=self.buyer, amount=Decimal('10'), transaction_type='credit',
+            description='Top up', balance_after=Decimal('100000'),
+        )
+        recent = create_order(self.buyer, self.seller, status='delivered')
+        self.backdate(paid, paid_transaction, open_order, refunding, pending_refund, credit)
+
+        expected = {'transactions': 1, 'credit_transactions': 1, 'orders': 1}
+        self.assertEqual(pending_archive_counts(), expected)
+        self.assertEqual(archive_history(), expected)
+        self.assertEqual(pending_archive_counts(), {label: 0 for label in expected})
+
+        self.assertEqual(set(Order.objects.values_list('pk', flat=True)), {open_order.pk, refunding.pk, recent.pk})
+        self.assertEqual(list(Transaction.objects.values_list('pk', flat=True)), [pending_refund.pk])
+        archived = OrderArchive.objects.get()
+        self.assertEqual(archived.pk, paid.pk)
+        self.assertEqual(TransactionArchive.objects.get().order_id, paid.pk)
+        self.assertEqual(CreditTransactionArchive.objects.get().pk, credit.pk)
+
+    def test_admin_transactions_pages_through_archived_rows(self):
+        transactions = [
+            self.create_transaction(status='failed' if i % 2 else 'completed') for i in range(30)
+        ]
+        self.backdate(*transactions[:20])
+        self.assertEqual(archive_history()['transactions'], 20)
+        self.client.force_login(self.staff)
+        url = reverse('marketplace:admin_transactions')
+
+        response = self.client.get(url)
+        first = [row.pk for row in response.context['transactions']]
+        next_cursor = response.context['page_obj'].next_cursor
+        response = self.client.get(url, {'after': next_cursor})
+        second = [row.pk for row in response.context['transactions']]
+        # Newest first: the ten hot rows, then the archived ones
+        self.assertEqual(first + second, [row.pk for row in reversed(transactions)])
+        self.assertFalse(response.context['page_obj'].has_next)
+        archived = response.context['transactions'][0]
+        self.assertTrue(archived.archived)
+        self.assertEqual(archived.buyer, self.buyer)
+        self.assertEqual(archived.seller, self.seller)
+        self.assertContains(response, 'Archived')
+
+        response = self.client.get(url, {'status': 'failed'})
+        self.assertEqual(
+            [row.pk for row in response.context['transactions']],
+            [row.pk for row in reversed(transactions) if row.status == 'failed'],
+        )
+
+    def test_dashboards_include_archived_orders(self):
+        old = create_order(self.buyer, self.seller, status='delivered')
+        cancelled = create_order(self.buyer, self.seller, status='cancelled')
+        credit = CreditTransaction.objects.create(
+            buyer=self.buyer, amount=Decimal('10'), transaction_type='credit',
+            description='Top up', balance_after=Decimal('100000'),
+        )
+        self.backdate(old, cancelled, credit)
+        create_order(self.buyer, self.seller)
+        archive_history()
+        self.assertEqual(Order.objects.count(), 1)
+
+        log_in(self.client, self.buyer, 'buyer')
+        context = self.client.get(reverse('marketplace:buyer_dashboard')).context
+        self.assertEqual(context['total_orders'], 3)
+        self.assertEqual(context['delivered_orders'], 1)
+        self.assertEqual(context['total_spent'], Decimal('236.00'))
+        self.assertEqual([order.pk for order in context['orders']][1:], [cancelled.pk, old.pk])
+        self.assertEqual(context['credit_transactions'][0].pk, credit.pk)
+
+        log_in(self.client, self.seller, 'seller')
+        context = self.client.get(reverse('marketplace:seller_dashboard')).context
+        self.assertEqual(context['total_orders'], 3)
+        self.assertTrue(context['orders'][-1].archived)
+
+
+class AdminTransactionsPaginationTests(TestCase):
+    """admin_transactions pages with cursors that stay stable when timestamps tie"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('staff', password='password', is_staff=True)
+        cls.seller = create_seller()
+        cls.other_seller = create_seller('other_seller', gstin='29AAPFU0939F1ZR')
+        cls.buyer = create_buyer()
+        cls.other_buyer = create_buyer('other_buyer', gstin='27AAPFU0939F1ZV')
+        types = ['purchase', 'refund', 'credit_add']
+        statuses = ['completed', 'pending', 'failed']
+        transactions = [
+            Transaction.objects.create(
+                buyer=cls.buyer if i % 2 else cls.other_buyer,
+                seller=cls.seller if i % 5 else cls.other_seller,
+                transaction_type=types[i % 3], status=statuses[i // 3 % 3], amount=Decimal(i + 1),
+            )
+            for i in range(60)
+        ]
+        # Three timestamps for 60 rows: pages have to break ties on the id
+        cls.now = timezone.now()
+        cls.days = [[row.pk for row in transactions[start:start + 20]] for start in range(0, 60, 20)]
+        for days, ids in enumerate(cls.days):
+            Transaction.objects.filter(pk__in=ids).update(created_at=cls.now - timedelta(days=days))
+
+    def setUp(self):
+        self.client.force_login(self.staff)
+
+    def get(self, **params):
+        response = self.client.get(reverse('marketplace:admin_transactions'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.context['page_obj']
+
+    def ids(self, page):
+        return [row.pk for row in page]
+
+    def walk(self, **filters):
+        pages = [self.get(**filters)]
+        while pages[-1].has_next:
+            pages.append(self.get(**filters, after=pages[-1].next_cursor))
+        return pages
+
+    def expected(self, **lookups):
+        return list(Transaction.objects.filter(**lookups).order_by('-created_at', '-id').values_list('pk', flat=True))
+
+    def test_pages_cover_tied_timestamps_once(self):
+        pages = self.walk()
+        self.assertEqual([len(page) for page in pages], [25, 25, 10])
+        self.assertEqual([pk for page in pages for pk in self.ids(page)], self.expected())
+        self.assertFalse(pages[0].has_previous)
+        self.assertFalse(pages[-1].has_next)
+
+        # Walking back from the last page gives the same pages
+        for page, previous in zip(pages[1:], pages):
+            self.assertEqual(self.ids(self.get(before=page.previous_cursor)), self.ids(previous))
+
+    def test_cursor_survives_new_rows(self):
+        first = self.get()
+        Transaction.objects.create(
+            buyer=self.buyer, seller=self.seller, transaction_type='purchase', status='completed', amount=Decimal(1),
+        )
+        second = self.get(after=first.next_cursor)
+        self.assertEqual(self.ids(second), self.expected()[26:51])
+
+    def test_filters(self):
+        yesterday = timezone.localdate(self.now - timedelta(days=1))
+        cases = [
+            ({'transaction_type': 'refund'}, {'transaction_type': 'refund'}),
+            ({'status': 'failed'}, {'status': 'failed'}),
+            ({'buyer': self.buyer.pk}, {'buyer': self.buyer}),
+            ({'seller': self.other_seller.pk}, {'seller': self.other_seller}),
+            ({'status': 'pending', 'buyer': self.other_buyer.pk}, {'status': 'pending', 'buyer': self.other_buyer}),
+            ({'date_from': yesterday, 'date_to': yesterday}, {'pk__in': self.days[1]}),
+        ]
+        for params, lookups in cases:
+            with self.subTest(params):
+                pages = self.walk(**params)
+                self.assertEqual([pk for page in pages for pk in self.ids(page)], self.expected(**lookups))
+                self.assertFalse(pages[-1].has_next)
+
+    def test_malformed_cursor_starts_over(self):
+        self.assertEqual(self.ids(self.get(after='not-a-cursor')), self.expected()[:25])
+
+
+class ProductImportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = create_seller()
+        cls.category = Category.objects.create(name='Textiles')
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root, MARKETPLACE_IMPORT_ASYNC=False)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client.force_login(self.seller.user)
+
+    def upload(self, rows):
+        content = 'SKU,Name,Category,Description,MRP,Selling Price,GST Rate,Stock Quantity\n' + '\n'.join(rows)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('marketplace:product_import'), {
+                'file': SimpleUploadedFile('catalog.csv', content.encode(), content_type='text/csv'),
+            })
+        return ProductImport.objects.latest('pk')
+
+    def test_creates_updates_and_reports_errors(self):
+        upload = self.upload([
+            'A-1,Cotton Shirt,textiles,Shirt,500,450,5,10',
+            'A-2,Silk Saree,Textiles,Saree,900,950,5,3',
+            'A-3,Wool Scarf,Knitwear,Scarf,300,250,12,8',
+        ])
+        self.assertEqual(upload.status, 'completed')
+        self.assertEqual((upload.total_rows, upload.created_count, upload.error_count), (3, 1, 2))
+        report = self.client.get(reverse('marketplace:product_import_errors', args=[upload.pk]))
+        report_text = b''.join(report.streaming_content).decode()
+        self.assertIn('3,A-2,Selling price cannot be greater than MRP', report_text)
+        self.assertIn('Unknown category', report_text)
+
+        upload = self.upload(['A-1,Cotton Shirt,Textiles,Shirt,500,400,5,25'])
+        self.assertEqual((upload.created_count, upload.updated_count), (0, 1))
+        product = Product.objects.get(seller=self.seller, sku='A-1')
+        self.assertEqual((product.selling_price, product.stock_quantity), (Decimal('400.00'), 25))
+
+    def test_missing_columns_fail_the_import(self):
+        content = b'name,mrp\nShirt,500\n'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('marketplace:product_import'), {
+                'file': SimpleUploadedFile('catalog.csv', content, content_type='text/csv'),
+            })
+        upload = ProductImport.objects.get()
+        self.assertEqual(upload.status, 'failed')
+        self.assertIn('Missing required columns', upload.error)
+
+
+class BulkCatalogUpdateTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = create_seller()
+        cls.category = Category.objects.create(name='Textiles')
+        cls.other_category = Category.objects.create(name='Leather')
+        for i in range(4):
+            create_product(
+                cls.seller, cls.category if i < 3 else cls.other_category, name=f'Product {i}',
+                sku=f'S-{i}', stock_quantity=10, mrp=Decimal('110'), selling_price=Decimal('100'),
+                tags='cotton,summer' if i % 2 else 'silk',
+            )
+
+    def setUp(self):
+        self.client.force_login(self.seller.user)
+
+    def post(self, name, payload):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse(f'marketplace:{name}'), payload, content_type='application/json')
+        return response.status_code, response.json()
+
+    def test_stock_preview_then_apply(self):
+        items = [{'sku': 'S-0', 'stock': 5}, {'sku': 'S-1', 'stock': 10}, {'sku': 'NOPE', 'stock': 1}]
+        status, result = self.post('bulk_update_stock', {'items': items, 'preview': True})
+        self.assertEqual((status, result['matched'], result['changed'], result['unknown_skus']), (200, 2, 1, ['NOPE']))
+        self.assertEqual(Product.objects.get(sku='S-0').stock_quantity, 10)
+
+        # session, user joined with profiles, SKU lookup, savepoint, one executemany UPDATE, release
+        with self.assertNumQueries(6):
+            status, result = self.post('bulk_update_stock', {'items': items})
+        self.assertEqual(result['updated'], 1)
+        self.assertEqual(Product.objects.get(sku='S-0').stock_quantity, 5)
+
+    def test_price_change_is_clamped_to_mrp(self):
+        payload = {'mode': 'percent', 'value': '20', 'category': self.category.pk}
+        status, result = self.post('bulk_update_prices', {**payload, 'preview': True})
+        self.assertEqual((result['matched'], result['clamped']), (3, 3))
+        self.assertEqual(Decimal(result['sample'][0]['new_price']), Decimal('110'))
+
+        status, result = self.post('bulk_update_prices', {'mode': 'absolute', 'value': '-15.50', 'tag': 'cotton'})
+        self.assertEqual(result['updated'], 2)
+        self.assertEqual(
+            sorted(Product.objects.values_list('sku', 'selling_price')),
+            [('S-0', Decimal('100.00')), ('S-1', Decimal('84.50')), ('S-2', Decimal('100.00')), ('S-3', Decimal('84.50'))],
+        )
+
+    def test_toggle_active_and_validation(self):
+        status, result = self.post('bulk_update_active', {'active': False, 'skus': ['S-0', 'S-1']})
+        self.assertEqual((status, result['updated']), (200, 2))
+        self.assertEqual(Product.objects.filter(is_active=False).count(), 2)
+
+        status, result = self.post('bulk_update_active', {'skus': ['S-0']})
+        self.assertEqual(status, 400)
+        status, result = self.post('bulk_update_prices', {'mode': 'percent', 'value': '0'})
+        self.assertEqual(status, 400)
+
+    def test_rejected_products_stay_hidden(self):
+        Product.objects.filter(sku='S-0').update(approval_status='rejected', is_active=False)
+        Product.objects.filter(sku='S-1').update(approval_status='pending', is_active=False)
+        Product.objects.filter(sku='S-2').update(is_active=False)
+
+        status, result = self.post('bulk_update_active', {'active': True, 'skus': ['S-0', 'S-1', 'S-2']})
+        self.assertEqual((status, result['changed'], result['not_approved'], result['updated']), (200, 1, 2, 1))
+        self.assertEqual(
+            sorted(Product.objects.filter(is_active=True).values_list('sku', flat=True)), ['S-2', 'S-3'],
+        )
+
+
+class GstinVerificationTests(TestCase):
+    """GSTINs are checked for format, state code and check digit"""
+
+    def test_check_gstin(self):
+        self.assertEqual(check_gstin('27AAPFU0939F1ZV'), 'valid')
+        self.assertEqual(check_gstin('27AAPFU0939F1ZX'), 'invalid_checksum')
+        self.assertEqual(check_gstin('45AAPFU0939F1ZV'), 'invalid_state')
+        self.assertEqual(check_gstin('27AAPFU0939F1Z'), 'invalid_format')
+        self.assertEqual(pan_from_gstin('27AAPFU0939F1ZV'), 'AAPFU0939F')
+        self.assertEqual(state_from_gstin('27AAPFU0939F1ZV'), 'Maharashtra')
+
+    def test_registration_rejects_bad_check_digit(self):
+        form = BuyerRegistrationForm({'gstin': '27aapfu0939f1zx'})
+        form.is_valid()
+        self.assertEqual(form.errors.as_data()['gstin'][0].code, 'invalid_checksum')
+
+    def test_command_records_status(self):
+        seller = create_seller()
+        buyer = create_buyer(gstin='29AAPFU0939F1ZV')
+        for workers in ('1', '2'):
+            Seller.objects.update(gstin_status='unverified')
+            Buyer.objects.update(gstin_status='unverified')
+            call_command('verify_gstins', '--workers', workers, '--chunk-size', '1', stdout=StringIO())
+            seller.refresh_from_db()
+            buyer.refresh_from_db()
+            self.assertEqual(seller.gstin_status, 'valid')
+            self.assertEqual(buyer.gstin_status, 'invalid_checksum')
+
+
+class AdminChangelistTests(TestCase):
+    """
+    Identifier searches use a prefix match without hiding the other search
+    fields, and changelists run the same queries however many rows they show
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', password='password')
+        cls.buyer = create_buyer(mobile_number='9123456780')
+        cls.other = create_buyer('other', name='Ordway Stores', gstin='27AAPFU0939F1ZV')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def search(self, model, term):
+        response = self.client.get(reverse(f'admin:marketplace_{model}_changelist'), {'q': term})
+        return list(response.context['cl'].result_list)
+
+    def test_buyer_mobile_number_search(self):
+        self.assertEqual(self.search('buyer', '91234'), [self.buyer])
+
+    def test_gstin_prefix_search(self):
+        self.assertEqual(self.search('buyer', '27aapfu'), [self.other])
+        self.assertEqual(self.search('buyer', '29AAPFU0939F1ZR'), [self.buyer])
+
+    def test_audit_changelist_queries_do_not_grow_with_rows(self):
+        url = reverse('admin:marketplace_approvalaudit_changelist')
+        seller = create_seller()
+        apply_decision('seller', 'approve', [seller.pk], actor=self.admin)
+
+        def queries():
+            with CaptureQueriesContext(connection) as captured:
+                self.assertEqual(self.client.get(url).status_code, 200)
+            return len(captured)
+
+        few = queries()
+        for _ in range(5):
+            job = ModerationJob.objects.create(target='seller', action='approve', object_ids=[seller.pk], total=1)
+            apply_decision('seller', 'approve', [seller.pk], actor=self.admin, job=job)
+        self.assertEqual(queries(), few)
+
+    def test_names_are_not_taken_for_identifiers(self):
+        seller = create_seller()
+        order = create_order(self.other, seller)
+        self.assertEqual(self.search('order', 'ordway'), [order])
+        self.assertEqual(self.search('order', order.order_number), [order])
+
+
+@override_settings(MARKETPLACE_MODERATION_ASYNC=False, MARKETPLACE_MODERATION_CHUNK_SIZE=2)
+class ModerationJobTests(TestCase):
+    """Bulk moderation jobs are processed in chunks by the worker, with an audit row per decision"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('staff', password='password', is_staff=True)
+        seller = create_seller()
+        category = Category.objects.create(name='Textiles')
+        cls.products = [
+            create_product(seller, category, name=f'Product {i}', approval_status='pending', is_active=False)
+            for i in range(5)
+        ]
+
+    def enqueue(self, action='approve', reason=''):
+        with self.captureOnCommitCallbacks(execute=True):
+            return enqueue_job('product', action, [product.pk for product in self.products], self.staff, reason)
+
+    def test_worker_runs_queued_jobs(self):
+        job = self.enqueue('reject', 'Blurry photos')
+        # Left for the worker when ASYNC is off
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.processed), ('queued', 0))
+
+        call_command('process_moderation_jobs', stdout=StringIO())
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.processed, job.total), ('completed', 5, 5))
+        self.assertEqual(
+            set(Product.objects.values_list('approval_status', 'is_active', 'rejection_reason')),
+            {('rejected', False, 'Blurry photos')},
+        )
+        self.assertEqual(
+            sorted(job.audits.values_list('object_id', 'action', 'actor', 'reason')),
+            [(product.pk, 'reject', self.staff.pk, 'Blurry photos') for product in self.products],
+        )
+
+    def test_stale_running_jobs_resume(self):
+        job = self.enqueue()
+        # A worker died after the first chunk
+        apply_decision('product', 'approve', job.object_ids[:2], actor=self.staff, job=job)
+        ModerationJob.objects.filter(pk=job.pk).update(
+            status='running', processed=2, started_at=timezone.now() - timedelta(hours=2),
+        )
+        running = self.enqueue()
+        ModerationJob.objects.filter(pk=running.pk).update(status='running', started_at=timezone.now())
+
+        with self.assertLogs('marketplace.moderation', 'WARNING'):
+            self.assertEqual(run_queued_jobs(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.processed), ('completed', 5))
+        self.assertEqual(job.audits.count(), 5)
+        self.assertFalse(Product.objects.filter(is_active=False).exists())
+        # A job that is still making progress is left to its worker
+        self.assertEqual(ModerationJob.objects.get(pk=running.pk).status, 'running')
+
+    def test_failed_job_keeps_completed_chunks(self):
+        job = self.enqueue()
+        ModerationJob.objects.filter(pk=job.pk).update(target='unknown')
+        with self.assertRaises(KeyError), self.assertLogs('marketplace.moderation', 'ERROR'):
+            run_job(job.pk)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.processed), ('failed', 0))
+        self.assertTrue(job.error)
+        self.assertFalse(ApprovalAudit.objects.exists())
+
+
+class ChunkedUploadTests(TestCase):
+    content = b'%PDF-scanned-purchase-order'
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.buyer = create_buyer()
+        self.client.force_login(self.buyer.user)
+
+    def start(self):
+        response = self.client.post(reverse('marketplace:upload_start'), {
+            'purpose': 'po_document', 'filename': 'po.pdf', 'size': len(self.content),
+        })
+        self.assertEqual(response.status_code, 201)
+        return response.json()
+
+    def send(self, state, offset, data, checksum=None):
+        return self.client.post(
+            state['chunk_url'], {'chunk': SimpleUploadedFile('po.pdf', data)},
+            headers={'Upload-Offset': str(offset), 'Upload-Checksum': checksum or hashlib.sha256(data).hexdigest()},
+        )
+
+    def test_upload_resumes_and_completes(self):
+        state = self.start()
+        self.assertEqual(self.send(state, 0, self.content[:10]).json()['offset'], 10)
+
+        # A retried or stale chunk is refused with the offset to resume from
+        response = self.send(state, 0, self.content[:10])
+        self.assertEqual((response.status_code, response.json()['offset']), (409, 10))
+        response = self.send(state, 10, self.content[10:20], checksum='0' * 64)
+        self.assertEqual(response.status_code, 422)
+
+        self.assertEqual(self.client.get(state['status_url']).json()['offset'], 10)
+        response = self.send(state, 10, self.content[10:])
+        self.assertEqual(response.json()['status'], 'complete')
+        self.assertEqual(response.json()['sha256'], hashlib.sha256(self.content).hexdigest())
+
+        upload = ChunkedUpload.objects.get()
+        with upload.file.open('rb') as handle:
+            self.assertEqual(handle.read(), self.content)
+
+        form = OrderForm({
+            'payment_method': 'credit', 'shipping_address': 'Street 2', 'po_document_token': upload.token,
+        }, upload_user=self.buyer.user)
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.cleaned_data['po_document'], upload.file.name)
+
+    def test_rejects_oversized_chunk_and_other_users(self):
+        state = self.start()
+        response = self.send(state, 0, self.content + b'extra')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(ChunkedUpload.objects.get().offset, 0)
+
+        self.client.force_login(create_seller().user)
+        self.assertEqual(self.client.get(state['status_url']).status_code, 404)
+
+    def test_csrf_is_checked_before_the_chunk_is_written(self):
+        self.client = Client(enforce_csrf_checks=True)
+        self.client.force_login(self.buyer.user)
+        self.client.cookies['csrftoken'] = 'a' * 32
+        state = self.client.post(reverse('marketplace:upload_start'), {
+            'purpose': 'po_document', 'filename': 'po.pdf', 'size': len(self.content),
+        }, headers={'X-CSRFToken': 'a' * 32}).json()
+
+        # A token in the form body would only be seen after the chunk is written
+        response = self.client.post(
+            state['chunk_url'], {'chunk': SimpleUploadedFile('po.pdf', self.content), 'csrfmiddlewaretoken': 'a' * 32},
+            headers={'Upload-Offset': '0'},
+        )
+        self.assertEqual(response.status_code, 403)
+        upload = ChunkedUpload.objects.get()
+        self.assertEqual(upload.offset, 0)
+        with upload.file.open('rb') as handle:
+            self.assertNotIn(self.content, handle.read())
+
+        response = self.client.post(
+            state['chunk_url'], {'chunk': SimpleUploadedFile('po.pdf', self.content)},
+            headers={'Upload-Offset': '0', 'X-CSRFToken': 'a' * 32},
+        )
+        self.assertEqual(response.json()['status'], 'complete')
+
+
+class RoleTests(TestCase):
+    """The user's role is loaded with the user and kept in the session"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = create_seller()
+        cls.buyer = create_buyer()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_role_views_and_session_invalidation(self):
+        log_in(self.client, self.seller, 'seller')
+        self.assertEqual(self.client.session['marketplace_role']['name'], 'seller')
+        response = self.client.get(reverse('marketplace:home'))
+        self.assertTrue(response.context['role'].is_seller)
+        self.assertEqual(self.client.get(reverse('marketplace:buyer_dashboard')).status_code, 302)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            apply_decision('seller', 'reject', [self.seller.pk])
+        response = self.client.get(reverse('marketplace:home'))
+        self.assertEqual(response.context['role'].approval_status, 'rejected')
+
+    def test_json_views_refuse_other_roles(self):
+        log_in(self.client, self.buyer, 'buyer')
+        response = self.client.get(reverse('marketplace:seller_analytics'))
+        self.assertEqual(response.status_code, 403)
+
+
+@override_settings(MARKETPLACE_READ_REPLICAS=['replica_1'])
+class ReplicaRoutingTests(SimpleTestCase):
+    """Only catalog reads of GET requests that have not written go to a replica"""
+
+    def test_router(self):
+        router = PrimaryReplicaRouter()
+        self.assertEqual(router.db_for_read(Product), 'default')
+        with replica_reads():
+            self.assertEqual(router.db_for_read(Product), 'replica_1')
+            self.assertEqual(router.db_for_read(Order), 'default')
+            self.assertEqual(router.db_for_write(Product), 'default')
+            self.assertEqual(router.db_for_read(Product), 'default')
+        with replica_reads(enabled=False):
+            self.assertEqual(router.db_for_read(Category), 'default')
+        self.assertIs(router.allow_migrate('replica_1', 'marketplace'), False)
+
+    def test_unsafe_requests_pin_the_client_to_the_primary(self):
+        response = self.client.post(reverse('marketplace:logout'))
+        self.assertIn('mkt_primary', response.cookies)
+
+
+class DatabaseSettingsTests(SimpleTestCase):
+    """power_app.settings builds DATABASES and CACHES from the DB_* and CACHE_* environment variables"""
+
+    def load_settings(self, **environ):
+        environ = {
+            name: value for name, value in os.environ.items() if not name.startswith(('DB_', 'CACHE_'))
+        } | environ
+        with mock.patch.dict(os.environ, environ, clear=True):
+            return runpy.run_path(os.path.join(settings.BASE_DIR, 'power_app', 'settings.py'))
+
+    def test_sqlite_pragmas_apply_to_new_connections(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        databases = self.load_settings(
+            DB_NAME=os.path.join(directory, 'check.sqlite3'), DB_BUSY_TIMEOUT_MS='1500', DB_CONN_MAX_AGE='30',
+        )['DATABASES']
+        self.assertEqual(databases['default']['CONN_MAX_AGE'], 30)
+
+        # Under an alias of its own, apart from the test database
+        handler = ConnectionHandler({'default': databases['default'], 'settings_check': databases['default']})
+        new_connection = handler['settings_check']
+        self.addCleanup(new_connection.close)
+        with new_connection.cursor() as cursor:
+            pragmas = {}
+            for name in ('journal_mode', 'synchronous', 'busy_timeout', 'cache_size', 'mmap_size', 'temp_store'):
+                cursor.execute(f'PRAGMA {name}')
+                pragmas[name] = cursor.fetchone()[0]
+        self.assertEqual(pragmas, {
+            # synchronous=NORMAL is 1, temp_store=MEMORY is 2
+            'journal_mode': 'wal', 'synchronous': 1, 'busy_timeout': 1500, 'cache_size': -64000,
+            'mmap_size': 256 * 1024 * 1024, 'temp_store': 2,
+        })
+        self.assertEqual(new_connection.transaction_mode, 'IMMEDIATE')
+
+    def test_postgres_connections_persist_or_pool(self):
+        database = self.load_settings(DB_ENGINE='postgres', DB_HOST='db', DB_CONN_MAX_AGE='60')['DATABASES']['default']
+        self.assertEqual(database['ENGINE'], 'marketplace.backends.postgresql')
+        self.assertEqual((database['HOST'], database['CONN_MAX_AGE'], database['CONN_HEALTH_CHECKS']), ('db', 60, True))
+        self.assertNotIn('pool', database['OPTIONS'])
+
+        database = self.load_settings(DB_ENGINE='postgres', DB_POOL_MAX_SIZE='8')['DATABASES']['default']
+        self.assertEqual(database['CONN_MAX_AGE'], 0)
+        self.assertEqual(database['OPTIONS']['pool'], {'min_size': 2, 'max_size': 8, 'timeout': 10})
+
+    def test_cache_from_environment(self):
+        cache_settings = self.load_settings()['CACHES']['default']
+        self.assertEqual(cache_settings['BACKEND'], 'django.core.cache.backends.locmem.LocMemCache')
+
+        cache_settings = self.load_settings(
+            CACHE_BACKEND='redis', CACHE_LOCATION='redis://cache:6379/2', CACHE_KEY_PREFIX='power',
+        )['CACHES']['default']
+        self.assertEqual(cache_settings, {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://cache:6379/2',
+            'KEY_PREFIX': 'power',
+        })
+
+    def test_replicas_from_environment(self):
+        loaded = self.load_settings(DB_REPLICAS='replica1.sqlite3, replica2.sqlite3')
+        databases = loaded['DATABASES']
+        self.assertEqual(loaded['MARKETPLACE_READ_REPLICAS'], ['replica_1', 'replica_2'])
+        self.assertEqual(databases['replica_2']['NAME'], 'replica2.sqlite3')
+        self.assertEqual(databases['replica_1']['TEST'], {'MIRROR': 'default'})
+        self.assertEqual(databases['replica_1']['OPTIONS'], databases['default']['OPTIONS'])
+        self.assertIsNot(databases['replica_1']['OPTIONS'], databases['default']['OPTIONS'])
+
+
+class CatalogViewTests(TestCase):
+    """The async catalog views share their filtering and run under either handler"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = create_seller()
+        cls.tools = Category.objects.create(name='Tools')
+        cls.paper = Category.objects.create(name='Paper')
+        cls.drill = create_product(cls.seller, cls.tools, 'Drill', selling_price=Decimal('900'))
+        cls.hammer = create_product(cls.seller, cls.tools, 'Hammer', selling_price=Decimal('300'))
+        cls.notebook = create_product(cls.seller, cls.paper, 'Notebook', selling_price=Decimal('50'))
+        create_product(cls.seller, cls.paper, 'Hidden Pad', is_active=False)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_home_filters_and_sorts(self):
+        response = self.client.get(reverse('marketplace:home'), {
+            'category': self.tools.pk, 'min_price': 'abc', 'sort': 'price_low', 'page': '7',
+        })
+        self.assertEqual(list(response.context['products']), [self.hammer, self.drill])
+        self.assertEqual(response.context['page_obj'].number, 1)
+        self.assertEqual(response.context['price_range']['max_price'], Decimal('900'))
+        self.assertEqual(response.context['business_types'], ['manufacturer'])
+
+    def test_product_detail(self):
+        response = self.client.get(reverse('marketplace:product_detail', args=[self.drill.pk]))
+        self.assertEqual(response.context['related_products'], [self.hammer])
+        self.assertIsNone(response.context['avg_rating'])
+        self.assertEqual(self.client.get(reverse('marketplace:product_detail', args=[9999])).status_code, 404)
+
+    async def test_json_endpoints_under_the_async_handler(self):
+        response = await self.async_client.get(reverse('marketplace:ajax_filter'), {'max_price': '500'})
+        data = response.json()
+        self.assertEqual(data['total_products'], 2)
+        self.assertEqual([product['name'] for product in data['products']], ['Notebook', 'Hammer'])
+
+        response = await self.async_client.get(reverse('marketplace:autocomplete'), {'q': 'no'})
+        self.assertEqual([product['name'] for product in response.json()['products']], ['Notebook'])
+        response = await self.async_client.get(reverse('marketplace:autocomplete'), {'q': 'h'})
+        self.assertEqual(response.json()['products'], [])
+
+
+class PageCacheTests(TestCase):
+    """Anonymous catalog pages are cached per catalog version and revalidated by one request"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = create_seller()
+        cls.category = Category.objects.create(name='Tools')
+        cls.product = create_product(cls.seller, cls.category, 'Drill')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_hits_conditional_gets_and_invalidation(self):
+        url = reverse('marketplace:home')
+        response = self.client.get(url, {'sort': 'name', 'search': ''})
+        self.assertEqual(response['X-Page-Cache'], 'MISS')
+        etag = response['ETag']
+
+        response = self.client.get(url + '?sort=name')
+        self.assertEqual(response['X-Page-Cache'], 'HIT')
+        self.assertContains(response, 'Drill')
+        self.assertEqual(self.client.get(url + '?sort=name', headers={'If-None-Match': etag}).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.name = 'Hammer Drill'
+            self.product.save()
+        response = self.client.get(url + '?sort=name')
+        self.assertEqual(response['X-Page-Cache'], 'MISS')
+        self.assertContains(response, 'Hammer Drill')
+
+    def test_stale_copy_served_while_another_request_renders(self):
+        url = reverse('marketplace:category_products', args=[self.category.pk])
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.save()
+        request = RequestFactory().get(url)
+        cache.add(f'{page_cache_key(request)}:lock', 1)
+        self.assertEqual(self.client.get(url)['X-Page-Cache'], 'STALE')
+
+    def test_first_render_does_not_wait_for_the_lock(self):
+        url = reverse('marketplace:category_products', args=[self.category.pk])
+        key = page_cache_key(RequestFactory().get(url))
+        cache.add(f'{key}:lock', 1)
+        response = self.client.get(url)
+        # Rendered without caching; storing it is left to the lock holder
+        self.assertContains(response, 'Drill')
+        self.assertNotIn('X-Page-Cache', response)
+        self.assertIsNone(cache.get(key))
+
+    def test_evicted_catalog_version_is_not_reused(self):
+        url = reverse('marketplace:home')
+        self.client.get(url)
+        bump_catalog_version()
+        self.assertEqual(self.client.get(url)['X-Page-Cache'], 'MISS')
+        cache.delete(CATALOG_VERSION_KEY)
+        bump_catalog_version()
+        self.assertEqual(self.client.get(url)['X-Page-Cache'], 'MISS')
+
+    def test_logged_in_users_bypass_the_cache(self):
+        log_in(self.client, create_buyer(), 'buyer')
+        response = self.client.get(reverse('marketplace:product_detail', args=[self.product.pk]))
+        self.assertNotIn('X-Page-Cache', response)
+
+
+class FragmentCacheTests(TestCase):
+    """Product cards are cached per product and updated_at, which related changes move"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = create_seller()
+        cls.category = Category.objects.create(name='Tools')
+        cls.product = create_product(cls.seller, cls.category, 'Drill', is_customizable=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def cards(self):
+        return render_product_cards(Product.objects.filter(pk=self.product.pk).select_related('seller'))
+
+    def test_cards_are_cached_until_the_product_is_touched(self):
+        self.assertIn('Drill', self.cards()[0])
+        products = list(Product.objects.filter(pk=self.product.pk).select_related('seller'))
+        with self.assertNumQueries(0):
+            self.assertIn('Drill', render_product_cards(products)[0])
+
+        Product.objects.filter(pk=self.product.pk).update(name='Hammer Drill')
+        self.assertNotIn('Hammer Drill', self.cards()[0])
+        PODCustomization.objects.create(product=self.product, customization_type='text', name='Engraving')
+        self.assertIn('Hammer Drill', self.cards()[0])
+
+    def test_seller_rename_refreshes_cards(self):
+        self.cards()
+        seller = Seller.objects.get(pk=self.seller.pk)
+        seller.business_name = 'Renamed Traders'
+        seller.save()
+        self.assertIn('Renamed Traders', self.cards()[0])
+
+
+class StaticFilesTests(SimpleTestCase):
+    """collectstatic writes hashed, precompressed assets that the middleware serves with long caching"""
+
+    def setUp(self):
+        static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, static_root)
+        settings_override = override_settings(STATIC_ROOT=static_root, MARKETPLACE_SERVE_STATIC=True)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+        self.middleware = StaticFilesMiddleware(lambda request: HttpResponse('view'))
+
+    def test_hashed_assets_are_immutable_and_compressed(self):
+        url = static('js/marketplace.js')
+        self.assertRegex(url, r'^/static/js/marketplace\.[0-9a-f]{12}\.js$')
+
+        response = self.middleware(RequestFactory().get(url, headers={'Accept-Encoding': 'gzip, br'}))
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertIn(b'initChunkedUploads', gzip.decompress(response.content))
+
+        revalidation = RequestFactory().get(
+            url, headers={'Accept-Encoding': 'gzip', 'If-None-Match': response['ETag']}
+        )
+        self.assertEqual(self.middleware(revalidation).status_code, 304)
+
+        plain = self.middleware(RequestFactory().get('/static/js/marketplace.js'))
+        self.assertNotIn('Content-Encoding', plain)
+        self.assertEqual(plain['Cache-Control'], 'public, max-age=60')
+        self.assertEqual(self.middleware(RequestFactory().get('/static/missing.js')).content, b'view')
+
+
+class InstrumentationTests(TestCase):
+    """Requests are recorded per URL name and reported to staff"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Tools')
+        create_product(create_seller(), cls.category, 'Drill')
+        cls.staff = User.objects.create_user('staff', password='password', is_staff=True)
+
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+
+    def test_views_are_recorded_and_reported(self):
+        url = reverse('marketplace:category_products', args=[self.category.pk])
+        with self.assertLogs('marketplace.instrumentation', 'WARNING') as logs:
+            with override_settings(MARKETPLACE_INSTRUMENTATION_QUERY_THRESHOLD=1):
+                self.client.get(url)
+        self.assertIn(f'GET {url} issued', logs.output[0])
+        self.client.get(url)
+
+        stats = {view['name']: view for view in registry.report()}['marketplace:category_products']
+        self.assertEqual(stats['requests'], 2)
+        self.assertGreater(stats['queries_max'], 1)
+        self.assertGreater(stats['template_ms_avg'], 0)
+        self.assertTrue(stats['slowest'])
+
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('marketplace:admin_performance'))
+        self.assertContains(response, 'marketplace:category_products')
+
+    def test_report_is_staff_only(self):
+        response = self.client.get(reverse('marketplace:admin_performance'))
+        self.assertEqual(response.status_code, 302)
+
+
+class MetricsTests(TestCase):
+    """Metrics are shared through per-process files and exported in the Prometheus format"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        settings_override = override_settings(MARKETPLACE_METRICS_DIR=self.directory, MARKETPLACE_METRICS_TOKEN='token')
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        metrics.reset_store()
+        self.addCleanup(metrics.reset_store)
+
+    def test_processes_are_added_up(self):
+        registry = metrics.Registry()
+        orders = metrics.Counter('test_orders_total', 'Orders', ['method'], registry=registry)
+        in_progress = metrics.Gauge('test_in_progress', 'In progress', registry=registry)
+        latency = metrics.Histogram('test_seconds', 'Latency', buckets=[0.1, 1], registry=registry)
+        orders.inc(method='credit')
+        in_progress.set(2)
+        latency.observe(0.05)
+        latency.observe(0.5)
+
+        # Files left by another worker, which has since exited; its gauges no longer count
+        other = metrics.MmapValues(os.path.join(self.directory, 'counter_4194305.db'))
+        for i in range(2000):
+            # Enough keys to grow the file past its initial size
+            other.add(orders.key('', [f'method-{i}']), 1)
+        other.add(orders.key('', ['credit']), 2)
+        other.close()
+        other_gauges = metrics.MmapValues(os.path.join(self.directory, 'gauge_4194305.db'))
+        other_gauges.set(in_progress.key('', []), 5)
+        other_gauges.close()
+
+        lines = registry.render().splitlines()
+        self.assertIn('# TYPE test_orders_total counter', lines)
+        self.assertIn('test_orders_total{method="credit"} 3.0', lines)
+        self.assertIn('test_orders_total{method="method-1999"} 1.0', lines)
+        self.assertIn('test_in_progress 2.0', lines)
+        self.assertIn('test_seconds_bucket{le="0.1"} 1.0', lines)
+        self.assertIn('test_seconds_bucket{le="+Inf"} 2.0', lines)
+        self.assertIn('test_seconds_count 2.0', lines)
+
+    def test_endpoint_requires_the_token(self):
+        seller = create_seller(approval_status='pending', verified=False)
+        with self.captureOnCommitCallbacks(execute=True):
+            apply_decision('seller', 'approve', [seller.pk])
+
+        self.assertEqual(self.client.get(reverse('marketplace:metrics')).status_code, 401)
+        response = self.client.get(reverse('marketplace:metrics'), headers={'Authorization': 'Bearer token'})
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+        self.assertContains(response, 'marketplace_approval_decisions_total{target="seller",action="approve"} 1.0')
+
+
+def unique_gstin(number, state_code='27'):
+    first_14 = f'{state_code}AAAAA{number:04d}A1Z'
+    return first_14 + check_digit(first_14)
+
+
+# Seeding creates dozens of users; hashing their passwords properly takes seconds
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ViewQueryBudgetTests(TestCase):
+    """
+    Every URL runs a fixed number of queries, with cold caches, whether its
+    lists have one row or more than a page of them. With
+    MARKETPLACE_TIMING_TESTS=1 in the environment, the hot paths also have
+    to stay within a (generous) time budget; wall-clock limits fail on slow
+    or busy machines, so they are left out of normal runs.
+    """
+    # Queries per request, by the labels in ``cases``. Logged-in requests
+    # start with the session and the user joined with its profiles.
+    BUDGETS = {
+        # count, page, categories, price range, business types, locations, card images
+        'home': 7,
+        # product, reviews, rating, related products, images, related card images
+        'product_detail': 6,
+        # seller or category, count, page, card images
+        'seller_products': 4,
+        'category_products': 4,
+        'ajax_filter': 2,
+        # products, categories, sellers
+        'autocomplete': 3,
+        'login': 0,
+        'seller_register': 0,
+        'buyer_register': 0,
+        'upload_start': 1,
+        'upload_status': 1,
+        # upload, savepoint, offset update, release, upload re-read after the update
+        'upload_chunk': 5,
+        # counters, archived counters, products, orders, archived orders, trend, top products
+        'seller_dashboard': 9,
+        'seller_analytics': 6,
+        # categories for the select
+        'add_product': 3,
+        # category lookup and check, insert
+        'add_product_post': 5,
+        'product_import': 3,
+        'product_import_errors': 3,
+        # current stock of the SKUs, then one executemany in a savepoint
+        'bulk_update_stock': 6,
+        # counts, preview rows
+        'bulk_update_prices': 4,
+        # matched and changed counts, one UPDATE in a savepoint
+        'bulk_update_active': 6,
+        'buyer_dashboard': 8,
+        'add_credit': 2,
+        'add_credit_post': 4,
+        'place_order': 3,
+        # product; in a savepoint: buyer and product locked, order, item, sales
+        # stats check and two updates, balance, credit entry, order, payment, stock
+        'place_order_post': 17,
+        # hot and archived pages
+        'admin_transactions': 4,
+        'admin_approve_seller': 3,
+        'admin_approve_buyer': 3,
+        'admin_approve_product': 3,
+        # product; in a savepoint: update, audit rows, sellers to refresh
+        'admin_approve_product_post': 8,
+        # page, images, customizations, three pending counts
+        'moderation_queue': 8,
+        'moderation_queue_post': 10,
+        'admin_performance': 2,
+        'metrics': 2,
+        # session, user, session again and its deletion
+        'logout': 4,
+    }
+    # Median milliseconds allowed on the hot paths, cold caches
+    HOT_PATH_MS = {
+        'home': 250, 'product_detail': 250, 'category_products': 200, 'ajax_filter': 100, 'autocomplete': 60,
+        'place_order_post': 200,
+    }
+    ROUNDS = 5
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Tools')
+        cls.seller = create_seller()
+        cls.buyer = create_buyer()
+        cls.staff = User.objects.create_user('staff', password='password', is_staff=True)
+        cls.seeded = 0
+        cls.seed(2)
+
+    @classmethod
+    def seed(cls, count):
+        """Add ``count`` products, orders, payments, reviews and pending sellers, buyers and products"""
+        start, cls.seeded = cls.seeded, cls.seeded + count
+        products = [
+            create_product(
+                cls.seller, cls.category, f'Product {i}', sku=f'SKU-{i}', tags='steel,hand tool',
+                is_customizable=i % 2 == 0,
+            )
+            for i in range(start, cls.seeded)
+        ]
+        # Rows only: saving a ProductImage would open the (absent) file to resize it
+        ProductImage.objects.bulk_create([
+            ProductImage(product=product, image=f'products/{product.pk}.jpg', is_primary=True) for product in products
+        ])
+        PODCustomization.objects.bulk_create([
+            PODCustomization(product=product, customization_type='text', name='Engraving') for product in products
+        ])
+        ProductReview.objects.bulk_create([
+            ProductReview(product=product, user=cls.buyer.user, rating=4, comment='Good') for product in products
+        ])
+        for product in products:
+            order = create_order(cls.buyer, cls.seller, status='delivered')
+            OrderItem.objects.create(
+                order=order, product=product, quantity=1, unit_price=Decimal('100'), gst_rate=18,
+                total_price=Decimal('100'),
+            )
+            Transaction.objects.create(
+                buyer=cls.buyer, seller=cls.seller, order=order, transaction_type='purchase',
+                amount=Decimal('118'), status='completed', description='Purchase',
+            )
+            CreditTransaction.objects.create(
+                buyer=cls.buyer, amount=Decimal('118'), transaction_type='debit',
+                description='Purchase', balance_after=Decimal('100000'),
+            )
+        for i in range(start, cls.seeded):
+            create_seller(f'pending_seller_{i}', gstin=unique_gstin(i), approval_status='pending', verified=False)
+            create_buyer(f'pending_buyer_{i}', gstin=unique_gstin(i, '29'), approval_status='pending', verified=False)
+            create_product(cls.seller, cls.category, f'Pending {i}', approval_status='pending', is_active=False)
+
+    def setUp(self):
+        cache.clear()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root, MARKETPLACE_METRICS_TOKEN='')
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.clients = {name: Client() for name in ('anonymous', 'seller', 'buyer', 'staff', 'leaving')}
+        log_in(self.clients['seller'], self.seller, 'seller')
+        log_in(self.clients['buyer'], self.buyer, 'buyer')
+        self.clients['staff'].force_login(self.staff)
+        # The first request after logging in refreshes the role kept in the session
+        for client, url_name in [
+            ('seller', 'seller_dashboard'), ('buyer', 'buyer_dashboard'), ('staff', 'admin_performance'),
+        ]:
+            self.clients[client].get(reverse(f'marketplace:{url_name}'))
+        self.product_import = ProductImport.objects.create(
+            seller=self.seller, file='product_imports/catalog.csv', status='completed', error_count=1,
+        )
+        self.product_import.error_report.save('errors.csv', ContentFile(b'row,sku,error\n2,X,Unknown category\n'))
+
+    def cases(self):
+        """(label, client, method, url, data, extra request arguments) for every URL"""
+        product = Product.objects.filter(is_active=True).latest('pk')
+        pending_seller = Seller.objects.filter(approval_status='pending').latest('pk')
+        pending_buyer = Buyer.objects.filter(approval_status='pending').latest('pk')
+        pending_product = Product.objects.filter(approval_status='pending').latest('pk')
+        upload = uploads.start_upload('po_document', 'po.pdf', 4)
+        skus = list(Product.objects.filter(seller=self.seller).exclude(sku='').values_list('sku', flat=True))
+        url = reverse
+        json_post = {'content_type': 'application/json'}
+        return [
+            ('home', 'anonymous', 'get', url('marketplace:home'), {'search': 'Product', 'sort': 'price_low'}, {}),
+            ('product_detail', 'anonymous', 'get', url('marketplace:product_detail', args=[product.pk]), {}, {}),
+            ('seller_products', 'anonymous', 'get', url('marketplace:seller_products', args=[self.seller.pk]), {}, {}),
+            ('category_products', 'anonymous', 'get',
+             url('marketplace:category_products', args=[self.category.pk]), {}, {}),
+            ('ajax_filter', 'anonymous', 'get', url('marketplace:ajax_filter'), {'category': self.category.pk}, {}),
+            ('autocomplete', 'anonymous', 'get', url('marketplace:autocomplete'), {'q': 'Pr'}, {}),
+            ('login', 'anonymous', 'get', url('marketplace:login'), {}, {}),
+            ('seller_register', 'anonymous', 'get', url('marketplace:seller_register'), {}, {}),
+            ('buyer_register', 'anonymous', 'get', url('marketplace:buyer_register'), {}, {}),
+            ('upload_start', 'anonymous', 'post', url('marketplace:upload_start'),
+             {'purpose': 'po_document', 'filename': 'po.pdf', 'size': 4}, {}),
+            ('upload_status', 'anonymous', 'get', url('marketplace:upload_status', args=[upload.token]), {}, {}),
+            ('upload_chunk', 'anonymous', 'post', url('marketplace:upload_chunk', args=[upload.token]),
+             {'chunk': SimpleUploadedFile('po.pdf', b'%PDF')},
+             {'headers': {'Upload-Offset': '0', 'Upload-Checksum': hashlib.sha256(b'%PDF').hexdigest()}}),
+            ('seller_dashboard', 'seller', 'get', url('marketplace:seller_dashboard'), {}, {}),
+            ('seller_analytics', 'seller', 'get', url('marketplace:seller_analytics'),
+             {'bucket': 'day', 'window': 7}, {}),
+            ('add_product', 'seller', 'get', url('marketplace:add_product'), {}, {}),
+            ('add_product_post', 'seller', 'post', url('marketplace:add_product'), {
+                'category': self.category.pk, 'name': 'Vice', 'description': 'Bench vice', 'mrp': '500',
+                'selling_price': '450', 'gst_rate': 18, 'stock_quantity': 5, 'minimum_order_quantity': 1,
+            }, {}),
+            ('product_import', 'seller', 'get', url('marketplace:product_import'), {}, {}),
+            ('product_import_errors', 'seller', 'get',
+             url('marketplace:product_import_errors', args=[self.product_import.pk]), {}, {}),
+            ('bulk_update_stock', 'seller', 'post', url('marketplace:bulk_update_stock'),
+             json.dumps({'items': [{'sku': sku, 'stock': 7} for sku in skus]}), json_post),
+            ('bulk_update_prices', 'seller', 'post', url('marketplace:bulk_update_prices'),
+             json.dumps({'mode': 'percent', 'value': '5', 'preview': True}), json_post),
+            ('bulk_update_active', 'seller', 'post', url('marketplace:bulk_update_active'),
+             json.dumps({'active': True, 'tag': 'steel'}), json_post),
+            ('buyer_dashboard', 'buyer', 'get', url('marketplace:buyer_dashboard'), {}, {}),
+            ('add_credit', 'buyer', 'get', url('marketplace:add_credit'), {}, {}),
+            ('add_credit_post', 'buyer', 'post', url('marketplace:add_credit'),
+             {'amount': '500', 'reference': 'NEFT-1', 'description': 'Top up'}, {}),
+            ('place_order', 'buyer', 'get', url('marketplace:place_order', args=[product.pk]), {}, {}),
+            ('place_order_post', 'buyer', 'post', url('marketplace:place_order', args=[product.pk]),
+             {'quantity': 2, 'payment_method': 'credit', 'shipping_address': 'Street 2'}, {}),
+            ('admin_transactions', 'staff', 'get', url('marketplace:admin_transactions'), {}, {}),
+            ('admin_approve_seller', 'staff', 'get',
+             url('marketplace:admin_approve_seller', args=[pending_seller.pk]), {}, {}),
+            ('admin_approve_buyer', 'staff', 'get',
+             url('marketplace:admin_approve_buyer', args=[pending_buyer.pk]), {}, {}),
+            ('admin_approve_product', 'staff', 'get',
+             url('marketplace:admin_approve_product', args=[pending_product.pk]), {}, {}),
+            ('admin_approve_product_post', 'staff', 'post',
+             url('marketplace:admin_approve_product', args=[pending_product.pk]), {'action': 'approve'}, {}),
+            ('moderation_queue', 'staff', 'get', url('marketplace:moderation_queue', args=['product']), {}, {}),
+            ('moderation_queue_post', 'staff', 'post', url('marketplace:moderation_queue', args=['seller']), {
+                'object_id': [pending_seller.pk], f'decision_{pending_seller.pk}': 'approve',
+            }, {}),
+            ('admin_performance', 'staff', 'get', url('marketplace:admin_performance'), {}, {}),
+            ('metrics', 'staff', 'get', url('marketplace:metrics'), {}, {}),
+            ('logout', 'leaving', 'get', url('marketplace:logout'), {}, {}),
+        ]
+
+    def request(self, client, method, url, data, extra):
+        # Cold caches, apart from the role versions the sessions were checked against
+        role_versions = cache.get_many([
+            role_version_key(user.pk) for user in (self.seller.user, self.buyer.user, self.staff)
+        ])
+        cache.clear()
+        cache.set_many(role_versions, timeout=None)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = getattr(self.clients[client], method)(url, data, **extra)
+        self.assertLess(response.status_code, 400, f'{method.upper()} {url}: {response.status_code}')
+        self.assertNotIn('login', response.get('Location', ''), f'{method.upper()} {url} needs a login')
+        return response
+
+    def measure(self):
+        """Queries run by each case, by label"""
+        counts = {}
+        for label, client, method, url, data, extra in self.cases():
+            if label == 'logout':
+                log_in(self.clients['leaving'], self.buyer, 'buyer')
+            # An earlier case may have changed the user's profile; refresh the
+            # role kept in the session first, so only the case's own queries count
+            self.clients[client].get(reverse('marketplace:home'))
+            with CaptureQueriesContext(connection) as queries:
+                self.request(client, method, url, data, extra)
+            counts[label] = len(queries)
+        return counts
+
+    def test_query_budgets_hold_as_data_grows(self):
+        small = self.measure()
+        # More rows than any list's page
+        self.seed(30)
+        large = self.measure()
+        for label in small:
+            with self.subTest(label):
+                self.assertEqual(small[label], self.BUDGETS.get(label), f'{label} with few rows')
+                self.assertEqual(large[label], self.BUDGETS.get(label), f'{label} with more than a page of rows')
+
+    @skipUnless(os.environ.get('MARKETPLACE_TIMING_TESTS'), 'set MARKETPLACE_TIMING_TESTS=1 to time the hot paths')
+    def test_hot_paths_are_fast(self):
+        self.seed(30)
+        cases = {label: case for label, *case in self.cases()}
+        for label in self.HOT_PATH_MS:
+            samples = []
+            for _ in range(self.ROUNDS):
+                started = time.perf_counter()
+                self.request(*cases[label])
+                samples.append((time.perf_counter() - started) * 1000)
+            with self.subTest(label):
+                self.assertLess(statistics.median(samples), self.HOT_PATH_MS[label])
+
+
+
+class SyntheticDataTests(TestCase):
+    """load_sample_data generates consistent rows at scale, the same ones for the same seed"""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def generate(self, *args):
+        call_command(
+            'load_sample_data', '--sellers', '4', '--buyers', '12', '--products', '60', '--orders', '80',
+            '--reviews', '30', '--batch-size', '25', '--seed', '3', *args, stdout=StringIO(),
+        )
+
+    def test_generated_rows_are_consistent(self):
+        self.generate()
+        self.assertEqual(Seller.objects.count(), 4)
+        self.assertEqual(Buyer.objects.count(), 12)
+        self.assertEqual(Product.objects.count(), 60)
+        self.assertEqual(Order.objects.count(), 80)
+        self.assertEqual(ProductReview.objects.count(), 30)
+        self.assertEqual(Transaction.objects.filter(transaction_type='purchase').count(), 80)
+        gstins = [*Seller.objects.values_list('gstin', flat=True), *Buyer.objects.values_list('gstin', flat=True)]
+        self.assertEqual({check_gstin(gstin) for gstin in gstins}, {'valid'})
+
+        # Each running balance follows from the one before it in time order
+        for buyer in Buyer.objects.prefetch_related('credit_transactions'):
+            balance = Decimal('0.00')
+            for row in sorted(buyer.credit_transactions.all(), key=lambda row: (row.created_at, row.pk)):
+                balance += row.amount if row.transaction_type == 'credit' else -row.amount
+                self.assertEqual(row.balance_after, balance, f'buyer {buyer.pk}, entry {row.pk}')
+                self.assertGreaterEqual(row.balance_after, 0)
+                self.assertGreaterEqual(row.created_at, buyer.created_at)
+            self.assertEqual(balance, buyer.credit_balance)
+        for order in Order.objects.prefetch_related('items__product'):
+            items = list(order.items.all())
+            self.assertEqual(sum(item.total_price for item in items), order.subtotal)
+            self.assertEqual(order.subtotal + order.gst_amount, order.total_amount)
+            self.assertEqual({item.product.seller_id for item in items}, {order.seller_id})
+            for item in items:
+                self.assertEqual(item.product.approval_status, 'approved')
+                self.assertLessEqual(item.product.created_at, order.created_at)
+
+        # Rows are inserted without signals; the sales rollups are rebuilt afterwards
+        sold = OrderItem.objects.exclude(order__status='cancelled').aggregate(units=Sum('quantity'))['units']
+        self.assertEqual(SellerProductDailyStats.objects.aggregate(units=Sum('units'))['units'], sold)
+        image = ProductImage.objects.first()
+        self.assertTrue(image.image.storage.exists(image.image.name))
+
+    def test_same_seed_gives_same_rows(self):
+        def newest(model, fields, count):
+            return list(model.objects.order_by('-pk').values_list(*fields)[:count])
+
+        self.generate()
+        products = newest(Product, ['name', 'selling_price', 'mrp', 'gst_rate', 'stock_quantity'], 60)
+        orders = newest(Order, ['total_amount', 'status', 'payment_method', 'payment_status'], 80)
+        # Generated again after the first run, in worker processes
+        self.generate('--workers', '2')
+        self.assertEqual(newest(Product, ['name', 'selling_price', 'mrp', 'gst_rate', 'stock_quantity'], 60), products)
+        self.assertEqual(newest(Order, ['total_amount', 'status', 'payment_method', 'payment_status'], 80), orders)
+        self.assertEqual(Product.objects.count(), 120)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class LoadTestHarnessTests(LiveServerTestCase):
+    """The loadtest command logs in seeded accounts and replays the mix against a live server"""
+
+    def setUp(self):
+        category = Category.objects.create(name='Category')
+        seller = create_seller()
+        create_buyer('synth_buyer_1')
+        for index in range(3):
+            create_product(seller, category, name=f'Cotton Tote {index}', stock_quantity=10 ** 6)
+
+    def test_run_reports_each_url_name(self):
+        output = os.path.join(tempfile.mkdtemp(), 'results.json')
+        self.addCleanup(shutil.rmtree, os.path.dirname(output))
+        # One user at a time: the live server's in-memory database fails
+        # concurrent writes instead of waiting for them
+        options = [
+            '--url', self.live_server_url, '--sellers', '0', '--anonymous', '0', '--duration', '1.5',
+            '--think', '0', '--password', 'password', '--output', output,
+        ]
+        mix = 'browse=1,product_detail=1,checkout=1,dashboard=1'
+        call_command('loadtest', *options, '--buyers', '1', '--mix', mix, stdout=StringIO())
+        with open(output) as f:
+            results = json.load(f)
+        names = {endpoint['name'] for endpoint in results['endpoints']}
+        self.assertLessEqual({
+            'marketplace:login POST', 'marketplace:home', 'marketplace:product_detail',
+            'marketplace:place_order POST', 'marketplace:buyer_dashboard',
+        }, names)
+        self.assertEqual(results['errors'], 0)
+        self.assertEqual(results['requests'], sum(endpoint['requests'] for endpoint in results['endpoints']))
+        self.assertTrue(Order.objects.filter(buyer__user__username='synth_buyer_1').exists())
+
+        stdout = StringIO()
+        call_command(
+            'loadtest', *options, '--buyers', '0', '--anonymous', '1', '--baseline', output, '--mix',
+            'product_detail=1', stdout=stdout,
+        )
+        self.assertIn('Compared with', stdout.getvalue())
+        self.assertNotIn('marketplace:place_order', stdout.getvalue().split('Compared with')[1])
+
+    def test_mix_is_validated(self):
+        self.assertEqual(parse_mix('browse=2, checkout=1')['checkout'], 1)
+        self.assertEqual(parse_mix('browse=2')['search'], 0)
+        for mix in ('browse=x', 'shop=1', 'browse=0'):
+            with self.assertRaises(ValueError):
+                parse_mix(mix)
+
+
+class StartupTests(SimpleTestCase):
+    """Pillow stays out of django.setup(); images are processed through marketplace.images"""
+
+    def test_setup_does_not_import_pillow(self):
+        output = os.path.join(tempfile.mkdtemp(), 'startup.json')
+        self.addCleanup(shutil.rmtree, os.path.dirname(output))
+        call_command('benchmark_startup', '--runs', '1', '--output', output, stdout=StringIO())
+        with open(output) as f:
+            results = json.load(f)
+        self.assertEqual(results['forbidden_imported'], [])
+        self.assertIn('marketplace.models', results['project_modules_ms'])
+
+        with self.assertRaisesMessage(CommandError, 'django.setup() imports marketplace.signals'):
+            call_command('benchmark_startup', '--runs', '1', '--forbid', 'marketplace.signals', stdout=StringIO())
+
+    def test_shrink_to_fit(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        large, small = os.path.join(directory, 'large.jpg'), os.path.join(directory, 'small.jpg')
+        for path, size in ((large, (1200, 600)), (small, (640, 480))):
+            with open(path, 'wb') as f:
+                f.write(solid_jpeg(size, (200, 120, 40)))
+
+        self.assertTrue(shrink_to_fit(large))
+        self.assertFalse(shrink_to_fit(small))
+        from PIL import Image
+        with Image.open(large) as image:
+            self.assertEqual(image.size, (800, 400))
+        with Image.open(small) as image:
+            self.assertEqual(image.size, (640, 480))
@@ -0,0 +1,209 @@
+"""
+Resumable chunked uploads for seller documents and purchase orders.
+
+The client starts an upload (purpose, filename, size), then sends the file
+in chunks. Each chunk goes to an offset the server names, along with the
+chunk's SHA-256. ``ChunkedUploadHandler`` streams the multipart body
+straight into the file at its final storage path, so there is no temp file
+and no in-memory copy. If a connection drops, the client asks for the
+current offset and carries on from there. Once every byte has arrived the
+upload is complete, and a form can attach it by token instead of receiving
+the file itself.
+"""
+import hashlib
+import os
+import secrets
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+from django.db import transaction
+from django.http import QueryDict
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.datastructures import MultiValueDict
+
+from .models import ChunkedUpload, Order, Seller
+
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+DEFAULT_MAX_SIZE = 50 * 1024 * 1024
+
+# Purpose -> (upload_to of the field the file ends up in, allowed extensions)
+PURPOSES = {
+    'pan_document': (Seller._meta.get_field('pan_document').upload_to, {'.pdf', '.jpg', '.jpeg', '.png'}),
+    'gst_certificate': (Seller._meta.get_field('gst_certificate').upload_to, {'.pdf', '.jpg', '.jpeg', '.png'}),
+    'po_document': (Order._meta.get_field('po_document').upload_to, {'.pdf', '.doc', '.docx', '.jpg', '.png'}),
+}
+
+
+class UploadError(Exception):
+    """A chunk was rejected; ``status`` is the HTTP status to answer with"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def chunk_size():
+    return getattr(settings, 'MARKETPLACE_UPLOAD_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+
+
+def max_size():
+    return getattr(settings, 'MARKETPLACE_UPLOAD_MAX_SIZE', DEFAULT_MAX_SIZE)
+
+
+def start_upload(purpose, filename, size, user=None):
+    """Reserve the file's final name (created empty) and return the upload"""
+    upload_to, _ = PURPOSES[purpose]
+    name = default_storage.save(os.path.join(upload_to, os.path.basename(filename)), ContentFile(b''))
+    return ChunkedUpload.objects.create(
+        token=secrets.token_urlsafe(32), user=user, purpose=purpose, file=name, size=size,
+    )
+
+
+def upload_state(upload):
+    return {
+        'token': upload.token,
+        'purpose': upload.purpose,
+        'filename': upload.filename,
+        'size': upload.size,
+        'offset': upload.offset,
+        'status': upload.status,
+        'sha256': upload.sha256,
+        'chunk_size': chunk_size(),
+        'status_url': reverse('marketplace:upload_status', args=[upload.token]),
+        'chunk_url': reverse('marketplace:upload_chunk', args=[upload.token]),
+    }
+
+
+class ChunkedUploadHandler(FileUploadHandler):
+    """
+    Writes the ``chunk`` file field of a multipart request into ``upload``'s
+    file at ``offset``, hashing as it goes. Nothing is buffered beyond the
+    parser's own 64 KB reads; other file fields are ignored.
+    """
+    chunk_size = 64 * 2 ** 10
+
+    def __init__(self, upload, offset, request=None):
+        super().__init__(request)
+        self.upload = upload
+        self.offset = offset
+        self.remaining = upload.size - offset
+        self.received = 0
+        self.digest = hashlib.sha256()
+        self.handle = None
+        self.error = None
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        # The multipart envelope adds a few hundred bytes; anything far larger
+        # than the rest of the file is refused before reading the body
+        if content_length > self.remaining + 64 * 1024:
+            self.error = 'Chunk is larger than the rest of the file'
+            return QueryDict(encoding=encoding), MultiValueDict()
+        return None
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        if field_name != 'chunk' or self.handle is not None:
+            return
+        self.handle = default_storage.open(self.upload.file.name, 'r+b')
+        self.handle.seek(self.offset)
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.field_name != 'chunk' or self.handle is None:
+            return None
+        self.received += len(raw_data)
+        if self.received > self.remaining:
+            self.error = 'Chunk is larger than the rest of the file'
+            raise StopUpload()
+        self.handle.write(raw_data)
+        self.digest.update(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        return None
+
+    def upload_complete(self):
+        self.close()
+
+    def upload_interrupted(self):
+        self.close()
+
+    def close(self):
+        if self.handle is not None and not self.handle.closed:
+            self.handle.close()
+
+
+def _file_sha256(name):
+    digest = hashlib.sha256()
+    with default_storage.open(name, 'rb') as handle:
+        for block in iter(lambda: handle.read(DEFAULT_CHUNK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _truncate(upload, offset):
+    # Leave the file alone if another request has since moved the upload on
+    if not ChunkedUpload.objects.filter(pk=upload.pk, offset=offset).exists():
+        return
+    with default_storage.open(upload.file.name, 'r+b') as handle:
+        handle.truncate(offset)
+
+
+def record_chunk(upload, handler, expected_sha256=''):
+    """
+    Accept the chunk ``handler`` has written, or roll the file back to the
+    offset it started at. Returns the updated upload.
+    """
+    offset = handler.offset
+    if handler.error or not handler.received:
+        _truncate(upload, offset)
+        raise UploadError(handler.error or 'No chunk received')
+    chunk_sha256 = handler.digest.hexdigest()
+    if expected_sha256 and expected_sha256.lower() != chunk_sha256:
+        _truncate(upload, offset)
+        raise UploadError('Chunk checksum does not match', status=422)
+
+    new_offset = offset + handler.received
+    complete = new_offset == upload.size
+    with transaction.atomic():
+        # Two clients resuming at once: only the one still at the offset wins
+        advanced = ChunkedUpload.objects.filter(pk=upload.pk, offset=offset, status='uploading').update(
+            offset=new_offset,
+            chunk_hashes=upload.chunk_hashes + [[offset, handler.received, chunk_sha256]],
+            sha256=_file_sha256(upload.file.name) if complete else '',
+            status='complete' if complete else 'uploading',
+        )
+    if not advanced:
+        raise UploadError('Upload offset has moved; fetch the current offset and resume', status=409)
+    upload.refresh_from_db()
+    return upload
+
+
+def claim_upload(token, purpose, user=None):
+    """Return the completed upload for a form field, or raise ValidationError"""
+    try:
+        upload = ChunkedUpload.objects.get(token=token, purpose=purpose)
+    except ChunkedUpload.DoesNotExist:
+        raise ValidationError('Upload not found; please upload the file again', code='upload_missing')
+    if upload.user_id is not None and (user is None or upload.user_id != user.pk):
+        raise ValidationError('Upload not found; please upload the file again', code='upload_missing')
+    if upload.status != 'complete':
+        raise ValidationError('The file has not finished uploading', code='upload_incomplete')
+    return upload
+
+
+def attach_uploads(uploads):
+    """Mark uploads as used by a saved record so they cannot be attached twice"""
+    pks = [upload.pk for upload in uploads]
+    if pks:
+        ChunkedUpload.objects.filter(pk__in=pks).update(status='attached', updated_at=timezone.now())
+
+
+def delete_upload(upload):
+    """Remove an abandoned upload and its partial file"""
+    default_storage.delete(upload.file.name)
+    upload.delete()
@@ -10,6 +10,7 @@ urlpatterns = [
     path('seller/<int:seller_id>/', views.seller_products, name='seller_products'),
     path('category/<int:category_id>/', views.category_products, name='category_products'),
     path('ajax/filter/', views.ajax_filter_products, name='ajax_filter'),
+    path('ajax/autocomplete/', views.autocomplete, name='autocomplete'),
     
     # Authentication
     path('login/', views.custom_login, name='login'),
@@ -19,18 +20,34 @@ urlpatterns = [
     
     # Dashboards
     path('seller/dashboard/', views.seller_dashboard, name='seller_dashboard'),
+    path('seller/analytics/', views.seller_analytics_api, name='seller_analytics'),
     path('buyer/dashboard/', views.buyer_dashboard, name='buyer_dashboard'),
     
     # Product Management
     path('product/add/', views.add_product, name='add_product'),
+    path('product/import/', views.product_import, name='product_import'),
+    path('product/import/<int:import_id>/errors/', views.product_import_errors, name='product_import_errors'),
+    path('seller/products/stock/', views.bulk_update_stock, name='bulk_update_stock'),
+    path('seller/products/prices/', views.bulk_update_prices, name='bulk_update_prices'),
+    path('seller/products/active/', views.bulk_update_active, name='bulk_update_active'),
     
     # Financial
     path('credit/add/', views.add_credit, name='add_credit'),
     path('order/place/<int:product_id>/', views.place_order, name='place_order'),
     
+    # Chunked document uploads
+    path('uploads/', views.upload_start, name='upload_start'),
+    path('uploads/<str:token>/', views.upload_status, name='upload_status'),
+    path('uploads/<str:token>/chunk/', views.upload_chunk, name='upload_chunk'),
+    
     # Admin Views
     path('admin/transactions/', views.admin_transactions, name='admin_transactions'),
     path('admin/approve/seller/<int:seller_id>/', views.admin_approve_seller, name='admin_approve_seller'),
     path('admin/approve/buyer/<int:buyer_id>/', views.admin_approve_buyer, name='admin_approve_buyer'),
     path('admin/approve/product/<int:product_id>/', views.admin_approve_product, name='admin_approve_product'),
+    path('admin/moderation/<str:target>/', views.moderation_queue, name='moderation_queue'),
+    path('admin/performance/', views.admin_performance, name='admin_performance'),
+    
+    # Prometheus scrape endpoint
+    path('metrics', views.metrics_view, name='metrics'),
 ]
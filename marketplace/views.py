@@ -1,21 +1,47 @@
-from django.shortcuts import render, get_object_or_404, redirect
+from django.shortcuts import render, get_object_or_404, aget_object_or_404, redirect
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib import messages
-from django.db.models import Q, Min, Max, Count, Avg
+from django.db.models import Avg
 from django.core.paginator import Paginator
-from django.http import JsonResponse
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, QueryDict
 from django.urls import reverse
 from django.db import transaction
+from django.middleware.csrf import CsrfViewMiddleware
+from django.utils.datastructures import MultiValueDict
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+from datetime import datetime, time, timedelta
+import copy
+import json
+from asgiref.sync import sync_to_async
 from .models import (
     Product, Category, Seller, Buyer, PODCustomization, ProductReview,
-    Order, OrderItem, Transaction, CreditTransaction
+    Order, OrderItem, Transaction, CreditTransaction, ProductImport, ChunkedUpload, TransactionArchive
 )
 from .forms import (
     SellerRegistrationForm, BuyerRegistrationForm, ProductForm, 
-    ProductImageForm, OrderForm, AddCreditForm, LoginForm, AdminApprovalForm
+    ProductImageForm, OrderForm, AddCreditForm, LoginForm, AdminApprovalForm,
+    TransactionFilterForm, SellerAnalyticsForm, ProductImportForm,
+    BulkStockForm, BulkPriceForm, BulkActiveForm, ChunkedUploadStartForm
 )
+from . import bulk
+from .analytics import seller_analytics
+from .archive import attach_related
+from .catalog import (
+    RELATED_LIMIT, acatalog_facets, aautocomplete, aget_page, alist, catalog_filters, filter_products,
+    product_summary
+)
+from .dashboards import buyer_dashboard_data, seller_dashboard_data
+from .fragments import fragment_cache_seconds, render_product_cards
+from .imports import COLUMNS as IMPORT_COLUMNS, REQUIRED_COLUMNS as IMPORT_REQUIRED_COLUMNS, start_import
+from .moderation import MODERATION_TARGETS, apply_batch, apply_decision, pending_queryset
+from .pagination import keyset_paginate, merged_keyset_paginate
+from .roles import buyer_required, remember_role, resolve_role, seller_required
+from . import instrumentation, metrics, uploads
 
 
 # Authentication Views
@@ -30,24 +56,15 @@ def custom_login(request):
             
             user = authenticate(request, username=username, password=password)
             if user is not None:
-                # Check user type and verification status
-                if user_type == 'seller':
-                    try:
-                        seller = user.seller
-                        if seller.approval_status != 'approved':
-                            messages.error(request, 'Your seller account is not approved yet.')
-                            return render(request, 'registration/login.html', {'form': form})
-                    except Seller.DoesNotExist:
-                        messages.error(request, 'No seller account found for this user.')
+                # Check user type and verification status; the profiles
+                # were loaded with the user
+                role = resolve_role(user)
+                if user_type in ('seller', 'buyer'):
+                    if role.name != user_type:
+                        messages.error(request, f'No {user_type} account found for this user.')
                         return render(request, 'registration/login.html', {'form': form})
-                elif user_type == 'buyer':
-                    try:
-                        buyer = user.buyer
-                        if buyer.approval_status != 'approved':
-                            messages.error(request, 'Your buyer account is not approved yet.')
-                            return render(request, 'registration/login.html', {'form': form})
-                    except Buyer.DoesNotExist:
-                        messages.error(request, 'No buyer account found for this user.')
+                    if not role.is_approved:
+                        messages.error(request, f'Your {user_type} account is not approved yet.')
                         return render(request, 'registration/login.html', {'form': form})
                 elif user_type == 'admin':
                     if not user.is_staff:
@@ -55,6 +72,7 @@ def custom_login(request):
                         return render(request, 'registration/login.html', {'form': form})
                 
                 login(request, user)
+                remember_role(request, role)
                 
                 # Redirect based on user type
                 if user_type == 'seller':
@@ -93,6 +111,7 @@ def seller_register(request):
                     state=form.cleaned_data['state'],
                     pincode=form.cleaned_data['pincode'],
                     gstin=form.cleaned_data['gstin'],
+                    gstin_status='valid',
                     turnover=form.cleaned_data['turnover'],
                     bank_name=form.cleaned_data['bank_name'],
                     account_number=form.cleaned_data['account_number'],
@@ -102,6 +121,7 @@ def seller_register(request):
                     pan_document=form.cleaned_data['pan_document'],
                     gst_certificate=form.cleaned_data.get('gst_certificate'),
                 )
+                uploads.attach_uploads(form.chunked_uploads)
                 
             messages.success(request, 'Registration successful! Your account is pending approval.')
             return redirect('marketplace:login')
@@ -128,6 +148,7 @@ def buyer_register(request):
                     address=form.cleaned_data['address'],
                     mobile_number=form.cleaned_data['mobile_number'],
                     gstin=form.cleaned_data['gstin'],
+                    gstin_status='valid',
                     bank_name=form.cleaned_data.get('bank_name', ''),
                     account_number=form.cleaned_data.get('account_number', ''),
                     ifsc_code=form.cleaned_data.get('ifsc_code', ''),
@@ -150,184 +171,136 @@ def custom_logout(request):
 
 
 # Dashboard Views
-@login_required
+@seller_required
 def seller_dashboard(request):
     """Seller dashboard with products and orders"""
-    try:
-        seller = request.user.seller
-    except Seller.DoesNotExist:
-        messages.error(request, 'Seller profile not found.')
-        return redirect('marketplace:home')
-    
-    products = Product.objects.filter(seller=seller).order_by('-created_at')[:10]
-    orders = Order.objects.filter(seller=seller).order_by('-created_at')[:10]
+    seller = request.user.seller
     
     context = {
         'seller': seller,
-        'products': products,
-        'orders': orders,
-        'total_products': Product.objects.filter(seller=seller).count(),
-        'pending_orders': Order.objects.filter(seller=seller, status='pending').count(),
+        **seller_dashboard_data(seller),
     }
     
     return render(request, 'marketplace/seller_dashboard.html', context)
 
 
-@login_required
+@seller_required(json=True)
+def seller_analytics_api(request):
+    """Time-bucketed sales series and breakdowns for the logged-in seller"""
+    seller = request.user.seller
+    
+    form = SellerAnalyticsForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+    
+    report = seller_analytics(
+        seller,
+        form.cleaned_data['start'],
+        form.cleaned_data['end'],
+        bucket=form.cleaned_data['bucket'],
+        window=form.cleaned_data['window'],
+    )
+    return JsonResponse(report)
+
+
+@buyer_required
 def buyer_dashboard(request):
     """Buyer dashboard with orders and credit balance"""
-    try:
-        buyer = request.user.buyer
-    except Buyer.DoesNotExist:
-        messages.error(request, 'Buyer profile not found.')
-        return redirect('marketplace:home')
-    
-    orders = Order.objects.filter(buyer=buyer).order_by('-created_at')[:10]
-    credit_transactions = CreditTransaction.objects.filter(buyer=buyer)[:10]
+    buyer = request.user.buyer
     
     context = {
         'buyer': buyer,
-        'orders': orders,
-        'credit_transactions': credit_transactions,
-        'total_orders': Order.objects.filter(buyer=buyer).count(),
-        'pending_orders': Order.objects.filter(buyer=buyer, status='pending').count(),
+        **buyer_dashboard_data(buyer),
     }
     
     return render(request, 'marketplace/buyer_dashboard.html', context)
 
 
-def marketplace_home(request):
+async def marketplace_home(request):
     """Main marketplace page with products grid, filters, and search"""
-    products = Product.objects.filter(is_active=True).select_related('seller', 'category')
-    
-    # Get filter parameters
-    search_query = request.GET.get('search', '')
-    category_id = request.GET.get('category', '')
-    min_price = request.GET.get('min_price', '')
-    max_price = request.GET.get('max_price', '')
-    location = request.GET.get('location', '')
-    business_type = request.GET.get('business_type', '')
-    customizable = request.GET.get('customizable', '')
-    sort_by = request.GET.get('sort', 'newest')
-    
-    # Apply filters
-    if search_query:
-        products = products.filter(
-            Q(name__icontains=search_query) |
-            Q(description__icontains=search_query) |
-            Q(tags__icontains=search_query) |
-            Q(seller__business_name__icontains=search_query)
-        )
-    
-    if category_id:
-        products = products.filter(category_id=category_id)
-    
-    if min_price:
-        products = products.filter(selling_price__gte=min_price)
-    
-    if max_price:
-        products = products.filter(selling_price__lte=max_price)
-    
-    if location:
-        products = products.filter(
-            Q(seller__city__icontains=location) |
-            Q(seller__state__icontains=location)
-        )
-    
-    if business_type:
-        products = products.filter(seller__business_type=business_type)
-    
-    if customizable == 'true':
-        products = products.filter(is_customizable=True)
-    
-    # Apply sorting
-    if sort_by == 'price_low':
-        products = products.order_by('selling_price')
-    elif sort_by == 'price_high':
-        products = products.order_by('-selling_price')
-    elif sort_by == 'name':
-        products = products.order_by('name')
-    else:  # newest
-        products = products.order_by('-created_at')
+    filters = catalog_filters(request.GET)
+    products = filter_products(filters)
     
-    # Pagination
-    paginator = Paginator(products, 12)  # Show 12 products per page
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    
-    # Get filter options
-    categories = Category.objects.all()
-    price_range = Product.objects.filter(is_active=True).aggregate(
-        min_price=Min('selling_price'),
-        max_price=Max('selling_price')
-    )
-    
-    business_types = Seller.objects.values_list('business_type', flat=True).distinct()
-    locations = Seller.objects.values('city', 'state').distinct()[:20]
+    with metrics.SEARCH_SECONDS.time(endpoint='home', search='yes' if filters['search'] else 'no'):
+        page_obj = await aget_page(products, request.GET.get('page'))
+        facets = await acatalog_facets()
     
     context = {
         'page_obj': page_obj,
         'products': page_obj.object_list,
-        'categories': categories,
-        'price_range': price_range,
-        'business_types': business_types,
-        'locations': locations,
-        'search_query': search_query,
-        'selected_category': category_id,
-        'min_price': min_price,
-        'max_price': max_price,
-        'selected_location': location,
-        'selected_business_type': business_type,
-        'customizable': customizable,
-        'sort_by': sort_by,
-        'total_products': paginator.count,
+        'product_cards': await sync_to_async(render_product_cards)(page_obj.object_list),
+        **facets,
+        'search_query': filters['search'],
+        'selected_category': filters['category'],
+        'min_price': filters['min_price'],
+        'max_price': filters['max_price'],
+        'selected_location': filters['location'],
+        'selected_business_type': filters['business_type'],
+        'customizable': filters['customizable'],
+        'sort_by': filters['sort'],
+        'total_products': page_obj.paginator.count,
     }
     
-    return render(request, 'marketplace/home.html', context)
+    # Templates and context processors may touch lazy relations and the session
+    return await sync_to_async(render)(request, 'marketplace/home.html', context)
 
 
-def product_detail(request, pk):
+async def product_detail(request, pk):
     """Product detail page with customization options"""
-    product = get_object_or_404(Product, pk=pk, is_active=True)
-    
-    # Get customization options
-    customizations = PODCustomization.objects.filter(product=product)
+    product = await aget_object_or_404(Product.objects.select_related('seller', 'category'), pk=pk, is_active=True)
     
-    # Get reviews
     reviews = ProductReview.objects.filter(product=product).select_related('user')
-    avg_rating = reviews.aggregate(avg_rating=Avg('rating'))['avg_rating']
-    
-    # Related products
-    related_products = Product.objects.filter(
-        category=product.category,
-        is_active=True
-    ).exclude(pk=product.pk)[:6]
+    review_list = await alist(reviews)
+    rating = await reviews.aaggregate(avg_rating=Avg('rating'))
+    related_products = await alist(
+        Product.objects.filter(category_id=product.category_id, is_active=True)
+        .exclude(pk=product.pk).select_related('seller')[:RELATED_LIMIT]
+    )
     
     context = {
         'product': product,
-        'customizations': customizations,
-        'reviews': reviews,
-        'avg_rating': avg_rating,
+        # Only read when the cached fragments showing them are rebuilt
+        'customizations': PODCustomization.objects.filter(product=product),
+        'fragment_cache_seconds': fragment_cache_seconds(),
+        'reviews': review_list,
+        'avg_rating': rating['avg_rating'],
         'related_products': related_products,
+        'related_cards': await sync_to_async(render_product_cards)(related_products),
     }
     
-    return render(request, 'marketplace/product_detail.html', context)
+    return await sync_to_async(render)(request, 'marketplace/product_detail.html', context)
 
 
-def ajax_filter_products(request):
-    """AJAX endpoint for filtering products"""
-    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-        # This would contain the same filtering logic as marketplace_home
-        # but return JSON response for AJAX requests
-        pass
+@require_GET
+async def ajax_filter_products(request):
+    """AJAX endpoint for filtering products, taking the same parameters as the home page"""
+    filters = catalog_filters(request.GET)
+    with metrics.SEARCH_SECONDS.time(endpoint='filter', search='yes' if filters['search'] else 'no'):
+        page_obj = await aget_page(filter_products(filters), request.GET.get('page'))
     
-    return JsonResponse({'status': 'error'})
+    return JsonResponse({
+        'status': 'ok',
+        'products': [product_summary(product) for product in page_obj],
+        'page': page_obj.number,
+        'num_pages': page_obj.paginator.num_pages,
+        'total_products': page_obj.paginator.count,
+        'has_next': page_obj.has_next(),
+        'has_previous': page_obj.has_previous(),
+    })
+
+
+@require_GET
+async def autocomplete(request):
+    """Search suggestions: products, categories and sellers starting with ``q``"""
+    with metrics.SEARCH_SECONDS.time(endpoint='autocomplete', search='yes'):
+        suggestions = await aautocomplete(request.GET.get('q', ''))
+    return JsonResponse(suggestions)
 
 
 def seller_products(request, seller_id):
     """View all products from a specific seller"""
     seller = get_object_or_404(Seller, pk=seller_id)
-    products = Product.objects.filter(seller=seller, is_active=True)
+    products = Product.objects.filter(seller=seller, is_active=True).select_related('seller')
     
     # Pagination
     paginator = Paginator(products, 12)
@@ -338,6 +311,7 @@ def seller_products(request, seller_id):
         'seller': seller,
         'page_obj': page_obj,
         'products': page_obj.object_list,
+        'product_cards': render_product_cards(page_obj.object_list),
     }
     
     return render(request, 'marketplace/seller_products.html', context)
@@ -346,7 +320,7 @@ def seller_products(request, seller_id):
 def category_products(request, category_id):
     """View all products in a specific category"""
     category = get_object_or_404(Category, pk=category_id)
-    products = Product.objects.filter(category=category, is_active=True)
+    products = Product.objects.filter(category=category, is_active=True).select_related('seller')
     
     # Pagination
     paginator = Paginator(products, 12)
@@ -357,20 +331,17 @@ def category_products(request, category_id):
         'category': category,
         'page_obj': page_obj,
         'products': page_obj.object_list,
+        'product_cards': render_product_cards(page_obj.object_list),
     }
     
     return render(request, 'marketplace/category_products.html', context)
 
 
 # Product Management Views
-@login_required
+@seller_required(message='Only sellers can add products.')
 def add_product(request):
     """Add new product (seller only)"""
-    try:
-        seller = request.user.seller
-    except Seller.DoesNotExist:
-        messages.error(request, 'Only sellers can add products.')
-        return redirect('marketplace:home')
+    seller = request.user.seller
     
     if request.method == 'POST':
         form = ProductForm(request.POST)
@@ -387,14 +358,126 @@ def add_product(request):
     return render(request, 'marketplace/add_product.html', {'form': form})
 
 
+@seller_required(message='Only sellers can upload products.')
+def product_import(request):
+    """Bulk upload of a seller's catalog from CSV/XLSX"""
+    seller = request.user.seller
+    
+    if request.method == 'POST':
+        form = ProductImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            with transaction.atomic():
+                upload = ProductImport.objects.create(seller=seller, file=form.cleaned_data['file'])
+                transaction.on_commit(lambda: start_import(upload.pk))
+            
+            messages.success(request, f'Upload received. Import #{upload.pk} is being processed.')
+            return redirect('marketplace:product_import')
+    else:
+        form = ProductImportForm()
+    
+    context = {
+        'form': form,
+        'imports': ProductImport.objects.filter(seller=seller)[:10],
+        'columns': IMPORT_COLUMNS,
+        'required_columns': IMPORT_REQUIRED_COLUMNS,
+    }
+    return render(request, 'marketplace/product_import.html', context)
+
+
 @login_required
+def product_import_errors(request, import_id):
+    """Download the per-row error report of a bulk upload"""
+    upload = get_object_or_404(ProductImport, pk=import_id, seller__user=request.user)
+    if not upload.error_report:
+        raise Http404('This import has no error report.')
+    return FileResponse(
+        upload.error_report.open('rb'), as_attachment=True,
+        filename=f'import_{upload.pk}_errors.csv'
+    )
+
+
+def _seller_json_request(request, form_class):
+    """
+    Validate a JSON body with ``form_class`` for a ``@seller_required`` view.
+    Returns ``(seller, form, None)`` or ``(None, None, error response)``.
+    """
+    seller = request.user.seller
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        return None, None, JsonResponse({'error': 'Request body must be JSON.'}, status=400)
+    if not isinstance(data, dict):
+        return None, None, JsonResponse({'error': 'Request body must be a JSON object.'}, status=400)
+    
+    form = form_class(data)
+    if not form.is_valid():
+        return None, None, JsonResponse({'errors': form.errors}, status=400)
+    return seller, form, None
+
+
+def _filtered_products(seller, form):
+    return bulk.seller_products(
+        seller,
+        category=form.cleaned_data.get('category'),
+        tag=form.cleaned_data.get('tag'),
+        skus=form.cleaned_data.get('skus'),
+    )
+
+
+@seller_required(json=True)
+@require_POST
+def bulk_update_stock(request):
+    """Set stock quantities for a list of SKUs; {"preview": true} only counts"""
+    seller, form, error = _seller_json_request(request, BulkStockForm)
+    if error:
+        return error
+    
+    preview = form.cleaned_data['preview']
+    result = bulk.set_stock(seller, form.cleaned_data['items'], apply=not preview)
+    return JsonResponse({'preview': preview, **result})
+
+
+@seller_required(json=True)
+@require_POST
+def bulk_update_prices(request):
+    """Change selling prices by a percentage or amount for filtered products"""
+    seller, form, error = _seller_json_request(request, BulkPriceForm)
+    if error:
+        return error
+    
+    preview = form.cleaned_data['preview']
+    result = bulk.change_prices(
+        seller,
+        _filtered_products(seller, form),
+        form.cleaned_data['mode'],
+        form.cleaned_data['value'],
+        apply=not preview,
+    )
+    return JsonResponse({'preview': preview, **result})
+
+
+@seller_required(json=True)
+@require_POST
+def bulk_update_active(request):
+    """Activate or deactivate filtered products"""
+    seller, form, error = _seller_json_request(request, BulkActiveForm)
+    if error:
+        return error
+    
+    preview = form.cleaned_data['preview']
+    result = bulk.set_active(
+        seller,
+        _filtered_products(seller, form),
+        form.cleaned_data['active'],
+        apply=not preview,
+    )
+    return JsonResponse({'preview': preview, **result})
+
+
+@buyer_required(message='Only buyers can add credit.')
 def add_credit(request):
     """Add credit to buyer account"""
-    try:
-        buyer = request.user.buyer
-    except Buyer.DoesNotExist:
-        messages.error(request, 'Only buyers can add credit.')
-        return redirect('marketplace:home')
+    buyer = request.user.buyer
     
     if request.method == 'POST':
         form = AddCreditForm(request.POST)
@@ -416,54 +499,64 @@ def add_credit(request):
                 description=description,
                 balance_after=buyer.credit_balance
             )
+            metrics.CREDIT_TOPUPS.inc()
+            metrics.CREDIT_TOPUP_AMOUNT.inc(amount)
             
             messages.success(request, f'₹{amount} credit added successfully!')
             return redirect('marketplace:buyer_dashboard')
     else:
         form = AddCreditForm()
     
-    return render(request, 'marketplace/add_credit.html', {'form': form, 'buyer': request.user.buyer})
+    return render(request, 'marketplace/add_credit.html', {'form': form, 'buyer': buyer})
 
 
-@login_required
+@buyer_required(message='Only approved buyers can place orders.', redirect_to='marketplace:login')
 def place_order(request, product_id):
     """Place an order for a product"""
-    try:
-        buyer = request.user.buyer
-    except Buyer.DoesNotExist:
-        messages.error(request, 'Only approved buyers can place orders.')
-        return redirect('marketplace:login')
+    buyer = request.user.buyer
     
     product = get_object_or_404(Product, pk=product_id, is_active=True)
     
     if request.method == 'POST':
-        form = OrderForm(request.POST, request.FILES)
+        form = OrderForm(request.POST, request.FILES, upload_user=request.user)
         quantity = int(request.POST.get('quantity', 1))
         
         if form.is_valid():
-            # Calculate order totals
-            unit_price = product.selling_price
-            subtotal = unit_price * quantity
-            gst_amount = (subtotal * product.gst_rate) / 100
-            total_amount = subtotal + gst_amount
-            
-            # Check credit balance for credit payments
-            if form.cleaned_data['payment_method'] == 'credit':
-                if not buyer.can_purchase(total_amount):
-                    messages.error(request, 'Insufficient credit balance.')
-                    return render(request, 'marketplace/place_order.html', {
-                        'form': form, 'product': product, 'buyer': buyer
-                    })
-            
-            with transaction.atomic():
+            # Timed up to and including the commit
+            with (
+                metrics.CHECKOUTS_IN_PROGRESS.track_in_progress(),
+                metrics.CHECKOUT_SECONDS.time(),
+                transaction.atomic(),
+            ):
+                # Re-read balance, price and stock inside the write transaction
+                # (locked on PostgreSQL, IMMEDIATE on SQLite) so concurrent
+                # checkouts cannot overdraw them
+                buyer = Buyer.objects.select_for_update().get(pk=buyer.pk)
+                product = Product.objects.select_for_update().get(pk=product.pk)
+                
+                # Calculate order totals
+                unit_price = product.selling_price
+                subtotal = unit_price * quantity
+                gst_amount = (subtotal * product.gst_rate) / 100
+                total_amount = subtotal + gst_amount
+                
+                # Check credit balance for credit payments
+                if form.cleaned_data['payment_method'] == 'credit':
+                    if not buyer.can_purchase(total_amount):
+                        messages.error(request, 'Insufficient credit balance.')
+                        return render(request, 'marketplace/place_order.html', {
+                            'form': form, 'product': product, 'buyer': buyer
+                        })
+                
                 # Create order
                 order = form.save(commit=False)
                 order.buyer = buyer
-                order.seller = product.seller
+                order.seller_id = product.seller_id
                 order.subtotal = subtotal
                 order.gst_amount = gst_amount
                 order.total_amount = total_amount
                 order.save()
+                uploads.attach_uploads(form.chunked_uploads)
                 
                 # Create order item
                 OrderItem.objects.create(
@@ -498,7 +591,7 @@ def place_order(request, product_id):
                 # Create transaction record
                 Transaction.objects.create(
                     buyer=buyer,
-                    seller=product.seller,
+                    seller_id=product.seller_id,
                     order=order,
                     transaction_type='purchase',
                     amount=total_amount,
@@ -509,11 +602,12 @@ def place_order(request, product_id):
                 # Update product stock
                 product.stock_quantity -= quantity
                 product.save()
+            metrics.ORDERS.inc(payment_method=order.payment_method)
             
             messages.success(request, f'Order {order.order_number} placed successfully!')
             return redirect('marketplace:buyer_dashboard')
     else:
-        form = OrderForm()
+        form = OrderForm(upload_user=request.user)
     
     context = {
         'form': form,
@@ -524,20 +618,127 @@ def place_order(request, product_id):
     return render(request, 'marketplace/place_order.html', context)
 
 
+# Document Uploads
+# Large documents are sent in chunks before the form is submitted; the form
+# then carries only the upload's token (see marketplace.uploads).
+
+def _get_upload(request, token):
+    upload = get_object_or_404(ChunkedUpload, token=token)
+    if upload.user_id is not None and upload.user_id != request.user.pk:
+        raise Http404('Upload not found.')
+    return upload
+
+
+@require_POST
+def upload_start(request):
+    """Start a resumable upload and return its token"""
+    form = ChunkedUploadStartForm(request.POST)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+    
+    upload = uploads.start_upload(
+        form.cleaned_data['purpose'],
+        form.cleaned_data['filename'],
+        form.cleaned_data['size'],
+        user=request.user if request.user.is_authenticated else None,
+    )
+    return JsonResponse(uploads.upload_state(upload), status=201)
+
+
+@require_GET
+def upload_status(request, token):
+    """Current offset of an upload, for resuming after a dropped connection"""
+    return JsonResponse(uploads.upload_state(_get_upload(request, token)))
+
+
+def _csrf_rejection(request):
+    """
+    CsrfViewMiddleware's verdict on ``request`` without reading its body, so
+    the token has to come in the X-CSRFToken header; None when it passes
+    """
+    headers_only = copy.copy(request)
+    headers_only._post, headers_only._files = QueryDict(), MultiValueDict()
+    return CsrfViewMiddleware(lambda request: None).process_view(headers_only, None, (), {})
+
+
+@csrf_exempt
+@require_POST
+def upload_chunk(request, token):
+    """Append one chunk (multipart field ``chunk``) at the ``Upload-Offset`` header"""
+    upload = _get_upload(request, token)
+    if upload.status != 'uploading':
+        return JsonResponse({'error': 'Upload is already complete.', **uploads.upload_state(upload)}, status=409)
+    try:
+        offset = int(request.headers.get('Upload-Offset', ''))
+    except ValueError:
+        return JsonResponse({'error': 'Upload-Offset header is required.'}, status=400)
+    if offset != upload.offset:
+        return JsonResponse({'error': 'Offset does not match.', **uploads.upload_state(upload)}, status=409)
+    
+    # The handler has to be in place before the body is read, which rules out
+    # the CSRF middleware reading it first. It is checked here instead, before
+    # any of the chunk is written to the file.
+    rejection = _csrf_rejection(request)
+    if rejection is not None:
+        return rejection
+    handler = uploads.ChunkedUploadHandler(upload, offset, request)
+    request.upload_handlers = [handler]
+    request.POST  # parse the body through the handler
+    try:
+        upload = uploads.record_chunk(upload, handler, request.headers.get('Upload-Checksum', ''))
+    except uploads.UploadError as error:
+        return JsonResponse({'error': str(error), **uploads.upload_state(upload)}, status=error.status)
+    return JsonResponse(uploads.upload_state(upload))
+
+
 # Admin Views
 @staff_member_required
 def admin_transactions(request):
-    """Admin view for all transactions"""
-    transactions = Transaction.objects.all().order_by('-created_at')
+    """Admin view for all transactions, hot and archived, keyset-paginated with server-side filters"""
+    # Each filter lines up with a composite (column, created_at, id) index
+    lookups = {}
+    form = TransactionFilterForm(request.GET or None)
+    if form.is_valid():
+        filters = form.cleaned_data
+        if filters.get('transaction_type'):
+            lookups['transaction_type'] = filters['transaction_type']
+        if filters.get('status'):
+            lookups['status'] = filters['status']
+        if filters.get('buyer'):
+            lookups['buyer_id'] = filters['buyer']
+        if filters.get('seller'):
+            lookups['seller_id'] = filters['seller']
+        if filters.get('date_from'):
+            start = datetime.combine(filters['date_from'], time.min)
+            lookups['created_at__gte'] = timezone.make_aware(start)
+        if filters.get('date_to'):
+            end = datetime.combine(filters['date_to'] + timedelta(days=1), time.min)
+            lookups['created_at__lt'] = timezone.make_aware(end)
+    
+    # Keyset pagination: no COUNT(*) and no OFFSET, so every page costs the
+    # same. Archived transactions keep their ids, so one cursor covers both.
+    page = merged_keyset_paginate(
+        [
+            Transaction.objects.select_related('buyer', 'seller', 'order').filter(**lookups),
+            TransactionArchive.objects.filter(**lookups),
+        ],
+        ordering=['-created_at', '-id'],
+        per_page=25,
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
+    attach_related(page.object_list)
     
-    # Pagination
-    paginator = Paginator(transactions, 25)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Preserve active filters in the pager links
+    query = request.GET.copy()
+    query.pop('after', None)
+    query.pop('before', None)
     
     context = {
-        'page_obj': page_obj,
-        'transactions': page_obj.object_list,
+        'form': form,
+        'page_obj': page,
+        'transactions': page.object_list,
+        'filter_query': query.urlencode(),
     }
     
     return render(request, 'admin/transactions.html', context)
@@ -554,18 +755,12 @@ def admin_approve_seller(request, seller_id):
             action = form.cleaned_data['action']
             rejection_reason = form.cleaned_data.get('rejection_reason', '')
             
+            apply_decision('seller', action, [seller.pk], actor=request.user, reason=rejection_reason)
+            
             if action == 'approve':
-                seller.approval_status = 'approved'
-                seller.verified = True
-                seller.rejection_reason = ''
                 messages.success(request, f'Seller {seller.business_name} approved successfully.')
             else:
-                seller.approval_status = 'rejected'
-                seller.verified = False
-                seller.rejection_reason = rejection_reason
                 messages.success(request, f'Seller {seller.business_name} rejected.')
-            
-            seller.save()
             return redirect('admin:marketplace_seller_changelist')
     else:
         form = AdminApprovalForm()
@@ -581,7 +776,7 @@ def admin_approve_seller(request, seller_id):
 @staff_member_required
 def admin_approve_buyer(request, buyer_id):
     """Admin view to approve/reject buyers"""
-    buyer = get_object_or_404(Buyer, pk=buyer_id)
+    buyer = get_object_or_404(Buyer.objects.select_related('user'), pk=buyer_id)
     
     if request.method == 'POST':
         form = AdminApprovalForm(request.POST)
@@ -589,18 +784,12 @@ def admin_approve_buyer(request, buyer_id):
             action = form.cleaned_data['action']
             rejection_reason = form.cleaned_data.get('rejection_reason', '')
             
+            apply_decision('buyer', action, [buyer.pk], actor=request.user, reason=rejection_reason)
+            
             if action == 'approve':
-                buyer.approval_status = 'approved'
-                buyer.verified = True
-                buyer.rejection_reason = ''
                 messages.success(request, f'Buyer {buyer.name} approved successfully.')
             else:
-                buyer.approval_status = 'rejected'
-                buyer.verified = False
-                buyer.rejection_reason = rejection_reason
                 messages.success(request, f'Buyer {buyer.name} rejected.')
-            
-            buyer.save()
             return redirect('admin:marketplace_buyer_changelist')
     else:
         form = AdminApprovalForm()
@@ -616,7 +805,7 @@ def admin_approve_buyer(request, buyer_id):
 @staff_member_required
 def admin_approve_product(request, product_id):
     """Admin view to approve/reject products"""
-    product = get_object_or_404(Product, pk=product_id)
+    product = get_object_or_404(Product.objects.select_related('seller', 'category'), pk=product_id)
     
     if request.method == 'POST':
         form = AdminApprovalForm(request.POST)
@@ -624,18 +813,12 @@ def admin_approve_product(request, product_id):
             action = form.cleaned_data['action']
             rejection_reason = form.cleaned_data.get('rejection_reason', '')
             
+            apply_decision('product', action, [product.pk], actor=request.user, reason=rejection_reason)
+            
             if action == 'approve':
-                product.approval_status = 'approved'
-                product.is_active = True
-                product.rejection_reason = ''
                 messages.success(request, f'Product {product.name} approved successfully.')
             else:
-                product.approval_status = 'rejected'
-                product.is_active = False
-                product.rejection_reason = rejection_reason
                 messages.success(request, f'Product {product.name} rejected.')
-            
-            product.save()
             return redirect('admin:marketplace_product_changelist')
     else:
         form = AdminApprovalForm()
@@ -646,3 +829,88 @@ def admin_approve_product(request, product_id):
     }
     
     return render(request, 'admin/approve_product.html', context)
+
+
+@staff_member_required
+def moderation_queue(request, target):
+    """Review queue of pending sellers, buyers or products, oldest first"""
+    if target not in MODERATION_TARGETS:
+        raise Http404('Unknown moderation queue')
+    
+    if request.method == 'POST':
+        decisions = []
+        missing_reasons = []
+        for object_id in request.POST.getlist('object_id'):
+            if not object_id.isdigit():
+                continue
+            action = request.POST.get(f'decision_{object_id}', 'skip')
+            reason = request.POST.get(f'reason_{object_id}', '').strip()
+            if action == 'reject' and not reason:
+                missing_reasons.append(object_id)
+            elif action in ('approve', 'reject'):
+                decisions.append((int(object_id), action, reason))
+        
+        if missing_reasons:
+            messages.error(request, f'Rejection reason is required when rejecting (#{", #".join(missing_reasons)}).')
+        else:
+            if decisions:
+                updated = apply_batch(target, decisions, actor=request.user)
+                messages.success(request, f'{updated} {target}s updated.')
+            
+            # Continue after the reviewed page; skipped rows stay in the queue
+            url = reverse('marketplace:moderation_queue', kwargs={'target': target})
+            next_cursor = request.POST.get('next_cursor')
+            return redirect(f'{url}?after={next_cursor}' if next_cursor else url)
+    
+    page = keyset_paginate(
+        pending_queryset(target),
+        ordering=['created_at', 'id'],
+        per_page=20,
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
+    
+    # Counts read only the partial pending indexes
+    pending_counts = {
+        name: model.objects.filter(approval_status='pending').count()
+        for name, (model, _) in MODERATION_TARGETS.items()
+    }
+    
+    context = {
+        'target': target,
+        'page_obj': page,
+        'items': page.object_list,
+        'pending_counts': pending_counts,
+    }
+    
+    return render(request, 'admin/moderation_queue.html', context)
+
+
+@staff_member_required
+def admin_performance(request):
+    """Latency percentiles, query counts and slowest SQL per view, as recorded by this process"""
+    if request.method == 'POST':
+        instrumentation.registry.reset()
+        messages.success(request, 'Performance statistics reset.')
+        return redirect('marketplace:admin_performance')
+    
+    context = {
+        'enabled': instrumentation.is_enabled(),
+        'views': instrumentation.registry.report(),
+        'since': datetime.fromtimestamp(instrumentation.registry.started, tz=timezone.get_current_timezone()),
+        'query_threshold': instrumentation.query_threshold(),
+    }
+    
+    return render(request, 'admin/performance.html', context)
+
+
+def metrics_view(request):
+    """Marketplace metrics in the Prometheus text format, for scrapers holding the token or for staff"""
+    token = metrics.scrape_token()
+    authorization = request.headers.get('Authorization', '')
+    if not (token and constant_time_compare(authorization, f'Bearer {token}')) and not request.user.is_staff:
+        return HttpResponse('Unauthorized\n', status=401, content_type='text/plain', headers={
+            'WWW-Authenticate': 'Bearer realm="metrics"',
+        })
+    
+    return HttpResponse(metrics.registry.render(), content_type=metrics.CONTENT_TYPE)
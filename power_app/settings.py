@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -41,20 +42,29 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'marketplace.middleware.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'marketplace.middleware.StaticFilesMiddleware',
+    'marketplace.middleware.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'marketplace.middleware.RoleMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'marketplace.middleware.CatalogPageCacheMiddleware',
 ]
 
 ROOT_URLCONF = 'power_app.urls'
 
+# With no 'loaders' option Django wraps the loaders in the cached loader, so
+# each template is compiled once per process (in development too, with
+# autoreload clearing it when template files change).
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates, timing renders for marketplace.instrumentation
+        'BACKEND': 'marketplace.instrumentation.InstrumentedDjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -63,6 +73,7 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'django.template.context_processors.media',
+                'marketplace.context_processors.role',
             ],
         },
     },
@@ -70,18 +81,210 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'power_app.wsgi.application'
 
+# Users are loaded with their seller/buyer profile in one query; the role
+# derived from it is available as request.role (see marketplace.roles)
+AUTHENTICATION_BACKENDS = ['marketplace.roles.ProfileModelBackend']
+
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
+#
+# Chosen by environment: DB_ENGINE=sqlite (default) or DB_ENGINE=postgres.
+#
+# SQLite runs in WAL mode, so readers don't block the writer. Each new
+# connection sets the pragmas in DB_SQLITE_PRAGMAS. Write transactions BEGIN
+# IMMEDIATE: they wait up to DB_BUSY_TIMEOUT_MS for the write lock instead of
+# failing with "database is locked" when a read transaction upgrades.
+#
+# PostgreSQL keeps connections open for DB_CONN_MAX_AGE seconds, checking
+# them before reuse. Set DB_POOL_MAX_SIZE to use psycopg's connection pool
+# instead; this needs psycopg[pool]. Under ASGI every request runs its
+# database work on a thread of its own, so persistent connections are never
+# reused there: use the pool, or DB_CONN_MAX_AGE=0. ASGI is also slower here
+# than WSGI (47 against 69 req/s in benchmark_asgi, see power_app/asgi.py),
+# so prefer WSGI.
+#
+# The engines are Django's own, timing new connections for /metrics (see
+# marketplace.backends).
+
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite')
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', '600'))
+
+DB_SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': int(os.environ.get('DB_BUSY_TIMEOUT_MS', '20000')),
+    'cache_size': -64000,  # KiB, i.e. 64 MB per connection
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+if DB_ENGINE == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'marketplace.backends.postgresql',
+            'NAME': os.environ.get('DB_NAME', 'power_app'),
+            'USER': os.environ.get('DB_USER', 'power_app'),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', 'localhost'),
+            'PORT': os.environ.get('DB_PORT', '5432'),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'connect_timeout': int(os.environ.get('DB_CONNECT_TIMEOUT', '5')),
+            },
+        }
+    }
+    if os.environ.get('DB_POOL_MAX_SIZE'):
+        # Pooled connections are returned after each request; persistent
+        # connections and the pool are mutually exclusive
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', '2')),
+            'max_size': int(os.environ['DB_POOL_MAX_SIZE']),
+            'timeout': int(os.environ.get('DB_POOL_TIMEOUT', '10')),
+        }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'marketplace.backends.sqlite3',
+            'NAME': os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'OPTIONS': {
+                'transaction_mode': 'IMMEDIATE',
+                'init_command': ';'.join(f'PRAGMA {name}={value}' for name, value in DB_SQLITE_PRAGMAS.items()),
+            },
+        }
+    }
 
-DATABASES = {
+# Read replicas
+# DB_REPLICAS lists replica SQLite files (or, for postgres, replica hosts),
+# comma-separated; they become aliases replica_1, replica_2, ... Catalog
+# pages read from a replica; writes and everything else use the primary.
+# A client that writes reads from the primary for MARKETPLACE_REPLICA_PIN_SECONDS.
+# Locally, `manage.py sync_replica --interval 1` keeps SQLite replicas in step.
+
+MARKETPLACE_READ_REPLICAS = []
+MARKETPLACE_REPLICA_PIN_SECONDS = 10
+
+for number, location in enumerate(filter(None, os.environ.get('DB_REPLICAS', '').split(',')), start=1):
+    alias = f'replica_{number}'
+    replica = {**DATABASES['default'], 'OPTIONS': dict(DATABASES['default']['OPTIONS'])}
+    replica[('HOST' if DB_ENGINE == 'postgres' else 'NAME')] = location.strip()
+    # Tests run replicas against the test database instead of a copy
+    replica['TEST'] = {'MIRROR': 'default'}
+    DATABASES[alias] = replica
+    MARKETPLACE_READ_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['marketplace.routers.ArchiveRouter', 'marketplace.routers.PrimaryReplicaRouter']
+
+
+# Cache
+# Dashboards, seller analytics, the catalog version and the page cache with
+# its locks are invalidated by deleting or bumping keys, so every process has
+# to share one cache. CACHE_BACKEND chooses it, at CACHE_LOCATION:
+# - redis: e.g. redis://127.0.0.1:6379/1; needs the redis package.
+# - memcached: host:port; needs pymemcache.
+# - database: a table, created with `manage.py createcachetable`.
+# The default, locmem, keeps a separate cache in each process. It is only
+# correct with a single process, e.g. runserver or one gunicorn worker.
+
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'locmem')
+
+# backend -> (Django backend, default location)
+CACHE_BACKENDS = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', 'marketplace'),
+    'redis': ('django.core.cache.backends.redis.RedisCache', 'redis://127.0.0.1:6379/1'),
+    'memcached': ('django.core.cache.backends.memcached.PyMemcacheCache', '127.0.0.1:11211'),
+    'database': ('django.core.cache.backends.db.DatabaseCache', 'marketplace_cache'),
+}
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': CACHE_BACKENDS[CACHE_BACKEND][0],
+        'LOCATION': os.environ.get('CACHE_LOCATION', CACHE_BACKENDS[CACHE_BACKEND][1]),
+        'KEY_PREFIX': os.environ.get('CACHE_KEY_PREFIX', ''),
     }
 }
 
 
+# Anonymous page cache
+# Catalog pages rendered for anonymous visitors are cached whole (see
+# marketplace.pagecache) until the catalog changes or they are older than
+# MARKETPLACE_PAGE_CACHE_SECONDS. For STALE_SECONDS more they are still served
+# while one request renders the fresh copy.
+
+MARKETPLACE_PAGE_CACHE_SECONDS = 60
+MARKETPLACE_PAGE_CACHE_STALE_SECONDS = 300
+
+# Product cards and detail page sections are cached per product and
+# Product.updated_at (see marketplace.fragments), for logged-in visitors too.
+
+MARKETPLACE_FRAGMENT_CACHE_SECONDS = 24 * 60 * 60
+
+
+# Request instrumentation
+# Query counts, SQL/template time and latency per URL name are kept in memory
+# (per process) and shown to staff at /admin/performance/. Requests issuing
+# more than QUERY_THRESHOLD queries are logged as warnings.
+
+MARKETPLACE_INSTRUMENTATION = True
+MARKETPLACE_INSTRUMENTATION_QUERY_THRESHOLD = 50
+
+
+# Prometheus metrics
+# Orders, checkout and search latency, credit top-ups, approvals, cache hits
+# and database connection wait are exported at /metrics (see
+# marketplace.metrics). With several worker processes, point
+# MARKETPLACE_METRICS_DIR at a directory they share and empty it on restart.
+# Scrapers authenticate with MARKETPLACE_METRICS_TOKEN as a bearer token;
+# without a token only logged-in staff can read /metrics.
+
+MARKETPLACE_METRICS_DIR = os.environ.get('MARKETPLACE_METRICS_DIR', '')
+MARKETPLACE_METRICS_TOKEN = os.environ.get('MARKETPLACE_METRICS_TOKEN', '')
+
+
+# History archive
+# Transactions, credit entries and orders older than the horizon are moved to
+# archive tables by `manage.py archive_history`. To keep them in a separate
+# SQLite file, add e.g. DATABASES['archive'] = {..., 'NAME': BASE_DIR / 'archive.sqlite3'},
+# set MARKETPLACE_ARCHIVE_DATABASE = 'archive' and run `migrate --database archive`.
+
+MARKETPLACE_ARCHIVE_DATABASE = 'default'
+MARKETPLACE_ARCHIVE_HORIZON_DAYS = 365
+
+
+# Bulk moderation jobs
+# Admin approve/reject actions enqueue a job processed in chunks. With ASYNC on,
+# jobs run in a background thread of the web process. With it off the admin
+# only enqueues them, and nothing runs them until a
+# `manage.py process_moderation_jobs --poll 5` worker is deployed. Workers
+# re-queue jobs left running for STALE_SECONDS, e.g. by a process that died.
+
+MARKETPLACE_MODERATION_ASYNC = True
+MARKETPLACE_MODERATION_CHUNK_SIZE = 500
+MARKETPLACE_MODERATION_STALE_SECONDS = 3600
+
+
+# Bulk product uploads
+# Seller CSV/XLSX uploads are imported in a background thread of the web
+# process, written to the database in batches of MARKETPLACE_IMPORT_BATCH_SIZE.
+# With ASYNC off the upload request imports the file itself.
+
+MARKETPLACE_IMPORT_ASYNC = True
+MARKETPLACE_IMPORT_BATCH_SIZE = 1000
+
+
+# Chunked document uploads
+# PAN/GST documents and purchase orders are sent in chunks of
+# MARKETPLACE_UPLOAD_CHUNK_SIZE bytes and written in place under MEDIA_ROOT;
+# an interrupted upload resumes from the last stored chunk. Abandoned uploads
+# are removed by `manage.py cleanup_uploads`.
+
+MARKETPLACE_UPLOAD_CHUNK_SIZE = 1024 * 1024
+MARKETPLACE_UPLOAD_MAX_SIZE = 50 * 1024 * 1024
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -120,6 +323,17 @@ STATIC_URL = 'static/'
 STATICFILES_DIRS = [BASE_DIR / 'static']
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
+# `manage.py collectstatic` writes content-hashed copies of each asset plus
+# .gz (and, with the brotli package, .br) variants; templates link the hashed
+# names. With DEBUG off the web process serves STATIC_ROOT itself, with
+# far-future caching for hashed names (see marketplace.staticfiles).
+
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'marketplace.staticfiles.CompressedManifestStaticFilesStorage'},
+}
+MARKETPLACE_SERVE_STATIC = not DEBUG
+
 # Media files
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
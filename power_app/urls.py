@@ -20,8 +20,10 @@ from django.conf import settings
 from django.conf.urls.static import static
 
 urlpatterns = [
-    path('admin/', admin.site.urls),
+    # Marketplace routes go first: its staff pages live under admin/ and would
+    # otherwise be swallowed by the admin site's catch-all view.
     path('', include('marketplace.urls')),
+    path('admin/', admin.site.urls),
 ]
 
 # Serve media files in development
@@ -6,6 +6,8 @@ document.addEventListener('DOMContentLoaded', function() {
     initPagination();
     initProductCards();
     initCustomization();
+    initChunkedUploads();
+    initAutocomplete();
 });
 
 function initFilters() {
@@ -252,3 +254,138 @@ window.MarketplaceJS = {
     showLoading,
     hideLoading
 };
+
+// Chunked document uploads: files picked in inputs marked data-chunked-upload
+// are sent in chunks as soon as they are chosen, resuming after dropped
+// connections, and the form then submits only the upload token.
+function initChunkedUploads() {
+    document.querySelectorAll('form[data-upload-start]').forEach(form => {
+        form.querySelectorAll('input[type="file"][data-chunked-upload]').forEach(input => {
+            const tokenInput = form.querySelector(`input[name="${input.name}_token"]`);
+            if (!tokenInput) {
+                return;
+            }
+            if (tokenInput.value) {
+                input.required = false;
+            }
+            input.addEventListener('change', function() {
+                if (this.files.length) {
+                    chunkedUpload(form, this, tokenInput);
+                }
+            });
+        });
+    });
+}
+
+function csrfToken(form) {
+    const field = form.querySelector('input[name="csrfmiddlewaretoken"]');
+    return field ? field.value : '';
+}
+
+async function sha256Hex(blob) {
+    if (!window.crypto || !window.crypto.subtle) {
+        return '';
+    }
+    const digest = await crypto.subtle.digest('SHA-256', await blob.arrayBuffer());
+    return Array.from(new Uint8Array(digest)).map(b => b.toString(16).padStart(2, '0')).join('');
+}
+
+async function chunkedUpload(form, input, tokenInput) {
+    const file = input.files[0];
+    const progress = form.querySelector(`[data-upload-progress="${input.dataset.chunkedUpload}"]`);
+    const bar = progress ? progress.querySelector('.progress-bar') : null;
+    const submit = form.querySelector('button[type="submit"]');
+    const headers = {'X-CSRFToken': csrfToken(form)};
+    const setProgress = (done) => {
+        if (bar) {
+            progress.classList.remove('d-none');
+            bar.style.width = `${Math.round(done * 100 / file.size)}%`;
+        }
+    };
+
+    tokenInput.value = '';
+    if (submit) submit.disabled = true;
+    try {
+        const body = new FormData();
+        body.append('purpose', input.dataset.chunkedUpload);
+        body.append('filename', file.name);
+        body.append('size', file.size);
+        let response = await fetch(form.dataset.uploadStart, {method: 'POST', headers, body});
+        let state = await response.json();
+        if (!response.ok) {
+            throw new Error(Object.values(state.errors || {}).flat().join(' ') || state.error);
+        }
+
+        let failures = 0;
+        while (state.status === 'uploading') {
+            const chunk = file.slice(state.offset, state.offset + state.chunk_size);
+            const data = new FormData();
+            data.append('chunk', chunk, file.name);
+            try {
+                response = await fetch(state.chunk_url, {
+                    method: 'POST',
+                    headers: {...headers, 'Upload-Offset': state.offset, 'Upload-Checksum': await sha256Hex(chunk)},
+                    body: data,
+                });
+                const next = await response.json();
+                if (response.ok || response.status === 409 || response.status === 422) {
+                    state = {...state, ...next};
+                    failures = response.ok ? 0 : failures + 1;
+                } else {
+                    throw new Error(next.error);
+                }
+            } catch (error) {
+                // Dropped connection: ask where the server got to and carry on
+                failures += 1;
+                if (failures > 5) throw error;
+                await new Promise(resolve => setTimeout(resolve, 1000 * failures));
+                response = await fetch(state.status_url);
+                if (response.ok) state = {...state, ...(await response.json())};
+            }
+            if (failures > 5) throw new Error('Upload failed, please try again.');
+            setProgress(state.offset);
+        }
+
+        tokenInput.value = state.token;
+        // The file itself no longer needs to be posted with the form
+        input.required = false;
+        input.value = '';
+        if (bar) bar.classList.add('bg-success');
+    } catch (error) {
+        showMessage(`Upload of ${file.name} failed: ${error.message}`, 'danger');
+        if (bar) bar.classList.add('bg-danger');
+    } finally {
+        if (submit) submit.disabled = false;
+    }
+}
+
+// Search suggestions: inputs with data-autocomplete fill their datalist from
+// the autocomplete endpoint as the user types, dropping stale responses.
+function initAutocomplete() {
+    document.querySelectorAll('input[data-autocomplete]').forEach(input => {
+        const datalist = document.getElementById(input.getAttribute('list'));
+        let timer = null;
+        let latest = 0;
+        input.addEventListener('input', function() {
+            clearTimeout(timer);
+            const term = this.value.trim();
+            if (!datalist || term.length < 2) {
+                return;
+            }
+            timer = setTimeout(async () => {
+                const request = ++latest;
+                const response = await fetch(`${input.dataset.autocomplete}?q=${encodeURIComponent(term)}`);
+                if (!response.ok || request !== latest) {
+                    return;
+                }
+                const suggestions = await response.json();
+                const names = [
+                    ...suggestions.products.map(product => product.name),
+                    ...suggestions.categories.map(category => category.name),
+                    ...suggestions.sellers.map(seller => seller.business_name),
+                ];
+                datalist.replaceChildren(...[...new Set(names)].map(name => new Option(name)));
+            }, 200);
+        });
+    });
+}